@@ -0,0 +1,115 @@
+"""
+Симуляция распределения заказов: рассылка всем / волны ближайшим водителям
+
+Водители и точки подачи случайно разбросаны вокруг центра Щецина. Каждый
+водитель, получив предложение, отвечает через случайное время и принимает
+заказ с вероятностью --accept. Заказ достается первому принявшему; если
+никто не принял за AUTO_CANCEL_SECONDS, заказ отменяется.
+
+Сравниваются среднее расстояние до подачи у принявшего водителя, время до
+принятия и число сообщений на заказ (предложения + «заказ принят другим»).
+Волны строятся тем же plan_waves, что и в DriverNotificationService.
+Запуск:
+    python bench_dispatch.py [--drivers 200] [--orders 2000] [--ring 5]
+"""
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+os.environ.setdefault('CLIENT_BOT_TOKEN', '123456:TEST-CLIENT-TOKEN')
+os.environ.setdefault('DRIVER_BOT_TOKEN', '654321:TEST-DRIVER-TOKEN')
+sys.path.insert(0, str(current_dir))
+
+from core.services.dispatch import plan_waves, WAVE_TIMEOUT
+from core.services.driver_notification import AUTO_CANCEL_SECONDS
+
+CENTER = (53.4285, 14.5528)     # Щецин
+CITY_RADIUS_KM = 10.0
+MEAN_RESPONSE_SECONDS = 15.0
+
+
+def random_point(rng: random.Random) -> tuple:
+    """Точка, равномерно распределенная в круге CITY_RADIUS_KM"""
+    distance = CITY_RADIUS_KM * math.sqrt(rng.random())
+    bearing = rng.uniform(0, 2 * math.pi)
+    lat = CENTER[0] + distance * math.cos(bearing) / 111.32
+    lon = CENTER[1] + distance * math.sin(bearing) / (111.32 * math.cos(math.radians(CENTER[0])))
+    return lat, lon
+
+
+def simulate(waves: list, distances: dict, behaviour: dict) -> tuple:
+    """Один заказ: (расстояние принявшего или None, время до принятия, сообщений)"""
+    offered = []
+    start = 0.0
+    best = None     # (время принятия, водитель)
+    for wave in waves:
+        offered.extend(wave)
+        for driver_id in wave:
+            response, accepts = behaviour[driver_id]
+            if accepts and (best is None or start + response < best[0]):
+                best = (start + response, driver_id)
+
+        # Следующая волна: по таймеру или сразу после отказа всей волны
+        wave_done = max(behaviour[driver_id][0] for driver_id in wave)
+        next_start = start + min(WAVE_TIMEOUT, wave_done)
+        if best is not None and best[0] <= next_start:
+            break
+        start = next_start
+        if start >= AUTO_CANCEL_SECONDS:
+            break
+
+    if best is None or best[0] > AUTO_CANCEL_SECONDS:
+        return None, None, len(offered)
+    # Остальным предложенным - уведомление «заказ принят другим»
+    return distances[best[1]], best[0], 2 * len(offered) - 1
+
+
+def run(label: str, plan_for, drivers: dict, orders: list, rng: random.Random, accept: float) -> None:
+    pickups, times, messages, served = [], [], [], 0
+    for pickup in orders:
+        behaviour = {
+            driver_id: (rng.expovariate(1 / MEAN_RESPONSE_SECONDS), rng.random() < accept)
+            for driver_id in drivers
+        }
+        waves = plan_for(pickup)
+        distances = plan_waves(drivers, drivers, pickup).distances
+        distance, accepted_after, sent = simulate(waves, distances, behaviour)
+        messages.append(sent)
+        if distance is not None:
+            served += 1
+            pickups.append(distance)
+            times.append(accepted_after)
+
+    print(f"   {label:<16} pickup {statistics.mean(pickups):5.2f} km   "
+          f"accept {statistics.mean(times):5.1f} s   "
+          f"messages/order {statistics.mean(messages):6.1f}   "
+          f"served {served / len(orders):6.1%}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--drivers", type=int, default=200)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--ring", type=int, default=5)
+    parser.add_argument("--accept", type=float, default=0.35)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    drivers = {driver_id: random_point(rng) for driver_id in range(1, args.drivers + 1)}
+    orders = [random_point(rng) for _ in range(args.orders)]
+
+    print(f"🚖 {args.drivers} водителей, {args.orders} заказов, волна {args.ring}, "
+          f"ответ ~{MEAN_RESPONSE_SECONDS:.0f} с, принимают {args.accept:.0%}")
+    run("broadcast", lambda pickup: [list(drivers)], drivers, orders, random.Random(args.seed), args.accept)
+    run(f"nearest-{args.ring}", lambda pickup: plan_waves(drivers, drivers, pickup, args.ring).waves,
+        drivers, orders, random.Random(args.seed), args.accept)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Бенчмарк расстояний: geopy.geodesic по парам / haversine_km в цикле /
+векторные ядра NumPy
+
+Меряется ранжирование одного заказа: расстояния от точки подачи до
+--drivers водителей вокруг центра Щецина. Для матрицы (--orders заказов x
+--drivers водителей) сравниваются цикл haversine_km и many_to_many ядра.
+
+Запуск:
+    python bench_distance.py [--drivers 500] [--orders 50] [--repeat 20]
+"""
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+os.environ.setdefault('CLIENT_BOT_TOKEN', '123456:TEST-CLIENT-TOKEN')
+os.environ.setdefault('DRIVER_BOT_TOKEN', '654321:TEST-DRIVER-TOKEN')
+sys.path.insert(0, str(current_dir))
+
+import numpy as np
+from geopy.distance import geodesic
+
+from core.utils.distance import (
+    haversine_one_to_many, haversine_many_to_many,
+    equirectangular_one_to_many, equirectangular_many_to_many
+)
+from core.utils.geo import haversine_km
+
+CENTER = (53.4285, 14.5528)     # Щецин
+CITY_RADIUS_KM = 15.0
+
+
+def random_points(rng: random.Random, count: int) -> tuple:
+    """Точки, равномерно распределенные в круге CITY_RADIUS_KM"""
+    lats, lons = [], []
+    for _ in range(count):
+        distance = CITY_RADIUS_KM * math.sqrt(rng.random())
+        bearing = rng.uniform(0, 2 * math.pi)
+        lats.append(CENTER[0] + distance * math.cos(bearing) / 111.32)
+        lons.append(CENTER[1] + distance * math.sin(bearing) / (111.32 * math.cos(math.radians(CENTER[0]))))
+    return lats, lons
+
+
+def timed(func, repeat: int) -> float:
+    """Медианное время вызова, мс"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    lats, lons = random_points(rng, args.drivers)
+    order_lats, order_lons = random_points(rng, args.orders)
+    lats_np, lons_np = np.array(lats), np.array(lons)
+    pickup = (order_lats[0], order_lons[0])
+
+    print(f"🧪 Один заказ, {args.drivers} водителей")
+    one_to_many = [
+        ('geodesic по парам', lambda: [geodesic(pickup, point).km for point in zip(lats, lons)]),
+        ('haversine_km в цикле', lambda: [haversine_km(pickup[0], pickup[1], lat, lon)
+                                          for lat, lon in zip(lats, lons)]),
+        ('haversine numpy', lambda: haversine_one_to_many(pickup[0], pickup[1], lats_np, lons_np)),
+        ('equirectangular numpy', lambda: equirectangular_one_to_many(pickup[0], pickup[1], lats_np, lons_np)),
+    ]
+    baseline = None
+    for name, func in one_to_many:
+        elapsed = timed(func, args.repeat if name != 'geodesic по парам' else max(3, args.repeat // 5))
+        baseline = baseline or elapsed
+        print(f"   {name:<24} {elapsed:>9.3f} мс  {elapsed * 1000 / args.drivers:>8.2f} µs/пара  "
+              f"x{baseline / elapsed:.0f}")
+
+    print(f"\n🧪 Матрица {args.orders} заказов x {args.drivers} водителей")
+    order_lats_np, order_lons_np = np.array(order_lats), np.array(order_lons)
+    many_to_many = [
+        ('haversine_km в цикле', lambda: [[haversine_km(o_lat, o_lon, lat, lon) for lat, lon in zip(lats, lons)]
+                                          for o_lat, o_lon in zip(order_lats, order_lons)]),
+        ('haversine numpy', lambda: haversine_many_to_many(order_lats_np, order_lons_np, lats_np, lons_np)),
+        ('equirectangular numpy', lambda: equirectangular_many_to_many(order_lats_np, order_lons_np,
+                                                                       lats_np, lons_np)),
+    ]
+    baseline = None
+    for name, func in many_to_many:
+        elapsed = timed(func, args.repeat)
+        baseline = baseline or elapsed
+        print(f"   {name:<24} {elapsed:>9.3f} мс  x{baseline / elapsed:.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--drivers', type=int, default=500)
+    parser.add_argument('--orders', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    main(parser.parse_args())
@@ -0,0 +1,116 @@
+"""
+Бенчмарк запросов к Maps API: новая сессия на запрос / общая сессия с пулом
+
+Локальная заглушка aiohttp отвечает как Geocoding API. Сравниваются:
+- per-request: как было раньше - aiohttp.ClientSession на каждый вызов,
+  каждый раз новое соединение;
+- shared: MapsService.reverse_geocode через общую сессию с keep-alive.
+
+Печатаются p50/p99 одного вызова и сколько TCP-соединений увидел сервер.
+На реальном API к каждому новому соединению добавляется TLS-рукопожатие,
+так что разница там больше, чем на локальной заглушке без TLS.
+
+Запуск:
+    python bench_maps_session.py [--calls 500] [--concurrency 10] [--delay-ms 0]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+os.environ.setdefault('CLIENT_BOT_TOKEN', '123456:TEST-CLIENT-TOKEN')
+os.environ.setdefault('DRIVER_BOT_TOKEN', '654321:TEST-DRIVER-TOKEN')
+sys.path.insert(0, str(current_dir))
+
+import aiohttp
+from aiohttp import web
+
+from core.services.maps_service import MapsService
+
+POINT = (53.4285, 14.5528)
+REPLY = {'status': 'OK', 'results': [{'formatted_address': 'Wały Chrobrego 1, 70-500 Szczecin, Polska'}]}
+
+
+async def start_stub(delay_ms: float):
+    """Заглушка Maps API на свободном порту: (runner, base_url, множество соединений)"""
+    connections = set()
+
+    async def geocode(request: web.Request) -> web.Response:
+        connections.add(request.transport.get_extra_info('peername'))
+        if delay_ms:
+            await asyncio.sleep(delay_ms / 1000)
+        return web.json_response(REPLY)
+
+    app = web.Application()
+    app.router.add_get('/maps/api/geocode/json', geocode)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/maps/api", connections
+
+
+async def per_request_call(service: MapsService) -> str:
+    """Старый вариант reverse_geocode: новая сессия на каждый запрос"""
+    params = {'latlng': f"{POINT[0]},{POINT[1]}", 'key': service.api_key, 'language': 'pl'}
+    async with aiohttp.ClientSession(timeout=service.timeout) as session:
+        async with session.get(f"{service.base_url}/geocode/json", params=params) as response:
+            data = await response.json()
+            return data['results'][0]['formatted_address']
+
+
+async def shared_call(service: MapsService) -> str:
+    return await service.reverse_geocode(*POINT)
+
+
+async def measure(call, service: MapsService, calls: int, concurrency: int) -> list:
+    """Задержки вызовов в мс при заданном числе одновременных запросов"""
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            address = await call(service)
+            latencies.append((time.perf_counter() - started) * 1000)
+            assert address == REPLY['results'][0]['formatted_address']
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return latencies
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def main(args):
+    runner, base_url, connections = await start_stub(args.delay_ms)
+    print(f"🧪 {args.calls} вызовов, одновременно {args.concurrency}, задержка сервера {args.delay_ms} мс")
+    print(f"{'режим':<12} {'p50, мс':>9} {'p99, мс':>9} {'соединений':>11}")
+    try:
+        for name, call in (('per-request', per_request_call), ('shared', shared_call)):
+            service = MapsService(api_key='bench', base_url=base_url)
+            connections.clear()
+            # Прогрев
+            await measure(call, service, args.concurrency, args.concurrency)
+            connections.clear()
+            latencies = await measure(call, service, args.calls, args.concurrency)
+            await service.close()
+            print(f"{name:<12} {statistics.median(latencies):>9.2f} {percentile(latencies, 0.99):>9.2f} "
+                  f"{len(connections):>11}")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--delay-ms', type=float, default=0.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,127 @@
+"""
+Бенчмарк чтения SharedOrderStorage: соединение на каждый вызов / постоянное соединение
+
+Прежняя реализация открывала sqlite3.connect на каждый вызов; сейчас чтение
+идет через постоянное WAL-соединение с кэшем подготовленных выражений.
+Запуск:
+    python bench_shared_storage.py [--orders 50] [--calls 2000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+os.environ.setdefault('CLIENT_BOT_TOKEN', '123456:TEST-CLIENT-TOKEN')
+os.environ.setdefault('DRIVER_BOT_TOKEN', '654321:TEST-DRIVER-TOKEN')
+sys.path.insert(0, str(current_dir))
+
+from core.services.driver_notification import SharedOrderStorage
+
+
+class PerCallStorage:
+    """Чтение как в прежней реализации: новое соединение на каждый вызов"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+
+    def get_order(self, order_id: int) -> dict:
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT order_data FROM pending_orders WHERE order_id = ?", (order_id,)
+            ).fetchone()
+            return json.loads(row[0]) if row else {}
+
+    def get_all_orders(self) -> list:
+        with sqlite3.connect(self.db_path) as conn:
+            return [row[0] for row in conn.execute("SELECT order_id FROM pending_orders").fetchall()]
+
+    def get_responses(self, order_id: int) -> dict:
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.execute(
+                "SELECT driver_id, response FROM driver_responses WHERE order_id = ?", (order_id,)
+            )
+            return {row[0]: row[1] for row in cursor.fetchall()}
+
+
+def measure(call, calls: int) -> list:
+    """Задержки одного вызова, микросекунды"""
+    samples = []
+    for i in range(calls):
+        started = time.perf_counter()
+        call(i)
+        samples.append((time.perf_counter() - started) * 1_000_000)
+    return samples
+
+
+async def measure_async(call, calls: int) -> list:
+    samples = []
+    for i in range(calls):
+        started = time.perf_counter()
+        await call(i)
+        samples.append((time.perf_counter() - started) * 1_000_000)
+    return samples
+
+
+def report(label: str, samples: list) -> float:
+    samples = sorted(samples)
+    p50 = statistics.median(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f"   {label:<26} p50 {p50:8.1f} µs   p99 {p99:8.1f} µs")
+    return p50
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="SharedOrderStorage read latency benchmark")
+    parser.add_argument('--orders', type=int, default=50, help="заказов в хранилище")
+    parser.add_argument('--calls', type=int, default=2000, help="вызовов на каждый метод")
+    args = parser.parse_args()
+
+    print("🧪 БЕНЧМАРК ЧТЕНИЯ SHARED ORDER STORAGE")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SharedOrderStorage(Path(tmp) / "shared_orders.db")
+        for order_id in range(args.orders):
+            storage.add_order(order_id, {'pickup_address': f"Pickup {order_id}", 'estimated_price': 25})
+            storage.add_response(order_id, 1000 + order_id, "reject")
+        legacy = PerCallStorage(storage.db_path)
+
+        cases = {
+            'get_order': (
+                lambda i: legacy.get_order(i % args.orders),
+                lambda i: storage.get_order(i % args.orders),
+                lambda i: storage.get_order_async(i % args.orders),
+            ),
+            'get_all_orders': (
+                lambda i: legacy.get_all_orders(),
+                lambda i: storage.get_all_orders(),
+                lambda i: storage.get_all_orders_async(),
+            ),
+            'get_responses': (
+                lambda i: legacy.get_responses(i % args.orders),
+                lambda i: storage.get_responses(i % args.orders),
+                lambda i: storage.get_responses_async(i % args.orders),
+            ),
+        }
+
+        for name, (per_call, persistent, persistent_async) in cases.items():
+            print(f"📊 {name}")
+            before = report("connect per call", measure(per_call, args.calls))
+            after = report("persistent connection", measure(persistent, args.calls))
+            report("persistent, async", await measure_async(persistent_async, args.calls))
+            print(f"   🚀 Ускорение синхронного вызова: x{before / after:.1f}")
+
+        storage.close()
+
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""
+Бенчмарк пропускной способности записи SQLite: PRAGMA-профиль выключен / включен
+
+Каждая запись - отдельная транзакция (как в обработчиках бота: одна поездка -
+один commit). Запуск:
+    python bench_sqlite_profile.py [--writers 8] [--writes 200]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from dataclasses import replace
+from decimal import Decimal
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+os.environ.setdefault('CLIENT_BOT_TOKEN', 'test_token')
+os.environ.setdefault('DRIVER_BOT_TOKEN', 'test_token')
+sys.path.insert(0, str(current_dir))
+
+from core.config import DatabaseConfig, SQLiteConfig
+from core.database import DatabaseManager
+from core.models import RideStatus
+from core.repositories.rides import RideRepository
+
+
+async def run_case(label: str, profile: SQLiteConfig, writers: int, writes: int) -> float:
+    """Один прогон на чистом файле БД, возвращает записей в секунду"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.db"
+        manager = DatabaseManager(DatabaseConfig(
+            url=f"sqlite+aiosqlite:///{db_path}",
+            sqlite=profile
+        ))
+        await manager.initialize()
+        rides = RideRepository(db=manager)
+
+        async def writer(worker_id: int) -> None:
+            for i in range(writes):
+                await rides.create(
+                    client_id=worker_id,
+                    user_id=worker_id,
+                    pickup_address=f"Pickup {i}",
+                    pickup_lat=53.4285,
+                    pickup_lng=14.5528,
+                    destination_address=f"Destination {i}",
+                    destination_lat=53.4389,
+                    destination_lng=14.5186,
+                    estimated_price=Decimal('25.00'),
+                    status=RideStatus.PENDING
+                )
+
+        started = time.perf_counter()
+        await asyncio.gather(*(writer(w) for w in range(writers)))
+        elapsed = time.perf_counter() - started
+
+        async with manager.async_engine.connect() as conn:
+            mode = (await conn.exec_driver_sql("PRAGMA journal_mode")).scalar()
+            sync_mode = (await conn.exec_driver_sql("PRAGMA synchronous")).scalar()
+        await manager.close()
+
+    total = writers * writes
+    rate = total / elapsed
+    print(f"📊 {label:<12} journal={mode:<8} synchronous={sync_mode}  "
+          f"{total} записей за {elapsed:.2f}s  →  {rate:,.0f} записей/с")
+    return rate
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="SQLite write throughput benchmark")
+    parser.add_argument('--writers', type=int, default=8, help="параллельных писателей")
+    parser.add_argument('--writes', type=int, default=200, help="записей на писателя")
+    args = parser.parse_args()
+
+    logging.getLogger('core').setLevel(logging.WARNING)
+
+    print("🧪 БЕНЧМАРК ЗАПИСИ SQLITE (commit на каждую запись)")
+    print("=" * 70)
+
+    tuned = SQLiteConfig()
+    baseline = replace(tuned, enabled=False)
+
+    off_rate = await run_case("profile off", baseline, args.writers, args.writes)
+    on_rate = await run_case("profile on", tuned, args.writers, args.writes)
+
+    print("=" * 70)
+    print(f"🚀 Ускорение: x{on_rate / off_rate:.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,7 +1,7 @@
 """
 Унифицированная конфигурация с валидацией и типизацией
 """
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional
 import os
 import sys
@@ -12,11 +12,73 @@ from datetime import time
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class SQLiteConfig:
+    """Профиль SQLite: PRAGMA, применяемые к каждому новому соединению"""
+    enabled: bool = True
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    busy_timeout_ms: int = 5000
+    cache_size_kb: int = 20000        # Отрицательное значение cache_size = размер в KiB
+    mmap_size: int = 268435456        # 256 MiB
+    temp_store: str = "MEMORY"
+
+    @classmethod
+    def from_env(cls) -> 'SQLiteConfig':
+        """Профиль из переменных окружения SQLITE_*"""
+        defaults = cls()
+        return cls(
+            enabled=os.getenv('SQLITE_TUNING', 'true').lower() == 'true',
+            journal_mode=os.getenv('SQLITE_JOURNAL_MODE', defaults.journal_mode),
+            synchronous=os.getenv('SQLITE_SYNCHRONOUS', defaults.synchronous),
+            busy_timeout_ms=int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', str(defaults.busy_timeout_ms))),
+            cache_size_kb=int(os.getenv('SQLITE_CACHE_SIZE_KB', str(defaults.cache_size_kb))),
+            mmap_size=int(os.getenv('SQLITE_MMAP_SIZE', str(defaults.mmap_size))),
+            temp_store=os.getenv('SQLITE_TEMP_STORE', defaults.temp_store)
+        )
+
+    def pragmas(self) -> list:
+        """Список PRAGMA для выполнения при подключении"""
+        return [
+            f"PRAGMA journal_mode={self.journal_mode}",
+            f"PRAGMA synchronous={self.synchronous}",
+            f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}",
+            f"PRAGMA cache_size=-{abs(int(self.cache_size_kb))}",
+            f"PRAGMA mmap_size={int(self.mmap_size)}",
+            f"PRAGMA temp_store={self.temp_store}",
+        ]
+
+
 @dataclass
 class DatabaseConfig:
     """Конфигурация базы данных"""
     url: str
     echo: bool = False
+    # Строгий режим: ошибка при открытии синхронной сессии внутри event loop
+    strict_async: bool = False
+    sqlite: SQLiteConfig = field(default_factory=SQLiteConfig)
+
+
+@dataclass
+class EventBusConfig:
+    """Шина событий заказов между процессами ботов"""
+    backend: str = "unix"             # unix | redis | none
+    socket_path: str = "data/events.sock"
+    redis_url: str = "redis://localhost:6379/0"
+    redis_stream: str = "taxi:order_events"
+    replay_size: int = 1000           # Событий в журнале для повтора после переподключения
+
+    @classmethod
+    def from_env(cls) -> 'EventBusConfig':
+        """Настройки из переменных окружения EVENT_BUS_*"""
+        defaults = cls()
+        return cls(
+            backend=os.getenv('EVENT_BUS_BACKEND', defaults.backend).lower(),
+            socket_path=os.getenv('EVENT_BUS_SOCKET', defaults.socket_path),
+            redis_url=os.getenv('EVENT_BUS_REDIS_URL', defaults.redis_url),
+            redis_stream=os.getenv('EVENT_BUS_REDIS_STREAM', defaults.redis_stream),
+            replay_size=int(os.getenv('EVENT_BUS_REPLAY_SIZE', str(defaults.replay_size)))
+        )
 
 
 @dataclass
@@ -31,6 +93,7 @@ class MapsConfig:
     api_key: str
     default_city: str = "Szczecin"
     default_country: str = "Poland"
+    reverse_grid_m: float = 25.0    # Шаг сетки кэша обратного геокодирования, метров
 
 
 @dataclass
@@ -101,6 +164,9 @@ class Config:
     driver_chat_id: str = "628521909"
     driver_ids: list = None
 
+    # Шина событий между ботами
+    event_bus: EventBusConfig = field(default_factory=EventBusConfig)
+
     @classmethod
     def from_env(cls, allow_missing_tokens: bool = False) -> 'Config':
         """Создание конфигурации из переменных окружения"""
@@ -127,7 +193,9 @@ class Config:
             db_url = os.getenv('DATABASE_URL', 'sqlite+aiosqlite:///data/database.db')
             database = DatabaseConfig(
                 url=db_url,
-                echo=os.getenv('DB_ECHO', 'false').lower() == 'true'
+                echo=os.getenv('DB_ECHO', 'false').lower() == 'true',
+                strict_async=os.getenv('DB_STRICT_ASYNC', 'false').lower() == 'true',
+                sqlite=SQLiteConfig.from_env()
             )
 
             # Клиентский бот
@@ -140,7 +208,8 @@ class Config:
             maps = MapsConfig(
                 api_key=maps_key,
                 default_city=os.getenv('DEFAULT_CITY', 'Szczecin'),
-                default_country=os.getenv('DEFAULT_COUNTRY', 'Poland')
+                default_country=os.getenv('DEFAULT_COUNTRY', 'Poland'),
+                reverse_grid_m=float(os.getenv('REVERSE_GEOCODE_GRID_M', '25'))
             )
 
             # Тарифы
@@ -162,7 +231,8 @@ class Config:
                 base_price_pln=float(os.getenv('BASE_PRICE_PLN', '5.0')),
                 price_per_km_pln=float(os.getenv('PRICE_PER_KM_PLN', '2.5')),
                 driver_chat_id=os.getenv('DRIVER_CHAT_ID', '628521909'),
-                driver_ids=driver_ids
+                driver_ids=driver_ids,
+                event_bus=EventBusConfig.from_env()
             )
 
         except Exception as e:
@@ -1,30 +1,155 @@
 """
 Управление базой данных с поддержкой синхронных и асинхронных операций
 """
+import asyncio
 import logging
+import threading
+import time
 from contextlib import asynccontextmanager, contextmanager
-from typing import AsyncGenerator, Optional, Generator
+from typing import AsyncGenerator, Optional, Generator, Dict, Any
 
 from sqlalchemy.ext.asyncio import (
     AsyncSession, AsyncEngine, async_sessionmaker, create_async_engine
 )
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker, Session as SyncSession
+from sqlalchemy.pool import QueuePool
 
-from .models import Base
-from .config import config
+from .migrations import run_migrations, current_version, LATEST_VERSION
+from .config import config, DatabaseConfig, SQLiteConfig
+from .exceptions import DatabaseError
 
 logger = logging.getLogger(__name__)
 
 
+class PoolStats:
+    """Статистика пула соединений: количество выдач и задержки"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Сброс счетчиков"""
+        with self._lock:
+            self.connects = 0
+            self.checkouts = 0
+            self.checkins = 0
+            self.checked_out = 0
+            self.wait_total_ms = 0.0
+            self.wait_max_ms = 0.0
+            self.hold_total_ms = 0.0
+            self.hold_max_ms = 0.0
+
+    def record_connect(self) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def record_checkout(self, wait_ms: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.wait_total_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+
+    def record_checkin(self, hold_ms: float) -> None:
+        with self._lock:
+            self.checkins += 1
+            self.checked_out = max(0, self.checked_out - 1)
+            self.hold_total_ms += hold_ms
+            self.hold_max_ms = max(self.hold_max_ms, hold_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Снимок счетчиков для логов и мониторинга"""
+        with self._lock:
+            return {
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'checked_out': self.checked_out,
+                'wait_avg_ms': round(self.wait_total_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                'wait_max_ms': round(self.wait_max_ms, 3),
+                'hold_avg_ms': round(self.hold_total_ms / self.checkins, 3) if self.checkins else 0.0,
+                'hold_max_ms': round(self.hold_max_ms, 3),
+            }
+
+
+class MonitoredQueuePool(QueuePool):
+    """QueuePool, замеряющий время ожидания свободного соединения"""
+
+    stats: Optional[PoolStats] = None
+
+    def connect(self):
+        started = time.perf_counter()
+        connection = super().connect()
+        if self.stats is not None:
+            self.stats.record_checkout((time.perf_counter() - started) * 1000)
+        return connection
+
+
+def _attach_pool_stats(engine: Engine, stats: PoolStats) -> None:
+    """Подписка на события пула: физические подключения и время удержания"""
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        stats.record_connect()
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info['checked_out_at'] = time.perf_counter()
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop('checked_out_at', None)
+        if started is not None:
+            stats.record_checkin((time.perf_counter() - started) * 1000)
+
+
+def _apply_sqlite_profile(engine: Engine, profile: SQLiteConfig) -> None:
+    """Выполнять PRAGMA профиля на каждом новом DBAPI-соединении SQLite.
+
+    journal_mode=WAL сохраняется в файле БД, остальные PRAGMA действуют
+    только в рамках соединения, поэтому ставим их через событие connect.
+    """
+    pragmas = profile.pragmas()
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
 class DatabaseManager:
     """Менеджер базы данных"""
 
-    def __init__(self):
+    def __init__(self, database_config: Optional[DatabaseConfig] = None):
+        self._database_config = database_config
         self._async_engine: Optional[AsyncEngine] = None
-        self._sync_engine: Optional[create_engine] = None
+        self._sync_engine: Optional[Engine] = None
         self._async_session_factory: Optional[async_sessionmaker[AsyncSession]] = None
         self._sync_session_factory: Optional[sessionmaker[SyncSession]] = None
+        self._sync_lock = threading.Lock()
+        self.pool_stats = PoolStats()
+
+    @property
+    def database_config(self) -> DatabaseConfig:
+        """Конфигурация БД: явно переданная или глобальная"""
+        return self._database_config or config.database
+
+    def _sqlite_profile(self, url: str) -> Optional[SQLiteConfig]:
+        """Профиль PRAGMA, если он включен и БД - файл SQLite"""
+        profile = self.database_config.sqlite
+        parsed = make_url(url)
+        if not profile.enabled or parsed.get_backend_name() != 'sqlite':
+            return None
+        if parsed.database in (None, '', ':memory:'):
+            return None
+        return profile
 
     @property
     def async_engine(self) -> AsyncEngine:
@@ -34,10 +159,9 @@ class DatabaseManager:
         return self._async_engine
 
     @property
-    def sync_engine(self):
-        """Получить синхронный движок базы данных"""
-        if self._sync_engine is None:
-            raise RuntimeError("Database not initialized. Call initialize() first.")
+    def sync_engine(self) -> Engine:
+        """Получить синхронный движок базы данных (один на процесс)"""
+        self._ensure_sync_engine()
         return self._sync_engine
 
     @property
@@ -49,23 +173,96 @@ class DatabaseManager:
 
     @property
     def sync_session_factory(self) -> sessionmaker[SyncSession]:
-        """Получить фабрику синхронных сессий"""
-        if self._sync_session_factory is None:
-            raise RuntimeError("Database not initialized. Call initialize() first.")
+        """Получить фабрику синхронных сессий (создается лениво, один раз на процесс)"""
+        self._ensure_sync_engine()
         return self._sync_session_factory
 
+    def _ensure_sync_engine(self) -> None:
+        """Ленивое создание общего синхронного движка с пулом соединений.
+
+        Старый код (core.models.Session) может открыть сессию до initialize(),
+        поэтому движок создается при первом обращении, а не только в initialize().
+        """
+        if self._sync_session_factory is not None:
+            return
+
+        with self._sync_lock:
+            if self._sync_session_factory is not None:
+                return
+
+            sync_url = self.database_config.url.replace('sqlite+aiosqlite:', 'sqlite:')
+            sync_engine_kwargs = {
+                'echo': self.database_config.echo,
+            }
+
+            url = make_url(sync_url)
+            if url.get_backend_name() == 'sqlite':
+                # Для in-memory SQLite оставляем пул по умолчанию (одно соединение на поток)
+                if url.database not in (None, '', ':memory:'):
+                    sync_engine_kwargs['poolclass'] = MonitoredQueuePool
+            else:
+                sync_engine_kwargs.update({
+                    'poolclass': MonitoredQueuePool,
+                    'pool_pre_ping': True,
+                    'pool_recycle': 3600
+                })
+
+            MonitoredQueuePool.stats = self.pool_stats
+            self._sync_engine = create_engine(
+                sync_url,
+                **sync_engine_kwargs
+            )
+            _attach_pool_stats(self._sync_engine, self.pool_stats)
+
+            profile = self._sqlite_profile(sync_url)
+            if profile is not None:
+                _apply_sqlite_profile(self._sync_engine, profile)
+
+            self._sync_session_factory = sessionmaker(
+                bind=self._sync_engine,
+                expire_on_commit=False
+            )
+            logger.info(f"Sync engine created: {url.render_as_string(hide_password=True)}")
+
+    def open_sync_session(self) -> SyncSession:
+        """Открыть синхронную сессию из общего пула.
+
+        В строгом режиме (DB_STRICT_ASYNC=true) запрещает открытие синхронной
+        сессии в потоке с работающим event loop: такой запрос блокирует всех
+        пользователей бота. Из отдельного потока (asyncio.to_thread) можно.
+        """
+        if self.database_config.strict_async:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                pass
+            else:
+                raise DatabaseError(
+                    "Sync session opened inside the running event loop",
+                    error_code="SYNC_SESSION_IN_LOOP"
+                )
+        return self.sync_session_factory()
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Статистика общего синхронного пула соединений"""
+        stats = self.pool_stats.snapshot()
+        if self._sync_engine is not None:
+            stats['pool_status'] = self._sync_engine.pool.status()
+        return stats
+
     async def initialize(self) -> None:
         """Инициализация базы данных"""
         try:
             logger.info("Initializing database connection...")
 
             # Создаем асинхронный движок
+            database_config = self.database_config
             engine_kwargs = {
-                'echo': config.database.echo,
+                'echo': database_config.echo,
             }
 
             # Connection pooling только для PostgreSQL/MySQL, не для SQLite
-            if not config.database.url.startswith('sqlite'):
+            if not database_config.url.startswith('sqlite'):
                 engine_kwargs.update({
                     'pool_size': 20,
                     'max_overflow': 30,
@@ -74,27 +271,18 @@ class DatabaseManager:
                 })
 
             self._async_engine = create_async_engine(
-                config.database.url,
+                database_config.url,
                 **engine_kwargs
             )
 
-            # Создаем синхронный движок для обратной совместимости
-            sync_url = config.database.url.replace('sqlite+aiosqlite:', 'sqlite:')
-            sync_engine_kwargs = {
-                'echo': config.database.echo,
-            }
+            # PRAGMA-профиль SQLite (WAL, synchronous, busy_timeout, кэш)
+            profile = self._sqlite_profile(database_config.url)
+            if profile is not None:
+                _apply_sqlite_profile(self._async_engine.sync_engine, profile)
+                logger.info(f"SQLite profile applied: {', '.join(profile.pragmas())}")
 
-            # Connection pooling только для PostgreSQL/MySQL, не для SQLite
-            if not sync_url.startswith('sqlite'):
-                sync_engine_kwargs.update({
-                    'pool_pre_ping': True,
-                    'pool_recycle': 3600
-                })
-
-            self._sync_engine = create_engine(
-                sync_url,
-                **sync_engine_kwargs
-            )
+            # Синхронный движок для обратной совместимости (общий на процесс)
+            self._ensure_sync_engine()
 
             # Создаем фабрики сессий
             self._async_session_factory = async_sessionmaker(
@@ -103,11 +291,6 @@ class DatabaseManager:
                 expire_on_commit=False
             )
 
-            self._sync_session_factory = sessionmaker(
-                bind=self._sync_engine,
-                expire_on_commit=False
-            )
-
             # Создаем таблицы если их нет
             await self.create_tables()
 
@@ -118,16 +301,27 @@ class DatabaseManager:
             raise
 
     async def create_tables(self) -> None:
-        """Создание таблиц"""
+        """Создание и миграция схемы.
+
+        При актуальной схеме - один запрос к schema_version; иначе недостающие
+        шаги core/migrations.py применяются в одной транзакции.
+        """
         try:
-            # Создаем таблицы асинхронно
-            async with self._async_engine.begin() as conn:
-                await conn.run_sync(Base.metadata.create_all)
+            async with self._async_engine.connect() as conn:
+                version = await conn.run_sync(current_version)
+
+            if version >= LATEST_VERSION:
+                logger.info(f"Database schema is current (version {version})")
+                return
 
-            # Также создаем синхронно для совместимости
-            Base.metadata.create_all(self._sync_engine)
+            async with self._async_engine.begin() as conn:
+                applied = await conn.run_sync(run_migrations)
 
-            logger.info("Database tables created/verified")
+            if applied:
+                logger.info(f"Database schema migrated to version {applied[-1].version}: "
+                            f"{', '.join(migration.name for migration in applied)}")
+            else:
+                logger.info(f"Database schema is current (version {LATEST_VERSION})")
         except Exception as e:
             logger.error(f"Failed to create tables: {e}")
             raise
@@ -137,6 +331,7 @@ class DatabaseManager:
         if self._async_engine:
             await self._async_engine.dispose()
         if self._sync_engine:
+            logger.info(f"Sync pool stats: {self.get_pool_stats()}")
             self._sync_engine.dispose()
         logger.info("Database connections closed")
 
@@ -156,7 +351,7 @@ class DatabaseManager:
     @contextmanager
     def get_sync_session(self) -> Generator[SyncSession, None, None]:
         """Контекстный менеджер для получения синхронной сессии"""
-        session = self.sync_session_factory()
+        session = self.open_sync_session()
         try:
             yield session
             session.commit()
@@ -203,7 +398,7 @@ class SessionContext:
     """Контекстный менеджер для совместимости с old Session()"""
 
     def __enter__(self):
-        self._session = db_manager.sync_session_factory()
+        self._session = db_manager.open_sync_session()
         return self._session
 
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -10,8 +10,8 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from core.states import AlcoholOrderState
 from core.services.user_service import UserService
-from core.models import User, Ride, RideStatus
-from core.database import get_session
+from core.models import User, RideStatus
+from core.repositories import ride_repository
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -38,17 +38,15 @@ async def test_service_directly():
         test_data = {'test': 'data'}
 
         print(f"📦 [ALCOHOL] Adding test order {test_order_id} directly to service...")
-        driver_notification_service.pending_orders[test_order_id] = test_data
+        await driver_notification_service.storage.add_order_async(test_order_id, test_data)
 
-        print(f"📊 [ALCOHOL] Pending orders after direct add: {list(driver_notification_service.pending_orders.keys())}")
-
-        if test_order_id in driver_notification_service.pending_orders:
+        if await driver_notification_service.has_order(test_order_id):
             print(f"✅ [ALCOHOL] Direct add to service works!")
         else:
             print(f"❌ [ALCOHOL] Direct add to service failed!")
 
         # Очистка
-        driver_notification_service.pending_orders.pop(test_order_id, None)
+        await driver_notification_service.storage.remove_order_async(test_order_id)
 
     except Exception as e:
         print(f"❌ [ALCOHOL] Direct service test failed: {e}")
@@ -166,34 +164,29 @@ def calculate_alcohol_delivery_price(distance: float) -> float:
 async def save_alcohol_order(user_id: int, order_data: dict) -> int:
     """Сохранить заказ алкоголя"""
     try:
-        async with get_session() as session:
-            # Используем модель Ride как основу для заказа
-            ride = Ride(
-                client_id=user_id,
-                user_id=user_id,  # Для совместимости
-                pickup_address="Alcohol Shop Delivery",
-                pickup_lat=53.4285,  # Координаты Щецина
-                pickup_lng=14.5528,
-                destination_address=order_data['address'],
-                destination_lat=53.4285,  # Примерные координаты
-                destination_lng=14.5528,
-                distance_km=order_data.get('distance', 5.0),
-                estimated_price=order_data['price'],
-                price=order_data['price'],  # Для совместимости
-                status=RideStatus.PENDING,
-                order_type="alcohol_delivery",
-                products=order_data['products'],
-                budget=order_data['budget'],
-                payment_method="cash",
-                notes=f"ALCOHOL DELIVERY - Products: {order_data['products']}, Budget: {order_data['budget']} zł"
-            )
-
-            session.add(ride)
-            await session.commit()
-            await session.refresh(ride)
+        # Используем модель Ride как основу для заказа
+        ride = await ride_repository.create(
+            client_id=user_id,
+            user_id=user_id,  # Для совместимости
+            pickup_address="Alcohol Shop Delivery",
+            pickup_lat=53.4285,  # Координаты Щецина
+            pickup_lng=14.5528,
+            destination_address=order_data['address'],
+            destination_lat=53.4285,  # Примерные координаты
+            destination_lng=14.5528,
+            distance_km=order_data.get('distance', 5.0),
+            estimated_price=order_data['price'],
+            price=order_data['price'],  # Для совместимости
+            status=RideStatus.PENDING,
+            order_type="alcohol_delivery",
+            products=order_data['products'],
+            budget=order_data['budget'],
+            payment_method="cash",
+            notes=f"ALCOHOL DELIVERY - Products: {order_data['products']}, Budget: {order_data['budget']} zł"
+        )
 
-            logger.info(f"Alcohol order saved: {ride.id}")
-            return ride.id
+        logger.info(f"Alcohol order saved: {ride.id}")
+        return ride.id
 
     except Exception as e:
         logger.error(f"Error saving alcohol order: {e}")
@@ -231,10 +224,7 @@ async def notify_driver_simple(order_id: int, order_data: dict):
         print(f"✅ [NOTIFY] notify_all_drivers completed")
 
         # Проверяем результат
-        pending = list(driver_notification_service.pending_orders.keys())
-        print(f"📊 [NOTIFY] Pending orders after notify_all_drivers: {pending}")
-
-        if order_id in driver_notification_service.pending_orders:
+        if await driver_notification_service.has_order(order_id):
             print(f"✅ [NOTIFY] SUCCESS: Order {order_id} is now in pending_orders")
         else:
             print(f"❌ [NOTIFY] FAILURE: Order {order_id} not in pending_orders")
@@ -248,7 +238,8 @@ async def notify_driver_simple(order_id: int, order_data: dict):
 
         # Fallback к старому методу
         try:
-            from core.bot_instance import Bots
+            from core.models import OutboxPriority
+            from core.services.outbox import enqueue_message
             from aiogram.utils.keyboard import InlineKeyboardBuilder
 
             builder = InlineKeyboardBuilder()
@@ -269,20 +260,23 @@ async def notify_driver_simple(order_id: int, order_data: dict):
             from config import Config
             for driver_id in Config.DRIVER_IDS:
                 try:
-                    await Bots.driver.send_message(
+                    await enqueue_message(
+                        "driver",
                         chat_id=int(driver_id),
                         text="🔊🔊🔊 NOWE ZAMÓWIENIE (FALLBACK)! 🔊🔊🔊",
-                        disable_notification=False
+                        disable_notification=False,
+                        priority=OutboxPriority.OFFER
                     )
 
-                    await asyncio.sleep(0.5)
-
-                    await Bots.driver.send_message(
+                    # Паузу между сигналом и заказом выдерживает лимит чата в outbox
+                    await enqueue_message(
+                        "driver",
                         chat_id=int(driver_id),
                         text=text,
                         reply_markup=builder.as_markup(),
                         parse_mode="HTML",
-                        disable_notification=False
+                        disable_notification=False,
+                        priority=OutboxPriority.OFFER
                     )
                     print(f"📨 [NOTIFY] Fallback notification sent to driver {driver_id}")
 
@@ -522,10 +516,7 @@ async def confirm_alcohol_order(callback: CallbackQuery, state: FSMContext):
             # Проверяем попал ли заказ в сервис
             try:
                 from core.services.driver_notification import driver_notification_service
-                pending = list(driver_notification_service.pending_orders.keys())
-                print(f"📊 [ALCOHOL] Pending orders after notify: {pending}")
-
-                if order_id in driver_notification_service.pending_orders:
+                if await driver_notification_service.has_order(order_id):
                     print(f"✅ [ALCOHOL] Order {order_id} successfully added to pending_orders")
                 else:
                     print(f"❌ [ALCOHOL] Order {order_id} NOT found in pending_orders!")
@@ -9,7 +9,7 @@ from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery, ReplyKeyboardRemove
 
-from core.services import UserService, MapsService, PriceCalculatorService, Location
+from core.services import UserService, maps_service, PriceCalculatorService, Location
 from core.models import UserRole
 from core.exceptions import NotFoundError
 from core.utils.localization import get_text, Language
@@ -26,7 +26,6 @@ city_ride_router = Router()
 
 # Создаем сервисы
 user_service = UserService()
-maps_service = MapsService()
 price_calculator = PriceCalculatorService()
 
 
@@ -280,46 +279,43 @@ async def confirm_ride(callback: CallbackQuery, state: FSMContext) -> None:
 
         # Сохраняем заказ в базу данных
         try:
-            from core.models import Ride, RideStatus
-            from core.database import get_session
-
-            async with get_session() as session:
-                ride = Ride(
-                    client_id=callback.from_user.id,
-                    user_id=callback.from_user.id,  # Для совместимости
-                    pickup_address=pickup_location.address,
-                    pickup_lat=pickup_location.latitude,
-                    pickup_lng=pickup_location.longitude,
-                    destination_address=destination_location.address,
-                    destination_lat=destination_location.latitude,
-                    destination_lng=destination_location.longitude,
-                    distance_km=route_info.distance_km,
-                    duration_minutes=route_info.duration_minutes,
-                    estimated_price=estimated_price,
-                    price=estimated_price,  # Для совместимости
-                    status=RideStatus.PENDING,
-                    passengers_count=passengers_count,
-                    order_type="city_ride",
-                    payment_method="cash"
-                )
-
-                session.add(ride)
-                await session.commit()
-                await session.refresh(ride)
+            from core.models import RideStatus
+            from core.repositories import ride_repository
+
+            ride = await ride_repository.create(
+                client_id=callback.from_user.id,
+                user_id=callback.from_user.id,  # Для совместимости
+                pickup_address=pickup_location.address,
+                pickup_lat=pickup_location.latitude,
+                pickup_lng=pickup_location.longitude,
+                destination_address=destination_location.address,
+                destination_lat=destination_location.latitude,
+                destination_lng=destination_location.longitude,
+                distance_km=route_info.distance_km,
+                duration_minutes=route_info.duration_minutes,
+                estimated_price=estimated_price,
+                price=estimated_price,  # Для совместимости
+                status=RideStatus.PENDING,
+                passengers_count=passengers_count,
+                order_type="city_ride",
+                payment_method="cash"
+            )
 
-                logger.info(f"Ride saved to database: {ride.id}")
+            logger.info(f"Ride saved to database: {ride.id}")
 
-                # Отправляем уведомление водителям через новый сервис
-                from core.services.driver_notification import driver_notification_service
+            # Отправляем уведомление водителям через новый сервис
+            from core.services.driver_notification import driver_notification_service
 
-                await driver_notification_service.notify_all_drivers(ride.id, {
-                    'pickup_address': pickup_location.address,
-                    'destination_address': destination_location.address,
-                    'distance_km': route_info.distance_km,
-                    'estimated_price': estimated_price,
-                    'passengers_count': passengers_count,
-                    'order_type': 'city_ride'
-                })
+            await driver_notification_service.notify_all_drivers(ride.id, {
+                'pickup_address': pickup_location.address,
+                'pickup_lat': pickup_location.latitude,
+                'pickup_lng': pickup_location.longitude,
+                'destination_address': destination_location.address,
+                'distance_km': route_info.distance_km,
+                'estimated_price': estimated_price,
+                'passengers_count': passengers_count,
+                'order_type': 'city_ride'
+            })
 
         except Exception as e:
             logger.error(f"Error saving ride: {e}")
@@ -353,7 +349,8 @@ async def confirm_ride(callback: CallbackQuery, state: FSMContext) -> None:
 async def notify_driver_about_ride(ride_id: int, ride_data: dict):
     """Уведомление водителя о новом заказе такси"""
     try:
-        from core.bot_instance import Bots
+        from core.models import OutboxPriority
+        from core.services.outbox import enqueue_message
         from core.config import Config
         from aiogram.utils.keyboard import InlineKeyboardBuilder
 
@@ -371,11 +368,13 @@ async def notify_driver_about_ride(ride_id: int, ride_data: dict):
             f"⏰ <b>Czas na odpowiedź:</b> 60 sekund"
         )
 
-        await Bots.driver.send_message(
+        await enqueue_message(
+            "driver",
             chat_id=Config.DRIVER_CHAT_ID,
             text=text,
             reply_markup=builder.as_markup(),
-            parse_mode="HTML"
+            parse_mode="HTML",
+            priority=OutboxPriority.OFFER
         )
 
         logger.info(f"Driver notified about ride {ride_id}")
@@ -387,7 +386,8 @@ async def notify_driver_about_ride(ride_id: int, ride_data: dict):
 async def notify_driver_about_ride(ride_id: int, ride_data: dict):
     """Уведомление водителя о новом заказе такси"""
     try:
-        from core.bot_instance import Bots
+        from core.models import OutboxPriority
+        from core.services.outbox import enqueue_message
         from core.config import Config
         from aiogram.utils.keyboard import InlineKeyboardBuilder
 
@@ -405,11 +405,13 @@ async def notify_driver_about_ride(ride_id: int, ride_data: dict):
             f"⏰ <b>Czas na odpowiedź:</b> 60 sekund"
         )
 
-        await Bots.driver.send_message(
+        await enqueue_message(
+            "driver",
             chat_id=Config.DRIVER_CHAT_ID,
             text=text,
             reply_markup=builder.as_markup(),
-            parse_mode="HTML"
+            parse_mode="HTML",
+            priority=OutboxPriority.OFFER
         )
 
         logger.info(f"Driver notified about ride {ride_id}")
@@ -7,9 +7,13 @@ from aiogram.filters import StateFilter
 from aiogram.types import CallbackQuery, Message, Location
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from core.models import Session, Ride as Order
-from core.bot_instance import Bots
-from core.services.maps_service import MapsService, Location as MapLocation
+from core.models import RideStatus, OutboxPriority
+from core.repositories import ride_repository, ACTIVE_RIDE_STATUSES
+from core.services.active_rides import active_ride_index
+from core.services.availability import driver_availability
+from core.services.ride_state import ride_state_machine
+from core.services.outbox import outbox_message, enqueue_message
+from core.services.maps_service import maps_service, Location as MapLocation
 from core.services.price_calculator import PriceCalculatorService
 from core.keyboards import (
     get_client_ride_keyboard,
@@ -24,7 +28,6 @@ from core.models import UserRole
 
 logger = logging.getLogger(__name__)
 taxi_router = Router()
-maps_service = MapsService()
 
 
 async def get_user_language_simple(user_id: int) -> str:
@@ -177,39 +180,31 @@ async def confirm_ride(callback: CallbackQuery, state: FSMContext):
             return
 
         # Создаем заказ в базе данных
-        with Session() as session:
-            from core.models import Ride
-            from datetime import datetime
+        price_service = PriceCalculatorService()
 
-            price_service = PriceCalculatorService()
-
-            # Рассчитываем стоимость
-            pickup_loc = data['pickup_location']
-            dest_loc = data['destination_location']
-            distance = pickup_loc.distance_to(dest_loc)
-            estimated_price = price_service.calculate_price(distance)
-
-            # Создаем заказ
-            order = Ride(
-                client_id=callback.from_user.id,
-                pickup_address=pickup_loc.address,
-                pickup_lat=pickup_loc.latitude,
-                pickup_lng=pickup_loc.longitude,
-                destination_address=dest_loc.address,
-                destination_lat=dest_loc.latitude,
-                destination_lng=dest_loc.longitude,
-                distance_km=distance,
-                estimated_price=estimated_price,
-                passengers_count=data['passengers_count'],
-                status="pending",
-                order_type="city_ride"
-            )
+        # Рассчитываем стоимость
+        pickup_loc = data['pickup_location']
+        dest_loc = data['destination_location']
+        distance = pickup_loc.distance_to(dest_loc)
+        estimated_price = price_service.calculate_price(distance)
 
-            session.add(order)
-            session.commit()
-            session.refresh(order)
+        # Создаем заказ
+        order = await ride_repository.create(
+            client_id=callback.from_user.id,
+            pickup_address=pickup_loc.address,
+            pickup_lat=pickup_loc.latitude,
+            pickup_lng=pickup_loc.longitude,
+            destination_address=dest_loc.address,
+            destination_lat=dest_loc.latitude,
+            destination_lng=dest_loc.longitude,
+            distance_km=distance,
+            estimated_price=estimated_price,
+            passengers_count=data['passengers_count'],
+            status=RideStatus.PENDING,
+            order_type="city_ride"
+        )
 
-            order_id = order.id
+        order_id = order.id
 
         # Отправляем заказ водителям через сервис уведомлений если доступен
         try:
@@ -219,6 +214,8 @@ async def confirm_ride(callback: CallbackQuery, state: FSMContext):
                 'order_id': order_id,
                 'client_id': callback.from_user.id,
                 'pickup_address': pickup_loc.address,
+                'pickup_lat': pickup_loc.latitude,
+                'pickup_lng': pickup_loc.longitude,
                 'destination_address': dest_loc.address,
                 'distance_km': distance,
                 'estimated_price': float(estimated_price),
@@ -245,11 +242,13 @@ async def confirm_ride(callback: CallbackQuery, state: FSMContext):
                 f"📏 Dystans: {distance:.1f} km"
             )
 
-            await Bots.driver.send_message(
+            await enqueue_message(
+                "driver",
                 chat_id=Config.DRIVER_CHAT_ID,
                 text=notification_text,
                 reply_markup=builder.as_markup(),
-                parse_mode="HTML"
+                parse_mode="HTML",
+                priority=OutboxPriority.OFFER
             )
 
         # Обновляем сообщение клиента
@@ -286,68 +285,67 @@ async def request_stop(callback: CallbackQuery):
     try:
         print(f"🛑 [CLIENT] Stop request from passenger {callback.from_user.id}")
 
-        with Session() as session:
-            order = session.query(Order).filter_by(
-                client_id=callback.from_user.id,
-                status="in_progress"
-            ).order_by(Order.created_at.desc()).first()
-
-            if not order or not order.driver_id:
-                await callback.answer("❌ Активная поездка не найдена")
-                return
+        order = await ride_repository.get_active_for_client(
+            callback.from_user.id, (RideStatus.IN_PROGRESS,)
+        )
 
-            print(f"🎯 [CLIENT] Found active ride {order.id} with driver {order.driver_id}")
+        if not order or not order.driver_id:
+            await callback.answer("❌ Активная поездка не найдена")
+            return
 
-            # Проверяем, не активен ли уже счетчик ожидания
-            try:
-                from core.handlers.driver.ride_handlers import waiting_timers
-                if order.id in waiting_timers:
-                    await callback.answer("⏰ Licznik oczekiwania już jest aktywny")
-                    return
-            except ImportError:
-                print("⚠️ [CLIENT] Could not import waiting_timers, continuing anyway")
+        print(f"🎯 [CLIENT] Found active ride {order.id} with driver {order.driver_id}")
 
-            # Создаем клавиатуру для водителя
-            builder = InlineKeyboardBuilder()
-            builder.button(text="⏸️ Zatrzymaj i uruchom licznik", callback_data="accept_waiting")
-            builder.button(text="❌ Nie mogę się zatrzymać", callback_data="decline_waiting")
-            builder.adjust(1)
-
-            # Уведомляем водителя о запросе остановки
-            passenger_name = callback.from_user.first_name or f"ID {callback.from_user.id}"
-
-            driver_message = (
-                "⏸️ <b>PASAŻER PROSI O ZATRZYMANIE</b>\n\n"
-                f"🚖 <b>ID podróży:</b> {order.id}\n"
-                f"👤 <b>Pasażer:</b> {passenger_name}\n"
-                f"📍 <b>Trasa:</b> {order.pickup_address} → {order.destination_address}\n\n"
-                "⏰ <b>Taryfa oczekiwania:</b> 1 zł/minuta\n\n"
-                "Wybierz działanie:"
-            )
+        # Проверяем, не активен ли уже счетчик ожидания
+        try:
+            from core.handlers.driver.ride_handlers import waiting_timers
+            if order.id in waiting_timers:
+                await callback.answer("⏰ Licznik oczekiwania już jest aktywny")
+                return
+        except ImportError:
+            print("⚠️ [CLIENT] Could not import waiting_timers, continuing anyway")
+
+        # Создаем клавиатуру для водителя
+        builder = InlineKeyboardBuilder()
+        builder.button(text="⏸️ Zatrzymaj i uruchom licznik", callback_data="accept_waiting")
+        builder.button(text="❌ Nie mogę się zatrzymać", callback_data="decline_waiting")
+        builder.adjust(1)
+
+        # Уведомляем водителя о запросе остановки
+        passenger_name = callback.from_user.first_name or f"ID {callback.from_user.id}"
+
+        driver_message = (
+            "⏸️ <b>PASAŻER PROSI O ZATRZYMANIE</b>\n\n"
+            f"🚖 <b>ID podróży:</b> {order.id}\n"
+            f"👤 <b>Pasażer:</b> {passenger_name}\n"
+            f"📍 <b>Trasa:</b> {order.pickup_address} → {order.destination_address}\n\n"
+            "⏰ <b>Taryfa oczekiwania:</b> 1 zł/minuta\n\n"
+            "Wybierz działanie:"
+        )
 
-            await Bots.driver.send_message(
-                chat_id=order.driver_id,
-                text=driver_message,
-                parse_mode="HTML",
-                reply_markup=builder.as_markup()
-            )
+        await enqueue_message(
+            "driver",
+            chat_id=order.driver_id,
+            text=driver_message,
+            parse_mode="HTML",
+            reply_markup=builder.as_markup()
+        )
 
-            print(f"📢 [CLIENT] Sent stop request to driver {order.driver_id}")
+        print(f"📢 [CLIENT] Sent stop request to driver {order.driver_id}")
 
-            # Уведомляем пассажира
-            passenger_message = (
-                "⏸️ <b>Prośba o zatrzymanie wysłana!</b>\n\n"
-                "⏰ <b>Taryfa oczekiwania:</b> 1 zł/minuta\n\n"
-                "Czekamy na odpowiedź kierowcy..."
-            )
+        # Уведомляем пассажира
+        passenger_message = (
+            "⏸️ <b>Prośba o zatrzymanie wysłana!</b>\n\n"
+            "⏰ <b>Taryfa oczekiwania:</b> 1 zł/minuta\n\n"
+            "Czekamy na odpowiedź kierowcy..."
+        )
 
-            await callback.message.edit_text(
-                text=passenger_message,
-                parse_mode="HTML"
-            )
+        await callback.message.edit_text(
+            text=passenger_message,
+            parse_mode="HTML"
+        )
 
-            await callback.answer("✅ Prośba wysłana do kierowcy")
-            print(f"✅ [CLIENT] Stop request processed successfully")
+        await callback.answer("✅ Prośba wysłana do kierowcy")
+        print(f"✅ [CLIENT] Stop request processed successfully")
 
     except Exception as e:
         logger.error(f"Error requesting stop: {e}")
@@ -362,36 +360,34 @@ async def show_current_location_enhanced(callback: CallbackQuery):
         print(f"📍 [CLIENT] Location request from passenger {callback.from_user.id}")
 
         # Находим активную поездку пассажира
-        with Session() as session:
-            order = session.query(Order).filter(
-                Order.client_id == callback.from_user.id,
-                Order.status.in_(["accepted", "driver_arrived", "in_progress"])
-            ).order_by(Order.created_at.desc()).first()
-
-            if not order or not order.driver_id:
-                await callback.answer("❌ Активная поездка не найдена")
-                return
+        order = await active_ride_index.for_client(callback.from_user.id)
 
-            # Запрашиваем у водителя текущее местоположение
-            await Bots.driver.send_message(
-                chat_id=order.driver_id,
-                text=(
-                    "📍 <b>PASAŻER PROSI O LOKALIZACJĘ</b>\n\n"
-                    "Pasażer chce poznać Twoją aktualną lokalizację.\n"
-                    "Naciśnij przycisk 'Транслировать геопозицию' aby wysłać swoją lokalizację."
-                ),
-                parse_mode="HTML"
-            )
+        if not order or not order.driver_id:
+            await callback.answer("❌ Активная поездка не найдена")
+            return
 
-            await callback.answer("✅ Poproszono kierowcę o lokalizację")
+        # Запрашиваем у водителя текущее местоположение
+        await enqueue_message(
+            "driver",
+            chat_id=order.driver_id,
+            text=(
+                "📍 <b>PASAŻER PROSI O LOKALIZACJĘ</b>\n\n"
+                "Pasażer chce poznać Twoją aktualną lokalizację.\n"
+                "Naciśnij przycisk 'Транслировать геопозицию' aby wysłać swoją lokalizację."
+            ),
+            parse_mode="HTML",
+            priority=OutboxPriority.STATUS
+        )
 
-            await callback.message.edit_text(
-                "📍 <b>Prośba o lokalizację wysłana</b>\n\n"
-                "Poproszono kierowcę o przesłanie aktualnej lokalizacji.",
-                parse_mode="HTML"
-            )
+        await callback.answer("✅ Poproszono kierowcę o lokalizację")
 
-            print(f"📍 [CLIENT] Location request sent to driver {order.driver_id}")
+        await callback.message.edit_text(
+            "📍 <b>Prośba o lokalizację wysłana</b>\n\n"
+            "Poproszono kierowcę o przesłanie aktualnej lokalizacji.",
+            parse_mode="HTML"
+        )
+
+        print(f"📍 [CLIENT] Location request sent to driver {order.driver_id}")
 
     except Exception as e:
         logger.error(f"Error requesting current location: {e}")
@@ -405,35 +401,34 @@ async def passenger_ready_to_continue(callback: CallbackQuery):
         print(f"✅ [CLIENT] Passenger ready to continue: {callback.from_user.id}")
 
         # Находим активную поездку пассажира
-        with Session() as session:
-            order = session.query(Order).filter(
-                Order.client_id == callback.from_user.id,
-                Order.status == "in_progress"
-            ).order_by(Order.created_at.desc()).first()
-
-            if not order or not order.driver_id:
-                await callback.answer("❌ Активная поездка не найдена")
-                return
+        order = await active_ride_index.for_client(
+            callback.from_user.id, (RideStatus.IN_PROGRESS,)
+        )
 
-            # Уведомляем водителя
-            await Bots.driver.send_message(
-                chat_id=order.driver_id,
-                text=(
-                    "✅ <b>PASAŻER GOTOWY DO KONTYNUACJI</b>\n\n"
-                    "Pasażer jest gotowy do kontynuacji podróży.\n"
-                    "Możesz zakończyć oczekiwanie i kontynuować jazdę."
-                ),
-                parse_mode="HTML"
-            )
+        if not order or not order.driver_id:
+            await callback.answer("❌ Активная поездка не найдена")
+            return
 
-            await callback.message.edit_text(
-                "✅ <b>Kierowca został powiadomiony</b>\n\n"
-                "Poinformowaliśmy kierowcę, że jesteś gotowy do kontynuacji podróży.",
-                parse_mode="HTML"
-            )
+        # Уведомляем водителя
+        await enqueue_message(
+            "driver",
+            chat_id=order.driver_id,
+            text=(
+                "✅ <b>PASAŻER GOTOWY DO KONTYNUACJI</b>\n\n"
+                "Pasażer jest gotowy do kontynuacji podróży.\n"
+                "Możesz zakończyć oczekiwanie i kontynuować jazdę."
+            ),
+            parse_mode="HTML"
+        )
+
+        await callback.message.edit_text(
+            "✅ <b>Kierowca został powiadomiony</b>\n\n"
+            "Poinformowaliśmy kierowcę, że jesteś gotowy do kontynuacji podróży.",
+            parse_mode="HTML"
+        )
 
-            await callback.answer("✅ Kierowca został powiadomiony")
-            print(f"📢 [CLIENT] Notified driver {order.driver_id} that passenger is ready")
+        await callback.answer("✅ Kierowca został powiadomiony")
+        print(f"📢 [CLIENT] Notified driver {order.driver_id} that passenger is ready")
 
     except Exception as e:
         logger.error(f"Error notifying driver passenger ready: {e}")
@@ -447,42 +442,40 @@ async def check_waiting_cost_passenger(callback: CallbackQuery):
         print(f"📊 [CLIENT] Passenger checking waiting cost: {callback.from_user.id}")
 
         # Находим активную поездку пассажира
-        with Session() as session:
-            order = session.query(Order).filter(
-                Order.client_id == callback.from_user.id,
-                Order.status == "in_progress"
-            ).order_by(Order.created_at.desc()).first()
-
-            if not order:
-                await callback.answer("❌ Активная поездка не найдена")
-                return
+        order = await active_ride_index.for_client(
+            callback.from_user.id, (RideStatus.IN_PROGRESS,)
+        )
+
+        if not order:
+            await callback.answer("❌ Активная поездка не найдена")
+            return
 
-            # Ищем активный счетчик для этой поездки
-            try:
-                from core.handlers.driver.ride_handlers import waiting_timers
-                from datetime import datetime
-
-                if order.id in waiting_timers:
-                    start_time = waiting_timers[order.id]['start_time']
-                    current_time = datetime.now()
-                    elapsed = current_time - start_time
-                    minutes = int(elapsed.total_seconds() / 60)
-                    cost = max(1, minutes)  # Минимум 1 минута
-
-                    text = (
-                        f"📊 <b>AKTUALNY KOSZT OCZEKIWANIA</b>\n\n"
-                        f"⏰ <b>Rozpoczęto:</b> {start_time.strftime('%H:%M:%S')}\n"
-                        f"⏱️ <b>Upłynęło:</b> {minutes} min\n"
-                        f"💰 <b>Koszt:</b> {cost} zł\n\n"
-                        f"<i>Taryfa: 1 zł za minutę</i>"
-                    )
-                else:
-                    text = "ℹ️ Licznik oczekiwania nie jest aktywny"
-
-            except ImportError:
-                text = "⚠️ Informacje o oczekiwaniu niedostępne"
-
-            await callback.answer(text, show_alert=True)
+        # Ищем активный счетчик для этой поездки
+        try:
+            from core.handlers.driver.ride_handlers import waiting_timers
+            from datetime import datetime
+
+            if order.id in waiting_timers:
+                start_time = waiting_timers[order.id]['start_time']
+                current_time = datetime.now()
+                elapsed = current_time - start_time
+                minutes = int(elapsed.total_seconds() / 60)
+                cost = max(1, minutes)  # Минимум 1 минута
+
+                text = (
+                    f"📊 <b>AKTUALNY KOSZT OCZEKIWANIA</b>\n\n"
+                    f"⏰ <b>Rozpoczęto:</b> {start_time.strftime('%H:%M:%S')}\n"
+                    f"⏱️ <b>Upłynęło:</b> {minutes} min\n"
+                    f"💰 <b>Koszt:</b> {cost} zł\n\n"
+                    f"<i>Taryfa: 1 zł za minutę</i>"
+                )
+            else:
+                text = "ℹ️ Licznik oczekiwania nie jest aktywny"
+
+        except ImportError:
+            text = "⚠️ Informacje o oczekiwaniu niedostępne"
+
+        await callback.answer(text, show_alert=True)
 
     except Exception as e:
         logger.error(f"Error checking waiting cost for passenger: {e}")
@@ -498,40 +491,39 @@ async def cancel_ride_client(callback: CallbackQuery, state: FSMContext):
     """Отмена заказа клиентом"""
     try:
         # Получаем активный заказ клиента
-        with Session() as session:
-            order = session.query(Order).filter_by(
-                client_id=callback.from_user.id
-            ).filter(Order.status.in_(["pending", "accepted", "driver_arrived"])).order_by(
-                Order.created_at.desc()).first()
-
-            if not order:
-                await callback.answer("❌ Активный заказ не найден")
-                return
+        cancellable = (RideStatus.PENDING, RideStatus.ACCEPTED, RideStatus.DRIVER_ARRIVED)
+        active = await active_ride_index.for_client(callback.from_user.id, cancellable)
 
-            order.status = "cancelled"
-            order.cancellation_reason = "Cancelled by client"
-            from datetime import datetime
-            order.cancelled_at = datetime.now()
-            session.commit()
-
-            # Уведомляем водителя, если заказ был принят
-            if order.driver_id:
-                try:
-                    await Bots.driver.send_message(
-                        chat_id=order.driver_id,
-                        text=f"❌ <b>Заказ #{order.id} отменен пассажиром</b>",
-                        parse_mode="HTML"
-                    )
-                except:
-                    pass
-
-            await callback.message.edit_text(
-                "❌ <b>Zamówienie anulowane</b>\n\n"
-                "Twoje zamówienie zostało pomyślnie anulowane.",
+        if not active:
+            await callback.answer("❌ Активный заказ не найден")
+            return
+
+        def notify_driver(order):
+            """Уведомление водителя, если заказ был принят - в outbox"""
+            if not order.driver_id:
+                return []
+            return [outbox_message(
+                "driver",
+                order.driver_id,
+                f"❌ <b>Заказ #{order.id} отменен пассажиром</b>",
                 parse_mode="HTML"
-            )
-            await callback.answer("✅ Zamówienie anulowane")
-            await state.clear()
+            )]
+
+        # Атомарная отмена: не перезаписывает уже начатую или завершенную поездку
+        result = await ride_state_machine.cancel(
+            active.ride_id, "Cancelled by client", expected=cancellable, outbox=notify_driver
+        )
+        if not result.won:
+            await callback.answer("❌ Активный заказ не найден")
+            return
+
+        await callback.message.edit_text(
+            "❌ <b>Zamówienie anulowane</b>\n\n"
+            "Twoje zamówienie zostało pomyślnie anulowane.",
+            parse_mode="HTML"
+        )
+        await callback.answer("✅ Zamówienie anulowane")
+        await state.clear()
 
     except Exception as e:
         logger.error(f"Error cancelling ride: {e}")
@@ -542,22 +534,23 @@ async def cancel_ride_client(callback: CallbackQuery, state: FSMContext):
 async def show_driver_location(callback: CallbackQuery):
     """Показать местоположение водителя"""
     try:
-        with Session() as session:
-            order = session.query(Order).filter_by(
-                client_id=callback.from_user.id
-            ).filter(Order.status.in_(["accepted", "driver_arrived"])).order_by(Order.created_at.desc()).first()
+        # Поездка - из индекса активных поездок, позиция - из реестра доступности
+        order = await active_ride_index.for_client(
+            callback.from_user.id, (RideStatus.ACCEPTED, RideStatus.DRIVER_ARRIVED)
+        )
 
-            if not order or not order.driver_id:
-                await callback.answer("❌ Водитель не найден")
-                return
+        if not order or not order.driver_id:
+            await callback.answer("❌ Водитель не найден")
+            return
 
-            # Отправляем примерное местоположение водителя
-            # В реальной системе здесь должна быть актуальная геопозиция
-            await callback.message.answer_location(
-                latitude=order.pickup_lat + 0.001,  # Примерно рядом с точкой подачи
-                longitude=order.pickup_lng + 0.001
-            )
-            await callback.answer("📍 Lokalizacja kierowcy")
+        location = driver_availability.location(order.driver_id)
+        if location is None:
+            # Водитель еще не делился геопозицией - примерно рядом с точкой подачи
+            ride = await ride_repository.get(order.ride_id)
+            location = (ride.pickup_lat + 0.001, ride.pickup_lng + 0.001)
+
+        await callback.message.answer_location(latitude=location[0], longitude=location[1])
+        await callback.answer("📍 Lokalizacja kierowcy")
 
     except Exception as e:
         logger.error(f"Error showing driver location: {e}")
@@ -705,36 +698,32 @@ async def handle_ride_status_update(callback: CallbackQuery):
     try:
         status = callback.data.split("_")[2]
 
-        with Session() as session:
-            order = session.query(Order).filter_by(
-                client_id=callback.from_user.id
-            ).filter(Order.status.in_(["accepted", "driver_arrived", "in_progress"])).order_by(
-                Order.created_at.desc()).first()
+        order = await ride_repository.get_active_for_client(callback.from_user.id)
 
-            if not order:
-                await callback.answer("❌ Активный заказ не найден")
-                return
+        if not order:
+            await callback.answer("❌ Активный заказ не найден")
+            return
 
-            lang = await get_user_language_simple(callback.from_user.id)
-
-            # Обновляем клавиатуру клиента в зависимости от статуса
-            if status == "accepted":
-                keyboard = get_client_ride_keyboard(lang, "accepted")
-                status_text = "✅ Kierowca jedzie do Ciebie"
-            elif status == "arrived":
-                keyboard = get_client_ride_keyboard(lang, "arrived")
-                status_text = "🚗 Kierowca przyjechał na miejsce"
-            elif status == "in_progress":
-                keyboard = get_client_ride_keyboard(lang, "in_progress")
-                status_text = "🚦 Podróż rozpoczęta"
-            else:
-                keyboard = None
-                status_text = "📱 Status zaktualizowany"
+        lang = await get_user_language_simple(callback.from_user.id)
+
+        # Обновляем клавиатуру клиента в зависимости от статуса
+        if status == "accepted":
+            keyboard = get_client_ride_keyboard(lang, "accepted")
+            status_text = "✅ Kierowca jedzie do Ciebie"
+        elif status == "arrived":
+            keyboard = get_client_ride_keyboard(lang, "arrived")
+            status_text = "🚗 Kierowca przyjechał na miejsce"
+        elif status == "in_progress":
+            keyboard = get_client_ride_keyboard(lang, "in_progress")
+            status_text = "🚦 Podróż rozpoczęta"
+        else:
+            keyboard = None
+            status_text = "📱 Status zaktualizowany"
 
-            if keyboard:
-                await callback.message.edit_reply_markup(reply_markup=keyboard)
+        if keyboard:
+            await callback.message.edit_reply_markup(reply_markup=keyboard)
 
-            await callback.answer(f"📱 {status_text}")
+        await callback.answer(f"📱 {status_text}")
 
     except Exception as e:
         logger.error(f"Error handling ride status update: {e}")
@@ -749,45 +738,45 @@ async def handle_ride_status_update(callback: CallbackQuery):
 async def check_client_status(message: Message):
     """Команда для проверки статуса клиента"""
     try:
-        with Session() as session:
-            # Найти активный заказ клиента
-            active_order = session.query(Order).filter_by(
-                client_id=message.from_user.id
-            ).filter(Order.status.not_in(["completed", "cancelled"])).order_by(Order.created_at.desc()).first()
-
-            if not active_order:
-                await message.answer("📊 <b>СТАТУС КЛИЕНТА</b>\n\n❌ Нет активных заказов", parse_mode="HTML")
-                return
+        # Найти активный заказ клиента
+        active_order = await ride_repository.get_active_for_client(
+            message.from_user.id,
+            (RideStatus.PENDING, RideStatus.REJECTED) + ACTIVE_RIDE_STATUSES
+        )
 
-            result_text = (
-                f"📊 <b>СТАТУС КЛИЕНТА</b>\n\n"
-                f"🆔 <b>Заказ:</b> #{active_order.id}\n"
-                f"📋 <b>Статус:</b> {active_order.status}\n"
-                f"📍 <b>Откуда:</b> {active_order.pickup_address}\n"
-                f"📍 <b>Куда:</b> {active_order.destination_address}\n"
-                f"👥 <b>Пассажиров:</b> {getattr(active_order, 'passengers_count', 1)}\n"
-                f"💵 <b>Стоимость:</b> {getattr(active_order, 'estimated_price', getattr(active_order, 'price', 0))} zł\n"
-                f"🕒 <b>Создан:</b> {active_order.created_at.strftime('%H:%M:%S')}"
-            )
+        if not active_order:
+            await message.answer("📊 <b>СТАТУС КЛИЕНТА</b>\n\n❌ Нет активных заказов", parse_mode="HTML")
+            return
 
-            if active_order.driver_id:
-                result_text += f"\n👤 <b>Водитель:</b> {active_order.driver_name or active_order.driver_id}"
+        result_text = (
+            f"📊 <b>СТАТУС КЛИЕНТА</b>\n\n"
+            f"🆔 <b>Заказ:</b> #{active_order.id}\n"
+            f"📋 <b>Статус:</b> {active_order.status}\n"
+            f"📍 <b>Откуда:</b> {active_order.pickup_address}\n"
+            f"📍 <b>Куда:</b> {active_order.destination_address}\n"
+            f"👥 <b>Пассажиров:</b> {getattr(active_order, 'passengers_count', 1)}\n"
+            f"💵 <b>Стоимость:</b> {getattr(active_order, 'estimated_price', getattr(active_order, 'price', 0))} zł\n"
+            f"🕒 <b>Создан:</b> {active_order.created_at.strftime('%H:%M:%S')}"
+        )
 
-            if active_order.started_at:
-                result_text += f"\n🚦 <b>Начат:</b> {active_order.started_at.strftime('%H:%M:%S')}"
+        if active_order.driver_id:
+            result_text += f"\n👤 <b>Водитель:</b> {active_order.driver_name or active_order.driver_id}"
 
-            # Добавляем соответствующие кнопки
-            lang = await get_user_language_simple(message.from_user.id)
-            keyboard = None
+        if active_order.started_at:
+            result_text += f"\n🚦 <b>Начат:</b> {active_order.started_at.strftime('%H:%M:%S')}"
+
+        # Добавляем соответствующие кнопки
+        lang = await get_user_language_simple(message.from_user.id)
+        keyboard = None
 
-            if active_order.status == "pending":
-                keyboard = get_client_ride_keyboard(lang, "pending")
-            elif active_order.status == "accepted":
-                keyboard = get_client_ride_keyboard(lang, "accepted")
-            elif active_order.status == "in_progress":
-                keyboard = get_client_ride_keyboard(lang, "in_progress")
+        if active_order.status == "pending":
+            keyboard = get_client_ride_keyboard(lang, "pending")
+        elif active_order.status == "accepted":
+            keyboard = get_client_ride_keyboard(lang, "accepted")
+        elif active_order.status == "in_progress":
+            keyboard = get_client_ride_keyboard(lang, "in_progress")
 
-            await message.answer(result_text, reply_markup=keyboard, parse_mode="HTML")
+        await message.answer(result_text, reply_markup=keyboard, parse_mode="HTML")
 
     except Exception as e:
         await message.answer(f"❌ Ошибка проверки статуса: {e}")
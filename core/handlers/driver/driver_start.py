@@ -4,7 +4,8 @@ from aiogram.filters import CommandStart
 from core.keyboards import language_keyboard  # Исправленный импорт
 from core.handlers.driver.vehicle_handlers import get_vehicle_keyboard
 from core.services.user_service import UserService  # Исправленный импорт
-from core.models import Session, User
+from core.models import UserRole
+from core.repositories import user_repository
 
 router = Router()
 
@@ -40,7 +41,6 @@ async def set_driver_language(callback: CallbackQuery):
 
         if not user:
             # Если пользователя нет, создаем нового
-            from core.models import UserRole
             user = await user_service.get_or_create_user(
                 telegram_id=callback.from_user.id,
                 username=callback.from_user.username,
@@ -54,23 +54,15 @@ async def set_driver_language(callback: CallbackQuery):
 
     except Exception as e:
         print(f"Ошибка обновления языка: {e}")
-        # Fallback - используем синхронную сессию
-        with Session() as session:
-            user = session.query(User).filter_by(telegram_id=callback.from_user.id).first()
-            if not user:
-                from core.models import UserRole
-                user = User(
-                    telegram_id=callback.from_user.id,
-                    username=callback.from_user.username,
-                    first_name=callback.from_user.first_name,
-                    last_name=callback.from_user.last_name,
-                    language=lang_code,
-                    role=UserRole.DRIVER
-                )
-                session.add(user)
-            else:
-                user.language = lang_code
-            session.commit()
+        # Fallback - напрямую через репозиторий
+        await user_repository.upsert_language(
+            callback.from_user.id,
+            lang_code,
+            role=UserRole.DRIVER,
+            username=callback.from_user.username,
+            first_name=callback.from_user.first_name,
+            last_name=callback.from_user.last_name
+        )
 
     await callback.message.edit_text(
         text="🚖 Панель водителя",
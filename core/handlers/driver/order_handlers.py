@@ -2,8 +2,11 @@
 
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, Message, ReplyKeyboardMarkup, KeyboardButton
-from core.models import Session, Ride as Order, Vehicle as DriverVehicle
-from core.bot_instance import Bots
+from core.repositories import ride_repository, vehicle_repository
+from core.services.ride_state import ride_state_machine
+from core.services.outbox import outbox_message, outbox_dispatcher, enqueue_message
+from core.services.active_rides import active_ride_index
+from core.services.availability import driver_availability
 from config import Config
 from core.handlers.driver.vehicle_handlers import get_vehicle_keyboard
 import logging
@@ -62,7 +65,7 @@ async def accept_order(callback: CallbackQuery):
             from core.services.driver_notification import driver_notification_service
 
             # Проверяем через сервис
-            if order_id not in driver_notification_service.pending_orders:
+            if not await driver_notification_service.has_order(order_id):
                 print(f"❌ [HANDLER] Order {order_id} not in pending orders")
                 await callback.answer("❌ Заказ уже принят другим водителем или отменен", show_alert=True)
                 await callback.message.edit_text("ℹ️ <b>Заказ больше недоступен</b>", parse_mode="HTML")
@@ -70,182 +73,186 @@ async def accept_order(callback: CallbackQuery):
         except ImportError:
             print("⚠️ [HANDLER] Driver notification service not available, using basic acceptance")
 
-        with Session() as session:
-            # Получаем заказ из базы данных
-            order = session.query(Order).get(order_id)
-            if not order:
-                print(f"❌ [HANDLER] Order {order_id} not found in database")
-                await callback.answer("Zamówienie nie zostało znalezione!")
-                return
-
-            # Проверяем статус заказа в базе данных
-            if order.status != "pending":
-                print(f"❌ [HANDLER] Order {order_id} status is {order.status}, not pending")
-                await callback.answer("❌ Заказ уже принят другим водителем", show_alert=True)
-                await callback.message.edit_text("ℹ️ <b>Заказ уже принят</b>", parse_mode="HTML")
-                return
-
-            # Проверяем данные автомобиля водителя
-            vehicle = session.query(DriverVehicle).filter_by(driver_id=callback.from_user.id).first()
-            if not vehicle:
-                print(f"⚠️ [HANDLER] No vehicle data for driver {callback.from_user.id}")
-                await callback.answer()
-                lang = await get_user_language_simple(callback.from_user.id)
-                await callback.message.answer(
-                    "⚠️ Перед принятием заказа необходимо добавить данные об автомобиле",
-                    reply_markup=get_vehicle_keyboard(lang)
-                )
-                return
+        # Проверяем данные автомобиля водителя
+        vehicle = await vehicle_repository.get_by_driver(callback.from_user.id)
+        if not vehicle:
+            print(f"⚠️ [HANDLER] No vehicle data for driver {callback.from_user.id}")
+            await callback.answer()
+            lang = await get_user_language_simple(callback.from_user.id)
+            await callback.message.answer(
+                "⚠️ Перед принятием заказа необходимо добавить данные об автомобиле",
+                reply_markup=get_vehicle_keyboard(lang)
+            )
+            return
 
-            print(f"🚗 [HANDLER] Vehicle found for driver: {vehicle.model}")
+        print(f"🚗 [HANDLER] Vehicle found for driver: {vehicle.model}")
 
-            # Обновляем статус заказа в базе данных
-            order.status = "accepted"
-            order.driver_id = callback.from_user.id
-            order.driver_name = callback.from_user.full_name
+        # Формируем информацию об автомобиле
+        car_info = f"{vehicle.color} {vehicle.model} ({vehicle.license_plate})"
 
-            # Формируем информацию об автомобиле
-            car_info = f"{vehicle.color} {vehicle.model} ({vehicle.license_plate})"
+        # Язык клиента - до транзакции: построитель outbox не делает ввод-вывод
+        pending_order = await ride_repository.get(order_id)
+        pending_client_id = getattr(pending_order, 'client_id', getattr(pending_order, 'user_id', None))
+        client_lang = await get_user_language_simple(pending_client_id) if pending_client_id else "pl"
 
-            session.commit()
-            print(f"💾 [HANDLER] Order {order_id} updated in database")
+        def notify_client(order):
+            """Уведомление клиента с кнопками управления поездкой - в outbox вместе с принятием"""
+            client_id = getattr(order, 'client_id', getattr(order, 'user_id', None))
+            if not client_id:
+                return []
 
-            # Обрабатываем через сервис ПОСЛЕ обновления БД если доступен
+            # Импортируем новые клавиатуры
             try:
-                from core.services.driver_notification import driver_notification_service
-                print(f"📢 [HANDLER] Notifying service about acceptance...")
-                await driver_notification_service.handle_driver_response(
-                    order_id, callback.from_user.id, "accept"
-                )
+                from core.keyboards import get_client_ride_keyboard
+                client_keyboard = get_client_ride_keyboard(client_lang, "accepted")
             except ImportError:
-                print("⚠️ [HANDLER] Driver notification service not available")
-
-            # Отправляем клиенту уведомление с кнопками управления поездкой
-            client_id = getattr(order, 'client_id', getattr(order, 'user_id', None))
-            if client_id:
-                # Импортируем новые клавиатуры
-                try:
-                    from core.keyboards import get_client_ride_keyboard
-                    lang = await get_user_language_simple(client_id)
-                    client_keyboard = get_client_ride_keyboard(lang, "accepted")
-                except ImportError:
-                    client_keyboard = None
-
-                # Формируем сообщение для клиента с правильной ценой алкоголя
-                if order.order_type == "alcohol_delivery" or (order.notes and "ALCOHOL DELIVERY" in order.notes):
-                    arrival_time = "~30-45 minut"
-                    budget_info = f" (do {getattr(order, 'budget', 'N/A')} zł)" if hasattr(order,
-                                                                                           'budget') and order.budget else ""
-
-                    # ФИКСИРОВАННАЯ ЦЕНА 20 zł для алкоголя
-                    alcohol_delivery_price = 20
-
-                    message_text = (
-                        "✅ <b>Kierowca zaakceptował zamówienie zakupu!</b>\n\n"
-                        f"👤 <b>Kierowca:</b> {callback.from_user.full_name}\n"
-                        f"🚗 <b>Samochód:</b> {car_info}\n"
-                        f"🕒 <b>Szacowany czas:</b> {arrival_time}\n\n"
-                        "🛒 <b>Proces realizacji:</b>\n"
-                        "1. Kierowca kupi produkty w sklepie\n"
-                        "2. Dostarczy je pod wskazany adres\n"
-                        "3. Przedstawi paragon do zapłaty\n\n"
-                        f"💵 <b>Do zapłaty:</b>\n"
-                        f"- Opłata za usługę: {alcohol_delivery_price} zł\n"
-                        f"- Koszt zakupów{budget_info}\n\n"
-                        "⚠️ <b>Przygotuj:</b>\n"
-                        "1. Dowód osobisty\n"
-                        "2. Gotówkę na pełną kwotę"
-                    )
-                else:
-                    arrival_time = "~10 minut"
-                    message_text = (
-                        "✅ <b>Kierowca zaakceptował Twoje zamówienie!</b>\n\n"
-                        f"👤 <b>Kierowca:</b> {callback.from_user.full_name}\n"
-                        f"🚗 <b>Samochód:</b> {car_info}\n"
-                        f"🕒 <b>Czas dojazdu:</b> {arrival_time}\n\n"
-                        f"💵 <b>Do zapłaty:</b> {getattr(order, 'estimated_price', getattr(order, 'price', 0))} zł\n\n"
-                        "🎯 Водитель едет к вам. Вы можете отслеживать его местоположение."
-                    )
-
-                # Отправляем уведомление клиенту
-                try:
-                    await Bots.client.send_message(
-                        chat_id=client_id,
-                        text=message_text,
-                        reply_markup=client_keyboard,
-                        parse_mode="HTML",
-                        disable_notification=False
-                    )
-                    print(f"📱 [HANDLER] Client {client_id} notified about acceptance")
-                except Exception as e:
-                    print(f"❌ [HANDLER] Error notifying client: {e}")
-
-            # Отправляем водителю расширенную клавиатуру управления поездкой
-            try:
-                lang = await get_user_language_simple(callback.from_user.id)
-
-                # Импортируем новые клавиатуры
-                from core.keyboards import get_driver_ride_keyboard
-                ride_keyboard = get_driver_ride_keyboard(lang, "accepted")
-
-                await Bots.driver.send_message(
-                    chat_id=callback.from_user.id,
-                    text=(
-                        f"🎯 <b>УПРАВЛЕНИЕ ЗАКАЗОМ #{order_id}</b>\n\n"
-                        f"📍 Едьте к пассажиру: {order.pickup_address}\n"
-                        f"⏰ Ожидаемое время прибытия: ~10 минут\n\n"
-                        f"Используйте кнопки ниже для управления заказом:"
-                    ),
-                    reply_markup=ride_keyboard,
-                    parse_mode="HTML"
-                )
+                client_keyboard = None
 
-                print(f"✅ [HANDLER] Sent ride management interface to driver {callback.from_user.id}")
-
-            except Exception as e:
-                logger.error(f"Error sending ride management interface: {e}")
-
-            # Подтверждаем водителю
-            await callback.answer("✅ Zamówienie zaakceptowane!")
-
-            # Обновляем сообщение водителя с правильной ценой
+            # Формируем сообщение для клиента с правильной ценой алкоголя
             if order.order_type == "alcohol_delivery" or (order.notes and "ALCOHOL DELIVERY" in order.notes):
-                products = getattr(order, 'products', 'Zobacz szczegóły w zamówieniu')
-                if order.notes and "Products:" in order.notes:
-                    try:
-                        products = order.notes.split("Products:")[1].split(",")[0].strip()
-                    except:
-                        pass
-
-                confirmation_text = "✅ <b>ZAMÓWIENIE PRZYJĘTE</b>\n\n"
-                confirmation_text += (
-                    f"🛒 <b>Twoje zadania:</b>\n"
-                    f"1. Wybierz najbliższy sklep\n"
-                    f"2. Kup: {products}\n"
-                    f"3. Zachowaj paragon!\n"
-                    f"4. Dostarcz na: {order.destination_address}\n\n"
-                    f"💰 <b>Budżet klienta:</b> {getattr(order, 'budget', 'N/A')} zł\n"
-                    f"💵 <b>Twoja opłata:</b> 20 zł\n\n"  # ФИКСИРОВАННАЯ ЦЕНА
-                    f"👤 <b>Клиент:</b> {client_id}\n"
-                    f"🚗 <b>Ваше авто:</b> {car_info}"
+                arrival_time = "~30-45 minut"
+                budget_info = f" (do {getattr(order, 'budget', 'N/A')} zł)" if hasattr(order,
+                                                                                       'budget') and order.budget else ""
+
+                # ФИКСИРОВАННАЯ ЦЕНА 20 zł для алкоголя
+                alcohol_delivery_price = 20
+
+                message_text = (
+                    "✅ <b>Kierowca zaakceptował zamówienie zakupu!</b>\n\n"
+                    f"👤 <b>Kierowca:</b> {callback.from_user.full_name}\n"
+                    f"🚗 <b>Samochód:</b> {car_info}\n"
+                    f"🕒 <b>Szacowany czas:</b> {arrival_time}\n\n"
+                    "🛒 <b>Proces realizacji:</b>\n"
+                    "1. Kierowca kupi produkty w sklepie\n"
+                    "2. Dostarczy je pod wskazany adres\n"
+                    "3. Przedstawi paragon do zapłaty\n\n"
+                    f"💵 <b>Do zapłaty:</b>\n"
+                    f"- Opłata za usługę: {alcohol_delivery_price} zł\n"
+                    f"- Koszt zakupów{budget_info}\n\n"
+                    "⚠️ <b>Przygotuj:</b>\n"
+                    "1. Dowód osobisty\n"
+                    "2. Gotówkę na pełną kwotę"
                 )
             else:
-                confirmation_text = (
-                    f"✅ <b>ЗАКАЗ ПРИНЯТ</b>\n\n"
-                    f"📍 <b>Откуда:</b> {order.pickup_address}\n"
-                    f"📍 <b>Куда:</b> {order.destination_address}\n"
-                    f"👥 <b>Пассажиров:</b> {getattr(order, 'passengers_count', 1)}\n"
-                    f"💵 <b>Стоимость:</b> {getattr(order, 'estimated_price', getattr(order, 'price', 0))} zł\n\n"
-                    f"👤 <b>Клиент:</b> {client_id}\n"
-                    f"🚗 <b>Ваше авто:</b> {car_info}"
+                arrival_time = "~10 minut"
+                message_text = (
+                    "✅ <b>Kierowca zaakceptował Twoje zamówienie!</b>\n\n"
+                    f"👤 <b>Kierowca:</b> {callback.from_user.full_name}\n"
+                    f"🚗 <b>Samochód:</b> {car_info}\n"
+                    f"🕒 <b>Czas dojazdu:</b> {arrival_time}\n\n"
+                    f"💵 <b>Do zapłaty:</b> {getattr(order, 'estimated_price', getattr(order, 'price', 0))} zł\n\n"
+                    "🎯 Водитель едет к вам. Вы можете отслеживать его местоположение."
                 )
 
-            await callback.message.edit_text(
-                text=confirmation_text,
+            return [outbox_message(
+                "client",
+                client_id,
+                message_text,
+                reply_markup=client_keyboard,
+                parse_mode="HTML",
+                disable_notification=False
+            )]
+
+        # Атомарно принимаем заказ: выигрывает только один водитель,
+        # уведомление клиента записывается в той же транзакции
+        result = await ride_state_machine.accept(
+            order_id,
+            callback.from_user.id,
+            driver_name=callback.from_user.full_name,
+            vehicle_id=vehicle.id,
+            outbox=notify_client
+        )
+        if not result.found:
+            print(f"❌ [HANDLER] Order {order_id} not found in database")
+            await callback.answer("Zamówienie nie zostało znalezione!")
+            return
+        if not result.won:
+            print(f"❌ [HANDLER] Order {order_id} status is {result.ride.status}, not pending")
+            await callback.answer("❌ Заказ уже принят другим водителем", show_alert=True)
+            await callback.message.edit_text("ℹ️ <b>Заказ уже принят</b>", parse_mode="HTML")
+            return
+        order = result.ride
+        client_id = getattr(order, 'client_id', getattr(order, 'user_id', None))
+
+        print(f"💾 [HANDLER] Order {order_id} updated in database, client notification queued")
+
+        # Обрабатываем через сервис ПОСЛЕ обновления БД если доступен
+        try:
+            from core.services.driver_notification import driver_notification_service
+            print(f"📢 [HANDLER] Notifying service about acceptance...")
+            await driver_notification_service.handle_driver_response(
+                order_id, callback.from_user.id, "accept"
+            )
+        except ImportError:
+            print("⚠️ [HANDLER] Driver notification service not available")
+
+        # Отправляем водителю расширенную клавиатуру управления поездкой
+        try:
+            lang = await get_user_language_simple(callback.from_user.id)
+
+            # Импортируем новые клавиатуры
+            from core.keyboards import get_driver_ride_keyboard
+            ride_keyboard = get_driver_ride_keyboard(lang, "accepted")
+
+            await enqueue_message(
+                "driver",
+                chat_id=callback.from_user.id,
+                text=(
+                    f"🎯 <b>УПРАВЛЕНИЕ ЗАКАЗОМ #{order_id}</b>\n\n"
+                    f"📍 Едьте к пассажиру: {order.pickup_address}\n"
+                    f"⏰ Ожидаемое время прибытия: ~10 минут\n\n"
+                    f"Используйте кнопки ниже для управления заказом:"
+                ),
+                reply_markup=ride_keyboard,
                 parse_mode="HTML"
             )
 
-            print(f"✅ [HANDLER] Order {order_id} processed successfully")
+            print(f"✅ [HANDLER] Sent ride management interface to driver {callback.from_user.id}")
+
+        except Exception as e:
+            logger.error(f"Error sending ride management interface: {e}")
+
+        # Подтверждаем водителю
+        await callback.answer("✅ Zamówienie zaakceptowane!")
+
+        # Обновляем сообщение водителя с правильной ценой
+        if order.order_type == "alcohol_delivery" or (order.notes and "ALCOHOL DELIVERY" in order.notes):
+            products = getattr(order, 'products', 'Zobacz szczegóły w zamówieniu')
+            if order.notes and "Products:" in order.notes:
+                try:
+                    products = order.notes.split("Products:")[1].split(",")[0].strip()
+                except:
+                    pass
+
+            confirmation_text = "✅ <b>ZAMÓWIENIE PRZYJĘTE</b>\n\n"
+            confirmation_text += (
+                f"🛒 <b>Twoje zadania:</b>\n"
+                f"1. Wybierz najbliższy sklep\n"
+                f"2. Kup: {products}\n"
+                f"3. Zachowaj paragon!\n"
+                f"4. Dostarcz na: {order.destination_address}\n\n"
+                f"💰 <b>Budżet klienta:</b> {getattr(order, 'budget', 'N/A')} zł\n"
+                f"💵 <b>Twoja opłata:</b> 20 zł\n\n"  # ФИКСИРОВАННАЯ ЦЕНА
+                f"👤 <b>Клиент:</b> {client_id}\n"
+                f"🚗 <b>Ваше авто:</b> {car_info}"
+            )
+        else:
+            confirmation_text = (
+                f"✅ <b>ЗАКАЗ ПРИНЯТ</b>\n\n"
+                f"📍 <b>Откуда:</b> {order.pickup_address}\n"
+                f"📍 <b>Куда:</b> {order.destination_address}\n"
+                f"👥 <b>Пассажиров:</b> {getattr(order, 'passengers_count', 1)}\n"
+                f"💵 <b>Стоимость:</b> {getattr(order, 'estimated_price', getattr(order, 'price', 0))} zł\n\n"
+                f"👤 <b>Клиент:</b> {client_id}\n"
+                f"🚗 <b>Ваше авто:</b> {car_info}"
+            )
+
+        await callback.message.edit_text(
+            text=confirmation_text,
+            parse_mode="HTML"
+        )
+
+        print(f"✅ [HANDLER] Order {order_id} processed successfully")
 
     except Exception as e:
         print(f"💥 [HANDLER] Error in accept_order: {e}")
@@ -276,7 +283,7 @@ async def reject_order(callback: CallbackQuery):
             from core.services.driver_notification import driver_notification_service
 
             # Проверяем через сервис
-            if order_id not in driver_notification_service.pending_orders:
+            if not await driver_notification_service.has_order(order_id):
                 print(f"❌ [HANDLER] Order {order_id} not in pending orders")
                 await callback.answer("ℹ️ Заказ уже обработан", show_alert=True)
                 await callback.message.edit_text("ℹ️ <b>Заказ больше недоступен</b>", parse_mode="HTML")
@@ -310,63 +317,75 @@ async def reject_order(callback: CallbackQuery):
 async def handle_driver_location_enhanced(message: Message):
     """Улучшенная обработка локации водителя с множественными статусами"""
     try:
-        with Session() as session:
-            # Обновляем локацию водителя в базе
-            driver = session.query(DriverVehicle).filter_by(driver_id=message.from_user.id).first()
-            if driver and hasattr(driver, 'last_lat'):
-                driver.last_lat = message.location.latitude
-                driver.last_lon = message.location.longitude
-                session.commit()
-
-            # Находим активный заказ водителя (расширенный поиск по статусам)
-            order = session.query(Order).filter_by(
-                driver_id=message.from_user.id
-            ).filter(Order.status.in_(["accepted", "driver_arrived", "in_progress"])).order_by(
-                Order.created_at.desc()).first()
-
-            if not order:
-                await message.answer("ℹ️ Нет активных заказов для отслеживания геопозиции")
-                return
+        # Водитель в сети, позиция - для поиска ближайших
+        driver_availability.heartbeat(
+            message.from_user.id, message.location.latitude, message.location.longitude
+        )
 
-            # Отправляем локацию пассажиру
-            client_id = getattr(order, 'client_id', getattr(order, 'user_id', None))
-            if client_id:
-                try:
-                    await Bots.client.send_location(
-                        chat_id=client_id,
-                        latitude=message.location.latitude,
-                        longitude=message.location.longitude,
-                        disable_notification=True
-                    )
-
-                    # Отправляем статус в зависимости от стадии поездки
-                    if order.status == "accepted":
-                        status_text = "🚗 Kierowca jedzie do Ciebie"
-                    elif order.status == "driver_arrived":
-                        status_text = "✅ Kierowca czeka na miejscu"
-                    elif order.status == "in_progress":
-                        status_text = "🚦 Podróż w toku"
-                    else:
-                        status_text = "📍 Aktualizacja lokalizacji"
-
-                    await Bots.client.send_message(
-                        chat_id=client_id,
-                        text=f"📍 {status_text}",
-                        disable_notification=True
-                    )
-
-                    print(f"📍 [LOCATION] Sent location update to client {client_id} for order {order.id}")
-
-                except Exception as e:
-                    print(f"❌ [LOCATION] Error sending location to client: {e}")
-
-            await message.answer("✅ Местоположение обновлено", disable_notification=True)
+        # Находим активный заказ водителя (индекс в памяти, обычно без запроса к БД)
+        order = await active_ride_index.for_driver(message.from_user.id)
+
+        # Сообщения пассажиру записываются в outbox в одной транзакции с локацией
+        outbox = []
+        client_id = order.client_id if order else None
+        if client_id:
+            # Отправляем статус в зависимости от стадии поездки
+            if order.status == "accepted":
+                status_text = "🚗 Kierowca jedzie do Ciebie"
+            elif order.status == "driver_arrived":
+                status_text = "✅ Kierowca czeka na miejscu"
+            elif order.status == "in_progress":
+                status_text = "🚦 Podróż w toku"
+            else:
+                status_text = "📍 Aktualizacja lokalizacji"
+
+            outbox = [
+                outbox_message(
+                    "client",
+                    client_id,
+                    method="send_location",
+                    latitude=message.location.latitude,
+                    longitude=message.location.longitude,
+                    disable_notification=True
+                ),
+                outbox_message("client", client_id, f"📍 {status_text}", disable_notification=True),
+            ]
+
+        # Обновляем локацию водителя в базе
+        await vehicle_repository.update_location(
+            message.from_user.id,
+            message.location.latitude,
+            message.location.longitude,
+            outbox=outbox
+        )
+
+        if not order:
+            await message.answer("ℹ️ Нет активных заказов для отслеживания геопозиции")
+            return
+
+        if outbox:
+            outbox_dispatcher.wake()
+            print(f"📍 [LOCATION] Queued location update to client {client_id} for order {order.id}")
+
+        await message.answer("✅ Местоположение обновлено", disable_notification=True)
 
     except Exception as e:
         print(f"💥 [LOCATION] Error in location handler: {e}")
         await message.answer("❌ Błąd podczas aktualizacji lokalizacji")
 
 
+@router.edited_message(F.location)
+async def handle_driver_live_location(message: Message):
+    """Трансляция геопозиции: Telegram присылает ее правками исходного сообщения.
+
+    Только обновляем доступность и индекс позиций - без ответа водителю и
+    сообщений пассажиру на каждую правку.
+    """
+    driver_availability.heartbeat(
+        message.from_user.id, message.location.latitude, message.location.longitude
+    )
+
+
 # ===================================================================
 # КОМАНДЫ ДЛЯ ТЕСТИРОВАНИЯ И ОТЛАДКИ
 # ===================================================================
@@ -410,32 +429,31 @@ async def check_alcohol_price(message: Message):
 
     try:
         # Проверяем текущие заказы алкоголя в базе
-        with Session() as session:
-            alcohol_orders = session.query(Order).filter_by(order_type="alcohol_delivery").limit(5).all()
+        alcohol_orders = await ride_repository.list_by_order_type("alcohol_delivery", limit=5)
 
-            if not alcohol_orders:
-                await message.answer("📊 Заказов алкоголя не найдено")
-                return
+        if not alcohol_orders:
+            await message.answer("📊 Заказов алкоголя не найдено")
+            return
 
-            result_text = "📊 <b>ПРОВЕРКА ЦЕН НА АЛКОГОЛЬ</b>\n\n"
+        result_text = "📊 <b>ПРОВЕРКА ЦЕН НА АЛКОГОЛЬ</b>\n\n"
 
-            for order in alcohol_orders:
-                price = getattr(order, 'estimated_price', getattr(order, 'price', 0))
-                status = "✅" if float(price) == 20.0 else "❌"
-
-                result_text += (
-                    f"{status} <b>Заказ #{order.id}</b>\n"
-                    f"   Цена: {price} zł\n"
-                    f"   Статус: {order.status}\n"
-                    f"   Продукты: {getattr(order, 'products', 'N/A')[:50]}...\n\n"
-                )
+        for order in alcohol_orders:
+            price = getattr(order, 'estimated_price', getattr(order, 'price', 0))
+            status = "✅" if float(price) == 20.0 else "❌"
 
             result_text += (
-                f"\n💡 <b>Правильная цена алкоголя: 20 zł</b>\n"
-                f"❌ Если видите другие цены - значит есть ошибка"
+                f"{status} <b>Заказ #{order.id}</b>\n"
+                f"   Цена: {price} zł\n"
+                f"   Статус: {order.status}\n"
+                f"   Продукты: {getattr(order, 'products', 'N/A')[:50]}...\n\n"
             )
 
-            await message.answer(result_text, parse_mode="HTML")
+        result_text += (
+            f"\n💡 <b>Правильная цена алкоголя: 20 zł</b>\n"
+            f"❌ Если видите другие цены - значит есть ошибка"
+        )
+
+        await message.answer(result_text, parse_mode="HTML")
 
     except Exception as e:
         await message.answer(f"❌ Ошибка проверки: {e}")
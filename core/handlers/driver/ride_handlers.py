@@ -13,8 +13,12 @@ from aiogram.types import CallbackQuery, Message, ReplyKeyboardMarkup, KeyboardB
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-from core.models import Session, Ride as Order
-from core.bot_instance import Bots
+from core.models import Ride as Order, RideStatus, OutboxPriority
+from core.repositories import ride_repository, vehicle_repository, ACTIVE_RIDE_STATUSES
+from core.services.active_rides import active_ride_index
+from core.services.availability import driver_availability
+from core.services.ride_state import ride_state_machine
+from core.services.outbox import outbox_message, outbox_dispatcher, enqueue_message
 from core.keyboards import get_driver_ride_keyboard, get_location_sharing_keyboard
 
 logger = logging.getLogger(__name__)
@@ -46,13 +50,8 @@ async def get_user_language_simple(user_id: int) -> str:
 async def get_current_ride_id(user_id: int) -> Optional[int]:
     """Получение ID текущей активной поездки пользователя"""
     try:
-        with Session() as session:
-            order = session.query(Order).filter(
-                Order.driver_id == user_id,
-                Order.status.in_(["accepted", "driver_arrived", "in_progress"])
-            ).order_by(Order.created_at.desc()).first()
-
-            return order.id if order else None
+        # Индекс в памяти: обычно без запроса к БД
+        return await active_ride_index.driver_ride_id(user_id)
 
     except Exception as e:
         logger.error(f"Error getting current ride ID: {e}")
@@ -132,29 +131,27 @@ async def start_waiting_counter(ride_id: int, driver_id: int):
         }
 
         # Обновляем базу данных
-        with Session() as session:
-            order = session.query(Order).get(ride_id)
-            if order:
-                # Добавляем поля ожидания если их нет
-                if not hasattr(order, 'waiting_started_at'):
-                    # Для обратной совместимости - используем notes поле
-                    waiting_info = {
-                        'waiting_started_at': current_time.isoformat(),
-                        'waiting_status': 'active'
-                    }
-                    if hasattr(order, 'notes') and order.notes:
-                        try:
-                            existing_notes = json.loads(order.notes)
-                            existing_notes.update(waiting_info)
-                            order.notes = json.dumps(existing_notes)
-                        except:
-                            order.notes = json.dumps(waiting_info)
-                    else:
+        def mark_waiting_started(order: Order):
+            # Добавляем поля ожидания если их нет
+            if not hasattr(order, 'waiting_started_at'):
+                # Для обратной совместимости - используем notes поле
+                waiting_info = {
+                    'waiting_started_at': current_time.isoformat(),
+                    'waiting_status': 'active'
+                }
+                if hasattr(order, 'notes') and order.notes:
+                    try:
+                        existing_notes = json.loads(order.notes)
+                        existing_notes.update(waiting_info)
+                        order.notes = json.dumps(existing_notes)
+                    except:
                         order.notes = json.dumps(waiting_info)
                 else:
-                    order.waiting_started_at = current_time
+                    order.notes = json.dumps(waiting_info)
+            else:
+                order.waiting_started_at = current_time
 
-                session.commit()
+        await ride_repository.modify(ride_id, mark_waiting_started)
 
         logger.info(f"Waiting counter started for ride {ride_id}")
 
@@ -176,49 +173,47 @@ async def stop_waiting_counter(ride_id: int) -> Optional[dict]:
         cost = Decimal(str(minutes))
 
         # Обновляем базу данных
-        with Session() as session:
-            order = session.query(Order).get(ride_id)
-            if order:
-                # Обновляем существующую стоимость
-                base_price = getattr(order, 'estimated_price', getattr(order, 'price', Decimal('0')))
-                if isinstance(base_price, (int, float)):
-                    base_price = Decimal(str(base_price))
-
-                total_price = base_price + cost
-
-                # Сохраняем информацию о ожидании в notes
-                waiting_log = {
-                    'waiting_started_at': start_time.isoformat(),
-                    'waiting_ended_at': end_time.isoformat(),
-                    'waiting_minutes': minutes,
-                    'waiting_cost': float(cost),
-                    'waiting_status': 'completed'
-                }
+        def apply_waiting_cost(order: Order):
+            # Обновляем существующую стоимость
+            base_price = getattr(order, 'estimated_price', getattr(order, 'price', Decimal('0')))
+            if isinstance(base_price, (int, float)):
+                base_price = Decimal(str(base_price))
 
-                if hasattr(order, 'notes') and order.notes:
-                    try:
-                        existing_notes = json.loads(order.notes)
-                        if isinstance(existing_notes, dict):
-                            existing_notes.update(waiting_log)
-                        else:
-                            existing_notes = waiting_log
-                        order.notes = json.dumps(existing_notes)
-                    except:
-                        order.notes = json.dumps(waiting_log)
-                else:
+            total_price = base_price + cost
+
+            # Сохраняем информацию о ожидании в notes
+            waiting_log = {
+                'waiting_started_at': start_time.isoformat(),
+                'waiting_ended_at': end_time.isoformat(),
+                'waiting_minutes': minutes,
+                'waiting_cost': float(cost),
+                'waiting_status': 'completed'
+            }
+
+            if hasattr(order, 'notes') and order.notes:
+                try:
+                    existing_notes = json.loads(order.notes)
+                    if isinstance(existing_notes, dict):
+                        existing_notes.update(waiting_log)
+                    else:
+                        existing_notes = waiting_log
+                    order.notes = json.dumps(existing_notes)
+                except:
                     order.notes = json.dumps(waiting_log)
+            else:
+                order.notes = json.dumps(waiting_log)
 
-                # Обновляем цену
-                if hasattr(order, 'final_price'):
-                    order.final_price = total_price
-                else:
-                    # Для обратной совместимости используем existing field
-                    if hasattr(order, 'estimated_price'):
-                        order.estimated_price = total_price
-                    elif hasattr(order, 'price'):
-                        order.price = total_price
+            # Обновляем цену
+            if hasattr(order, 'final_price'):
+                order.final_price = total_price
+            else:
+                # Для обратной совместимости используем existing field
+                if hasattr(order, 'estimated_price'):
+                    order.estimated_price = total_price
+                elif hasattr(order, 'price'):
+                    order.price = total_price
 
-                session.commit()
+        await ride_repository.modify(ride_id, apply_waiting_cost)
 
         # Удаляем из активных таймеров
         del waiting_timers[ride_id]
@@ -240,30 +235,30 @@ async def stop_waiting_counter(ride_id: int) -> Optional[dict]:
 async def notify_passenger_waiting_started(ride_id: int):
     """Уведомление пассажира о начале ожидания"""
     try:
-        with Session() as session:
-            order = session.query(Order).get(ride_id)
-            if not order:
-                return
+        order = await ride_repository.get(ride_id)
+        if not order:
+            return
 
-            client_id = getattr(order, 'client_id', getattr(order, 'user_id', None))
-            if not client_id:
-                return
+        client_id = getattr(order, 'client_id', getattr(order, 'user_id', None))
+        if not client_id:
+            return
 
-            text = (
-                "⏸️ <b>OCZEKIWANIE ROZPOCZĘTE</b>\n\n"
-                "⏰ <b>Taryfa:</b> 1 zł/minuta\n"
-                "🕐 <b>Czas rozpoczęcia:</b> " + datetime.now().strftime("%H:%M:%S") + "\n\n"
-                "Gdy będziesz gotowy do kontynuacji podróży, naciśnij przycisk poniżej:"
-            )
+        text = (
+            "⏸️ <b>OCZEKIWANIE ROZPOCZĘTE</b>\n\n"
+            "⏰ <b>Taryfa:</b> 1 zł/minuta\n"
+            "🕐 <b>Czas rozpoczęcia:</b> " + datetime.now().strftime("%H:%M:%S") + "\n\n"
+            "Gdy będziesz gotowy do kontynuacji podróży, naciśnij przycisk poniżej:"
+        )
 
-            keyboard = get_passenger_waiting_keyboard("pl")
+        keyboard = get_passenger_waiting_keyboard("pl")
 
-            await Bots.client.send_message(
-                chat_id=client_id,
-                text=text,
-                parse_mode="HTML",
-                reply_markup=keyboard
-            )
+        await enqueue_message(
+            "client",
+            chat_id=client_id,
+            text=text,
+            parse_mode="HTML",
+            reply_markup=keyboard
+        )
 
     except Exception as e:
         logger.error(f"Error notifying passenger about waiting start: {e}")
@@ -272,26 +267,27 @@ async def notify_passenger_waiting_started(ride_id: int):
 async def notify_passenger_waiting_declined(ride_id: int):
     """Уведомление пассажира об отклонении запроса остановки"""
     try:
-        with Session() as session:
-            order = session.query(Order).get(ride_id)
-            if not order:
-                return
+        order = await ride_repository.get(ride_id)
+        if not order:
+            return
 
-            client_id = getattr(order, 'client_id', getattr(order, 'user_id', None))
-            if not client_id:
-                return
+        client_id = getattr(order, 'client_id', getattr(order, 'user_id', None))
+        if not client_id:
+            return
 
-            text = (
-                "❌ <b>Prośba o zatrzymanie odrzucona</b>\n\n"
-                "Kierowca nie może się zatrzymać w tym momencie.\n"
-                "Podróż kontynuowana w normalnym trybie."
-            )
+        text = (
+            "❌ <b>Prośba o zatrzymanie odrzucona</b>\n\n"
+            "Kierowca nie może się zatrzymać w tym momencie.\n"
+            "Podróż kontynuowana w normalnym trybie."
+        )
 
-            await Bots.client.send_message(
-                chat_id=client_id,
-                text=text,
-                parse_mode="HTML"
-            )
+        await enqueue_message(
+            "client",
+            chat_id=client_id,
+            text=text,
+            parse_mode="HTML",
+            priority=OutboxPriority.STATUS
+        )
 
     except Exception as e:
         logger.error(f"Error notifying passenger about waiting decline: {e}")
@@ -300,27 +296,28 @@ async def notify_passenger_waiting_declined(ride_id: int):
 async def notify_passenger_waiting_ended(ride_id: int, waiting_info: dict):
     """Уведомление пассажира о завершении ожидания"""
     try:
-        with Session() as session:
-            order = session.query(Order).get(ride_id)
-            if not order:
-                return
+        order = await ride_repository.get(ride_id)
+        if not order:
+            return
 
-            client_id = getattr(order, 'client_id', getattr(order, 'user_id', None))
-            if not client_id:
-                return
+        client_id = getattr(order, 'client_id', getattr(order, 'user_id', None))
+        if not client_id:
+            return
 
-            text = (
-                f"▶️ <b>OCZEKIWANIE ZAKOŃCZONE</b>\n\n"
-                f"⏱️ <b>Czas oczekiwania:</b> {waiting_info['minutes']} min\n"
-                f"💰 <b>Koszt oczekiwania:</b> {waiting_info['cost']} zł\n\n"
-                f"Podróż jest kontynuowana..."
-            )
+        text = (
+            f"▶️ <b>OCZEKIWANIE ZAKOŃCZONE</b>\n\n"
+            f"⏱️ <b>Czas oczekiwania:</b> {waiting_info['minutes']} min\n"
+            f"💰 <b>Koszt oczekiwania:</b> {waiting_info['cost']} zł\n\n"
+            f"Podróż jest kontynuowana..."
+        )
 
-            await Bots.client.send_message(
-                chat_id=client_id,
-                text=text,
-                parse_mode="HTML"
-            )
+        await enqueue_message(
+            "client",
+            chat_id=client_id,
+            text=text,
+            parse_mode="HTML",
+            priority=OutboxPriority.STATUS
+        )
 
     except Exception as e:
         logger.error(f"Error notifying passenger about waiting end: {e}")
@@ -484,34 +481,33 @@ async def passenger_ready_to_continue(callback: CallbackQuery):
     """Пассажир готов продолжить поездку"""
     try:
         # Находим активную поездку пассажира
-        with Session() as session:
-            order = session.query(Order).filter(
-                Order.client_id == callback.from_user.id,
-                Order.status == "in_progress"
-            ).order_by(Order.created_at.desc()).first()
-
-            if not order or not order.driver_id:
-                await callback.answer("❌ Активная поездка не найдена")
-                return
-
-            # Уведомляем водителя
-            await Bots.driver.send_message(
-                chat_id=order.driver_id,
-                text=(
-                    "✅ <b>PASAŻER GOTOWY DO KONTYNUACJI</b>\n\n"
-                    "Pasażer jest gotowy do kontynuacji podróży.\n"
-                    "Możesz zakończyć oczekiwanie i kontynuować jazdę."
-                ),
-                parse_mode="HTML"
-            )
+        order = await active_ride_index.for_client(
+            callback.from_user.id, (RideStatus.IN_PROGRESS,)
+        )
 
-            await callback.message.edit_text(
-                "✅ <b>Kierowca został powiadomiony</b>\n\n"
-                "Poinformowaliśmy kierowcę, że jesteś gotowy do kontynuacji podróży.",
-                parse_mode="HTML"
-            )
+        if not order or not order.driver_id:
+            await callback.answer("❌ Активная поездка не найдена")
+            return
 
-            await callback.answer("✅ Kierowca został powiadomiony")
+        # Уведомляем водителя
+        await enqueue_message(
+            "driver",
+            chat_id=order.driver_id,
+            text=(
+                "✅ <b>PASAŻER GOTOWY DO KONTYNUACJI</b>\n\n"
+                "Pasażer jest gotowy do kontynuacji podróży.\n"
+                "Możesz zakończyć oczekiwanie i kontynuować jazdę."
+            ),
+            parse_mode="HTML"
+        )
+
+        await callback.message.edit_text(
+            "✅ <b>Kierowca został powiadomiony</b>\n\n"
+            "Poinformowaliśmy kierowcę, że jesteś gotowy do kontynuacji podróży.",
+            parse_mode="HTML"
+        )
+
+        await callback.answer("✅ Kierowca został powiadomiony")
 
     except Exception as e:
         logger.error(f"Error notifying driver passenger ready: {e}")
@@ -523,35 +519,33 @@ async def check_waiting_cost_passenger(callback: CallbackQuery):
     """Пассажир проверяет стоимость ожидания"""
     try:
         # Находим активную поездку пассажира
-        with Session() as session:
-            order = session.query(Order).filter(
-                Order.client_id == callback.from_user.id,
-                Order.status == "in_progress"
-            ).order_by(Order.created_at.desc()).first()
-
-            if not order:
-                await callback.answer("❌ Активная поездка не найдена")
-                return
-
-            # Ищем активный счетчик для этой поездки
-            if order.id in waiting_timers:
-                start_time = waiting_timers[order.id]['start_time']
-                current_time = datetime.now()
-                elapsed = current_time - start_time
-                minutes = int(elapsed.total_seconds() / 60)
-                cost = max(1, minutes)  # Минимум 1 минута
-
-                text = (
-                    f"📊 <b>AKTUALNY KOSZT OCZEKIWANIA</b>\n\n"
-                    f"⏰ <b>Rozpoczęto:</b> {start_time.strftime('%H:%M:%S')}\n"
-                    f"⏱️ <b>Upłynęło:</b> {minutes} min\n"
-                    f"💰 <b>Koszt:</b> {cost} zł\n\n"
-                    f"<i>Taryfa: 1 zł za minutę</i>"
-                )
-            else:
-                text = "ℹ️ Licznik oczekiwania nie jest aktywny"
+        order = await active_ride_index.for_client(
+            callback.from_user.id, (RideStatus.IN_PROGRESS,)
+        )
 
-            await callback.answer(text, show_alert=True)
+        if not order:
+            await callback.answer("❌ Активная поездка не найдена")
+            return
+
+        # Ищем активный счетчик для этой поездки
+        if order.id in waiting_timers:
+            start_time = waiting_timers[order.id]['start_time']
+            current_time = datetime.now()
+            elapsed = current_time - start_time
+            minutes = int(elapsed.total_seconds() / 60)
+            cost = max(1, minutes)  # Минимум 1 минута
+
+            text = (
+                f"📊 <b>AKTUALNY KOSZT OCZEKIWANIA</b>\n\n"
+                f"⏰ <b>Rozpoczęto:</b> {start_time.strftime('%H:%M:%S')}\n"
+                f"⏱️ <b>Upłynęło:</b> {minutes} min\n"
+                f"💰 <b>Koszt:</b> {cost} zł\n\n"
+                f"<i>Taryfa: 1 zł za minutę</i>"
+            )
+        else:
+            text = "ℹ️ Licznik oczekiwania nie jest aktywny"
+
+        await callback.answer(text, show_alert=True)
 
     except Exception as e:
         logger.error(f"Error checking waiting cost for passenger: {e}")
@@ -566,50 +560,56 @@ async def check_waiting_cost_passenger(callback: CallbackQuery):
 async def driver_arrived(callback: CallbackQuery, state: FSMContext):
     """Водитель прибыл к пассажиру"""
     try:
-        with Session() as session:
-            order = session.query(Order).filter_by(
-                driver_id=callback.from_user.id,
-                status="accepted"
-            ).order_by(Order.created_at.desc()).first()
-
-            if not order:
-                await callback.answer("❌ Активный заказ не найден")
-                return
-
-            # Обновляем статус
-            order.status = "driver_arrived"
-            order.accepted_at = datetime.now()
-            session.commit()
-
-            # Уведомляем пассажира
+        active_ride = await active_ride_index.for_driver(
+            callback.from_user.id, (RideStatus.ACCEPTED,)
+        )
+
+        if not active_ride:
+            await callback.answer("❌ Активный заказ не найден")
+            return
+        ride_id = active_ride.ride_id
+
+        # Язык пассажира - до транзакции: построитель outbox не делает ввод-вывод
+        client_lang = await get_user_language_simple(active_ride.client_id) if active_ride.client_id else "pl"
+
+        def notify_passenger(order):
+            """Уведомление пассажира - в outbox вместе со сменой статуса"""
             client_id = getattr(order, 'client_id', getattr(order, 'user_id', None))
-            if client_id:
-                from core.keyboards import get_client_ride_keyboard
-                lang = await get_user_language_simple(client_id)
-
-                await Bots.client.send_message(
-                    chat_id=client_id,
-                    text=(
-                        "✅ <b>Kierowca przyjechał!</b>\n\n"
-                        "🚗 Twój kierowca już na miejscu i czeka na Ciebie.\n"
-                        "Sprawdź numer rejestracyjny i wsiadaj do samochodu."
-                    ),
-                    reply_markup=get_client_ride_keyboard(lang, "arrived"),
-                    parse_mode="HTML"
-                )
-
-            # Обновляем клавиатуру водителя
-            lang = await get_user_language_simple(callback.from_user.id)
-
-            await callback.message.edit_text(
-                f"✅ <b>PRZYJECHAŁEŚ DO PASAŻERA</b>\n\n"
-                f"📍 Adres: {order.pickup_address}\n"
-                f"👥 Pasażerów: {getattr(order, 'passengers_count', 1)}\n\n"
-                f"🎯 Czekaj na pasażera i naciśnij 'Rozpocznij podróż' gdy wsiądzie do samochodu.",
-                reply_markup=get_driver_ride_keyboard(lang, "arrived"),
+            if not client_id:
+                return []
+            from core.keyboards import get_client_ride_keyboard
+
+            return [outbox_message(
+                "client",
+                client_id,
+                (
+                    "✅ <b>Kierowca przyjechał!</b>\n\n"
+                    "🚗 Twój kierowca już na miejscu i czeka na Ciebie.\n"
+                    "Sprawdź numer rejestracyjny i wsiadaj do samochodu."
+                ),
+                reply_markup=get_client_ride_keyboard(client_lang, "arrived"),
                 parse_mode="HTML"
-            )
-            await callback.answer("✅ Status zaktualizowany - przyjechałeś")
+            )]
+
+        # Атомарная смена статуса: ACCEPTED -> DRIVER_ARRIVED
+        result = await ride_state_machine.arrive(ride_id, callback.from_user.id, outbox=notify_passenger)
+        if not result.won:
+            await callback.answer("❌ Статус заказа уже изменился")
+            return
+        order = result.ride
+
+        # Обновляем клавиатуру водителя
+        lang = await get_user_language_simple(callback.from_user.id)
+
+        await callback.message.edit_text(
+            f"✅ <b>PRZYJECHAŁEŚ DO PASAŻERA</b>\n\n"
+            f"📍 Adres: {order.pickup_address}\n"
+            f"👥 Pasażerów: {getattr(order, 'passengers_count', 1)}\n\n"
+            f"🎯 Czekaj na pasażera i naciśnij 'Rozpocznij podróż' gdy wsiądzie do samochodu.",
+            reply_markup=get_driver_ride_keyboard(lang, "arrived"),
+            parse_mode="HTML"
+        )
+        await callback.answer("✅ Status zaktualizowany - przyjechałeś")
 
     except Exception as e:
         logger.error(f"Error updating driver arrival: {e}")
@@ -620,71 +620,75 @@ async def driver_arrived(callback: CallbackQuery, state: FSMContext):
 async def start_trip(callback: CallbackQuery, state: FSMContext):
     """Начать поездку"""
     try:
-        with Session() as session:
-            order = session.query(Order).filter_by(
-                driver_id=callback.from_user.id,
-                status="driver_arrived"
-            ).order_by(Order.created_at.desc()).first()
-
-            if not order:
-                await callback.answer("❌ Заказ не найден или статус неверный")
-                return
-
-            # Обновляем статус
-            order.status = "in_progress"
-            order.started_at = datetime.now()
-            session.commit()
-
-            # Уведомляем пассажира с кнопкой запроса остановки
+        ride_id = await active_ride_index.driver_ride_id(
+            callback.from_user.id, (RideStatus.DRIVER_ARRIVED,)
+        )
+
+        if not ride_id:
+            await callback.answer("❌ Заказ не найден или статус неверный")
+            return
+
+        def notify_passenger(order):
+            """Уведомление пассажира с кнопкой запроса остановки - в outbox"""
             client_id = getattr(order, 'client_id', getattr(order, 'user_id', None))
-            if client_id:
-                # Создаем клавиатуру с кнопкой запроса остановки
-                passenger_keyboard = InlineKeyboardBuilder()
-                passenger_keyboard.button(text="🛑 Poproś o zatrzymanie", callback_data="request_stop")
-                passenger_keyboard.button(text="📍 Obecna lokalizacja", callback_data="current_location")
-                passenger_keyboard.adjust(1)
-
-                await Bots.client.send_message(
-                    chat_id=client_id,
-                    text=(
-                        "🚦 <b>Podróż rozpoczęta!</b>\n\n"
-                        f"📍 Cel: {order.destination_address}\n"
-                        f"💵 Koszt: {getattr(order, 'estimated_price', getattr(order, 'price', 0))} zł\n\n"
-                        "Życzymy miłej podróży!\n\n"
-                        "ℹ️ <b>Dodatkowe opcje:</b>\n"
-                        "• Możesz poprosić o zatrzymanie (1 zł/minuta)\n"
-                        "• Sprawdzić bieżącą lokalizację"
-                    ),
-                    reply_markup=passenger_keyboard.as_markup(),
-                    parse_mode="HTML"
-                )
-
-            # Обновляем клавиатуру водителя
-            lang = await get_user_language_simple(callback.from_user.id)
-
-            await callback.message.edit_text(
-                f"🚦 <b>PODRÓŻ ROZPOCZĘTA</b>\n\n"
-                f"📍 Skąd: {order.pickup_address}\n"
-                f"📍 Dokąd: {order.destination_address}\n"
-                f"💵 Koszt: {getattr(order, 'estimated_price', getattr(order, 'price', 0))} zł\n\n"
-                f"🧭 Jedź trasą do miejsca przeznaczenia.",
-                reply_markup=get_driver_ride_keyboard(lang, "in_progress"),
+            if not client_id:
+                return []
+
+            # Создаем клавиатуру с кнопкой запроса остановки
+            passenger_keyboard = InlineKeyboardBuilder()
+            passenger_keyboard.button(text="🛑 Poproś o zatrzymanie", callback_data="request_stop")
+            passenger_keyboard.button(text="📍 Obecna lokalizacja", callback_data="current_location")
+            passenger_keyboard.adjust(1)
+
+            return [outbox_message(
+                "client",
+                client_id,
+                (
+                    "🚦 <b>Podróż rozpoczęta!</b>\n\n"
+                    f"📍 Cel: {order.destination_address}\n"
+                    f"💵 Koszt: {getattr(order, 'estimated_price', getattr(order, 'price', 0))} zł\n\n"
+                    "Życzymy miłej podróży!\n\n"
+                    "ℹ️ <b>Dodatkowe opcje:</b>\n"
+                    "• Możesz poprosić o zatrzymanie (1 zł/minuta)\n"
+                    "• Sprawdzić bieżącą lokalizację"
+                ),
+                reply_markup=passenger_keyboard.as_markup(),
                 parse_mode="HTML"
-            )
-            await callback.answer("✅ Podróż rozpoczęta")
-
-            # Отправляем клавиатуру для навигации
-            navigation_keyboard = ReplyKeyboardMarkup(
-                keyboard=[
-                    [KeyboardButton(text="📍 Транслировать геопозицию", request_location=True)],
-                    [KeyboardButton(text="🏁 Завершить поездку")]
-                ],
-                resize_keyboard=True
-            )
-            await callback.message.answer(
-                "📍 Naciśnij przycisk poniżej, aby pasażer widział Twoją lokalizację:",
-                reply_markup=navigation_keyboard
-            )
+            )]
+
+        # Атомарная смена статуса: DRIVER_ARRIVED -> IN_PROGRESS
+        result = await ride_state_machine.start(ride_id, callback.from_user.id, outbox=notify_passenger)
+        if not result.won:
+            await callback.answer("❌ Заказ не найден или статус неверный")
+            return
+        order = result.ride
+
+        # Обновляем клавиатуру водителя
+        lang = await get_user_language_simple(callback.from_user.id)
+
+        await callback.message.edit_text(
+            f"🚦 <b>PODRÓŻ ROZPOCZĘTA</b>\n\n"
+            f"📍 Skąd: {order.pickup_address}\n"
+            f"📍 Dokąd: {order.destination_address}\n"
+            f"💵 Koszt: {getattr(order, 'estimated_price', getattr(order, 'price', 0))} zł\n\n"
+            f"🧭 Jedź trasą do miejsca przeznaczenia.",
+            reply_markup=get_driver_ride_keyboard(lang, "in_progress"),
+            parse_mode="HTML"
+        )
+        await callback.answer("✅ Podróż rozpoczęta")
+
+        # Отправляем клавиатуру для навигации
+        navigation_keyboard = ReplyKeyboardMarkup(
+            keyboard=[
+                [KeyboardButton(text="📍 Транслировать геопозицию", request_location=True)],
+                [KeyboardButton(text="🏁 Завершить поездку")]
+            ],
+            resize_keyboard=True
+        )
+        await callback.message.answer(
+            "📍 Naciśnij przycisk poniżej, aby pasażer widział Twoją lokalizację:",
+            reply_markup=navigation_keyboard
+        )
 
     except Exception as e:
         logger.error(f"Error starting trip: {e}")
@@ -706,80 +710,70 @@ async def complete_trip(callback: CallbackQuery, state: FSMContext):
         if ride_id in waiting_timers:
             waiting_info = await stop_waiting_counter(ride_id)
 
-        with Session() as session:
-            order = session.query(Order).get(ride_id)
-            if not order:
-                await callback.answer("❌ Заказ не найден")
-                return
-
-            # Обновляем статус поездки
-            order.status = "completed"
-            order.completed_at = datetime.now()
-
-            # Рассчитываем финальную стоимость
-            base_price = getattr(order, 'estimated_price', getattr(order, 'price', Decimal('0')))
-            if isinstance(base_price, (int, float)):
-                base_price = Decimal(str(base_price))
-
-            waiting_cost = Decimal('0')
-            if waiting_info:
-                waiting_cost = waiting_info['cost']
+        order = await ride_repository.get(ride_id)
+        if not order:
+            await callback.answer("❌ Заказ не найден")
+            return
 
-            total_price = base_price + waiting_cost
+        # Рассчитываем финальную стоимость
+        base_price = getattr(order, 'estimated_price', getattr(order, 'price', Decimal('0')))
+        if isinstance(base_price, (int, float)):
+            base_price = Decimal(str(base_price))
 
-            # Обновляем финальную цену
-            if hasattr(order, 'final_price'):
-                order.final_price = total_price
-            else:
-                # Для обратной совместимости
-                if hasattr(order, 'estimated_price'):
-                    order.estimated_price = total_price
-                elif hasattr(order, 'price'):
-                    order.price = total_price
+        waiting_cost = Decimal('0')
+        if waiting_info:
+            waiting_cost = waiting_info['cost']
 
-            session.commit()
+        total_price = base_price + waiting_cost
 
-            # Отправляем итоговый чек пассажиру
+        def send_receipt(order):
+            """Итоговый чек пассажиру - в outbox вместе с завершением поездки"""
             client_id = getattr(order, 'client_id', getattr(order, 'user_id', None))
-            if client_id:
-                receipt_text = (
-                    f"🏁 <b>PODRÓŻ ZAKOŃCZONA!</b>\n\n"
-                    f"💵 <b>Do zapłaty:</b>\n"
-                    f"- Taryfa podstawowa: {base_price} zł\n"
-                )
-
-                if waiting_cost > 0:
-                    receipt_text += f"- Czas oczekiwania: {waiting_cost} zł ({waiting_info['minutes']} min)\n"
-
-                receipt_text += (
-                    f"- <b>Razem: {total_price} zł</b>\n\n"
-                    f"Dziękujemy za skorzystanie z naszych usług!"
-                )
-
-                await Bots.client.send_message(
-                    chat_id=client_id,
-                    text=receipt_text,
-                    parse_mode="HTML"
-                )
-
-            # Уведомляем водителя
-            driver_text = (
-                f"✅ <b>PODRÓŻ ZAKOŃCZONA</b>\n\n"
-                f"💰 <b>Otrzymano:</b> {total_price} zł\n"
-                f"- Podstawa: {base_price} zł\n"
+            if not client_id:
+                return []
+
+            receipt_text = (
+                f"🏁 <b>PODRÓŻ ZAKOŃCZONA!</b>\n\n"
+                f"💵 <b>Do zapłaty:</b>\n"
+                f"- Taryfa podstawowa: {base_price} zł\n"
             )
 
             if waiting_cost > 0:
-                driver_text += f"- Oczekiwanie: {waiting_cost} zł\n"
+                receipt_text += f"- Czas oczekiwania: {waiting_cost} zł ({waiting_info['minutes']} min)\n"
 
-            await callback.message.edit_text(
-                driver_text,
-                parse_mode="HTML"
+            receipt_text += (
+                f"- <b>Razem: {total_price} zł</b>\n\n"
+                f"Dziękujemy za skorzystanie z naszych usług!"
             )
-            await callback.answer("✅ Podróż zakończona")
-            await state.clear()
+            return [outbox_message("client", client_id, receipt_text, parse_mode="HTML")]
 
-            logger.info(f"Trip {ride_id} completed with total cost {total_price} zł")
+        # Атомарно завершаем поездку с финальной ценой (только из IN_PROGRESS)
+        result = await ride_state_machine.complete(
+            ride_id, callback.from_user.id, total_price, outbox=send_receipt
+        )
+        if not result.won:
+            await callback.answer("❌ Поездка уже завершена или отменена")
+            return
+        order = result.ride
+
+        # Уведомляем водителя
+        driver_text = (
+            f"✅ <b>PODRÓŻ ZAKOŃCZONA</b>\n\n"
+            f"💰 <b>Otrzymano:</b> {total_price} zł\n"
+            f"- Podstawa: {base_price} zł\n"
+        )
+
+        if waiting_cost > 0:
+            driver_text += f"- Oczekiwanie: {waiting_cost} zł\n"
+
+        await callback.message.edit_text(
+            driver_text,
+            parse_mode="HTML"
+        )
+        await callback.answer("✅ Podróż zakończona")
+        await state.clear()
+
+        logger.info(f"Trip {ride_id} completed with total cost {total_price} zł")
 
     except Exception as e:
         logger.error(f"Error completing trip: {e}")
@@ -793,45 +787,45 @@ async def complete_trip(callback: CallbackQuery, state: FSMContext):
 async def notify_driver_stop_request(ride_id: int, passenger_id: int, language: str = "pl"):
     """Уведомление водителя о запросе остановки"""
     try:
-        with Session() as session:
-            order = session.query(Order).get(ride_id)
-            if not order or not order.driver_id:
-                return
-
-            if language == "en":
-                text = (
-                    "⏸️ <b>PASSENGER REQUESTS STOP</b>\n\n"
-                    f"🚖 <b>Trip ID:</b> {ride_id}\n"
-                    f"👤 <b>Passenger:</b> ID {passenger_id}\n\n"
-                    "⏰ <b>Waiting tariff:</b> 1 zł/minute\n\n"
-                    "Choose your action:"
-                )
-            elif language == "ru":
-                text = (
-                    "⏸️ <b>ПАССАЖИР ПРОСИТ ОСТАНОВКУ</b>\n\n"
-                    f"🚖 <b>ID поездки:</b> {ride_id}\n"
-                    f"👤 <b>Пассажир:</b> ID {passenger_id}\n\n"
-                    "⏰ <b>Тариф ожидания:</b> 1 zł/минута\n\n"
-                    "Выберите действие:"
-                )
-            else:  # Polish
-                text = (
-                    "⏸️ <b>PASAŻER PROSI O ZATRZYMANIE</b>\n\n"
-                    f"🚖 <b>ID podróży:</b> {ride_id}\n"
-                    f"👤 <b>Pasażer:</b> ID {passenger_id}\n\n"
-                    "⏰ <b>Taryfa oczekiwania:</b> 1 zł/minuta\n\n"
-                    "Wybierz działanie:"
-                )
-
-            keyboard = get_driver_waiting_response_keyboard(language)
-
-            await Bots.driver.send_message(
-                chat_id=order.driver_id,
-                text=text,
-                parse_mode="HTML",
-                reply_markup=keyboard
+        order = await ride_repository.get(ride_id)
+        if not order or not order.driver_id:
+            return
+
+        if language == "en":
+            text = (
+                "⏸️ <b>PASSENGER REQUESTS STOP</b>\n\n"
+                f"🚖 <b>Trip ID:</b> {ride_id}\n"
+                f"👤 <b>Passenger:</b> ID {passenger_id}\n\n"
+                "⏰ <b>Waiting tariff:</b> 1 zł/minute\n\n"
+                "Choose your action:"
+            )
+        elif language == "ru":
+            text = (
+                "⏸️ <b>ПАССАЖИР ПРОСИТ ОСТАНОВКУ</b>\n\n"
+                f"🚖 <b>ID поездки:</b> {ride_id}\n"
+                f"👤 <b>Пассажир:</b> ID {passenger_id}\n\n"
+                "⏰ <b>Тариф ожидания:</b> 1 zł/минута\n\n"
+                "Выберите действие:"
+            )
+        else:  # Polish
+            text = (
+                "⏸️ <b>PASAŻER PROSI O ZATRZYMANIE</b>\n\n"
+                f"🚖 <b>ID podróży:</b> {ride_id}\n"
+                f"👤 <b>Pasażer:</b> ID {passenger_id}\n\n"
+                "⏰ <b>Taryfa oczekiwania:</b> 1 zł/minuta\n\n"
+                "Wybierz działanie:"
             )
 
+        keyboard = get_driver_waiting_response_keyboard(language)
+
+        await enqueue_message(
+            "driver",
+            chat_id=order.driver_id,
+            text=text,
+            parse_mode="HTML",
+            reply_markup=keyboard
+        )
+
     except Exception as e:
         logger.error(f"Error notifying driver about stop request: {e}")
 
@@ -842,36 +836,34 @@ async def handle_stop_request_from_passenger(callback: CallbackQuery):
     """Обработка запроса остановки от пассажира"""
     try:
         # Находим активную поездку пассажира
-        with Session() as session:
-            order = session.query(Order).filter(
-                Order.client_id == callback.from_user.id,
-                Order.status == "in_progress"
-            ).order_by(Order.created_at.desc()).first()
+        order = await active_ride_index.for_client(
+            callback.from_user.id, (RideStatus.IN_PROGRESS,)
+        )
 
-            if not order:
-                await callback.answer("❌ Активная поездка не найдена")
-                return
+        if not order:
+            await callback.answer("❌ Активная поездка не найдена")
+            return
 
-            # Проверяем, не активен ли уже счетчик ожидания
-            if order.id in waiting_timers:
-                await callback.answer("⏰ Licznik oczekiwania już jest aktywny")
-                return
+        # Проверяем, не активен ли уже счетчик ожидания
+        if order.id in waiting_timers:
+            await callback.answer("⏰ Licznik oczekiwania już jest aktywny")
+            return
 
-            # Уведомляем водителя о запросе остановки
-            await notify_driver_stop_request(order.id, callback.from_user.id, "pl")
+        # Уведомляем водителя о запросе остановки
+        await notify_driver_stop_request(order.id, callback.from_user.id, "pl")
 
-            # Уведомляем пассажира
-            text = (
-                "⏸️ <b>Prośba o zatrzymanie wysłana!</b>\n\n"
-                "⏰ <b>Taryfa oczekiwania:</b> 1 zł/minuta\n\n"
-                "Czekamy na odpowiedź kierowcy..."
-            )
+        # Уведомляем пассажира
+        text = (
+            "⏸️ <b>Prośba o zatrzymanie wysłana!</b>\n\n"
+            "⏰ <b>Taryfa oczekiwania:</b> 1 zł/minuta\n\n"
+            "Czekamy na odpowiedź kierowcy..."
+        )
 
-            await callback.message.edit_text(
-                text=text,
-                parse_mode="HTML"
-            )
-            await callback.answer("✅ Prośba wysłana do kierowcy")
+        await callback.message.edit_text(
+            text=text,
+            parse_mode="HTML"
+        )
+        await callback.answer("✅ Prośba wysłana do kierowcy")
 
     except Exception as e:
         logger.error(f"Error handling stop request from passenger: {e}")
@@ -886,28 +878,26 @@ async def handle_stop_request_from_passenger(callback: CallbackQuery):
 async def navigate_to_pickup(callback: CallbackQuery):
     """Навигация к пассажиру"""
     try:
-        with Session() as session:
-            order = session.query(Order).filter_by(
-                driver_id=callback.from_user.id,
-                status="accepted"
-            ).order_by(Order.created_at.desc()).first()
-
-            if not order:
-                await callback.answer("❌ Активный заказ не найden")
-                return
-
-            # Создаем ссылку на Google Maps навигацию
-            pickup_address = quote(order.pickup_address)
-            google_maps_url = f"https://www.google.com/maps/dir/?api=1&destination={pickup_address}&travelmode=driving"
-
-            await callback.message.answer(
-                f"🧭 <b>Nawigacja do pasażera</b>\n\n"
-                f"📍 Adres: {order.pickup_address}\n\n"
-                f"[🗺️ Otwórz w Google Maps]({google_maps_url})",
-                parse_mode="HTML",
-                disable_web_page_preview=True
-            )
-            await callback.answer("🧭 Nawigacja wysłana")
+        order = await ride_repository.get_active_for_driver(
+            callback.from_user.id, (RideStatus.ACCEPTED,)
+        )
+
+        if not order:
+            await callback.answer("❌ Активный заказ не найden")
+            return
+
+        # Создаем ссылку на Google Maps навигацию
+        pickup_address = quote(order.pickup_address)
+        google_maps_url = f"https://www.google.com/maps/dir/?api=1&destination={pickup_address}&travelmode=driving"
+
+        await callback.message.answer(
+            f"🧭 <b>Nawigacja do pasażera</b>\n\n"
+            f"📍 Adres: {order.pickup_address}\n\n"
+            f"[🗺️ Otwórz w Google Maps]({google_maps_url})",
+            parse_mode="HTML",
+            disable_web_page_preview=True
+        )
+        await callback.answer("🧭 Nawigacja wysłana")
 
     except Exception as e:
         logger.error(f"Error getting navigation: {e}")
@@ -918,28 +908,26 @@ async def navigate_to_pickup(callback: CallbackQuery):
 async def navigate_to_destination(callback: CallbackQuery):
     """Навигация к месту назначения"""
     try:
-        with Session() as session:
-            order = session.query(Order).filter_by(
-                driver_id=callback.from_user.id,
-                status="in_progress"
-            ).order_by(Order.created_at.desc()).first()
-
-            if not order:
-                await callback.answer("❌ Активная поездка не найдена")
-                return
-
-            # Создаем ссылку на Google Maps навигацию
-            destination_address = quote(order.destination_address)
-            google_maps_url = f"https://www.google.com/maps/dir/?api=1&destination={destination_address}&travelmode=driving"
-
-            await callback.message.answer(
-                f"🧭 <b>Nawigacja do miejsca przeznaczenia</b>\n\n"
-                f"📍 Adres: {order.destination_address}\n\n"
-                f"[🗺️ Otwórz w Google Maps]({google_maps_url})",
-                parse_mode="HTML",
-                disable_web_page_preview=True
-            )
-            await callback.answer("🧭 Nawigacja wysłana")
+        order = await ride_repository.get_active_for_driver(
+            callback.from_user.id, (RideStatus.IN_PROGRESS,)
+        )
+
+        if not order:
+            await callback.answer("❌ Активная поездка не найдена")
+            return
+
+        # Создаем ссылку на Google Maps навигацию
+        destination_address = quote(order.destination_address)
+        google_maps_url = f"https://www.google.com/maps/dir/?api=1&destination={destination_address}&travelmode=driving"
+
+        await callback.message.answer(
+            f"🧭 <b>Nawigacja do miejsca przeznaczenia</b>\n\n"
+            f"📍 Adres: {order.destination_address}\n\n"
+            f"[🗺️ Otwórz w Google Maps]({google_maps_url})",
+            parse_mode="HTML",
+            disable_web_page_preview=True
+        )
+        await callback.answer("🧭 Nawigacja wysłana")
 
     except Exception as e:
         logger.error(f"Error getting destination navigation: {e}")
@@ -973,35 +961,38 @@ async def driver_cancel_order(callback: CallbackQuery):
         if ride_id in waiting_timers:
             await stop_waiting_counter(ride_id)
 
-        with Session() as session:
-            order = session.query(Order).get(ride_id)
-            if not order:
-                await callback.answer("❌ Заказ не найден")
-                return
-
-            order.status = "cancelled"
-            order.cancellation_reason = "Cancelled by driver"
-            order.cancelled_at = datetime.now()
-            session.commit()
-
-            # Уведомляем пассажира
+        def notify_passenger(order):
+            """Уведомление пассажира об отмене - в outbox"""
             client_id = getattr(order, 'client_id', getattr(order, 'user_id', None))
-            if client_id:
-                await Bots.client.send_message(
-                    chat_id=client_id,
-                    text=(
-                        "❌ <b>Kierowca anulował zamówienie</b>\n\n"
-                        "Przepraszamy za niedogodność. Możesz złożyć nowe zamówienie."
-                    ),
-                    parse_mode="HTML"
-                )
-
-            await callback.message.edit_text(
-                "❌ <b>ZAMÓWIENIE ANULOWANE</b>\n\n"
-                "Anulowałeś zamówienie. Pasażer został powiadomiony.",
+            if not client_id:
+                return []
+            return [outbox_message(
+                "client",
+                client_id,
+                (
+                    "❌ <b>Kierowca anulował zamówienie</b>\n\n"
+                    "Przepraszamy za niedogodność. Możesz złożyć nowe zamówienie."
+                ),
                 parse_mode="HTML"
-            )
-            await callback.answer("✅ Zamówienie anulowane")
+            )]
+
+        result = await ride_state_machine.cancel(
+            ride_id,
+            "Cancelled by driver",
+            expected=ACTIVE_RIDE_STATUSES,
+            owner_driver_id=callback.from_user.id,
+            outbox=notify_passenger
+        )
+        if not result.won:
+            await callback.answer("❌ Заказ не найден")
+            return
+
+        await callback.message.edit_text(
+            "❌ <b>ZAMÓWIENIE ANULOWANE</b>\n\n"
+            "Anulowałeś zamówienie. Pasażer został powiadomiony.",
+            parse_mode="HTML"
+        )
+        await callback.answer("✅ Zamówienie anulowane")
 
     except Exception as e:
         logger.error(f"Error cancelling order by driver: {e}")
@@ -1018,25 +1009,25 @@ async def emergency_stop(callback: CallbackQuery):
             await callback.answer("❌ Активная поездка не найдена")
             return
 
-        with Session() as session:
-            order = session.query(Order).get(ride_id)
-            if not order:
-                return
+        order = await ride_repository.get(ride_id)
+        if not order:
+            return
 
-            # Уведомляем пассажира
-            client_id = getattr(order, 'client_id', getattr(order, 'user_id', None))
-            if client_id:
-                await Bots.client.send_message(
-                    chat_id=client_id,
-                    text=(
-                        "🛑 <b>Nagłe zatrzymanie</b>\n\n"
-                        "Kierowca musiał zatrzymać się z powodu sytuacji nadzwyczajnej.\n"
-                        "Skontaktuj się z kierowcą w celu uzyskania szczegółów."
-                    ),
-                    parse_mode="HTML"
-                )
-
-            await callback.answer("🛑 Pasażer powiadomiony o nagłym zatrzymaniu")
+        # Уведомляем пассажира
+        client_id = getattr(order, 'client_id', getattr(order, 'user_id', None))
+        if client_id:
+            await enqueue_message(
+                "client",
+                chat_id=client_id,
+                text=(
+                    "🛑 <b>Nagłe zatrzymanie</b>\n\n"
+                    "Kierowca musiał zatrzymać się z powodu sytuacji nadzwyczajnej.\n"
+                    "Skontaktuj się z kierowcą w celu uzyskania szczegółów."
+                ),
+                parse_mode="HTML"
+            )
+
+        await callback.answer("🛑 Pasażer powiadomiony o nagłym zatrzymaniu")
 
     except Exception as e:
         logger.error(f"Error emergency stop: {e}")
@@ -1051,50 +1042,52 @@ async def emergency_stop(callback: CallbackQuery):
 async def handle_driver_location_updates(message: Message):
     """Обработка обновлений местоположения водителя"""
     try:
-        with Session() as session:
-            # Находим активный заказ водителя
-            order = session.query(Order).filter_by(
-                driver_id=message.from_user.id
-            ).filter(Order.status.in_(["accepted", "driver_arrived", "in_progress"])).order_by(
-                Order.created_at.desc()).first()
-
-            if not order:
-                await message.answer("ℹ️ Brak aktywnych zamówień do śledzenia")
-                return
-
-            # Обновляем местоположение водителя в базе (если нужно)
-            from core.models import Vehicle as DriverVehicle
-            vehicle = session.query(DriverVehicle).filter_by(driver_id=message.from_user.id).first()
-            if vehicle and hasattr(vehicle, 'last_lat'):
-                vehicle.last_lat = message.location.latitude
-                vehicle.last_lon = message.location.longitude
-                session.commit()
-
-            # Отправляем местоположение пассажиру
-            client_id = getattr(order, 'client_id', getattr(order, 'user_id', None))
-            if client_id:
-                await Bots.client.send_location(
-                    chat_id=client_id,
+        # Водитель в сети, позиция - для поиска ближайших (в любом случае)
+        driver_availability.heartbeat(
+            message.from_user.id, message.location.latitude, message.location.longitude
+        )
+
+        # Находим активный заказ водителя (индекс в памяти)
+        order = await active_ride_index.for_driver(message.from_user.id)
+
+        if not order:
+            await message.answer("ℹ️ Brak aktywnych zamówień do śledzenia")
+            return
+
+        # Местоположение для пассажира уходит через outbox вместе с обновлением в базе
+        outbox = []
+        client_id = order.client_id
+        if client_id:
+            # Статус обновления в зависимости от стадии поездки
+            if order.status == "accepted":
+                status_text = "🚗 Kierowca jedzie do Ciebie"
+            elif order.status == "driver_arrived":
+                status_text = "✅ Kierowca czeka na miejscu"
+            else:  # in_progress
+                status_text = "🚦 Podróż w toku"
+
+            outbox = [
+                outbox_message(
+                    "client",
+                    client_id,
+                    method="send_location",
                     latitude=message.location.latitude,
                     longitude=message.location.longitude,
                     disable_notification=True
-                )
-
-                # Статус обновления в зависимости от стадии поездки
-                if order.status == "accepted":
-                    status_text = "🚗 Kierowca jedzie do Ciebie"
-                elif order.status == "driver_arrived":
-                    status_text = "✅ Kierowca czeka na miejscu"
-                else:  # in_progress
-                    status_text = "🚦 Podróż w toku"
-
-                await Bots.client.send_message(
-                    chat_id=client_id,
-                    text=f"📍 {status_text}",
-                    disable_notification=True
-                )
+                ),
+                outbox_message("client", client_id, f"📍 {status_text}", disable_notification=True),
+            ]
+
+        await vehicle_repository.update_location(
+            message.from_user.id,
+            message.location.latitude,
+            message.location.longitude,
+            outbox=outbox
+        )
+        if outbox:
+            outbox_dispatcher.wake()
 
-            await message.answer("✅ Lokalizacja zaktualizowana", disable_notification=True)
+        await message.answer("✅ Lokalizacja zaktualizowana", disable_notification=True)
 
     except Exception as e:
         logger.error(f"Error handling location update: {e}")
@@ -1111,43 +1104,42 @@ async def complete_trip_button(message: Message):
             await message.answer("❌ Активная поездка не найдена")
             return
 
-        with Session() as session:
-            order = session.query(Order).get(ride_id)
-            if not order:
-                await message.answer("❌ Заказ не найден")
-                return
-
-            # Рассчитываем предварительную стоимость с учетом ожидания
-            base_price = getattr(order, 'estimated_price', getattr(order, 'price', 0))
-            waiting_cost = Decimal('0')
-            waiting_text = ""
-
-            if ride_id in waiting_timers:
-                start_time = waiting_timers[ride_id]['start_time']
-                current_time = datetime.now()
-                elapsed = current_time - start_time
-                minutes = max(1, int(elapsed.total_seconds() / 60))
-                waiting_cost = Decimal(str(minutes))
-                waiting_text = f"\n- Oczekiwanie: {waiting_cost} zł ({minutes} min)"
-
-            total_price = (Decimal(str(base_price)) if isinstance(base_price, (int, float)) else base_price) + waiting_cost
-
-            # Запрашиваем подтверждение
-            builder = InlineKeyboardBuilder()
-            builder.button(text="✅ Tak, zakończ", callback_data="complete_trip")
-            builder.button(text="❌ Anuluj", callback_data="cancel_complete")
-
-            await message.answer(
-                f"🏁 <b>Zakończyć podróż?</b>\n\n"
-                f"📍 Skąd: {order.pickup_address}\n"
-                f"📍 Dokąd: {order.destination_address}\n\n"
-                f"💵 <b>Koszt:</b>\n"
-                f"- Podstawa: {base_price} zł{waiting_text}\n"
-                f"- <b>Razem: {total_price} zł</b>\n\n"
-                f"Potwierdź zakończenie podróży:",
-                reply_markup=builder.as_markup(),
-                parse_mode="HTML"
-            )
+        order = await ride_repository.get(ride_id)
+        if not order:
+            await message.answer("❌ Заказ не найден")
+            return
+
+        # Рассчитываем предварительную стоимость с учетом ожидания
+        base_price = getattr(order, 'estimated_price', getattr(order, 'price', 0))
+        waiting_cost = Decimal('0')
+        waiting_text = ""
+
+        if ride_id in waiting_timers:
+            start_time = waiting_timers[ride_id]['start_time']
+            current_time = datetime.now()
+            elapsed = current_time - start_time
+            minutes = max(1, int(elapsed.total_seconds() / 60))
+            waiting_cost = Decimal(str(minutes))
+            waiting_text = f"\n- Oczekiwanie: {waiting_cost} zł ({minutes} min)"
+
+        total_price = (Decimal(str(base_price)) if isinstance(base_price, (int, float)) else base_price) + waiting_cost
+
+        # Запрашиваем подтверждение
+        builder = InlineKeyboardBuilder()
+        builder.button(text="✅ Tak, zakończ", callback_data="complete_trip")
+        builder.button(text="❌ Anuluj", callback_data="cancel_complete")
+
+        await message.answer(
+            f"🏁 <b>Zakończyć podróż?</b>\n\n"
+            f"📍 Skąd: {order.pickup_address}\n"
+            f"📍 Dokąd: {order.destination_address}\n\n"
+            f"💵 <b>Koszt:</b>\n"
+            f"- Podstawa: {base_price} zł{waiting_text}\n"
+            f"- <b>Razem: {total_price} zł</b>\n\n"
+            f"Potwierdź zakończenie podróży:",
+            reply_markup=builder.as_markup(),
+            parse_mode="HTML"
+        )
 
     except Exception as e:
         logger.error(f"Error requesting trip completion: {e}")
@@ -1236,38 +1228,37 @@ async def check_driver_status(message: Message):
             await message.answer("📊 <b>STATUS KIEROWCY</b>\n\n❌ Brak aktywnych zamówień", parse_mode="HTML")
             return
 
-        with Session() as session:
-            order = session.query(Order).get(ride_id)
-            if not order:
-                await message.answer("❌ Zamówienie nie znalezione")
-                return
-
-            status_manager = RideStatusManager()
-            status_text = status_manager.get_status_text(order.status, "pl")
-
-            result_text = (
-                f"📊 <b>STATUS KIEROWCY</b>\n\n"
-                f"🆔 <b>Zamówienie:</b> #{order.id}\n"
-                f"📋 <b>Status:</b> {status_text}\n"
-                f"📍 <b>Skąd:</b> {order.pickup_address}\n"
-                f"📍 <b>Dokąd:</b> {order.destination_address}\n"
-                f"👥 <b>Pasażerów:</b> {getattr(order, 'passengers_count', 1)}\n"
-                f"💵 <b>Koszt:</b> {getattr(order, 'estimated_price', getattr(order, 'price', 0))} zł\n"
-                f"🕒 <b>Utworzono:</b> {order.created_at.strftime('%H:%M:%S')}"
-            )
+        order = await ride_repository.get(ride_id)
+        if not order:
+            await message.answer("❌ Zamówienie nie znalezione")
+            return
+
+        status_manager = RideStatusManager()
+        status_text = status_manager.get_status_text(order.status, "pl")
+
+        result_text = (
+            f"📊 <b>STATUS KIEROWCY</b>\n\n"
+            f"🆔 <b>Zamówienie:</b> #{order.id}\n"
+            f"📋 <b>Status:</b> {status_text}\n"
+            f"📍 <b>Skąd:</b> {order.pickup_address}\n"
+            f"📍 <b>Dokąd:</b> {order.destination_address}\n"
+            f"👥 <b>Pasażerów:</b> {getattr(order, 'passengers_count', 1)}\n"
+            f"💵 <b>Koszt:</b> {getattr(order, 'estimated_price', getattr(order, 'price', 0))} zł\n"
+            f"🕒 <b>Utworzono:</b> {order.created_at.strftime('%H:%M:%S')}"
+        )
 
-            if order.started_at:
-                result_text += f"\n🚦 <b>Rozpoczęto:</b> {order.started_at.strftime('%H:%M:%S')}"
+        if order.started_at:
+            result_text += f"\n🚦 <b>Rozpoczęto:</b> {order.started_at.strftime('%H:%M:%S')}"
 
-            # Информация о счетчике ожидания
-            if ride_id in waiting_timers:
-                start_time = waiting_timers[ride_id]['start_time']
-                current_time = datetime.now()
-                elapsed = current_time - start_time
-                minutes = int(elapsed.total_seconds() / 60)
-                result_text += f"\n⏰ <b>Oczekiwanie:</b> {minutes} min (aktywne)"
+        # Информация о счетчике ожидания
+        if ride_id in waiting_timers:
+            start_time = waiting_timers[ride_id]['start_time']
+            current_time = datetime.now()
+            elapsed = current_time - start_time
+            minutes = int(elapsed.total_seconds() / 60)
+            result_text += f"\n⏰ <b>Oczekiwanie:</b> {minutes} min (aktywne)"
 
-            await message.answer(result_text, parse_mode="HTML")
+        await message.answer(result_text, parse_mode="HTML")
 
     except Exception as e:
         await message.answer(f"❌ Błąd sprawdzania statusu: {e}")
@@ -1289,32 +1280,23 @@ async def reset_driver_status(message: Message):
                 await stop_waiting_counter(ride_id)
                 stopped_timers.append(ride_id)
 
-        with Session() as session:
-            # Отменяем все активные заказы водителя
-            active_orders = session.query(Order).filter_by(
-                driver_id=message.from_user.id
-            ).filter(Order.status.in_(["accepted", "driver_arrived", "in_progress"])).all()
-
-            cancelled_count = 0
-            for order in active_orders:
-                order.status = "cancelled"
-                order.cancellation_reason = "Reset by driver command"
-                order.cancelled_at = datetime.now()
-                cancelled_count += 1
-
-            session.commit()
+        # Отменяем все активные заказы водителя
+        cancelled_ids = await ride_repository.cancel_active_for_driver(
+            message.from_user.id, "Reset by driver command"
+        )
+        cancelled_count = len(cancelled_ids)
 
-            result_text = (
-                f"🔄 <b>STATUS ZRESETOWANY</b>\n\n"
-                f"Anulowane zamówienia: {cancelled_count}\n"
-            )
+        result_text = (
+            f"🔄 <b>STATUS ZRESETOWANY</b>\n\n"
+            f"Anulowane zamówienia: {cancelled_count}\n"
+        )
 
-            if stopped_timers:
-                result_text += f"Zatrzymane liczniki: {len(stopped_timers)}\n"
+        if stopped_timers:
+            result_text += f"Zatrzymane liczniki: {len(stopped_timers)}\n"
 
-            result_text += f"Status kierowcy: wolny"
+        result_text += f"Status kierowcy: wolny"
 
-            await message.answer(result_text, parse_mode="HTML")
+        await message.answer(result_text, parse_mode="HTML")
 
     except Exception as e:
         await message.answer(f"❌ Błąd resetowania statusu: {e}")
@@ -1329,34 +1311,32 @@ async def show_current_location(callback: CallbackQuery):
     """Показать текущее местоположение (для пассажира)"""
     try:
         # Находим активную поездку пассажира
-        with Session() as session:
-            order = session.query(Order).filter(
-                Order.client_id == callback.from_user.id,
-                Order.status.in_(["accepted", "driver_arrived", "in_progress"])
-            ).order_by(Order.created_at.desc()).first()
-
-            if not order or not order.driver_id:
-                await callback.answer("❌ Активная поездка не найдена")
-                return
-
-            # Запрашиваем у водителя текущее местоположение
-            await Bots.driver.send_message(
-                chat_id=order.driver_id,
-                text=(
-                    "📍 <b>PASAŻER PROSI O LOKALIZACJĘ</b>\n\n"
-                    "Pasażer chce poznać Twoją aktualną lokalizację.\n"
-                    "Naciśnij przycisk 'Транслировать геопозицию' aby wysłać swoją lokalizację."
-                ),
-                parse_mode="HTML"
-            )
+        order = await ride_repository.get_active_for_client(callback.from_user.id)
 
-            await callback.answer("✅ Poproszono kierowcę o lokalizację")
+        if not order or not order.driver_id:
+            await callback.answer("❌ Активная поездка не найдена")
+            return
 
-            await callback.message.edit_text(
-                "📍 <b>Prośba o lokalizację wysłana</b>\n\n"
-                "Poproszono kierowcę o przesłanie aktualnej lokalizacji.",
-                parse_mode="HTML"
-            )
+        # Запрашиваем у водителя текущее местоположение
+        await enqueue_message(
+            "driver",
+            chat_id=order.driver_id,
+            text=(
+                "📍 <b>PASAŻER PROSI O LOKALIZACJĘ</b>\n\n"
+                "Pasażer chce poznać Twoją aktualną lokalizację.\n"
+                "Naciśnij przycisk 'Транслировать геопозицию' aby wysłać swoją lokalizację."
+            ),
+            parse_mode="HTML",
+            priority=OutboxPriority.STATUS
+        )
+
+        await callback.answer("✅ Poproszono kierowcę o lokalizację")
+
+        await callback.message.edit_text(
+            "📍 <b>Prośba o lokalizację wysłana</b>\n\n"
+            "Poproszono kierowcę o przesłanie aktualnej lokalizacji.",
+            parse_mode="HTML"
+        )
 
     except Exception as e:
         logger.error(f"Error requesting current location: {e}")
@@ -1418,47 +1398,42 @@ async def show_waiting_statistics(message: Message):
         return
 
     try:
-        with Session() as session:
-            # Получаем все завершенные поездки водителя за последние 7 дней
-            week_ago = datetime.now() - timedelta(days=7)
-
-            orders = session.query(Order).filter(
-                Order.driver_id == message.from_user.id,
-                Order.status == "completed",
-                Order.completed_at >= week_ago
-            ).all()
-
-            total_rides = len(orders)
-            waiting_rides = 0
-            total_waiting_minutes = 0
-            total_waiting_cost = Decimal('0')
-
-            for order in orders:
-                if hasattr(order, 'notes') and order.notes:
-                    try:
-                        notes = json.loads(order.notes)
-                        if isinstance(notes, dict) and 'waiting_minutes' in notes:
-                            waiting_rides += 1
-                            total_waiting_minutes += notes.get('waiting_minutes', 0)
-                            total_waiting_cost += Decimal(str(notes.get('waiting_cost', 0)))
-                    except (json.JSONDecodeError, TypeError):
-                        continue
-
-            # Статистика активных счетчиков
-            active_timers = sum(1 for timer_info in waiting_timers.values()
-                              if timer_info.get('driver_id') == message.from_user.id)
-
-            stats_text = (
-                f"📊 <b>STATYSTYKI OCZEKIWANIA (7 dni)</b>\n\n"
-                f"🚖 <b>Łączne przejazdy:</b> {total_rides}\n"
-                f"⏸️ <b>Przejazdy z oczekiwaniem:</b> {waiting_rides}\n"
-                f"⏱️ <b>Łączny czas oczekiwania:</b> {total_waiting_minutes} min\n"
-                f"💰 <b>Łączny zarobek z oczekiwania:</b> {total_waiting_cost} zł\n"
-                f"📈 <b>Średni czas oczekiwania:</b> {total_waiting_minutes / max(waiting_rides, 1):.1f} min\n\n"
-                f"🔄 <b>Aktywne liczniki:</b> {active_timers}"
-            )
+        # Получаем все завершенные поездки водителя за последние 7 дней
+        week_ago = datetime.now() - timedelta(days=7)
+
+        orders = await ride_repository.list_completed_since(week_ago, driver_id=message.from_user.id)
+
+        total_rides = len(orders)
+        waiting_rides = 0
+        total_waiting_minutes = 0
+        total_waiting_cost = Decimal('0')
+
+        for order in orders:
+            if hasattr(order, 'notes') and order.notes:
+                try:
+                    notes = json.loads(order.notes)
+                    if isinstance(notes, dict) and 'waiting_minutes' in notes:
+                        waiting_rides += 1
+                        total_waiting_minutes += notes.get('waiting_minutes', 0)
+                        total_waiting_cost += Decimal(str(notes.get('waiting_cost', 0)))
+                except (json.JSONDecodeError, TypeError):
+                    continue
+
+        # Статистика активных счетчиков
+        active_timers = sum(1 for timer_info in waiting_timers.values()
+                          if timer_info.get('driver_id') == message.from_user.id)
+
+        stats_text = (
+            f"📊 <b>STATYSTYKI OCZEKIWANIA (7 dni)</b>\n\n"
+            f"🚖 <b>Łączne przejazdy:</b> {total_rides}\n"
+            f"⏸️ <b>Przejazdy z oczekiwaniem:</b> {waiting_rides}\n"
+            f"⏱️ <b>Łączny czas oczekiwania:</b> {total_waiting_minutes} min\n"
+            f"💰 <b>Łączny zarobek z oczekiwania:</b> {total_waiting_cost} zł\n"
+            f"📈 <b>Średni czas oczekiwania:</b> {total_waiting_minutes / max(waiting_rides, 1):.1f} min\n\n"
+            f"🔄 <b>Aktywne liczniki:</b> {active_timers}"
+        )
 
-            await message.answer(stats_text, parse_mode="HTML")
+        await message.answer(stats_text, parse_mode="HTML")
 
     except Exception as e:
         logger.error(f"Error showing waiting statistics: {e}")
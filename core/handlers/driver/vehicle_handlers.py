@@ -1,10 +1,10 @@
 from aiogram import Router, F
-from aiogram.types import Message, PhotoSize, CallbackQuery
+from aiogram.types import Message, PhotoSize, CallbackQuery, BufferedInputFile
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from core.models import Session, DriverVehicle, VehicleType, detect_vehicle_type, get_seats_by_type
-from core.bot_instance import Bots
+from core.models import VehicleType, detect_vehicle_type, get_seats_by_type
+from core.repositories import vehicle_repository
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.types import InlineKeyboardButton
 
@@ -129,35 +129,37 @@ async def add_vehicle_callback(callback: CallbackQuery, state: FSMContext):
 async def show_vehicle_info(callback: CallbackQuery):
     lang = get_user_language(callback.from_user.id)
 
-    with Session() as session:
-        vehicle = session.query(DriverVehicle).filter_by(driver_id=callback.from_user.id).first()
-        if vehicle:
-            # Получаем отображаемое название типа
-            type_display = get_vehicle_type_display(vehicle.vehicle_type,
-                                                    lang) if vehicle.vehicle_type else "Не определен"
-
-            info_text = (
-                f"🚗 <b>Ваши данные об автомобиле:</b>\n\n"
-                f"🏭 <b>Марка:</b> {vehicle.make or 'Не определена'}\n"
-                f"🚙 <b>Модель:</b> {vehicle.model}\n"
-                f"🎨 <b>Цвет:</b> {vehicle.color}\n"
-                f"📅 <b>Год:</b> {vehicle.year}\n"
-                f"🔢 <b>Номер:</b> {vehicle.license_plate}\n"
-                f"🚘 <b>Тип кузова:</b> {type_display}\n"
-                f"👥 <b>Количество мест:</b> {vehicle.seats}\n"
-            )
-
-            if vehicle.photo:
-                info_text += f"\n📷 <b>Фото:</b> Загружено"
-            else:
-                info_text += f"\n📷 <b>Фото:</b> Не загружено"
+    vehicle = await vehicle_repository.get_by_driver(callback.from_user.id)
+    if vehicle:
+        # Получаем отображаемое название типа
+        type_display = get_vehicle_type_display(vehicle.vehicle_type,
+                                                lang) if vehicle.vehicle_type else "Не определен"
+
+        info_text = (
+            f"🚗 <b>Ваши данные об автомобиле:</b>\n\n"
+            f"🏭 <b>Марка:</b> {vehicle.make or 'Не определена'}\n"
+            f"🚙 <b>Модель:</b> {vehicle.model}\n"
+            f"🎨 <b>Цвет:</b> {vehicle.color}\n"
+            f"📅 <b>Год:</b> {vehicle.year}\n"
+            f"🔢 <b>Номер:</b> {vehicle.license_plate}\n"
+            f"🚘 <b>Тип кузова:</b> {type_display}\n"
+            f"👥 <b>Количество мест:</b> {vehicle.seats}\n"
+        )
 
-            await callback.message.answer(info_text, parse_mode="HTML")
+        # Фото загружаем только здесь, при просмотре
+        photo = await vehicle_repository.get_photo(callback.from_user.id, with_data=True)
+        if photo and (photo.file_id or photo.data):
+            info_text += f"\n📷 <b>Фото:</b> Загружено"
+            media = photo.file_id or BufferedInputFile(photo.data, filename="vehicle.jpg")
+            await callback.message.answer_photo(media, caption=info_text, parse_mode="HTML")
         else:
-            await callback.message.answer(
-                "⚠️ Вы еще не добавили данные об автомобиле",
-                reply_markup=get_vehicle_keyboard(lang)
-            )
+            info_text += f"\n📷 <b>Фото:</b> Не загружено"
+            await callback.message.answer(info_text, parse_mode="HTML")
+    else:
+        await callback.message.answer(
+            "⚠️ Вы еще не добавили данные об автомобиле",
+            reply_markup=get_vehicle_keyboard(lang)
+        )
     await callback.answer()
 
 
@@ -195,23 +197,18 @@ async def process_vehicle_info(message: Message, state: FSMContext):
 
         print(f"🔍 [VEHICLE] Auto-detected type: {vehicle_type}, seats: {seats}")
 
-        with Session() as session:
-            # Удаляем старую запись если есть
-            session.query(DriverVehicle).filter_by(driver_id=message.from_user.id).delete()
-
-            vehicle = DriverVehicle(
-                driver_id=message.from_user.id,
-                driver_name=message.from_user.full_name,
-                make=make,
-                model=model,
-                color=color,
-                year=year_int,
-                license_plate=plate,
-                vehicle_type=vehicle_type,
-                seats=seats
-            )
-            session.add(vehicle)
-            session.commit()
+        # Удаляем старую запись если есть и сохраняем новую
+        await vehicle_repository.replace_for_driver(
+            message.from_user.id,
+            driver_name=message.from_user.full_name,
+            make=make,
+            model=model,
+            color=color,
+            year=year_int,
+            license_plate=plate,
+            vehicle_type=vehicle_type,
+            seats=seats
+        )
 
         # Получаем отображаемое название типа для пользователя
         lang = get_user_language(message.from_user.id)
@@ -268,16 +265,14 @@ async def process_vehicle_info(message: Message, state: FSMContext):
 @router.message(VehicleStates.waiting_photo, F.photo)
 async def process_vehicle_photo(message: Message, state: FSMContext):
     photo = message.photo[-1]  # Берем самое большое фото
-    photo_data = await Bots.driver.download(photo.file_id)
-
-    with Session() as session:
-        vehicle = session.query(DriverVehicle).filter_by(driver_id=message.from_user.id).first()
-        if vehicle:
-            vehicle.photo = photo_data.read()
-            session.commit()
-            await message.answer("✅ Фото автомобиля сохранено!")
-        else:
-            await message.answer("❌ Сначала отправьте информацию об автомобиле!")
+
+    # Храним только file_id: файл остается на серверах Telegram
+    if await vehicle_repository.set_photo(
+            message.from_user.id, photo.file_id, photo.file_unique_id, photo.file_size
+    ):
+        await message.answer("✅ Фото автомобиля сохранено!")
+    else:
+        await message.answer("❌ Сначала отправьте информацию об автомобиле!")
 
     await state.clear()
 
@@ -333,57 +328,49 @@ async def show_vehicle_statistics(message: Message):
         return
 
     try:
-        with Session() as session:
-            vehicles = session.query(DriverVehicle).all()
-
-            if not vehicles:
-                await message.answer("📊 Автомобилей в базе не найдено")
-                return
-
-            # Подсчитываем статистику по типам
-            type_stats = {}
-            total_vehicles = len(vehicles)
-            lancer_sportback_count = 0
-
-            for vehicle in vehicles:
-                vehicle_type = getattr(vehicle, 'vehicle_type', 'UNKNOWN')
-                type_stats[vehicle_type] = type_stats.get(vehicle_type, 0) + 1
-
-                # Считаем Lancer Sportback
-                if (vehicle.model and 'lancer' in vehicle.model.lower() and
-                        'sportback' in vehicle.model.lower()):
-                    lancer_sportback_count += 1
-
-            # Формируем отчет
-            stats_text = f"📊 <b>СТАТИСТИКА АВТОМОБИЛЕЙ</b>\n\n"
-            stats_text += f"📈 <b>Всего:</b> {total_vehicles} автомобилей\n\n"
-
-            stats_text += f"🚗 <b>По типам кузова:</b>\n"
-            for vehicle_type, count in sorted(type_stats.items()):
-                percentage = (count / total_vehicles) * 100
-                lang = get_user_language(message.from_user.id)
-                type_display = get_vehicle_type_display(VehicleType(vehicle_type), lang) if vehicle_type in [t.value for
-                                                                                                             t in
-                                                                                                             VehicleType] else vehicle_type
-                stats_text += f"• {type_display}: {count} ({percentage:.1f}%)\n"
-
-            if lancer_sportback_count > 0:
-                stats_text += f"\n🎯 <b>Lancer Sportback:</b> {lancer_sportback_count} шт.\n"
-
-                # Проверяем правильность типа
-                with Session() as check_session:
-                    correct_lancers = check_session.query(DriverVehicle).filter(
-                        DriverVehicle.model.ilike('%lancer%'),
-                        DriverVehicle.model.ilike('%sportback%'),
-                        DriverVehicle.vehicle_type == VehicleType.HATCHBACK
-                    ).count()
-
-                if correct_lancers == lancer_sportback_count:
-                    stats_text += f"✅ Все Lancer Sportback правильно помечены как Hatchback"
-                else:
-                    stats_text += f"❌ {lancer_sportback_count - correct_lancers} Lancer Sportback с неправильным типом"
-
-            await message.answer(stats_text, parse_mode="HTML")
+        # Агрегация в SQL: строки автомобилей не загружаются
+        by_type = await vehicle_repository.count_by_type()
+        total_vehicles = sum(by_type.values())
+
+        if not total_vehicles:
+            await message.answer("📊 Автомобилей в базе не найдено")
+            return
+
+        type_stats = {}
+        for vehicle_type, count in by_type.items():
+            key = vehicle_type.value if vehicle_type else 'UNKNOWN'
+            type_stats[key] = type_stats.get(key, 0) + count
+
+        # Считаем Lancer Sportback
+        lancer_sportback_count = await vehicle_repository.count_by_model(('lancer', 'sportback'))
+
+        # Формируем отчет
+        stats_text = f"📊 <b>СТАТИСТИКА АВТОМОБИЛЕЙ</b>\n\n"
+        stats_text += f"📈 <b>Всего:</b> {total_vehicles} автомобилей\n\n"
+
+        stats_text += f"🚗 <b>По типам кузова:</b>\n"
+        for vehicle_type, count in sorted(type_stats.items()):
+            percentage = (count / total_vehicles) * 100
+            lang = get_user_language(message.from_user.id)
+            type_display = get_vehicle_type_display(VehicleType(vehicle_type), lang) if vehicle_type in [t.value for
+                                                                                                         t in
+                                                                                                         VehicleType] else vehicle_type
+            stats_text += f"• {type_display}: {count} ({percentage:.1f}%)\n"
+
+        if lancer_sportback_count > 0:
+            stats_text += f"\n🎯 <b>Lancer Sportback:</b> {lancer_sportback_count} шт.\n"
+
+            # Проверяем правильность типа
+            correct_lancers = await vehicle_repository.count_by_model(
+                ('lancer', 'sportback'), VehicleType.HATCHBACK
+            )
+
+            if correct_lancers == lancer_sportback_count:
+                stats_text += f"✅ Все Lancer Sportback правильно помечены как Hatchback"
+            else:
+                stats_text += f"❌ {lancer_sportback_count - correct_lancers} Lancer Sportback с неправильным типом"
+
+        await message.answer(stats_text, parse_mode="HTML")
 
     except Exception as e:
         await message.answer(f"❌ Ошибка получения статистики: {e}")
@@ -397,40 +384,36 @@ async def fix_lancer_sportback(message: Message):
         return
 
     try:
-        with Session() as session:
-            # Находим все Lancer Sportback
-            lancers = session.query(DriverVehicle).filter(
-                DriverVehicle.model.ilike('%lancer%'),
-                DriverVehicle.model.ilike('%sportback%')
-            ).all()
-
-            if not lancers:
-                await message.answer("🎯 Lancer Sportback не найдены в базе")
-                return
-
-            fixed_count = 0
-            result_text = f"🔧 <b>ИСПРАВЛЕНИЕ LANCER SPORTBACK</b>\n\n"
-
-            for lancer in lancers:
-                old_type = lancer.vehicle_type
-                if old_type != VehicleType.HATCHBACK:
-                    lancer.vehicle_type = VehicleType.HATCHBACK
-                    lancer.seats = get_seats_by_type(VehicleType.HATCHBACK)
-                    fixed_count += 1
-
-                    result_text += f"✅ {lancer.model} ({lancer.license_plate})\n"
-                    result_text += f"   {old_type} → HATCHBACK\n\n"
-                else:
-                    result_text += f"ℹ️ {lancer.model} ({lancer.license_plate})\n"
-                    result_text += f"   Уже HATCHBACK ✓\n\n"
-
-            if fixed_count > 0:
-                session.commit()
-                result_text += f"🎉 <b>Исправлено:</b> {fixed_count} автомобилей"
+        # Находим и исправляем все Lancer Sportback
+        lancers = await vehicle_repository.reclassify_by_model(
+            ('lancer', 'sportback'),
+            VehicleType.HATCHBACK,
+            get_seats_by_type(VehicleType.HATCHBACK)
+        )
+
+        if not lancers:
+            await message.answer("🎯 Lancer Sportback не найдены в базе")
+            return
+
+        fixed_count = 0
+        result_text = f"🔧 <b>ИСПРАВЛЕНИЕ LANCER SPORTBACK</b>\n\n"
+
+        for lancer in lancers:
+            if lancer['fixed']:
+                fixed_count += 1
+
+                result_text += f"✅ {lancer['model']} ({lancer['license_plate']})\n"
+                result_text += f"   {lancer['old_type']} → HATCHBACK\n\n"
             else:
-                result_text += f"✅ <b>Все Lancer Sportback уже имеют правильный тип</b>"
+                result_text += f"ℹ️ {lancer['model']} ({lancer['license_plate']})\n"
+                result_text += f"   Уже HATCHBACK ✓\n\n"
+
+        if fixed_count > 0:
+            result_text += f"🎉 <b>Исправлено:</b> {fixed_count} автомобилей"
+        else:
+            result_text += f"✅ <b>Все Lancer Sportback уже имеют правильный тип</b>"
 
-            await message.answer(result_text, parse_mode="HTML")
+        await message.answer(result_text, parse_mode="HTML")
 
     except Exception as e:
         await message.answer(f"❌ Ошибка исправления: {e}")
@@ -441,82 +424,83 @@ async def show_my_vehicle_info(message: Message):
     """Подробная информация о своем автомобиле"""
 
     try:
-        with Session() as session:
-            vehicle = session.query(DriverVehicle).filter_by(driver_id=message.from_user.id).first()
+        vehicle = await vehicle_repository.get_by_driver(message.from_user.id)
 
-            if not vehicle:
-                await message.answer(
-                    "⚠️ У вас нет зарегистрированного автомобиля\n\n"
-                    "Используйте команду в боте водителя для добавления авто",
-                    reply_markup=get_vehicle_keyboard(get_user_language(message.from_user.id))
-                )
-                return
-
-            lang = get_user_language(message.from_user.id)
-            type_display = get_vehicle_type_display(vehicle.vehicle_type,
-                                                    lang) if vehicle.vehicle_type else "Не определен"
-
-            # Определяем, правильно ли определен тип
-            auto_detected_type = detect_vehicle_type(vehicle.make or "", vehicle.model or "")
-            auto_seats = get_seats_by_type(auto_detected_type)
-
-            type_status = "✅" if vehicle.vehicle_type == auto_detected_type else "⚠️"
-            seats_status = "✅" if vehicle.seats == auto_seats else "⚠️"
-
-            info_text = (
-                f"🚗 <b>ПОДРОБНАЯ ИНФОРМАЦИЯ ОБ АВТОМОБИЛЕ</b>\n\n"
-                f"👤 <b>Владелец:</b> {vehicle.driver_name}\n"
-                f"🏭 <b>Марка:</b> {vehicle.make or 'Не определена'}\n"
-                f"🚙 <b>Модель:</b> {vehicle.model}\n"
-                f"🎨 <b>Цвет:</b> {vehicle.color}\n"
-                f"📅 <b>Год:</b> {vehicle.year}\n"
-                f"🔢 <b>Номер:</b> {vehicle.license_plate}\n\n"
-                f"🚘 <b>Тип кузова:</b> {type_status} {type_display}\n"
-                f"👥 <b>Количество мест:</b> {seats_status} {vehicle.seats}\n\n"
+        if not vehicle:
+            await message.answer(
+                "⚠️ У вас нет зарегистрированного автомобиля\n\n"
+                "Используйте команду в боте водителя для добавления авто",
+                reply_markup=get_vehicle_keyboard(get_user_language(message.from_user.id))
             )
+            return
 
-            if vehicle.vehicle_type != auto_detected_type:
-                auto_type_display = get_vehicle_type_display(auto_detected_type, lang)
-                info_text += (
-                    f"🤖 <b>Авто-определение предлагает:</b>\n"
-                    f"   Тип: {auto_type_display}\n"
-                    f"   Мест: {auto_seats}\n\n"
-                )
-
-            # Статус фото
-            if vehicle.photo:
-                info_text += f"📷 <b>Фото:</b> ✅ Загружено ({len(vehicle.photo)} байт)\n"
-            else:
-                info_text += f"📷 <b>Фото:</b> ❌ Не загружено\n"
-
-            # Статус активности
-            status_icon = "🟢" if vehicle.is_active else "🔴"
-            verified_icon = "✅" if vehicle.is_verified else "⏳"
+        lang = get_user_language(message.from_user.id)
+        type_display = get_vehicle_type_display(vehicle.vehicle_type,
+                                                lang) if vehicle.vehicle_type else "Не определен"
+
+        # Определяем, правильно ли определен тип
+        auto_detected_type = detect_vehicle_type(vehicle.make or "", vehicle.model or "")
+        auto_seats = get_seats_by_type(auto_detected_type)
+
+        type_status = "✅" if vehicle.vehicle_type == auto_detected_type else "⚠️"
+        seats_status = "✅" if vehicle.seats == auto_seats else "⚠️"
+
+        info_text = (
+            f"🚗 <b>ПОДРОБНАЯ ИНФОРМАЦИЯ ОБ АВТОМОБИЛЕ</b>\n\n"
+            f"👤 <b>Владелец:</b> {vehicle.driver_name}\n"
+            f"🏭 <b>Марка:</b> {vehicle.make or 'Не определена'}\n"
+            f"🚙 <b>Модель:</b> {vehicle.model}\n"
+            f"🎨 <b>Цвет:</b> {vehicle.color}\n"
+            f"📅 <b>Год:</b> {vehicle.year}\n"
+            f"🔢 <b>Номер:</b> {vehicle.license_plate}\n\n"
+            f"🚘 <b>Тип кузова:</b> {type_status} {type_display}\n"
+            f"👥 <b>Количество мест:</b> {seats_status} {vehicle.seats}\n\n"
+        )
 
+        if vehicle.vehicle_type != auto_detected_type:
+            auto_type_display = get_vehicle_type_display(auto_detected_type, lang)
             info_text += (
-                f"\n📊 <b>СТАТУС:</b>\n"
-                f"{status_icon} Активность: {'Активен' if vehicle.is_active else 'Неактивен'}\n"
-                f"{verified_icon} Верификация: {'Подтвержден' if vehicle.is_verified else 'Ожидает'}\n"
+                f"🤖 <b>Авто-определение предлагает:</b>\n"
+                f"   Тип: {auto_type_display}\n"
+                f"   Мест: {auto_seats}\n\n"
             )
 
-            # Геолокация
-            if hasattr(vehicle, 'last_lat') and vehicle.last_lat:
-                info_text += (
-                    f"\n📍 <b>ПОСЛЕДНЯЯ ПОЗИЦИЯ:</b>\n"
-                    f"   Широта: {vehicle.last_lat:.6f}\n"
-                    f"   Долгота: {vehicle.last_lon:.6f}\n"
-                )
+        # Статус фото
+        photo = await vehicle_repository.get_photo(message.from_user.id)
+        if photo:
+            size = f" ({photo.file_size} байт)" if photo.file_size else ""
+            info_text += f"📷 <b>Фото:</b> ✅ Загружено{size}\n"
+        else:
+            info_text += f"📷 <b>Фото:</b> ❌ Не загружено\n"
+
+        # Статус активности
+        status_icon = "🟢" if vehicle.is_active else "🔴"
+        verified_icon = "✅" if vehicle.is_verified else "⏳"
+
+        info_text += (
+            f"\n📊 <b>СТАТУС:</b>\n"
+            f"{status_icon} Активность: {'Активен' if vehicle.is_active else 'Неактивен'}\n"
+            f"{verified_icon} Верификация: {'Подтвержден' if vehicle.is_verified else 'Ожидает'}\n"
+        )
 
-            # Даты
+        # Геолокация
+        if hasattr(vehicle, 'last_lat') and vehicle.last_lat:
             info_text += (
-                f"\n📅 <b>ДАТЫ:</b>\n"
-                f"   Создан: {vehicle.created_at.strftime('%d.%m.%Y %H:%M')}\n"
+                f"\n📍 <b>ПОСЛЕДНЯЯ ПОЗИЦИЯ:</b>\n"
+                f"   Широта: {vehicle.last_lat:.6f}\n"
+                f"   Долгота: {vehicle.last_lon:.6f}\n"
             )
 
-            if vehicle.updated_at:
-                info_text += f"   Обновлен: {vehicle.updated_at.strftime('%d.%m.%Y %H:%M')}\n"
+        # Даты
+        info_text += (
+            f"\n📅 <b>ДАТЫ:</b>\n"
+            f"   Создан: {vehicle.created_at.strftime('%d.%m.%Y %H:%M')}\n"
+        )
+
+        if vehicle.updated_at:
+            info_text += f"   Обновлен: {vehicle.updated_at.strftime('%d.%m.%Y %H:%M')}\n"
 
-            await message.answer(info_text, parse_mode="HTML")
+        await message.answer(info_text, parse_mode="HTML")
 
     except Exception as e:
         await message.answer(f"❌ Ошибка получения информации: {e}")
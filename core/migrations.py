@@ -0,0 +1,269 @@
+"""
+Версионные миграции схемы базы данных
+
+Каждый шаг - идемпотентная функция над синхронным соединением SQLAlchemy.
+Номер последнего примененного шага хранится в таблице schema_version, поэтому
+при актуальной схеме запуск бота ограничивается одним запросом MAX(version).
+
+Шаги заменяют отдельные скрипты fix_database.py, migration_compatibility.py,
+migration_alcohol.py, update_vehicle_types.py и migration_indexes.py.
+Новый шаг добавляется в конец MIGRATIONS со следующим номером.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Any, Dict, List
+
+from sqlalchemy import inspect, select, func, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from .models import Base, SchemaVersion, detect_vehicle_type, get_seats_by_type
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Migration:
+    """Шаг миграции"""
+    version: int
+    name: str
+    apply: Callable[[Any], Any]
+
+
+# ============================================
+# ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ
+# ============================================
+
+def _add_columns(connection, table: str, columns: Dict[str, str]) -> List[str]:
+    """Добавить в таблицу отсутствующие колонки {имя: DDL-тип}"""
+    inspector = inspect(connection)
+    if not inspector.has_table(table):
+        return []
+    existing = {column['name'] for column in inspector.get_columns(table)}
+    added = []
+    for name, ddl in columns.items():
+        if name not in existing:
+            connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+            added.append(name)
+    if added:
+        logger.info(f"Columns added to {table}: {', '.join(added)}")
+    return added
+
+
+def ensure_indexes(connection) -> list:
+    """Создать недостающие индексы моделей (идемпотентно).
+
+    create_all создает индексы только вместе с новой таблицей, поэтому для
+    уже существующих баз индексы досоздаются отдельно с checkfirst.
+    Возвращает имена индексов, которые были созданы.
+    """
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda i: i.name or ''):
+            if index.name in present:
+                continue
+            index.create(connection, checkfirst=True)
+            created.append(index.name)
+    return created
+
+
+def move_vehicle_photos(connection) -> int:
+    """Перенести старые фото из vehicles.photo в vehicle_photos (идемпотентно).
+
+    Возвращает количество перенесенных фото.
+    """
+    inspector = inspect(connection)
+    if not inspector.has_table('vehicles') or not inspector.has_table('vehicle_photos'):
+        return 0
+    if 'photo' not in {column['name'] for column in inspector.get_columns('vehicles')}:
+        return 0
+
+    moved = connection.exec_driver_sql(
+        "INSERT INTO vehicle_photos (vehicle_id, data, file_size, created_at) "
+        "SELECT id, photo, length(photo), CURRENT_TIMESTAMP FROM vehicles "
+        "WHERE photo IS NOT NULL AND id NOT IN (SELECT vehicle_id FROM vehicle_photos)"
+    ).rowcount
+    connection.exec_driver_sql("UPDATE vehicles SET photo = NULL WHERE photo IS NOT NULL")
+    return moved
+
+
+# ============================================
+# ШАГИ МИГРАЦИИ
+# ============================================
+
+def _initial_schema(connection) -> None:
+    """Таблицы моделей, которых еще нет в базе"""
+    Base.metadata.create_all(connection)
+
+
+def _ride_waiting_columns(connection) -> None:
+    """Поля системы ожидания в rides (бывший fix_database.py)"""
+    added = _add_columns(connection, 'rides', {
+        'waiting_started_at': 'TIMESTAMP',
+        'waiting_ended_at': 'TIMESTAMP',
+        'waiting_minutes': 'INTEGER DEFAULT 0',
+        'waiting_cost': 'DECIMAL(10,2) DEFAULT 0.00',
+        'stops_log': 'TEXT',
+    })
+    if added:
+        connection.exec_driver_sql(
+            "UPDATE rides SET waiting_minutes = 0, waiting_cost = 0.00 "
+            "WHERE waiting_minutes IS NULL OR waiting_cost IS NULL"
+        )
+
+
+def _compatibility_columns(connection) -> None:
+    """Колонки совместимости со старой архитектурой (бывший migration_compatibility.py)"""
+    _add_columns(connection, 'rides', {
+        'user_id': 'INTEGER',
+        'driver_name': 'TEXT',
+        'origin': 'TEXT',
+        'destination': 'TEXT',
+        'price': 'DECIMAL(10,2)',
+        'order_type': 'VARCHAR(50)',
+        'products': 'TEXT',
+        'budget': 'REAL',
+        'payment_method': "VARCHAR(20) DEFAULT 'cash'",
+    })
+    _add_columns(connection, 'vehicles', {
+        'driver_name': 'VARCHAR(255)',
+        'photo': 'BLOB',
+        'last_lat': 'REAL',
+        'last_lon': 'REAL',
+    })
+
+
+def _legacy_orders_budget(connection) -> None:
+    """Поле budget в старой таблице orders (бывший migration_alcohol.py)"""
+    _add_columns(connection, 'orders', {'budget': 'REAL'})
+
+
+def _vehicle_types(connection) -> None:
+    """Переопределить типы кузова и число мест (бывший update_vehicle_types.py)"""
+    _add_columns(connection, 'vehicles', {'vehicle_type': 'VARCHAR(11)'})
+    if not inspect(connection).has_table('vehicles'):
+        return
+
+    rows = connection.exec_driver_sql("SELECT id, make, model, vehicle_type, seats FROM vehicles").fetchall()
+    updates = []
+    for vehicle_id, make, model, current_type, seats in rows:
+        vehicle_type = detect_vehicle_type(make or "", model or "")
+        new_seats = get_seats_by_type(vehicle_type)
+        if current_type != vehicle_type.name or seats != new_seats:
+            updates.append({'id': vehicle_id, 'vehicle_type': vehicle_type.name, 'seats': new_seats})
+
+    if updates:
+        connection.execute(
+            text("UPDATE vehicles SET vehicle_type = :vehicle_type, seats = :seats WHERE id = :id"),
+            updates
+        )
+        logger.info(f"Vehicle types updated: {len(updates)}")
+
+
+def _ride_status_indexes(connection) -> None:
+    """Составные индексы rides и статистика планировщика (бывший migration_indexes.py)"""
+    created = ensure_indexes(connection)
+    if created:
+        logger.info(f"Indexes created: {', '.join(created)}")
+        if connection.dialect.name == 'sqlite':
+            connection.exec_driver_sql("ANALYZE")
+
+
+def _vehicle_photos(connection) -> None:
+    """Фото автомобилей из vehicles.photo в vehicle_photos"""
+    moved = move_vehicle_photos(connection)
+    if moved:
+        logger.info(f"Vehicle photos moved to vehicle_photos: {moved}")
+
+
+def _outbox_priority(connection) -> None:
+    """Приоритеты и очередь по ботам в outbox_messages"""
+    _add_columns(connection, 'outbox_messages', {'priority': 'INTEGER NOT NULL DEFAULT 10'})
+    connection.exec_driver_sql("DROP INDEX IF EXISTS ix_outbox_status_available")
+    connection.exec_driver_sql("UPDATE outbox_messages SET status = 'DEAD' WHERE status = 'FAILED'")
+    ensure_indexes(connection)
+
+
+def _scheduled_jobs(connection) -> None:
+    """Таблица отложенных задач планировщика"""
+    Base.metadata.tables['scheduled_jobs'].create(connection, checkfirst=True)
+    ensure_indexes(connection)
+
+
+def _driver_locations_unique(connection) -> None:
+    """Одна строка driver_locations на водителя (upsert реестра доступности)"""
+    if inspect(connection).has_table('driver_locations'):
+        connection.exec_driver_sql(
+            "DELETE FROM driver_locations WHERE id NOT IN "
+            "(SELECT MAX(id) FROM driver_locations GROUP BY driver_id)"
+        )
+    ensure_indexes(connection)
+
+
+def _geocode_cache(connection) -> None:
+    """Постоянный кэш геокодера"""
+    Base.metadata.tables['geocode_cache'].create(connection, checkfirst=True)
+    ensure_indexes(connection)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "initial_schema", _initial_schema),
+    Migration(2, "ride_waiting_columns", _ride_waiting_columns),
+    Migration(3, "compatibility_columns", _compatibility_columns),
+    Migration(4, "legacy_orders_budget", _legacy_orders_budget),
+    Migration(5, "vehicle_types", _vehicle_types),
+    Migration(6, "ride_status_indexes", _ride_status_indexes),
+    Migration(7, "vehicle_photos", _vehicle_photos),
+    Migration(8, "outbox_priority", _outbox_priority),
+    Migration(9, "scheduled_jobs", _scheduled_jobs),
+    Migration(10, "driver_locations_unique", _driver_locations_unique),
+    Migration(11, "geocode_cache", _geocode_cache),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+# ============================================
+# ЗАПУСК
+# ============================================
+
+def current_version(connection) -> int:
+    """Версия схемы; 0 - таблицы schema_version еще нет"""
+    try:
+        return connection.execute(select(func.max(SchemaVersion.version))).scalar() or 0
+    except (OperationalError, ProgrammingError):
+        return 0
+
+
+def run_migrations(connection) -> List[Migration]:
+    """Применить недостающие шаги по порядку, вернуть примененные.
+
+    Вызывается внутри транзакции. Шаги идемпотентны, поэтому если два
+    процесса стартуют одновременно, повторное применение безопасно.
+    """
+    SchemaVersion.__table__.create(connection, checkfirst=True)
+    version = current_version(connection)
+
+    applied = []
+    for migration in MIGRATIONS:
+        if migration.version <= version:
+            continue
+        logger.info(f"Applying migration {migration.version}: {migration.name}")
+        migration.apply(connection)
+
+        recorded = connection.execute(
+            select(SchemaVersion.version).where(SchemaVersion.version == migration.version)
+        ).first()
+        if recorded is None:
+            connection.execute(SchemaVersion.__table__.insert().values(
+                version=migration.version,
+                name=migration.name,
+                applied_at=datetime.now()
+            ))
+        applied.append(migration)
+    return applied
@@ -10,12 +10,11 @@ from uuid import uuid4
 
 from sqlalchemy import (
     String, Integer, Float, Boolean, DateTime, Text,
-    ForeignKey, Enum as SQLEnum, DECIMAL, LargeBinary
+    ForeignKey, Enum as SQLEnum, DECIMAL, LargeBinary, Index
 )
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, sessionmaker
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import create_engine
 
 
 class Base(DeclarativeBase):
@@ -108,7 +107,8 @@ class Vehicle(Base):
     seats: Mapped[int] = mapped_column(Integer, nullable=False, default=4)
 
     # Дополнительные поля for compatibility
-    photo: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+    # Устарело: фото хранится в vehicle_photos, колонка не загружается вместе со строкой
+    photo: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True, deferred=True)
     last_lat: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
     last_lon: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
 
@@ -128,9 +128,39 @@ class Vehicle(Base):
         return f"<Vehicle(id={self.id}, {self.make} {self.model}, plate={self.license_plate}, type={self.vehicle_type})>"
 
 
+class VehiclePhoto(Base):
+    """Фото автомобиля: Telegram file_id вместо бинарных данных в строке vehicles"""
+    __tablename__ = "vehicle_photos"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    vehicle_id: Mapped[int] = mapped_column(Integer, ForeignKey("vehicles.id"), nullable=False, unique=True, index=True)
+
+    # Telegram хранит файл сам, повторная отправка по file_id бесплатна
+    file_id: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    file_unique_id: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    file_size: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+
+    # Данные старых фото, перенесенные из vehicles.photo (загружаются только при просмотре)
+    data: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True, deferred=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self) -> str:
+        return f"<VehiclePhoto(vehicle_id={self.vehicle_id}, file_id={self.file_id})>"
+
+
 class Ride(Base):
     """Модель поездки"""
     __tablename__ = "rides"
+    __table_args__ = (
+        # Текущая поездка водителя/клиента: WHERE driver_id=? AND status IN (...) ORDER BY created_at DESC
+        Index("ix_rides_driver_status_created", "driver_id", "status", "created_at"),
+        Index("ix_rides_client_status_created", "client_id", "status", "created_at"),
+        # Выборки по статусу (ожидающие заказы, статистика)
+        Index("ix_rides_status_created", "status", "created_at"),
+        # Статистика завершенных поездок за период
+        Index("ix_rides_completed_at", "completed_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     client_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False)
@@ -208,8 +238,12 @@ class Ride(Base):
 
 
 class DriverLocation(Base):
-    """Модель для отслеживания местоположения водителя"""
+    """Модель для отслеживания местоположения водителя (одна строка на водителя)"""
     __tablename__ = "driver_locations"
+    __table_args__ = (
+        # Запись реестра доступности - upsert по водителю
+        Index("ux_driver_locations_driver_id", "driver_id", unique=True),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     driver_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"), nullable=False, index=True)
@@ -233,6 +267,98 @@ class DriverLocation(Base):
         return f"<DriverLocation(driver_id={self.driver_id}, lat={self.latitude}, lng={self.longitude})>"
 
 
+class OutboxStatus(str, Enum):
+    """Статусы исходящих сообщений"""
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    DEAD = "dead"             # Dead-letter: доставка невозможна, сообщение ждет разбора
+
+
+class OutboxPriority(int, Enum):
+    """Классы приоритета исходящих сообщений (меньше - раньше)"""
+    OFFER = 0                 # Заказы и все, что связано с их распределением
+    RIDE = 10                 # Смена статуса поездки для второй стороны
+    STATUS = 50               # Косметика: геопозиция, статусные пинги
+
+
+class OutboxMessage(Base):
+    """Исходящее сообщение Telegram, записанное в той же транзакции, что и изменение данных"""
+    __tablename__ = "outbox_messages"
+    __table_args__ = (
+        Index("ix_outbox_bot_status_priority", "bot", "status", "priority", "available_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    bot: Mapped[str] = mapped_column(String(20), nullable=False)            # "client" / "driver"
+    chat_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    method: Mapped[str] = mapped_column(String(50), nullable=False, default="send_message")
+    payload: Mapped[str] = mapped_column(Text, nullable=False)              # JSON с аргументами метода
+    priority: Mapped[int] = mapped_column(Integer, nullable=False, default=OutboxPriority.RIDE)
+
+    status: Mapped[OutboxStatus] = mapped_column(SQLEnum(OutboxStatus), nullable=False, default=OutboxStatus.PENDING)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=datetime.now)
+    available_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=datetime.now)
+    sent_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<OutboxMessage(id={self.id}, bot={self.bot}, chat_id={self.chat_id}, status={self.status})>"
+
+
+class ScheduledJob(Base):
+    """Отложенная задача планировщика (автоотмена заказа, удаление сообщения ...)"""
+    __tablename__ = "scheduled_jobs"
+    __table_args__ = (
+        Index("ix_scheduled_jobs_run_at", "run_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    key: Mapped[str] = mapped_column(String(100), nullable=False, unique=True)  # Для отмены и замены
+    name: Mapped[str] = mapped_column(String(50), nullable=False)               # Зарегистрированный обработчик
+    payload: Mapped[str] = mapped_column(Text, nullable=False)                  # JSON с аргументами
+    run_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=datetime.now)
+
+    def __repr__(self) -> str:
+        return f"<ScheduledJob(id={self.id}, key={self.key}, run_at={self.run_at})>"
+
+
+class GeocodeCacheEntry(Base):
+    """Сохраненный ответ геокодера (постоянный уровень кэша MapsService)"""
+    __tablename__ = "geocode_cache"
+    __table_args__ = (
+        Index("ix_geocode_cache_last_used_at", "last_used_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    key: Mapped[str] = mapped_column(String(255), nullable=False, unique=True)  # Нормализованный запрос
+    latitude: Mapped[float] = mapped_column(Float, nullable=False)
+    longitude: Mapped[float] = mapped_column(Float, nullable=False)
+    address: Mapped[str] = mapped_column(String(500), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=datetime.now)
+    last_used_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=datetime.now)
+
+    def __repr__(self) -> str:
+        return f"<GeocodeCacheEntry(key={self.key}, address={self.address})>"
+
+
+class SchemaVersion(Base):
+    """Примененные шаги миграции схемы (см. core/migrations.py)"""
+    __tablename__ = "schema_version"
+
+    version: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(100), nullable=False)
+    applied_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=datetime.now)
+
+    def __repr__(self) -> str:
+        return f"<SchemaVersion(version={self.version}, name={self.name})>"
+
+
 # ============================================
 # АЛИАСЫ ДЛЯ ОБРАТНОЙ СОВМЕСТИМОСТИ
 # ============================================
@@ -248,15 +374,11 @@ Order = Ride
 # ============================================
 
 def get_sync_session():
-    """Создание синхронной сессии для обратной совместимости"""
-    from core.config import config
-
-    # Преобразуем async URL в sync URL
-    sync_url = config.database.url.replace('sqlite+aiosqlite:', 'sqlite:')
+    """Синхронная сессия из общего пула процесса (для обратной совместимости)"""
+    # Импорт внутри функции: core.database сам импортирует этот модуль
+    from core.database import db_manager
 
-    engine = create_engine(sync_url, echo=config.database.echo)
-    SessionLocal = sessionmaker(bind=engine)
-    return SessionLocal()
+    return db_manager.open_sync_session()
 
 
 class SessionContext:
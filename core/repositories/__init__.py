@@ -0,0 +1,31 @@
+"""
+Асинхронные репозитории для работы с БД из обработчиков.
+
+Все запросы идут через DatabaseManager.get_async_session, поэтому
+обработчики aiogram не блокируют event loop синхронным SQLAlchemy.
+"""
+from .rides import RideRepository, ride_repository, ACTIVE_RIDE_STATUSES
+from .users import UserRepository, user_repository
+from .vehicles import VehicleRepository, vehicle_repository
+from .outbox import OutboxRepository, outbox_repository
+from .jobs import JobRepository, job_repository
+from .driver_locations import DriverLocationRepository, driver_location_repository
+from .geocode_cache import GeocodeCacheRepository, geocode_cache_repository
+
+__all__ = [
+    'RideRepository',
+    'ride_repository',
+    'ACTIVE_RIDE_STATUSES',
+    'UserRepository',
+    'user_repository',
+    'VehicleRepository',
+    'vehicle_repository',
+    'OutboxRepository',
+    'outbox_repository',
+    'JobRepository',
+    'job_repository',
+    'DriverLocationRepository',
+    'driver_location_repository',
+    'GeocodeCacheRepository',
+    'geocode_cache_repository',
+]
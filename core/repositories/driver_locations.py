@@ -0,0 +1,62 @@
+"""
+Репозиторий позиций и доступности водителей (driver_locations)
+"""
+import logging
+from typing import Iterable, List, Dict, Any
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+
+from core.models import DriverLocation
+
+logger = logging.getLogger(__name__)
+
+
+class DriverLocationRepository:
+    """Асинхронный доступ к таблице driver_locations"""
+
+    def __init__(self, db=None):
+        self._db = db
+
+    @property
+    def db(self):
+        if self._db is None:
+            from core.database import db_manager
+            self._db = db_manager
+        return self._db
+
+    async def upsert_many(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Записать состояние водителей одной транзакцией.
+
+        rows: driver_id, latitude, longitude, is_online, is_available,
+        updated_at. Более старое состояние не перезаписывает более новое,
+        записанное другим процессом.
+        """
+        rows = list(rows)
+        if not rows:
+            return 0
+        statement = insert(DriverLocation)
+        statement = statement.on_conflict_do_update(
+            index_elements=[DriverLocation.driver_id],
+            set_={
+                'latitude': statement.excluded.latitude,
+                'longitude': statement.excluded.longitude,
+                'is_online': statement.excluded.is_online,
+                'is_available': statement.excluded.is_available,
+                'updated_at': statement.excluded.updated_at,
+            },
+            where=DriverLocation.updated_at <= statement.excluded.updated_at
+        )
+        async with self.db.get_async_session() as session:
+            await session.execute(statement, rows)
+        return len(rows)
+
+    async def list_all(self) -> List[DriverLocation]:
+        """Все записи (при старте реестра)"""
+        async with self.db.get_async_session() as session:
+            result = await session.scalars(select(DriverLocation))
+            return list(result.all())
+
+
+# Глобальный экземпляр
+driver_location_repository = DriverLocationRepository()
@@ -0,0 +1,85 @@
+"""
+Репозиторий постоянного кэша геокодера (geocode_cache)
+"""
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import select, update, delete
+from sqlalchemy.dialects.sqlite import insert
+
+from core.models import GeocodeCacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+class GeocodeCacheRepository:
+    """Асинхронный доступ к таблице geocode_cache"""
+
+    def __init__(self, db=None):
+        self._db = db
+
+    @property
+    def db(self):
+        if self._db is None:
+            from core.database import db_manager
+            self._db = db_manager
+        return self._db
+
+    async def get(self, key: str, created_after: datetime) -> Optional[GeocodeCacheEntry]:
+        """Свежая запись по ключу; отмечает использование (для вытеснения)"""
+        async with self.db.get_async_session() as session:
+            entry = await session.scalar(
+                update(GeocodeCacheEntry)
+                .where(GeocodeCacheEntry.key == key, GeocodeCacheEntry.created_at >= created_after)
+                .values(last_used_at=datetime.now())
+                .returning(GeocodeCacheEntry)
+            )
+            return entry
+
+    async def put(self, key: str, latitude: float, longitude: float, address: str) -> None:
+        """Сохранить ответ геокодера (повторный ключ перезаписывается)"""
+        now = datetime.now()
+        statement = insert(GeocodeCacheEntry).values(
+            key=key, latitude=latitude, longitude=longitude, address=address,
+            created_at=now, last_used_at=now
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[GeocodeCacheEntry.key],
+            set_={
+                'latitude': statement.excluded.latitude,
+                'longitude': statement.excluded.longitude,
+                'address': statement.excluded.address,
+                'created_at': statement.excluded.created_at,
+                'last_used_at': statement.excluded.last_used_at,
+            }
+        )
+        async with self.db.get_async_session() as session:
+            await session.execute(statement)
+
+    async def recent(self, created_after: datetime, limit: int) -> List[GeocodeCacheEntry]:
+        """Недавно использованные свежие записи (прогрев памяти при старте)"""
+        async with self.db.get_async_session() as session:
+            result = await session.scalars(
+                select(GeocodeCacheEntry)
+                .where(GeocodeCacheEntry.created_at >= created_after)
+                .order_by(GeocodeCacheEntry.last_used_at.desc())
+                .limit(limit)
+            )
+            return list(result.all())
+
+    async def purge(self, created_before: datetime, keep: int) -> int:
+        """Удалить устаревшие записи и все, кроме keep последних использованных"""
+        async with self.db.get_async_session() as session:
+            expired = await session.execute(
+                delete(GeocodeCacheEntry).where(GeocodeCacheEntry.created_at < created_before)
+            )
+            kept = select(GeocodeCacheEntry.id).order_by(GeocodeCacheEntry.last_used_at.desc()).limit(keep)
+            overflow = await session.execute(
+                delete(GeocodeCacheEntry).where(GeocodeCacheEntry.id.not_in(kept))
+            )
+            return expired.rowcount + overflow.rowcount
+
+
+# Глобальный экземпляр
+geocode_cache_repository = GeocodeCacheRepository()
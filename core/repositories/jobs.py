@@ -0,0 +1,93 @@
+"""
+Репозиторий отложенных задач планировщика
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import select, update, delete, func
+
+from core.models import ScheduledJob
+
+logger = logging.getLogger(__name__)
+
+
+class JobRepository:
+    """Асинхронный доступ к таблице scheduled_jobs"""
+
+    def __init__(self, db=None):
+        self._db = db
+
+    @property
+    def db(self):
+        if self._db is None:
+            from core.database import db_manager
+            self._db = db_manager
+        return self._db
+
+    async def upsert(self, key: str, name: str, payload: str, run_at: datetime) -> int:
+        """Запланировать задачу; задача с тем же ключом заменяется (новый id)"""
+        async with self.db.get_async_session() as session:
+            await session.execute(delete(ScheduledJob).where(ScheduledJob.key == key))
+            job = ScheduledJob(key=key, name=name, payload=payload, run_at=run_at)
+            session.add(job)
+            await session.flush()
+            return job.id
+
+    async def delete_key(self, key: str) -> bool:
+        """Отменить задачу по ключу"""
+        async with self.db.get_async_session() as session:
+            result = await session.execute(delete(ScheduledJob).where(ScheduledJob.key == key))
+            return result.rowcount > 0
+
+    async def due_before(self, until: datetime, limit: int) -> List[ScheduledJob]:
+        """Задачи со сроком до until (включая просроченные), по возрастанию срока"""
+        async with self.db.get_async_session() as session:
+            result = await session.scalars(
+                select(ScheduledJob)
+                .where(ScheduledJob.run_at <= until)
+                .order_by(ScheduledJob.run_at)
+                .limit(limit)
+            )
+            return list(result.all())
+
+    async def claim(self, job_id: int, lease_seconds: float) -> Optional[ScheduledJob]:
+        """Захватить наступившую задачу.
+
+        Условный UPDATE ... RETURNING: из нескольких процессов задачу
+        получает один. Срок сдвигается на время аренды - если процесс упадет
+        во время выполнения, задача снова станет доступна.
+        """
+        now = datetime.now()
+        async with self.db.get_async_session() as session:
+            result = await session.scalars(
+                update(ScheduledJob)
+                .where(ScheduledJob.id == job_id, ScheduledJob.run_at <= now)
+                .values(run_at=now + timedelta(seconds=lease_seconds), attempts=ScheduledJob.attempts + 1)
+                .returning(ScheduledJob)
+                .execution_options(synchronize_session=False)
+            )
+            return result.first()
+
+    async def complete(self, job_id: int) -> None:
+        """Удалить выполненную задачу"""
+        async with self.db.get_async_session() as session:
+            await session.execute(delete(ScheduledJob).where(ScheduledJob.id == job_id))
+
+    async def retry(self, job_id: int, run_at: datetime, error: str) -> None:
+        """Перенести задачу после ошибки"""
+        async with self.db.get_async_session() as session:
+            await session.execute(
+                update(ScheduledJob)
+                .where(ScheduledJob.id == job_id)
+                .values(run_at=run_at, last_error=error)
+            )
+
+    async def count(self) -> int:
+        """Количество запланированных задач"""
+        async with self.db.get_async_session() as session:
+            return await session.scalar(select(func.count(ScheduledJob.id)))
+
+
+# Глобальный экземпляр
+job_repository = JobRepository()
@@ -0,0 +1,193 @@
+"""
+Репозиторий исходящих сообщений (transactional outbox)
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import List, Iterable, Dict, Optional
+
+from sqlalchemy import select, update, func, or_, and_
+
+from core.models import OutboxMessage, OutboxStatus
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxRepository:
+    """Асинхронный доступ к таблице outbox_messages"""
+
+    def __init__(self, db=None):
+        self._db = db
+
+    @property
+    def db(self):
+        if self._db is None:
+            from core.database import db_manager
+            self._db = db_manager
+        return self._db
+
+    async def enqueue(self, messages: Iterable[OutboxMessage]) -> List[int]:
+        """Записать сообщения отдельной транзакцией"""
+        messages = list(messages)
+        async with self.db.get_async_session() as session:
+            session.add_all(messages)
+            await session.flush()
+            return [message.id for message in messages]
+
+    async def claim_batch(
+            self,
+            limit: int,
+            lease_seconds: float,
+            bot: Optional[str] = None
+    ) -> List[OutboxMessage]:
+        """Захватить пачку готовых к отправке сообщений (сначала приоритетные).
+
+        Захват - условный UPDATE ... RETURNING, поэтому оба процесса бота могут
+        разбирать одну очередь без двойной отправки. Сообщения, захваченные
+        упавшим процессом, снова становятся доступны после истечения аренды.
+        """
+        now = datetime.now()
+        ready = or_(
+            OutboxMessage.status == OutboxStatus.PENDING,
+            OutboxMessage.status == OutboxStatus.SENDING
+        )
+        conditions = [ready, OutboxMessage.available_at <= now]
+        if bot is not None:
+            conditions.append(OutboxMessage.bot == bot)
+        async with self.db.get_async_session() as session:
+            candidates = (
+                select(OutboxMessage.id)
+                .where(*conditions)
+                .order_by(OutboxMessage.priority, OutboxMessage.id)
+                .limit(limit)
+                .scalar_subquery()
+            )
+            stmt = (
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_(candidates), *conditions)
+                .values(
+                    status=OutboxStatus.SENDING,
+                    available_at=now + timedelta(seconds=lease_seconds),
+                    attempts=OutboxMessage.attempts + 1
+                )
+                .returning(OutboxMessage)
+                .execution_options(synchronize_session=False)
+            )
+            result = await session.scalars(stmt)
+            return sorted(result.all(), key=lambda message: (message.priority, message.id))
+
+    async def mark_sent(self, message_ids: Iterable[int]) -> None:
+        """Отметить сообщения доставленными"""
+        message_ids = list(message_ids)
+        if not message_ids:
+            return
+        async with self.db.get_async_session() as session:
+            await session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_(message_ids))
+                .values(status=OutboxStatus.SENT, sent_at=datetime.now(), last_error=None)
+            )
+
+    async def release(self, messages: Iterable[OutboxMessage], delay_seconds: float = 0.0) -> int:
+        """Вернуть захваченные, но не отправленные сообщения в очередь.
+
+        Попытка не засчитывается: сообщение не отправлялось (остановка
+        диспетчера, чат еще на паузе). Сообщение, аренду которого уже
+        перехватил другой процесс (available_at изменился), не трогается.
+        """
+        owned = [
+            and_(OutboxMessage.id == message.id, OutboxMessage.available_at == message.available_at)
+            for message in messages
+        ]
+        if not owned:
+            return 0
+        async with self.db.get_async_session() as session:
+            result = await session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.status == OutboxStatus.SENDING, or_(*owned))
+                .values(
+                    status=OutboxStatus.PENDING,
+                    available_at=datetime.now() + timedelta(seconds=delay_seconds),
+                    attempts=OutboxMessage.attempts - 1
+                )
+            )
+            return result.rowcount
+
+    async def renew_lease(self, message: OutboxMessage, lease_seconds: float) -> bool:
+        """Продлить аренду, если сообщение все еще наше; True - продлена.
+
+        Владение проверяется по available_at, записанному при захвате: после
+        перехвата другим процессом оно другое, и отправлять уже нельзя.
+        """
+        lease_until = datetime.now() + timedelta(seconds=lease_seconds)
+        async with self.db.get_async_session() as session:
+            result = await session.execute(
+                update(OutboxMessage)
+                .where(
+                    OutboxMessage.id == message.id,
+                    OutboxMessage.status == OutboxStatus.SENDING,
+                    OutboxMessage.available_at == message.available_at
+                )
+                .values(available_at=lease_until)
+            )
+        if result.rowcount != 1:
+            return False
+        message.available_at = lease_until
+        return True
+
+    async def reschedule(self, message_id: int, delay_seconds: float, error: str) -> None:
+        """Вернуть сообщение в очередь для повторной попытки"""
+        async with self.db.get_async_session() as session:
+            await session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id == message_id)
+                .values(
+                    status=OutboxStatus.PENDING,
+                    available_at=datetime.now() + timedelta(seconds=delay_seconds),
+                    last_error=error
+                )
+            )
+
+    async def mark_dead(self, message_id: int, error: str) -> None:
+        """Перенести сообщение в dead-letter: доставка прекращена"""
+        async with self.db.get_async_session() as session:
+            await session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id == message_id)
+                .values(status=OutboxStatus.DEAD, last_error=error)
+            )
+
+    async def list_dead(self, limit: int = 50) -> List[OutboxMessage]:
+        """Последние сообщения из dead-letter"""
+        async with self.db.get_async_session() as session:
+            result = await session.scalars(
+                select(OutboxMessage)
+                .where(OutboxMessage.status == OutboxStatus.DEAD)
+                .order_by(OutboxMessage.id.desc())
+                .limit(limit)
+            )
+            return list(result.all())
+
+    async def requeue_dead(self, message_ids: Optional[Iterable[int]] = None) -> int:
+        """Вернуть сообщения из dead-letter в очередь (все, если ids не заданы)"""
+        stmt = (
+            update(OutboxMessage)
+            .where(OutboxMessage.status == OutboxStatus.DEAD)
+            .values(status=OutboxStatus.PENDING, attempts=0, available_at=datetime.now())
+        )
+        if message_ids is not None:
+            stmt = stmt.where(OutboxMessage.id.in_(list(message_ids)))
+        async with self.db.get_async_session() as session:
+            result = await session.execute(stmt)
+            return result.rowcount
+
+    async def count_by_status(self) -> Dict[str, int]:
+        """Количество сообщений по статусам"""
+        async with self.db.get_async_session() as session:
+            result = await session.execute(
+                select(OutboxMessage.status, func.count(OutboxMessage.id)).group_by(OutboxMessage.status)
+            )
+            return {status.value: count for status, count in result.all()}
+
+
+# Глобальный экземпляр
+outbox_repository = OutboxRepository()
@@ -0,0 +1,250 @@
+"""
+Репозиторий поездок (заказов)
+"""
+import inspect
+import logging
+from datetime import datetime
+from typing import Optional, List, Callable, Iterable, Dict, Any, Tuple
+
+from sqlalchemy import select, func, update
+
+from core.models import Ride, RideStatus
+
+logger = logging.getLogger(__name__)
+
+# Статусы, в которых поездка считается активной
+ACTIVE_RIDE_STATUSES = (
+    RideStatus.ACCEPTED,
+    RideStatus.DRIVER_ARRIVED,
+    RideStatus.IN_PROGRESS,
+)
+
+
+class RideRepository:
+    """Асинхронный доступ к таблице rides"""
+
+    def __init__(self, db=None):
+        self._db = db
+        self._listeners: List[Callable[[Ride], None]] = []
+
+    @property
+    def db(self):
+        if self._db is None:
+            from core.database import db_manager
+            self._db = db_manager
+        return self._db
+
+    def add_listener(self, listener: Callable[[Ride], None]) -> None:
+        """Подписаться на смену статуса поездки (вызывается после commit)"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def _notify(self, ride: Ride) -> None:
+        for listener in self._listeners:
+            try:
+                listener(ride)
+            except Exception as e:
+                logger.error(f"Ride listener failed for ride {ride.id}: {e}")
+
+    async def get(self, ride_id: int) -> Optional[Ride]:
+        """Получить поездку по ID"""
+        async with self.db.get_async_session() as session:
+            return await session.get(Ride, ride_id)
+
+    async def create(self, **fields) -> Ride:
+        """Создать поездку"""
+        async with self.db.get_async_session() as session:
+            ride = Ride(**fields)
+            session.add(ride)
+            await session.flush()
+            await session.refresh(ride)
+        self._notify(ride)
+        return ride
+
+    async def update(self, ride_id: int, **fields) -> Optional[Ride]:
+        """Обновить поля поездки, вернуть обновленный объект"""
+        async with self.db.get_async_session() as session:
+            ride = await session.get(Ride, ride_id)
+            if not ride:
+                return None
+            for name, value in fields.items():
+                setattr(ride, name, value)
+        if 'status' in fields:
+            self._notify(ride)
+        return ride
+
+    async def compare_and_set(
+            self,
+            ride_id: int,
+            expected: Iterable[RideStatus],
+            new_status: RideStatus,
+            owner_driver_id: Optional[int] = None,
+            outbox: Optional[Callable[[Ride], Any]] = None,
+            **fields
+    ) -> Tuple[bool, Optional[Ride]]:
+        """Атомарная смена статуса: UPDATE ... WHERE id=? AND status IN (...).
+
+        Если указан owner_driver_id, поездка должна принадлежать этому водителю.
+        outbox(ride) возвращает сообщения (OutboxMessage), которые записываются
+        в той же транзакции только при успешном переходе; может быть корутиной,
+        но не должен обращаться к сети.
+        Возвращает (выиграл ли вызывающий, текущее состояние поездки).
+        """
+        expected = list(expected)
+        async with self.db.get_async_session() as session:
+            stmt = (
+                update(Ride)
+                .where(Ride.id == ride_id, Ride.status.in_(expected))
+                .values(status=new_status, **fields)
+                .execution_options(synchronize_session=False)
+            )
+            if owner_driver_id is not None:
+                stmt = stmt.where(Ride.driver_id == owner_driver_id)
+            result = await session.execute(stmt)
+            won = result.rowcount == 1
+            ride = await session.get(Ride, ride_id, populate_existing=True)
+            if won and ride is not None and outbox is not None:
+                messages = outbox(ride)
+                if inspect.isawaitable(messages):
+                    messages = await messages
+                session.add_all(list(messages or ()))
+        if ride is not None:
+            self._notify(ride)
+        return won, ride
+
+    async def modify(self, ride_id: int, mutator: Callable[[Ride], None]) -> Optional[Ride]:
+        """Изменить поездку функцией внутри одной транзакции.
+
+        mutator вызывается синхронно и не должен делать ввод-вывод.
+        """
+        async with self.db.get_async_session() as session:
+            ride = await session.get(Ride, ride_id)
+            if not ride:
+                return None
+            mutator(ride)
+            return ride
+
+    async def get_active_for_driver(
+            self,
+            driver_id: int,
+            statuses: Iterable[RideStatus] = ACTIVE_RIDE_STATUSES
+    ) -> Optional[Ride]:
+        """Последняя активная поездка водителя"""
+        async with self.db.get_async_session() as session:
+            stmt = (
+                select(Ride)
+                .where(Ride.driver_id == driver_id, Ride.status.in_(list(statuses)))
+                .order_by(Ride.created_at.desc())
+                .limit(1)
+            )
+            result = await session.execute(stmt)
+            return result.scalar_one_or_none()
+
+    async def get_active_for_client(
+            self,
+            client_id: int,
+            statuses: Iterable[RideStatus] = ACTIVE_RIDE_STATUSES
+    ) -> Optional[Ride]:
+        """Последняя активная поездка клиента"""
+        async with self.db.get_async_session() as session:
+            stmt = (
+                select(Ride)
+                .where(Ride.client_id == client_id, Ride.status.in_(list(statuses)))
+                .order_by(Ride.created_at.desc())
+                .limit(1)
+            )
+            result = await session.execute(stmt)
+            return result.scalar_one_or_none()
+
+    async def list_for_driver(
+            self,
+            driver_id: int,
+            statuses: Iterable[RideStatus] = ACTIVE_RIDE_STATUSES
+    ) -> List[Ride]:
+        """Все поездки водителя в указанных статусах"""
+        async with self.db.get_async_session() as session:
+            stmt = (
+                select(Ride)
+                .where(Ride.driver_id == driver_id, Ride.status.in_(list(statuses)))
+                .order_by(Ride.created_at.desc())
+            )
+            result = await session.execute(stmt)
+            return list(result.scalars().all())
+
+    async def list_recent_for_client(self, client_id: int, limit: int = 3) -> List[Ride]:
+        """Последние поездки клиента"""
+        async with self.db.get_async_session() as session:
+            stmt = (
+                select(Ride)
+                .where(Ride.client_id == client_id)
+                .order_by(Ride.created_at.desc())
+                .limit(limit)
+            )
+            result = await session.execute(stmt)
+            return list(result.scalars().all())
+
+    async def list_by_order_type(self, order_type: str, limit: int = 5) -> List[Ride]:
+        """Поездки определенного типа заказа"""
+        async with self.db.get_async_session() as session:
+            stmt = select(Ride).where(Ride.order_type == order_type).limit(limit)
+            result = await session.execute(stmt)
+            return list(result.scalars().all())
+
+    async def list_completed_since(self, since: datetime, driver_id: Optional[int] = None) -> List[Ride]:
+        """Завершенные поездки начиная с даты"""
+        async with self.db.get_async_session() as session:
+            stmt = select(Ride).where(
+                Ride.status == RideStatus.COMPLETED,
+                Ride.completed_at >= since
+            )
+            if driver_id is not None:
+                stmt = stmt.where(Ride.driver_id == driver_id)
+            result = await session.execute(stmt)
+            return list(result.scalars().all())
+
+    async def cancel_active_for_driver(self, driver_id: int, reason: str) -> List[int]:
+        """Отменить все активные поездки водителя, вернуть ID отмененных этим вызовом.
+
+        Один условный UPDATE ... WHERE driver_id=? AND status IN (...): поездка,
+        которую успели завершить или отменить в другом месте, не перезаписывается.
+        """
+        async with self.db.get_async_session() as session:
+            stmt = (
+                update(Ride)
+                .where(Ride.driver_id == driver_id, Ride.status.in_(list(ACTIVE_RIDE_STATUSES)))
+                .values(status=RideStatus.CANCELLED, cancelled_at=datetime.now(), cancellation_reason=reason)
+                .returning(Ride.id)
+                .execution_options(synchronize_session=False)
+            )
+            ride_ids = list((await session.execute(stmt)).scalars().all())
+            rides = []
+            if ride_ids:
+                result = await session.execute(
+                    select(Ride).where(Ride.id.in_(ride_ids)).execution_options(populate_existing=True)
+                )
+                rides = list(result.scalars().all())
+        for ride in rides:
+            self._notify(ride)
+        return ride_ids
+
+    async def list_in_statuses(self, statuses: Iterable[RideStatus]) -> List[Ride]:
+        """Все поездки в указанных статусах (для восстановления индексов в памяти)"""
+        async with self.db.get_async_session() as session:
+            stmt = (
+                select(Ride)
+                .where(Ride.status.in_(list(statuses)))
+                .order_by(Ride.created_at)
+            )
+            result = await session.execute(stmt)
+            return list(result.scalars().all())
+
+    async def count_by_status(self) -> Dict[str, Any]:
+        """Количество поездок по статусам"""
+        async with self.db.get_async_session() as session:
+            stmt = select(Ride.status, func.count(Ride.id)).group_by(Ride.status)
+            result = await session.execute(stmt)
+            return {status.value: count for status, count in result.all()}
+
+
+# Глобальный экземпляр
+ride_repository = RideRepository()
@@ -0,0 +1,60 @@
+"""
+Репозиторий пользователей
+"""
+import logging
+from typing import Optional
+
+from sqlalchemy import select
+
+from core.models import User, UserRole
+
+logger = logging.getLogger(__name__)
+
+
+class UserRepository:
+    """Асинхронный доступ к таблице users"""
+
+    def __init__(self, db=None):
+        self._db = db
+
+    @property
+    def db(self):
+        if self._db is None:
+            from core.database import db_manager
+            self._db = db_manager
+        return self._db
+
+    async def get_by_telegram_id(self, telegram_id: int) -> Optional[User]:
+        """Получить пользователя по Telegram ID"""
+        async with self.db.get_async_session() as session:
+            result = await session.execute(select(User).where(User.telegram_id == telegram_id))
+            return result.scalar_one_or_none()
+
+    async def get_language(self, telegram_id: int, default: str = "pl") -> str:
+        """Язык пользователя или язык по умолчанию"""
+        async with self.db.get_async_session() as session:
+            result = await session.execute(select(User.language).where(User.telegram_id == telegram_id))
+            language = result.scalar_one_or_none()
+            return language or default
+
+    async def upsert_language(
+            self,
+            telegram_id: int,
+            language: str,
+            role: UserRole = UserRole.CLIENT,
+            **profile
+    ) -> User:
+        """Установить язык, создав пользователя при необходимости"""
+        async with self.db.get_async_session() as session:
+            result = await session.execute(select(User).where(User.telegram_id == telegram_id))
+            user = result.scalar_one_or_none()
+            if user is None:
+                user = User(telegram_id=telegram_id, language=language, role=role, **profile)
+                session.add(user)
+            else:
+                user.language = language
+            return user
+
+
+# Глобальный экземпляр
+user_repository = UserRepository()
@@ -0,0 +1,206 @@
+"""
+Репозиторий автомобилей водителей
+"""
+import logging
+from datetime import datetime
+from typing import Optional, List, Iterable, Dict, Any
+
+from sqlalchemy import select, delete, func, update
+from sqlalchemy.orm import undefer
+
+from core.models import Vehicle, VehicleType, VehiclePhoto, OutboxMessage, DriverLocation
+
+logger = logging.getLogger(__name__)
+
+
+class VehicleRepository:
+    """Асинхронный доступ к таблице vehicles"""
+
+    def __init__(self, db=None):
+        self._db = db
+
+    @property
+    def db(self):
+        if self._db is None:
+            from core.database import db_manager
+            self._db = db_manager
+        return self._db
+
+    async def get_by_driver(self, driver_id: int) -> Optional[Vehicle]:
+        """Автомобиль водителя"""
+        async with self.db.get_async_session() as session:
+            result = await session.execute(select(Vehicle).where(Vehicle.driver_id == driver_id).limit(1))
+            return result.scalar_one_or_none()
+
+    async def replace_for_driver(self, driver_id: int, **fields) -> Vehicle:
+        """Заменить автомобиль водителя новой записью"""
+        async with self.db.get_async_session() as session:
+            old_ids = select(Vehicle.id).where(Vehicle.driver_id == driver_id).scalar_subquery()
+            await session.execute(delete(VehiclePhoto).where(VehiclePhoto.vehicle_id.in_(old_ids)))
+            await session.execute(delete(Vehicle).where(Vehicle.driver_id == driver_id))
+            vehicle = Vehicle(driver_id=driver_id, **fields)
+            session.add(vehicle)
+            return vehicle
+
+    async def update_location(
+            self,
+            driver_id: int,
+            lat: float,
+            lon: float,
+            outbox: Iterable[OutboxMessage] = ()
+    ) -> bool:
+        """Сохранить последнюю позицию водителя (и сообщения outbox в той же транзакции)"""
+        async with self.db.get_async_session() as session:
+            result = await session.execute(
+                update(Vehicle)
+                .where(Vehicle.driver_id == driver_id)
+                .values(last_lat=lat, last_lon=lon)
+            )
+            session.add_all(list(outbox))
+            return result.rowcount > 0
+
+    async def get_location(self, driver_id: int) -> Optional[tuple]:
+        """Последняя сохраненная позиция водителя (lat, lon)"""
+        async with self.db.get_async_session() as session:
+            result = await session.execute(
+                select(Vehicle.last_lat, Vehicle.last_lon).where(Vehicle.driver_id == driver_id).limit(1)
+            )
+            row = result.first()
+            if row and row.last_lat and row.last_lon:
+                return (row.last_lat, row.last_lon)
+            return None
+
+    async def get_locations(self, driver_ids: Iterable[int], since: Optional[datetime] = None) -> Dict[int, tuple]:
+        """Последние позиции водителей {driver_id: (lat, lon)} одной сессией.
+
+        Онлайн-отметка из driver_locations важнее позиции автомобиля;
+        водители без известной позиции в ответ не попадают. С since - только
+        отметки driver_locations не старше since (у позиции автомобиля времени
+        нет, она не учитывается).
+        """
+        driver_ids = list(driver_ids)
+        if not driver_ids:
+            return {}
+        async with self.db.get_async_session() as session:
+            locations = {}
+            if since is None:
+                result = await session.execute(
+                    select(Vehicle.driver_id, Vehicle.last_lat, Vehicle.last_lon).where(
+                        Vehicle.driver_id.in_(driver_ids),
+                        Vehicle.last_lat.is_not(None),
+                        Vehicle.last_lon.is_not(None)
+                    )
+                )
+                locations = {row.driver_id: (row.last_lat, row.last_lon) for row in result}
+
+            query = (
+                select(DriverLocation.driver_id, DriverLocation.latitude, DriverLocation.longitude)
+                .where(DriverLocation.driver_id.in_(driver_ids), DriverLocation.is_online.is_(True))
+                .order_by(DriverLocation.updated_at)
+            )
+            if since is not None:
+                query = query.where(DriverLocation.updated_at >= since)
+            for row in await session.execute(query):
+                locations[row.driver_id] = (row.latitude, row.longitude)
+            return locations
+
+    async def set_photo(
+            self,
+            driver_id: int,
+            file_id: str,
+            file_unique_id: Optional[str] = None,
+            file_size: Optional[int] = None
+    ) -> bool:
+        """Сохранить фото автомобиля (Telegram file_id, без скачивания файла)"""
+        async with self.db.get_async_session() as session:
+            result = await session.execute(select(Vehicle.id).where(Vehicle.driver_id == driver_id).limit(1))
+            vehicle_id = result.scalar_one_or_none()
+            if vehicle_id is None:
+                return False
+
+            result = await session.execute(select(VehiclePhoto).where(VehiclePhoto.vehicle_id == vehicle_id))
+            photo = result.scalar_one_or_none()
+            if photo is None:
+                photo = VehiclePhoto(vehicle_id=vehicle_id)
+                session.add(photo)
+            photo.file_id = file_id
+            photo.file_unique_id = file_unique_id
+            photo.file_size = file_size
+            photo.data = None
+            return True
+
+    async def get_photo(self, driver_id: int, with_data: bool = False) -> Optional[VehiclePhoto]:
+        """Фото автомобиля водителя; бинарные данные старых фото - только по запросу"""
+        async with self.db.get_async_session() as session:
+            stmt = (
+                select(VehiclePhoto)
+                .join(Vehicle, Vehicle.id == VehiclePhoto.vehicle_id)
+                .where(Vehicle.driver_id == driver_id)
+                .limit(1)
+            )
+            if with_data:
+                stmt = stmt.options(undefer(VehiclePhoto.data))
+            result = await session.execute(stmt)
+            return result.scalar_one_or_none()
+
+    async def has_photo(self, driver_id: int) -> bool:
+        """Есть ли у автомобиля водителя фото"""
+        async with self.db.get_async_session() as session:
+            result = await session.execute(
+                select(VehiclePhoto.id)
+                .join(Vehicle, Vehicle.id == VehiclePhoto.vehicle_id)
+                .where(Vehicle.driver_id == driver_id)
+                .limit(1)
+            )
+            return result.first() is not None
+
+    async def count_by_type(self) -> Dict[Optional[VehicleType], int]:
+        """Количество автомобилей по типам кузова"""
+        async with self.db.get_async_session() as session:
+            result = await session.execute(
+                select(Vehicle.vehicle_type, func.count(Vehicle.id)).group_by(Vehicle.vehicle_type)
+            )
+            return {vehicle_type: count for vehicle_type, count in result.all()}
+
+    async def count_by_model(self, patterns: Iterable[str], vehicle_type: Optional[VehicleType] = None) -> int:
+        """Количество автомобилей, модель которых содержит все шаблоны"""
+        async with self.db.get_async_session() as session:
+            stmt = select(func.count(Vehicle.id))
+            for pattern in patterns:
+                stmt = stmt.where(Vehicle.model.ilike(f"%{pattern}%"))
+            if vehicle_type is not None:
+                stmt = stmt.where(Vehicle.vehicle_type == vehicle_type)
+            result = await session.execute(stmt)
+            return result.scalar_one()
+
+    async def reclassify_by_model(
+            self,
+            patterns: Iterable[str],
+            vehicle_type: VehicleType,
+            seats: int
+    ) -> List[Dict[str, Any]]:
+        """Исправить тип кузова для моделей, содержащих все шаблоны"""
+        async with self.db.get_async_session() as session:
+            stmt = select(Vehicle)
+            for pattern in patterns:
+                stmt = stmt.where(Vehicle.model.ilike(f"%{pattern}%"))
+            result = await session.execute(stmt)
+
+            changes = []
+            for vehicle in result.scalars().all():
+                old_type = vehicle.vehicle_type
+                fixed = old_type != vehicle_type
+                if fixed:
+                    vehicle.vehicle_type = vehicle_type
+                    vehicle.seats = seats
+                changes.append({
+                    'model': vehicle.model,
+                    'license_plate': vehicle.license_plate,
+                    'old_type': old_type,
+                    'fixed': fixed,
+                })
+            return changes
+
+
+# Глобальный экземпляр
+vehicle_repository = VehicleRepository()
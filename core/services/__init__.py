@@ -5,7 +5,7 @@
 """
 from .user_service import UserService
 from .price_calculator import PriceCalculatorService
-from .maps_service import MapsService, Location
+from .maps_service import MapsService, Location, maps_service
 from .driver_notification import driver_notification_service
 
 __all__ = [
@@ -13,5 +13,6 @@ __all__ = [
     'PriceCalculatorService',
     'MapsService',
     'Location',
+    'maps_service',
     'driver_notification_service'
 ]
\ No newline at end of file
@@ -0,0 +1,226 @@
+"""
+Индекс активных поездок в памяти процесса
+
+driver_id / client_id -> (ride_id, status). Обновляется на каждой смене
+статуса через RideRepository и восстанавливается из БД при старте, поэтому
+вопрос «какая поездка сейчас у пользователя» обычно не требует запроса к БД.
+
+Боты работают в разных процессах: переходы другого процесса приходят через
+шину событий (attach_event_bus). Шина - не гарантия доставки, поэтому записи
+по-прежнему живут не дольше MAX_ENTRY_AGE секунд, а промах или несовпадение
+статуса всегда проверяется по БД.
+"""
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Iterable, Any
+
+from core.models import Ride, RideStatus
+from core.repositories.rides import RideRepository, ride_repository, ACTIVE_RIDE_STATUSES
+from core.services.event_bus import EventBus, OrderEvent, RIDE_STATUS
+
+logger = logging.getLogger(__name__)
+
+# Статусы, которые хранятся в индексе (остальные - завершенные)
+TRACKED_STATUSES = (RideStatus.PENDING,) + ACTIVE_RIDE_STATUSES
+
+# Максимальный возраст записи, секунд
+MAX_ENTRY_AGE = 60.0
+
+
+@dataclass
+class ActiveRide:
+    """Запись индекса"""
+    ride_id: int
+    status: RideStatus
+    client_id: Optional[int]
+    driver_id: Optional[int]
+    updated_at: float
+
+    @property
+    def id(self) -> int:
+        """Совместимость с Ride.id в обработчиках"""
+        return self.ride_id
+
+
+class ActiveRideIndex:
+    """Индекс driver_id/client_id -> активная поездка"""
+
+    def __init__(self, repository: Optional[RideRepository] = None, max_age: float = MAX_ENTRY_AGE):
+        self.repository = repository or ride_repository
+        self.max_age = max_age
+        self._by_ride: Dict[int, ActiveRide] = {}
+        self._by_driver: Dict[int, int] = {}
+        self._by_client: Dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.remote_updates = 0
+        self._event_bus: Optional[EventBus] = None
+        self.repository.add_listener(self.observe)
+
+    # ------------------------------------------------------------------
+    # Обновление
+    # ------------------------------------------------------------------
+
+    def observe(self, ride: Ride) -> None:
+        """Учесть текущее состояние поездки"""
+        self.record(
+            ride.id,
+            RideStatus(ride.status),
+            ride.client_id or ride.user_id,
+            ride.driver_id
+        )
+
+    def record(
+            self,
+            ride_id: int,
+            status: RideStatus,
+            client_id: Optional[int] = None,
+            driver_id: Optional[int] = None
+    ) -> None:
+        """Записать переход поездки в новый статус"""
+        self.forget(ride_id)
+        if status not in TRACKED_STATUSES:
+            return
+
+        entry = ActiveRide(ride_id, status, client_id, driver_id, time.monotonic())
+        self._by_ride[ride_id] = entry
+        if client_id:
+            self._by_client[client_id] = ride_id
+        if driver_id and status in ACTIVE_RIDE_STATUSES:
+            self._by_driver[driver_id] = ride_id
+
+    def forget(self, ride_id: int) -> None:
+        """Удалить поездку из индекса"""
+        entry = self._by_ride.pop(ride_id, None)
+        if entry is None:
+            return
+        if entry.client_id and self._by_client.get(entry.client_id) == ride_id:
+            del self._by_client[entry.client_id]
+        if entry.driver_id and self._by_driver.get(entry.driver_id) == ride_id:
+            del self._by_driver[entry.driver_id]
+
+    async def rebuild(self) -> int:
+        """Заполнить индекс активными поездками из БД (при старте)"""
+        rides = await self.repository.list_in_statuses(TRACKED_STATUSES)
+        self._by_ride.clear()
+        self._by_driver.clear()
+        self._by_client.clear()
+        for ride in rides:
+            self.observe(ride)
+        logger.info(f"Active ride index rebuilt: {len(self._by_ride)} rides")
+        return len(self._by_ride)
+
+    # ------------------------------------------------------------------
+    # Синхронизация между процессами
+    # ------------------------------------------------------------------
+
+    def attach_event_bus(self, bus: EventBus) -> None:
+        """Публиковать свои переходы в шину и применять переходы других процессов"""
+        if self._event_bus is not None:
+            return
+        self._event_bus = bus
+        self.repository.add_listener(self._publish)
+        bus.subscribe(self.apply_event, (RIDE_STATUS,))
+
+    def _publish(self, ride: Ride) -> None:
+        self._event_bus.publish(
+            RIDE_STATUS,
+            ride.id,
+            status=RideStatus(ride.status).value,
+            client_id=ride.client_id or ride.user_id,
+            driver_id=ride.driver_id
+        )
+
+    def apply_event(self, event: OrderEvent) -> None:
+        """Переход, сделанный другим процессом"""
+        if event.origin == self._event_bus.origin:
+            return
+        self.remote_updates += 1
+        self.record(
+            event.order_id,
+            RideStatus(event.data['status']),
+            event.data.get('client_id'),
+            event.data.get('driver_id')
+        )
+
+    # ------------------------------------------------------------------
+    # Поиск
+    # ------------------------------------------------------------------
+
+    def _lookup(self, ride_id: Optional[int], statuses: Iterable[RideStatus]) -> Optional[ActiveRide]:
+        if ride_id is None:
+            return None
+        entry = self._by_ride.get(ride_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.updated_at > self.max_age:
+            self.forget(ride_id)
+            return None
+        if entry.status not in tuple(statuses):
+            return None
+        return entry
+
+    async def for_driver(
+            self,
+            driver_id: int,
+            statuses: Iterable[RideStatus] = ACTIVE_RIDE_STATUSES
+    ) -> Optional[ActiveRide]:
+        """Активная поездка водителя: из памяти, при промахе - из БД"""
+        statuses = tuple(statuses)
+        entry = self._lookup(self._by_driver.get(driver_id), statuses)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        ride = await self.repository.get_active_for_driver(driver_id, statuses)
+        if ride is None:
+            return None
+        self.observe(ride)
+        return self._by_ride.get(ride.id)
+
+    async def for_client(
+            self,
+            client_id: int,
+            statuses: Iterable[RideStatus] = ACTIVE_RIDE_STATUSES
+    ) -> Optional[ActiveRide]:
+        """Активная поездка клиента: из памяти, при промахе - из БД"""
+        statuses = tuple(statuses)
+        entry = self._lookup(self._by_client.get(client_id), statuses)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        ride = await self.repository.get_active_for_client(client_id, statuses)
+        if ride is None:
+            return None
+        self.observe(ride)
+        return self._by_ride.get(ride.id)
+
+    async def driver_ride_id(
+            self,
+            driver_id: int,
+            statuses: Iterable[RideStatus] = ACTIVE_RIDE_STATUSES
+    ) -> Optional[int]:
+        """ID активной поездки водителя"""
+        entry = await self.for_driver(driver_id, statuses)
+        return entry.ride_id if entry else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика индекса"""
+        total = self.hits + self.misses
+        return {
+            'rides': len(self._by_ride),
+            'drivers': len(self._by_driver),
+            'clients': len(self._by_client),
+            'hits': self.hits,
+            'misses': self.misses,
+            'remote_updates': self.remote_updates,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+# Глобальный экземпляр
+active_ride_index = ActiveRideIndex()
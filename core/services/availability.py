@@ -0,0 +1,273 @@
+"""
+Реестр доступности водителей в памяти
+
+Занят ли водитель, раньше выяснялось просмотром rides, а модель
+DriverLocation (is_online, is_available) не использовалась. Теперь состояние
+каждого водителя - в сети, принимает ли заказы, какая поездка у него идет -
+держится в памяти процесса и обновляется:
+
+- геолокацией водителя (heartbeat: в сети, последняя позиция);
+- переходами поездок через RideRepository (поездка началась/закончилась);
+- событиями другого бота через шину (RIDE_STATUS, DRIVER_LOCATION).
+
+Изменения записываются в driver_locations в фоне пачкой раз в
+FLUSH_INTERVAL секунд (write-behind), поэтому чтение - распределение заказов,
+«где мой водитель» - не делает запросов к БД. При старте реестр
+восстанавливается из driver_locations и активных поездок.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from core.models import Ride, RideStatus
+from core.repositories.driver_locations import DriverLocationRepository, driver_location_repository
+from core.repositories.rides import RideRepository, ride_repository, ACTIVE_RIDE_STATUSES
+from core.services.driver_index import DriverPositionIndex, driver_position_index, POSITION_TTL
+from core.services.event_bus import EventBus, OrderEvent, RIDE_STATUS, DRIVER_LOCATION
+
+logger = logging.getLogger(__name__)
+
+# Параметры реестра
+ONLINE_TTL = POSITION_TTL   # Без геолокации дольше этого водитель считается не в сети, секунд
+FLUSH_INTERVAL = 5.0        # Запись изменений в driver_locations, секунд
+
+
+@dataclass
+class DriverAvailability:
+    """Состояние водителя"""
+    driver_id: int
+    online: bool = False
+    available: bool = True
+    ride_id: Optional[int] = None
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    seen_at: float = 0.0        # Последняя геолокация (time.time())
+    updated_at: float = 0.0     # Последнее изменение (time.time())
+
+    @property
+    def on_ride(self) -> bool:
+        return self.ride_id is not None
+
+    @property
+    def can_take_orders(self) -> bool:
+        """Свободен и не отключил прием заказов"""
+        return self.available and self.ride_id is None
+
+    def is_online(self, now: Optional[float] = None, ttl: float = ONLINE_TTL) -> bool:
+        return self.online and (time.time() if now is None else now) - self.seen_at <= ttl
+
+
+class DriverAvailabilityRegistry:
+    """driver_id -> DriverAvailability, запись в driver_locations в фоне"""
+
+    def __init__(
+            self,
+            repository: Optional[DriverLocationRepository] = None,
+            rides: Optional[RideRepository] = None,
+            index: Optional[DriverPositionIndex] = None,
+            flush_interval: float = FLUSH_INTERVAL
+    ):
+        self.repository = repository or driver_location_repository
+        self.rides = rides or ride_repository
+        self.index = index if index is not None else driver_position_index
+        self.flush_interval = flush_interval
+        self._drivers: Dict[int, DriverAvailability] = {}
+        self._dirty: Set[int] = set()
+        self._event_bus: Optional[EventBus] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {'heartbeats': 0, 'transitions': 0, 'remote_updates': 0, 'flushed': 0}
+        self.rides.add_listener(self.observe)
+
+    def _state(self, driver_id: int) -> DriverAvailability:
+        state = self._drivers.get(driver_id)
+        if state is None:
+            state = self._drivers[driver_id] = DriverAvailability(driver_id)
+        return state
+
+    def _touch(self, state: DriverAvailability, at: Optional[float] = None) -> None:
+        state.updated_at = time.time() if at is None else at
+        self._dirty.add(state.driver_id)
+
+    # ------------------------------------------------------------------
+    # Обновление
+    # ------------------------------------------------------------------
+
+    def heartbeat(self, driver_id: int, lat: float, lon: float, at: Optional[float] = None,
+                  publish: bool = True) -> None:
+        """Геолокация водителя: он в сети, позиция - в пространственный индекс"""
+        at = time.time() if at is None else at
+        state = self._state(driver_id)
+        if at < state.seen_at:
+            return
+        state.online, state.lat, state.lon, state.seen_at = True, lat, lon, at
+        self._touch(state, at)
+        self.index.update(driver_id, lat, lon, at, publish=publish)
+        self.stats['heartbeats'] += 1
+
+    def observe(self, ride: Ride) -> None:
+        """Переход поездки (слушатель RideRepository)"""
+        self.record_ride(ride.id, RideStatus(ride.status), ride.driver_id)
+
+    def record_ride(self, ride_id: int, status: RideStatus, driver_id: Optional[int]) -> None:
+        if not driver_id:
+            return
+        state = self._state(driver_id)
+        if status in ACTIVE_RIDE_STATUSES:
+            state.ride_id = ride_id
+        elif state.ride_id == ride_id:
+            state.ride_id = None
+        else:
+            return
+        self._touch(state)
+        self.stats['transitions'] += 1
+
+    def attach_event_bus(self, bus: EventBus) -> None:
+        """Применять переходы поездок и геолокацию из другого процесса"""
+        if self._event_bus is not None:
+            return
+        self._event_bus = bus
+        bus.subscribe(self.apply_event, (RIDE_STATUS, DRIVER_LOCATION))
+
+    def apply_event(self, event: OrderEvent) -> None:
+        if event.origin == self._event_bus.origin:
+            return
+        self.stats['remote_updates'] += 1
+        data = event.data
+        if event.type == RIDE_STATUS:
+            self.record_ride(event.order_id, RideStatus(data['status']), data.get('driver_id'))
+        else:
+            self.heartbeat(data['driver_id'], data['lat'], data['lon'], data.get('at'), publish=False)
+
+    # ------------------------------------------------------------------
+    # Чтение (без запросов к БД)
+    # ------------------------------------------------------------------
+
+    def get(self, driver_id: int) -> Optional[DriverAvailability]:
+        return self._drivers.get(driver_id)
+
+    def can_take_orders(self, driver_id: int, now: Optional[float] = None) -> bool:
+        """Можно ли предложить заказ: свободен и не отключил прием.
+
+        Давность геолокации здесь не учитывается: позиция старше ONLINE_TTL
+        выпадает из индекса и считается неизвестной, такой водитель получает
+        заказ в последних волнах. Иначе после перезапуска (seen_at из
+        driver_locations) или без трансляции геопозиции заказы не получал бы
+        никто. О ком реестр ничего не знает - можно, как раньше.
+        """
+        state = self._drivers.get(driver_id)
+        if state is None:
+            return True
+        return state.can_take_orders
+
+    def available_drivers(self, driver_ids: Iterable[int]) -> List[int]:
+        """Водители, которым можно предложить заказ, в исходном порядке"""
+        now = time.time()
+        return [driver_id for driver_id in driver_ids if self.can_take_orders(driver_id, now)]
+
+    def location(self, driver_id: int) -> Optional[Tuple[float, float]]:
+        """Последняя известная позиция водителя"""
+        state = self._drivers.get(driver_id)
+        if state is None or state.lat is None:
+            return None
+        return state.lat, state.lon
+
+    # ------------------------------------------------------------------
+    # Восстановление и запись
+    # ------------------------------------------------------------------
+
+    async def rebuild(self) -> int:
+        """Восстановить реестр из driver_locations и активных поездок"""
+        self._drivers.clear()
+        now = time.time()
+        for row in await self.repository.list_all():
+            seen_at = row.updated_at.timestamp() if row.updated_at else 0.0
+            self._drivers[row.driver_id] = DriverAvailability(
+                driver_id=row.driver_id,
+                online=bool(row.is_online),
+                available=bool(row.is_available),
+                lat=row.latitude,
+                lon=row.longitude,
+                seen_at=seen_at,
+                updated_at=seen_at
+            )
+            if row.is_online and now - seen_at <= self.index.ttl:
+                self.index.update(row.driver_id, row.latitude, row.longitude, seen_at, publish=False)
+
+        for ride in await self.rides.list_in_statuses(ACTIVE_RIDE_STATUSES):
+            if ride.driver_id:
+                self._state(ride.driver_id).ride_id = ride.id
+        self._dirty.clear()
+        logger.info(f"Driver availability rebuilt: {len(self._drivers)} drivers")
+        return len(self._drivers)
+
+    async def flush(self) -> int:
+        """Записать изменившиеся состояния одной транзакцией"""
+        if not self._dirty:
+            return 0
+        dirty, self._dirty = self._dirty, set()
+        rows = []
+        for driver_id in dirty:
+            state = self._drivers[driver_id]
+            if state.lat is None:
+                continue    # Позиция неизвестна - строку driver_locations не создать
+            rows.append({
+                'driver_id': driver_id,
+                'latitude': state.lat,
+                'longitude': state.lon,
+                'is_online': state.online,
+                # Флаг самого водителя; занятость поездкой восстанавливается из rides
+                'is_available': state.available,
+                'updated_at': datetime.fromtimestamp(state.updated_at),
+            })
+        try:
+            written = await self.repository.upsert_many(rows)
+        except Exception:
+            self._dirty |= dirty    # Повторим на следующем проходе
+            raise
+        self.stats['flushed'] += written
+        return written
+
+    async def start(self) -> None:
+        """Восстановить состояние и запустить фоновую запись"""
+        if self._task is not None:
+            return
+        await self.rebuild()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить фоновую запись и записать оставшееся"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Driver availability final flush failed: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Driver availability flush failed: {e}")
+
+    def get_stats(self) -> Dict[str, int]:
+        """Статистика реестра"""
+        now = time.time()
+        return dict(
+            self.stats,
+            drivers=len(self._drivers),
+            online=sum(1 for state in self._drivers.values() if state.is_online(now)),
+            on_ride=sum(1 for state in self._drivers.values() if state.on_ride),
+            dirty=len(self._dirty)
+        )
+
+
+# Глобальный экземпляр
+driver_availability = DriverAvailabilityRegistry()
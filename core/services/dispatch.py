@@ -0,0 +1,110 @@
+"""
+Геораспределение заказов: сначала ближайшим водителям
+
+Раньше каждый заказ уходил всем водителям из Config.DRIVER_IDS, где бы они
+ни находились: с ростом парка росло число сообщений на заказ, а принимал
+чаще всего тот, кто быстрее нажал, а не тот, кто ближе.
+
+Теперь водители ранжируются по расстоянию по прямой от точки подачи
+(pickup_lat/pickup_lng) до последней известной позиции (индекс позиций в
+памяти, затем driver_locations не старше POSITION_TTL). Заказ
+предлагается волнами: сначала RING_SIZE ближайших, через WAVE_TIMEOUT секунд
+или после отказа всей волны - следующим RING_SIZE. Водители без позиции идут
+в последних волнах; если позиций нет ни у кого (или у заказа нет координат),
+заказ уходит всем сразу, как раньше.
+"""
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from core.services.driver_index import driver_position_index
+from core.utils.distance import haversine_one_to_many
+
+logger = logging.getLogger(__name__)
+
+# Параметры распределения
+RING_SIZE = 5               # Водителей в одной волне
+WAVE_TIMEOUT = 30           # Ожидание ответа волны перед следующей, секунд
+
+
+@dataclass
+class DispatchPlan:
+    """Волны предложения заказа, ближайшие водители - первыми"""
+    waves: List[List[int]]
+    distances: Dict[int, float] = field(default_factory=dict)
+
+    @property
+    def targeted(self) -> bool:
+        """Ранжирование по расстоянию (а не рассылка всем)"""
+        return bool(self.distances)
+
+
+def order_pickup(order_data: Mapping) -> Optional[Tuple[float, float]]:
+    """Координаты подачи из данных заказа"""
+    lat = order_data.get('pickup_lat')
+    lng = order_data.get('pickup_lng')
+    if lat is None or lng is None:
+        return None
+    return float(lat), float(lng)
+
+
+def rank_drivers(
+        driver_ids: Iterable[int],
+        locations: Mapping[int, Tuple[float, float]],
+        pickup: Tuple[float, float]
+) -> Tuple[List[int], Dict[int, float]]:
+    """Водители по возрастанию расстояния; без позиции - в конце, в исходном порядке"""
+    known, lats, lons = [], [], []
+    unknown = []
+    for driver_id in driver_ids:
+        location = locations.get(driver_id)
+        if location is None:
+            unknown.append(driver_id)
+        else:
+            known.append(driver_id)
+            lats.append(location[0])
+            lons.append(location[1])
+    # Все расстояния одним векторным вызовом
+    distances = dict(zip(known, haversine_one_to_many(pickup[0], pickup[1], lats, lons).tolist())) if known else {}
+    ranked = sorted(distances, key=distances.__getitem__)
+    return ranked + unknown, distances
+
+
+def plan_waves(
+        driver_ids: Iterable[int],
+        locations: Mapping[int, Tuple[float, float]],
+        pickup: Optional[Tuple[float, float]],
+        ring_size: int = RING_SIZE
+) -> DispatchPlan:
+    """Разбить водителей на волны по расстоянию до точки подачи"""
+    driver_ids = list(driver_ids)
+    if pickup is None or not any(driver_id in locations for driver_id in driver_ids):
+        return DispatchPlan(waves=[driver_ids] if driver_ids else [])
+
+    ranked, distances = rank_drivers(driver_ids, locations, pickup)
+    waves = [ranked[start:start + ring_size] for start in range(0, len(ranked), ring_size)]
+    return DispatchPlan(waves=waves, distances=distances)
+
+
+async def plan_dispatch(driver_ids: Iterable[int], order_data: Mapping, ring_size: int = RING_SIZE) -> DispatchPlan:
+    """План волн для заказа: позиции из индекса, недостающие - одним запросом к БД"""
+    driver_ids = list(driver_ids)
+    pickup = order_pickup(order_data)
+    locations = {}
+    if pickup is not None:
+        # Свежие позиции из индекса в памяти, остальные - из БД, но не старше TTL
+        # индекса: устаревшая позиция считается неизвестной (водитель в конце)
+        locations = driver_position_index.positions(driver_ids)
+        missing = [driver_id for driver_id in driver_ids if driver_id not in locations]
+        if missing:
+            try:
+                from core.repositories import vehicle_repository
+                since = datetime.fromtimestamp(time.time() - driver_position_index.ttl)
+                stored = await vehicle_repository.get_locations(missing, since=since)
+                locations.update(stored)
+            except Exception as e:
+                # Без позиций - рассылка по известным или всем, как раньше
+                logger.warning(f"Driver locations unavailable: {e}")
+    return plan_waves(driver_ids, locations, pickup, ring_size)
@@ -0,0 +1,220 @@
+"""
+Пространственный индекс позиций водителей в памяти
+
+Поиск ближайших водителей без индекса - полный просмотр vehicles и geodesic
+в Python для каждого. Здесь позиции лежат в равномерной сетке ячеек
+CELL_KM x CELL_KM: запрос по радиусу смотрит только ячейки, пересекающие
+квадрат вокруг точки, а k ближайших ищутся расширяющимися кольцами ячеек с
+остановкой, как только следующее кольцо заведомо дальше k-го найденного.
+
+Позиции приходят из обработчиков геолокации водителя; другой бот узнает о
+них через шину событий (DRIVER_LOCATION). Водитель, не обновлявший позицию
+дольше TTL, из индекса выпадает.
+"""
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from core.services.event_bus import EventBus, OrderEvent, DRIVER_LOCATION
+from core.utils.geo import haversine_km
+
+logger = logging.getLogger(__name__)
+
+# Параметры индекса
+CELL_KM = 1.0               # Сторона ячейки сетки, км
+POSITION_TTL = 600.0        # Позиция старше этого не учитывается, секунд
+REFERENCE_LAT = 53.4285     # Широта зоны обслуживания (Щецин) для ширины ячейки по долготе
+KM_PER_DEGREE = 111.32
+
+Cell = Tuple[int, int]
+
+
+@dataclass
+class DriverPosition:
+    """Последняя позиция водителя"""
+    driver_id: int
+    lat: float
+    lon: float
+    updated_at: float
+    cell: Cell
+
+
+class DriverPositionIndex:
+    """Сетка ячеек -> водители; запросы по радиусу и k ближайших"""
+
+    def __init__(self, cell_km: float = CELL_KM, ttl: float = POSITION_TTL, reference_lat: float = REFERENCE_LAT):
+        self.cell_km = cell_km
+        self.ttl = ttl
+        self._cell_lat = cell_km / KM_PER_DEGREE
+        self._cell_lon = cell_km / (KM_PER_DEGREE * math.cos(math.radians(reference_lat)))
+        self._cells: Dict[Cell, Set[int]] = {}
+        # Порядок обновления: самые старые в начале, истечение за O(истекших)
+        self._positions: "OrderedDict[int, DriverPosition]" = OrderedDict()
+        self._event_bus: Optional[EventBus] = None
+        self.stats = {'updates': 0, 'expired': 0, 'remote_updates': 0}
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def _cell(self, lat: float, lon: float) -> Cell:
+        return math.floor(lat / self._cell_lat), math.floor(lon / self._cell_lon)
+
+    # ------------------------------------------------------------------
+    # Обновление
+    # ------------------------------------------------------------------
+
+    def update(self, driver_id: int, lat: float, lon: float, updated_at: Optional[float] = None,
+               publish: bool = True) -> None:
+        """Новая позиция водителя"""
+        updated_at = time.time() if updated_at is None else updated_at
+        current = self._positions.get(driver_id)
+        if current is not None and current.updated_at > updated_at:
+            return  # Устаревшее событие из другого процесса
+        if updated_at < time.time() - self.ttl:
+            # Позиция уже старше TTL: в конец очереди expire() ее не ставим
+            self.remove(driver_id)
+            self.stats['expired'] += 1
+            return
+        cell = self._cell(lat, lon)
+        if current is not None and current.cell != cell:
+            self._discard_from_cell(driver_id, current.cell)
+        self._cells.setdefault(cell, set()).add(driver_id)
+        self._positions[driver_id] = DriverPosition(driver_id, lat, lon, updated_at, cell)
+        self._positions.move_to_end(driver_id)
+        self.stats['updates'] += 1
+
+        if publish and self._event_bus is not None:
+            # Событие не привязано к заказу
+            self._event_bus.publish(DRIVER_LOCATION, 0, driver_id=driver_id, lat=lat, lon=lon, at=updated_at)
+
+    def remove(self, driver_id: int) -> None:
+        """Убрать водителя из индекса (офлайн)"""
+        position = self._positions.pop(driver_id, None)
+        if position is not None:
+            self._discard_from_cell(driver_id, position.cell)
+
+    def _discard_from_cell(self, driver_id: int, cell: Cell) -> None:
+        drivers = self._cells.get(cell)
+        if drivers is not None:
+            drivers.discard(driver_id)
+            if not drivers:
+                del self._cells[cell]
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Удалить водителей без обновлений дольше TTL, вернуть их число"""
+        deadline = (time.time() if now is None else now) - self.ttl
+        expired = 0
+        while self._positions:
+            driver_id, position = next(iter(self._positions.items()))
+            if position.updated_at >= deadline:
+                break
+            self.remove(driver_id)
+            expired += 1
+        self.stats['expired'] += expired
+        return expired
+
+    def attach_event_bus(self, bus: EventBus) -> None:
+        """Публиковать свои обновления и принимать позиции из другого процесса"""
+        if self._event_bus is not None:
+            return
+        self._event_bus = bus
+        bus.subscribe(self.apply_event, (DRIVER_LOCATION,))
+
+    def apply_event(self, event: OrderEvent) -> None:
+        """Позиция, полученная другим процессом"""
+        if event.origin == self._event_bus.origin:
+            return
+        self.stats['remote_updates'] += 1
+        data = event.data
+        self.update(data['driver_id'], data['lat'], data['lon'], data.get('at'), publish=False)
+
+    # ------------------------------------------------------------------
+    # Запросы
+    # ------------------------------------------------------------------
+
+    def get(self, driver_id: int) -> Optional[Tuple[float, float]]:
+        """Позиция водителя, если она свежая"""
+        self.expire()
+        position = self._positions.get(driver_id)
+        return (position.lat, position.lon) if position is not None else None
+
+    def positions(self, driver_ids=None) -> Dict[int, Tuple[float, float]]:
+        """Свежие позиции {driver_id: (lat, lon)} (всех или указанных водителей)"""
+        self.expire()
+        if driver_ids is None:
+            return {driver_id: (p.lat, p.lon) for driver_id, p in self._positions.items()}
+        found = {}
+        for driver_id in driver_ids:
+            position = self._positions.get(driver_id)
+            if position is not None:
+                found[driver_id] = (position.lat, position.lon)
+        return found
+
+    def within_radius(self, lat: float, lon: float, radius_km: float) -> List[Tuple[int, float]]:
+        """Водители в радиусе radius_km: [(driver_id, км)] по возрастанию расстояния"""
+        self.expire()
+        lat_cells = math.ceil(radius_km / self.cell_km)
+        lon_cells = math.ceil(radius_km / (KM_PER_DEGREE * math.cos(math.radians(lat)) * self._cell_lon))
+        row, col = self._cell(lat, lon)
+        found = []
+        for r in range(row - lat_cells, row + lat_cells + 1):
+            for c in range(col - lon_cells, col + lon_cells + 1):
+                for driver_id in self._cells.get((r, c), ()):
+                    position = self._positions[driver_id]
+                    distance = haversine_km(lat, lon, position.lat, position.lon)
+                    if distance <= radius_km:
+                        found.append((driver_id, distance))
+        found.sort(key=lambda item: item[1])
+        return found
+
+    def nearest(self, lat: float, lon: float, k: int,
+                max_radius_km: Optional[float] = None) -> List[Tuple[int, float]]:
+        """k ближайших водителей: [(driver_id, км)] по возрастанию расстояния"""
+        self.expire()
+        if k <= 0 or not self._positions:
+            return []
+        row, col = self._cell(lat, lon)
+        # Минимальная сторона ячейки в км у точки запроса - нижняя граница шага кольца
+        step_km = min(self.cell_km, KM_PER_DEGREE * math.cos(math.radians(lat)) * self._cell_lon)
+        max_ring = math.ceil(max_radius_km / step_km) + 1 if max_radius_km is not None else None
+
+        found: List[Tuple[int, float]] = []
+        ring = 0
+        while len(found) < len(self._positions) and (max_ring is None or ring <= max_ring):
+            for cell in self._ring_cells(row, col, ring):
+                for driver_id in self._cells.get(cell, ()):
+                    position = self._positions[driver_id]
+                    found.append((driver_id, haversine_km(lat, lon, position.lat, position.lon)))
+            # Все в следующем кольце дальше ring * step_km
+            if len(found) >= k:
+                found.sort(key=lambda item: item[1])
+                if found[k - 1][1] <= ring * step_km:
+                    break
+            ring += 1
+        found.sort(key=lambda item: item[1])
+        if max_radius_km is not None:
+            found = [item for item in found if item[1] <= max_radius_km]
+        return found[:k]
+
+    @staticmethod
+    def _ring_cells(row: int, col: int, ring: int):
+        if ring == 0:
+            yield row, col
+            return
+        for c in range(col - ring, col + ring + 1):
+            yield row - ring, c
+            yield row + ring, c
+        for r in range(row - ring + 1, row + ring):
+            yield r, col - ring
+            yield r, col + ring
+
+    def get_stats(self) -> Dict[str, int]:
+        """Статистика индекса"""
+        return dict(self.stats, drivers=len(self._positions), cells=len(self._cells))
+
+
+# Глобальный экземпляр
+driver_position_index = DriverPositionIndex()
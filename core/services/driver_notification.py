@@ -8,12 +8,26 @@ import asyncio
 import logging
 import sqlite3
 import json
-from typing import Dict, List, Set
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Set, Optional
 from pathlib import Path
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from aiogram.exceptions import TelegramBadRequest
 from decimal import Decimal
 
+from core.write_coordinator import get_write_coordinator
+from core.services.fanout import driver_fanout
+from core.services.outbox import enqueue_message
+from core.services.scheduler import job_scheduler
+from core.services.message_sweeper import MessageSweeper
+from core.services.dispatch import plan_dispatch, WAVE_TIMEOUT
+from core.services.availability import driver_availability
+from core.services.event_bus import (
+    event_bus, EventBus, OrderEvent, ORDER_EVENTS,
+    ORDER_CREATED, ORDER_ACCEPTED, ORDER_REJECTED, ORDER_CANCELLED, ORDER_TIMED_OUT
+)
+
 # Импортируем конфигурацию безопасно
 try:
     from core.bot_instance import Bots
@@ -45,6 +59,29 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Отложенные задачи (core/services/scheduler.py)
+JOB_AUTO_CANCEL = "order.auto_cancel"
+JOB_DELETE_MESSAGE = "driver.delete_message"
+JOB_DISPATCH_WAVE = "order.dispatch_wave"
+AUTO_CANCEL_SECONDS = 120
+MIN_RESPONSE_SECONDS = 30   # Волну, которой до автоотмены осталось меньше, не предлагаем
+
+# Параметры соединений чтения общего хранилища
+STATEMENT_CACHE_SIZE = 64   # Подготовленных выражений на соединение
+READ_BUSY_TIMEOUT_MS = 1000  # Ожидание блокировки при чтении
+
+
+def response_time_text(seconds: int) -> str:
+    """Время на ответ для текста предложения (по-польски): "2 minuty", "90 s" """
+    if seconds < 60 or seconds % 60:
+        return f"{seconds} s"
+    minutes = seconds // 60
+    if minutes == 1:
+        return "1 minuta"
+    if minutes % 10 in (2, 3, 4) and minutes % 100 not in (12, 13, 14):
+        return f"{minutes} minuty"
+    return f"{minutes} minut"
+
 
 class DecimalEncoder(json.JSONEncoder):
     """Кастомный энкодер для сериализации Decimal объектов"""
@@ -54,167 +91,323 @@ class DecimalEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
+# Запросы хранилища. На постоянном соединении sqlite3 держит скомпилированные
+# выражения в кэше по тексту SQL, поэтому каждый запрос готовится один раз
+SQL_GET_ORDER = "SELECT order_data FROM pending_orders WHERE order_id = ?"
+SQL_ALL_ORDERS = "SELECT order_id FROM pending_orders"
+SQL_GET_RESPONSES = "SELECT driver_id, response FROM driver_responses WHERE order_id = ?"
+SQL_HAS_ORDER = "SELECT 1 FROM pending_orders WHERE order_id = ?"
+SQL_ORDERS_BULK = "SELECT order_id, order_data FROM pending_orders"
+SQL_RESPONSES_BULK = (
+    "SELECT p.order_id, r.driver_id, r.response FROM pending_orders p "
+    "LEFT JOIN driver_responses r ON r.order_id = p.order_id"
+)
+SQL_DRIVER_MESSAGES = "SELECT message_id FROM driver_messages WHERE driver_id = ?"
+SQL_DRIVER_ORDER_MESSAGES = "SELECT message_id FROM driver_messages WHERE driver_id = ? AND order_id = ?"
+SQL_ADD_ORDER = "INSERT OR REPLACE INTO pending_orders (order_id, order_data) VALUES (?, ?)"
+SQL_ADD_RESPONSE = "INSERT OR REPLACE INTO driver_responses (order_id, driver_id, response) VALUES (?, ?, ?)"
+SQL_ADD_MESSAGE = "INSERT OR REPLACE INTO driver_messages (driver_id, message_id, order_id) VALUES (?, ?, ?)"
+SQL_REMOVE_MESSAGES = "DELETE FROM driver_messages WHERE driver_id = ?"
+SQL_REMOVE_ORDER_MESSAGES = "DELETE FROM driver_messages WHERE driver_id = ? AND order_id = ?"
+SQL_REMOVE_MESSAGE = "DELETE FROM driver_messages WHERE driver_id = ? AND message_id = ?"
+# Все, кроме последних N сообщений каждого водителя; строку забирает один процесс
+SQL_CLAIM_EXCESS_MESSAGES = """
+    DELETE FROM driver_messages WHERE rowid IN (
+        SELECT rowid FROM (
+            SELECT rowid, ROW_NUMBER() OVER (PARTITION BY driver_id ORDER BY message_id DESC) AS position
+            FROM driver_messages
+        ) WHERE position > ?
+    )
+    RETURNING driver_id, message_id
+"""
+
+
 class SharedOrderStorage:
-    """Общее хранилище заказов между ботами через SQLite"""
+    """Общее хранилище заказов между ботами через SQLite
 
-    def __init__(self):
-        self.db_path = Path("data/shared_orders.db")
+    Чтение идет через постоянное WAL-соединение своего потока (без открытия
+    файла на каждый вызов), запись - через координатор записи. Методы с
+    суффиксом _async выполняют чтение в отдельном потоке и не блокируют
+    цикл событий.
+    """
+
+    def __init__(self, db_path: Optional[Path] = None):
+        self.db_path = Path(db_path or "data/shared_orders.db")
         self.db_path.parent.mkdir(exist_ok=True)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-orders-reader")
         self._init_db()
+        # Все записи идут через один поток-писатель; вызывающие ждут результат,
+        # поэтому пачку набирает сама очередь, без дополнительной паузы
+        self._writer = get_write_coordinator(self.db_path, flush_interval=0)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Постоянное соединение для чтения, свое у каждого потока"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                isolation_level=None,
+                check_same_thread=False,
+                cached_statements=STATEMENT_CACHE_SIZE
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={READ_BUSY_TIMEOUT_MS}")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    async def _read_async(self, method, *args):
+        """Выполнить синхронный метод чтения в потоке чтения"""
+        return await asyncio.get_running_loop().run_in_executor(self._reader, method, *args)
+
+    def close(self):
+        """Закрыть соединения чтения (записи фиксирует координатор при выходе)"""
+        self._reader.shutdown(wait=True)
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
 
     def _init_db(self):
         """Инициализация БД"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                         CREATE TABLE IF NOT EXISTS pending_orders
-                         (
-                             order_id
-                             INTEGER
-                             PRIMARY
-                             KEY,
-                             order_data
-                             TEXT
-                             NOT
-                             NULL,
-                             created_at
-                             TIMESTAMP
-                             DEFAULT
-                             CURRENT_TIMESTAMP
+        conn = self._connection()
+        conn.execute("""
+                     CREATE TABLE IF NOT EXISTS pending_orders
+                     (
+                         order_id
+                         INTEGER
+                         PRIMARY
+                         KEY,
+                         order_data
+                         TEXT
+                         NOT
+                         NULL,
+                         created_at
+                         TIMESTAMP
+                         DEFAULT
+                         CURRENT_TIMESTAMP
+                     )
+                     """)
+
+        conn.execute("""
+                     CREATE TABLE IF NOT EXISTS driver_responses
+                     (
+                         order_id
+                         INTEGER,
+                         driver_id
+                         INTEGER,
+                         response
+                         TEXT,
+                         created_at
+                         TIMESTAMP
+                         DEFAULT
+                         CURRENT_TIMESTAMP,
+                         PRIMARY
+                         KEY
+                     (
+                         order_id,
+                         driver_id
+                     )
                          )
-                         """)
-
-            conn.execute("""
-                         CREATE TABLE IF NOT EXISTS driver_responses
-                         (
-                             order_id
-                             INTEGER,
-                             driver_id
-                             INTEGER,
-                             response
-                             TEXT,
-                             created_at
-                             TIMESTAMP
-                             DEFAULT
-                             CURRENT_TIMESTAMP,
-                             PRIMARY
-                             KEY
-                         (
-                             order_id,
-                             driver_id
+                     """)
+
+        # НОВАЯ ТАБЛИЦА: Хранение ID сообщений для автоудаления
+        conn.execute("""
+                     CREATE TABLE IF NOT EXISTS driver_messages
+                     (
+                         driver_id
+                         INTEGER,
+                         message_id
+                         INTEGER,
+                         order_id
+                         INTEGER,
+                         created_at
+                         TIMESTAMP
+                         DEFAULT
+                         CURRENT_TIMESTAMP,
+                         PRIMARY
+                         KEY
+                     (
+                         driver_id,
+                         message_id
+                     )
                          )
-                             )
-                         """)
-
-            # НОВАЯ ТАБЛИЦА: Хранение ID сообщений для автоудаления
-            conn.execute("""
-                         CREATE TABLE IF NOT EXISTS driver_messages
-                         (
-                             driver_id
-                             INTEGER,
-                             message_id
-                             INTEGER,
-                             order_id
-                             INTEGER,
-                             created_at
-                             TIMESTAMP
-                             DEFAULT
-                             CURRENT_TIMESTAMP,
-                             PRIMARY
-                             KEY
-                         (
-                             driver_id,
-                             message_id
-                         )
-                             )
-                         """)
+                     """)
 
     def add_order(self, order_id: int, order_data: dict):
         """Добавить заказ"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
-                "INSERT OR REPLACE INTO pending_orders (order_id, order_data) VALUES (?, ?)",
-                (order_id, json.dumps(order_data, cls=DecimalEncoder, ensure_ascii=False))
-            )
-            print(f"💾 [STORAGE] Order {order_id} added to shared storage")
+        self._writer.execute(SQL_ADD_ORDER, self._order_row(order_id, order_data)).result()
+        print(f"💾 [STORAGE] Order {order_id} added to shared storage")
+
+    async def add_order_async(self, order_id: int, order_data: dict):
+        """add_order() для корутин"""
+        await self._writer.execute_async(SQL_ADD_ORDER, self._order_row(order_id, order_data))
+        print(f"💾 [STORAGE] Order {order_id} added to shared storage")
+
+    @staticmethod
+    def _order_row(order_id: int, order_data: dict) -> tuple:
+        return order_id, json.dumps(order_data, cls=DecimalEncoder, ensure_ascii=False)
 
     def get_order(self, order_id: int) -> dict:
         """Получить заказ"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute(
-                "SELECT order_data FROM pending_orders WHERE order_id = ?",
-                (order_id,)
-            )
-            row = cursor.fetchone()
-            if row:
-                return json.loads(row[0])
-            return {}
-
-    def remove_order(self, order_id: int):
-        """Удалить заказ"""
-        with sqlite3.connect(self.db_path) as conn:
+        row = self._connection().execute(SQL_GET_ORDER, (order_id,)).fetchone()
+        if row:
+            return json.loads(row[0])
+        return {}
+
+    async def get_order_async(self, order_id: int) -> dict:
+        """get_order() для корутин"""
+        return await self._read_async(self.get_order, order_id)
+
+    def has_order(self, order_id: int) -> bool:
+        """Есть ли заказ (поиск по первичному ключу)"""
+        return self._connection().execute(SQL_HAS_ORDER, (order_id,)).fetchone() is not None
+
+    async def has_order_async(self, order_id: int) -> bool:
+        """has_order() для корутин"""
+        return await self._read_async(self.has_order, order_id)
+
+    def get_orders_bulk(self, order_ids: Optional[Iterable[int]] = None) -> Dict[int, dict]:
+        """Данные заказов одним запросом: все или только order_ids"""
+        sql, params = self._filter_orders(SQL_ORDERS_BULK, "order_id", order_ids)
+        cursor = self._connection().execute(sql, params)
+        return {order_id: json.loads(order_data) for order_id, order_data in cursor.fetchall()}
+
+    async def get_orders_bulk_async(self, order_ids: Optional[Iterable[int]] = None) -> Dict[int, dict]:
+        """get_orders_bulk() для корутин"""
+        return await self._read_async(self.get_orders_bulk, order_ids)
+
+    @staticmethod
+    def _filter_orders(sql: str, column: str, order_ids: Optional[Iterable[int]]) -> tuple:
+        """Добавить к запросу условие column IN (...)"""
+        if order_ids is None:
+            return sql, ()
+        order_ids = tuple(order_ids)
+        placeholders = ", ".join("?" * len(order_ids))
+        return f"{sql} WHERE {column} IN ({placeholders})", order_ids
+
+    @staticmethod
+    def _remove_order(order_id: int):
+        def remove(conn):
             conn.execute("DELETE FROM pending_orders WHERE order_id = ?", (order_id,))
             conn.execute("DELETE FROM driver_responses WHERE order_id = ?", (order_id,))
             conn.execute("DELETE FROM driver_messages WHERE order_id = ?", (order_id,))
-            print(f"🗑️ [STORAGE] Order {order_id} removed from shared storage")
+        return remove
+
+    def remove_order(self, order_id: int):
+        """Удалить заказ"""
+        self._writer.submit(self._remove_order(order_id)).result()
+        print(f"🗑️ [STORAGE] Order {order_id} removed from shared storage")
+
+    async def remove_order_async(self, order_id: int):
+        """remove_order() для корутин"""
+        await self._writer.submit_async(self._remove_order(order_id))
+        print(f"🗑️ [STORAGE] Order {order_id} removed from shared storage")
 
     def get_all_orders(self) -> List[int]:
         """Получить все активные заказы"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute("SELECT order_id FROM pending_orders")
-            return [row[0] for row in cursor.fetchall()]
+        return [row[0] for row in self._connection().execute(SQL_ALL_ORDERS).fetchall()]
+
+    async def get_all_orders_async(self) -> List[int]:
+        """get_all_orders() для корутин"""
+        return await self._read_async(self.get_all_orders)
 
     def add_response(self, order_id: int, driver_id: int, response: str):
         """Добавить ответ водителя"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
-                "INSERT OR REPLACE INTO driver_responses (order_id, driver_id, response) VALUES (?, ?, ?)",
-                (order_id, driver_id, response)
-            )
-            print(f"📝 [STORAGE] Response from driver {driver_id} for order {order_id}: {response}")
+        self._writer.execute(SQL_ADD_RESPONSE, (order_id, driver_id, response)).result()
+        print(f"📝 [STORAGE] Response from driver {driver_id} for order {order_id}: {response}")
+
+    async def add_response_async(self, order_id: int, driver_id: int, response: str):
+        """add_response() для корутин"""
+        await self._writer.execute_async(SQL_ADD_RESPONSE, (order_id, driver_id, response))
+        print(f"📝 [STORAGE] Response from driver {driver_id} for order {order_id}: {response}")
 
     def get_responses(self, order_id: int) -> Dict[int, str]:
         """Получить все ответы для заказа"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute(
-                "SELECT driver_id, response FROM driver_responses WHERE order_id = ?",
-                (order_id,)
-            )
-            return {row[0]: row[1] for row in cursor.fetchall()}
+        cursor = self._connection().execute(SQL_GET_RESPONSES, (order_id,))
+        return {row[0]: row[1] for row in cursor.fetchall()}
+
+    async def get_responses_async(self, order_id: int) -> Dict[int, str]:
+        """get_responses() для корутин"""
+        return await self._read_async(self.get_responses, order_id)
+
+    def get_responses_bulk(self, order_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict[int, str]]:
+        """Ответы по всем активным заказам одним запросом (у заказа без ответов - {})"""
+        sql, params = self._filter_orders(SQL_RESPONSES_BULK, "p.order_id", order_ids)
+        responses: Dict[int, Dict[int, str]] = {}
+        for order_id, driver_id, response in self._connection().execute(sql, params).fetchall():
+            order_responses = responses.setdefault(order_id, {})
+            if driver_id is not None:
+                order_responses[driver_id] = response
+        return responses
+
+    async def get_responses_bulk_async(
+            self,
+            order_ids: Optional[Iterable[int]] = None
+    ) -> Dict[int, Dict[int, str]]:
+        """get_responses_bulk() для корутин"""
+        return await self._read_async(self.get_responses_bulk, order_ids)
 
     # НОВЫЕ МЕТОДЫ для управления сообщениями
     def add_message(self, driver_id: int, message_id: int, order_id: int):
         """Сохранить ID сообщения для автоудаления"""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
-                "INSERT OR REPLACE INTO driver_messages (driver_id, message_id, order_id) VALUES (?, ?, ?)",
-                (driver_id, message_id, order_id)
-            )
+        self._writer.execute(SQL_ADD_MESSAGE, (driver_id, message_id, order_id)).result()
+
+    async def add_message_async(self, driver_id: int, message_id: int, order_id: int):
+        """add_message() для корутин"""
+        await self._writer.execute_async(SQL_ADD_MESSAGE, (driver_id, message_id, order_id))
 
     def get_driver_messages(self, driver_id: int, order_id: int = None) -> List[int]:
         """Получить ID сообщений водителя"""
-        with sqlite3.connect(self.db_path) as conn:
-            if order_id:
-                cursor = conn.execute(
-                    "SELECT message_id FROM driver_messages WHERE driver_id = ? AND order_id = ?",
-                    (driver_id, order_id)
-                )
-            else:
-                cursor = conn.execute(
-                    "SELECT message_id FROM driver_messages WHERE driver_id = ?",
-                    (driver_id,)
-                )
-            return [row[0] for row in cursor.fetchall()]
+        if order_id:
+            cursor = self._connection().execute(SQL_DRIVER_ORDER_MESSAGES, (driver_id, order_id))
+        else:
+            cursor = self._connection().execute(SQL_DRIVER_MESSAGES, (driver_id,))
+        return [row[0] for row in cursor.fetchall()]
+
+    async def get_driver_messages_async(self, driver_id: int, order_id: int = None) -> List[int]:
+        """get_driver_messages() для корутин"""
+        return await self._read_async(self.get_driver_messages, driver_id, order_id)
+
+    async def claim_excess_messages_async(self, keep_last: int) -> Dict[int, List[int]]:
+        """Забрать из таблицы сообщения сверх последних keep_last у каждого водителя.
+
+        Запрос атомарный: из двух процессов каждое сообщение получает только один.
+        """
+        def claim(conn):
+            return conn.execute(SQL_CLAIM_EXCESS_MESSAGES, (keep_last,)).fetchall()
+
+        messages: Dict[int, List[int]] = {}
+        for driver_id, message_id in sorted(await self._writer.submit_async(claim)):
+            messages.setdefault(driver_id, []).append(message_id)
+        return messages
+
+    async def remove_messages_async(self, driver_id: int, message_ids: Iterable[int]):
+        """Удалить записи о конкретных сообщениях водителя"""
+        def remove(conn):
+            conn.executemany(SQL_REMOVE_MESSAGE, [(driver_id, message_id) for message_id in message_ids])
+        await self._writer.submit_async(remove)
 
     def remove_driver_messages(self, driver_id: int, order_id: int = None):
         """Удалить записи о сообщениях"""
-        with sqlite3.connect(self.db_path) as conn:
-            if order_id:
-                conn.execute(
-                    "DELETE FROM driver_messages WHERE driver_id = ? AND order_id = ?",
-                    (driver_id, order_id)
-                )
-            else:
-                conn.execute("DELETE FROM driver_messages WHERE driver_id = ?", (driver_id,))
+        if order_id:
+            future = self._writer.execute(SQL_REMOVE_ORDER_MESSAGES, (driver_id, order_id))
+        else:
+            future = self._writer.execute(SQL_REMOVE_MESSAGES, (driver_id,))
+        future.result()
+
+    async def remove_driver_messages_async(self, driver_id: int, order_id: int = None):
+        """remove_driver_messages() для корутин"""
+        if order_id:
+            await self._writer.execute_async(SQL_REMOVE_ORDER_MESSAGES, (driver_id, order_id))
+        else:
+            await self._writer.execute_async(SQL_REMOVE_MESSAGES, (driver_id,))
 
 
 class DriverNotificationService:
@@ -222,23 +415,120 @@ class DriverNotificationService:
 
     def __init__(self):
         self.storage = SharedOrderStorage()
-        self.notification_tasks: Dict[int, asyncio.Task] = {}  # Только таймеры локально
+        # Старые сообщения водителей удаляются в фоне пачками
+        self.sweeper = MessageSweeper(self.storage)
+        self.fanout = driver_fanout
+        self.events = event_bus
+        # Таймеры хранятся в БД и переживают перезапуск
+        self.scheduler = job_scheduler
+        self.scheduler.register(JOB_AUTO_CANCEL, self._auto_cancel_order)
+        self.scheduler.register(JOB_DELETE_MESSAGE, self._delete_message)
+        self.scheduler.register(JOB_DISPATCH_WAVE, self._offer_next_wave)
 
     @property
     def pending_orders(self) -> Dict[int, Dict]:
-        """Эмуляция старого интерфейса для совместимости"""
-        orders = {}
-        for order_id in self.storage.get_all_orders():
-            orders[order_id] = self.storage.get_order(order_id)
-        return orders
+        """Эмуляция старого интерфейса для совместимости (снимок, один запрос)"""
+        return self.storage.get_orders_bulk()
 
     @property
     def driver_responses(self) -> Dict[int, Dict[int, str]]:
-        """Эмуляция старого интерфейса для ответов водителей"""
-        responses = {}
-        for order_id in self.storage.get_all_orders():
-            responses[order_id] = self.storage.get_responses(order_id)
-        return responses
+        """Эмуляция старого интерфейса для ответов водителей (снимок, один запрос)"""
+        return self.storage.get_responses_bulk()
+
+    async def has_order(self, order_id: int) -> bool:
+        """Ожидает ли заказ ответа водителей"""
+        return await self.storage.has_order_async(order_id)
+
+    def attach_event_bus(self, bus: EventBus):
+        """Получать события заказов из другого процесса"""
+        self.events = bus
+        bus.subscribe(self._on_order_event, ORDER_EVENTS)
+
+    def _on_order_event(self, event: OrderEvent):
+        """Заказ закрыт в другом процессе - его таймер в памяти здесь больше не нужен"""
+        if event.type in (ORDER_ACCEPTED, ORDER_CANCELLED, ORDER_TIMED_OUT):
+            self.scheduler.discard(self._auto_cancel_key(event.order_id))
+            self.scheduler.discard(self._wave_key(event.order_id))
+
+    @staticmethod
+    def _auto_cancel_key(order_id: int) -> str:
+        return f"auto_cancel:{order_id}"
+
+    @staticmethod
+    def _wave_key(order_id: int) -> str:
+        return f"dispatch_wave:{order_id}"
+
+    @staticmethod
+    def _all_drivers() -> List[int]:
+        return [int(driver_id) for driver_id in getattr(Config, 'DRIVER_IDS', ['628521909', '6158974369'])]
+
+    @staticmethod
+    def _response_seconds(order_data: dict) -> int:
+        """Сколько секунд у водителя на ответ: до автоотмены заказа"""
+        dispatch = (order_data or {}).get('dispatch')
+        if not dispatch or 'deadline' not in dispatch:
+            return AUTO_CANCEL_SECONDS
+        return max(0, int(round(dispatch['deadline'] - time.time())))
+
+    def _can_offer_wave(self, order_data: dict, delay: float = 0) -> bool:
+        """Успеет ли волна, предложенная через delay секунд, ответить до автоотмены"""
+        dispatch = (order_data or {}).get('dispatch')
+        return bool(dispatch and dispatch['queue']) and \
+            self._response_seconds(order_data) - delay >= MIN_RESPONSE_SECONDS
+
+    def _offered_drivers(self, order_data: dict) -> List[int]:
+        """Водители, которым заказ уже предложен (без волн - все)"""
+        dispatch = (order_data or {}).get('dispatch')
+        return dispatch['offered'] if dispatch else self._all_drivers()
+
+    async def _stop_dispatch(self, order_id: int):
+        """Заказ закрыт - таймеры автоотмены и следующей волны больше не нужны"""
+        cancelled = await self.scheduler.cancel(self._auto_cancel_key(order_id))
+        await self.scheduler.cancel(self._wave_key(order_id))
+        return cancelled
+
+    async def _offer_wave(self, order_id: int, order_data: dict, drivers: List[int]) -> int:
+        """Разослать предложение одной волне, вернуть число доставленных"""
+        report = await self.fanout.fan_out(
+            drivers, lambda driver_id: self._send_clean_notification(driver_id, order_id, order_data)
+        )
+        for driver_id, error in report.failed.items():
+            print(f"❌ [SERVICE] Failed to notify driver {driver_id}: {error}")
+        if report.time_to_last is not None:
+            print(f"⏱️ [SERVICE] Order {order_id}: time to last driver {report.time_to_last:.2f}s "
+                  f"({report.success_count} delivered, {report.retries} retries)")
+        return report.success_count
+
+    async def _offer_next_wave(self, order_id: int) -> int:
+        """Предложить заказ следующей волне водителей (задача планировщика)"""
+        order_data = await self.storage.get_order_async(order_id)
+        dispatch = order_data.get('dispatch') if order_data else None
+        if not self._can_offer_wave(order_data):
+            return 0
+
+        # Пропускаем волны, в которых никому не удалось доставить
+        delivered = 0
+        while self._can_offer_wave(order_data) and not delivered:
+            wave = dispatch['queue'].pop(0)
+            dispatch['offered'].extend(wave)
+            await self.storage.add_order_async(order_id, order_data)
+            print(f"📡 [DISPATCH] Order {order_id}: offering to next {len(wave)} drivers")
+            delivered = await self._offer_wave(order_id, order_data, wave)
+
+        # Волны идут только пока до автоотмены остается время на ответ
+        if self._can_offer_wave(order_data, WAVE_TIMEOUT):
+            await self.scheduler.schedule(
+                JOB_DISPATCH_WAVE, WAVE_TIMEOUT, key=self._wave_key(order_id), order_id=order_id
+            )
+        return delivered
+
+    async def _delete_later(self, chat_id: int, message_id: int, delay_seconds: int):
+        """Удалить сообщение водителя через delay_seconds"""
+        await self.scheduler.schedule(
+            JOB_DELETE_MESSAGE, delay_seconds,
+            key=f"delete_message:{chat_id}:{message_id}",
+            chat_id=chat_id, message_id=message_id
+        )
 
     async def notify_all_drivers(self, order_id: int, order_data: dict):
         """Отправить уведомление всем водителям"""
@@ -246,35 +536,54 @@ class DriverNotificationService:
             print(f"🚀 [SERVICE] Starting notification for order {order_id}")
 
             # Сохраняем заказ в общее хранилище
-            self.storage.add_order(order_id, order_data)
+            await self.storage.add_order_async(order_id, order_data)
+            self.events.publish(
+                ORDER_CREATED, order_id, client_id=order_data.get('client_id') or order_data.get('user_id')
+            )
 
             # Проверяем что заказ сохранился
-            all_orders = self.storage.get_all_orders()
+            all_orders = await self.storage.get_all_orders_async()
             print(f"📊 [SERVICE] All orders in shared storage: {all_orders}")
 
-            # Отправляем уведомления всем водителям
-            drivers = getattr(Config, 'DRIVER_IDS', ['628521909', '6158974369'])
-            success_count = 0
-
-            for driver_id in drivers:
-                try:
-                    await self._send_clean_notification(int(driver_id), order_id, order_data)
-                    success_count += 1
-                    print(f"✅ [SERVICE] Notified driver {driver_id}")
-                    await asyncio.sleep(0.2)
-                except Exception as e:
-                    print(f"❌ [SERVICE] Failed to notify driver {driver_id}: {e}")
+            # Только свободные водители (реестр в памяти); сначала ближайшие, дальше - волнами
+            drivers = driver_availability.available_drivers(self._all_drivers())
+            plan = await plan_dispatch(drivers, order_data)
+            first_wave = plan.waves[0] if plan.waves else []
+            # Все волны отвечают до одного срока автоотмены: поздней волне - меньше времени
+            deadline = time.time() + AUTO_CANCEL_SECONDS
+            if len(plan.waves) > 1:
+                order_data['dispatch'] = {
+                    'offered': list(first_wave), 'queue': plan.waves[1:], 'deadline': deadline
+                }
+                await self.storage.add_order_async(order_id, order_data)
+                nearest = plan.distances.get(first_wave[0]) if first_wave else None
+                print(f"📡 [DISPATCH] Order {order_id}: {len(plan.waves)} waves of up to {len(first_wave)} drivers"
+                      + (f", nearest {nearest:.1f} km" if nearest is not None else ""))
+
+            # Параллельно, в пределах лимитов Telegram (30/с на бота, 1/с на чат)
+            success_count = await self._offer_wave(order_id, order_data, first_wave)
+
+            if len(plan.waves) > 1:
+                if success_count > 0 and self._can_offer_wave(order_data, WAVE_TIMEOUT):
+                    await self.scheduler.schedule(
+                        JOB_DISPATCH_WAVE, WAVE_TIMEOUT, key=self._wave_key(order_id), order_id=order_id
+                    )
+                elif success_count == 0:
+                    # Первая волна недоступна - сразу следующие
+                    success_count = await self._offer_next_wave(order_id)
 
             if success_count > 0:
                 # Запускаем таймер автоотмены
-                self.notification_tasks[order_id] = asyncio.create_task(
-                    self._auto_cancel_order(order_id)
+                await self.scheduler.schedule(
+                    JOB_AUTO_CANCEL, max(0.0, deadline - time.time()),
+                    key=self._auto_cancel_key(order_id), order_id=order_id
                 )
-                print(f"⏰ [SERVICE] Started timer for order {order_id}")
+                print(f"⏰ [SERVICE] Started {AUTO_CANCEL_SECONDS} second timer for order {order_id}")
                 print(f"🎯 [SERVICE] Successfully notified {success_count}/{len(drivers)} drivers")
             else:
                 await self._notify_client_no_drivers(order_data)
-                self.storage.remove_order(order_id)
+                await self.storage.remove_order_async(order_id)
+                self.events.publish(ORDER_CANCELLED, order_id, reason="no_drivers")
                 print(f"⚠️ [SERVICE] No drivers notified, order cleaned up")
 
         except Exception as e:
@@ -285,9 +594,6 @@ class DriverNotificationService:
     async def _send_clean_notification(self, driver_id: int, order_id: int, order_data: dict):
         """НОВЫЙ МЕТОД: Отправить чистое уведомление без спама"""
         try:
-            # Очищаем старые сообщения перед отправкой нового
-            await self._cleanup_old_messages(driver_id)
-
             # Создаем кнопки
             builder = InlineKeyboardBuilder()
             builder.button(text="✅ Przyjmij", callback_data=f"accept_{order_id}")
@@ -302,7 +608,7 @@ class DriverNotificationService:
                     f"📍 <b>Adres:</b> {order_data.get('address', 'N/A')}\n"
                     f"📏 <b>Dystans:</b> ~{order_data.get('distance', 5):.1f} km\n"
                     f"💵 <b>Zarobek:</b> {order_data.get('price', 20)} zł\n\n"
-                    f"⏰ <b>Czas na odpowiedź:</b> 2 minuty"
+                    f"⏰ <b>Czas na odpowiedź:</b> {response_time_text(self._response_seconds(order_data))}"
                 )
             else:
                 text = (
@@ -312,7 +618,7 @@ class DriverNotificationService:
                     f"📏 <b>Dystans:</b> {order_data.get('distance_km', 0):.1f} km\n"
                     f"💵 <b>Cena:</b> {order_data.get('estimated_price', 0)} zł\n"
                     f"👥 <b>Pasażerów:</b> {order_data.get('passengers_count', 1)}\n\n"
-                    f"⏰ <b>Czas na odpowiedź:</b> 2 minuty"
+                    f"⏰ <b>Czas na odpowiedź:</b> {response_time_text(self._response_seconds(order_data))}"
                 )
 
             # Отправляем ОДНО сообщение с уведомлением
@@ -324,42 +630,15 @@ class DriverNotificationService:
                 disable_notification=False  # Звук только для новых заказов
             )
 
-            # Сохраняем ID сообщения для автоудаления
-            self.storage.add_message(driver_id, message.message_id, order_id)
+            # Сохраняем ID сообщения; старше последних KEEP_LAST удалит sweeper
+            await self.storage.add_message_async(driver_id, message.message_id, order_id)
+            self.sweeper.track(driver_id, message.message_id)
             print(f"📱 [CLEAN] Sent clean notification to driver {driver_id}")
 
         except Exception as e:
             print(f"❌ [CLEAN] Error sending clean notification to driver {driver_id}: {e}")
             raise
 
-    async def _cleanup_old_messages(self, driver_id: int):
-        """Удаляет старые сообщения водителю"""
-        try:
-            message_ids = self.storage.get_driver_messages(driver_id)
-
-            # Удаляем старые сообщения (оставляем только последние 2)
-            if len(message_ids) > 2:
-                to_delete = message_ids[:-2]  # Все кроме последних 2
-
-                for message_id in to_delete:
-                    try:
-                        await Bots.driver.delete_message(chat_id=driver_id, message_id=message_id)
-                        print(f"🗑️ [CLEAN] Deleted old message {message_id} for driver {driver_id}")
-                    except TelegramBadRequest:
-                        pass  # Сообщение уже удалено или недоступно
-                    except Exception as e:
-                        print(f"⚠️ [CLEAN] Could not delete message {message_id}: {e}")
-
-                # Очищаем записи об удаленных сообщениях
-                self.storage.remove_driver_messages(driver_id)
-
-                # Оставляем записи о последних 2 сообщениях
-                for message_id in message_ids[-2:]:
-                    self.storage.add_message(driver_id, message_id, 0)  # order_id = 0 для старых
-
-        except Exception as e:
-            print(f"❌ [CLEAN] Error cleaning up messages for driver {driver_id}: {e}")
-
     async def _send_driver_notification(self, driver_id: int, order_id: int, order_data: dict):
         """СТАРЫЙ МЕТОД: Оставлен для совместимости"""
         await self._send_clean_notification(driver_id, order_id, order_data)
@@ -370,23 +649,19 @@ class DriverNotificationService:
             print(f"🎬 [SERVICE] Processing {response} from driver {driver_id} for order {order_id}")
 
             # Проверяем заказ в общем хранилище
-            all_orders = self.storage.get_all_orders()
-            print(f"📊 [SERVICE] Orders in shared storage: {all_orders}")
-
-            if order_id not in all_orders:
-                print(f"⚠️ [SERVICE] Order {order_id} NOT in shared storage")
-                return False
-
-            order_data = self.storage.get_order(order_id)
+            order_data = await self.storage.get_order_async(order_id)
             if not order_data:
-                print(f"❌ [SERVICE] No order data for {order_id}")
+                print(f"⚠️ [SERVICE] Order {order_id} NOT in shared storage")
                 return False
 
             # Записываем ответ в общее хранилище
-            self.storage.add_response(order_id, driver_id, response)
+            await self.storage.add_response_async(order_id, driver_id, response)
+            self.events.publish(
+                ORDER_ACCEPTED if response == "accept" else ORDER_REJECTED, order_id, driver_id=driver_id
+            )
 
             # Получаем все ответы
-            responses = self.storage.get_responses(order_id)
+            responses = await self.storage.get_responses_async(order_id)
             print(f"📝 [SERVICE] All responses for order {order_id}: {responses}")
 
             if response == "accept":
@@ -410,16 +685,12 @@ class DriverNotificationService:
         try:
             print(f"🎉 [SERVICE] Processing ORDER ACCEPTANCE: {order_id} by driver {accepting_driver_id}")
 
-            # Отменяем таймер
-            if order_id in self.notification_tasks:
-                self.notification_tasks[order_id].cancel()
-                del self.notification_tasks[order_id]
+            # Отменяем таймеры автоотмены и следующей волны
+            if await self._stop_dispatch(order_id):
                 print(f"⏰ [SERVICE] Cancelled auto-cancel timer for order {order_id}")
 
-            # НОВОЕ: Отправляем чистые уведомления другим водителям
-            drivers = getattr(Config, 'DRIVER_IDS', ['628521909', '6158974369'])
-            for driver_str in drivers:
-                driver_id = int(driver_str)
+            # НОВОЕ: Отправляем чистые уведомления другим водителям (тем, кому предлагали)
+            for driver_id in self._offered_drivers(order_data):
                 if driver_id != accepting_driver_id:
                     try:
                         # Отправляем уведомление о том, что заказ принят
@@ -431,14 +702,14 @@ class DriverNotificationService:
                         )
 
                         # Автоудаление через 3 секунды
-                        asyncio.create_task(self._delete_message_after_delay(driver_id, message.message_id, 3))
+                        await self._delete_later(driver_id, message.message_id, 3)
 
                         print(f"📢 [SERVICE] Notified driver {driver_id} that order {order_id} was taken")
                     except Exception as e:
                         print(f"❌ [SERVICE] Failed to notify driver {driver_id}: {e}")
 
             # Удаляем из общего хранилища
-            self.storage.remove_order(order_id)
+            await self.storage.remove_order_async(order_id)
             print(f"✅ [SERVICE] Order {order_id} processed and cleaned up successfully")
 
         except Exception as e:
@@ -449,8 +720,8 @@ class DriverNotificationService:
         try:
             print(f"👎 [SERVICE] Processing REJECTION from driver {rejecting_driver_id} for order {order_id}")
 
-            drivers = getattr(Config, 'DRIVER_IDS', ['628521909', '6158974369'])
-            all_drivers = [int(d) for d in drivers]
+            order_data = await self.storage.get_order_async(order_id)
+            all_drivers = self._offered_drivers(order_data)
 
             rejected_drivers = [d_id for d_id, resp in responses.items() if resp == "reject"]
             rejected_count = len(rejected_drivers)
@@ -461,9 +732,14 @@ class DriverNotificationService:
             print(f"   - Rejected drivers: {rejected_drivers}")
             print(f"   - All responses: {responses}")
 
-            if rejected_count >= total_drivers:
+            if rejected_count >= total_drivers and self._can_offer_wave(order_data):
+                # Вся волна отказалась - следующая волна сразу, не дожидаясь таймера
+                print(f"📡 [DISPATCH] Wave rejected for order {order_id}, offering to next drivers")
+                await self.scheduler.schedule(
+                    JOB_DISPATCH_WAVE, 0, key=self._wave_key(order_id), order_id=order_id
+                )
+            elif rejected_count >= total_drivers:
                 print(f"🚫 [SERVICE] ALL {total_drivers} DRIVERS REJECTED ORDER {order_id}")
-                order_data = self.storage.get_order(order_id)
                 await self._cancel_order_all_rejected(order_id, order_data)
             else:
                 remaining = total_drivers - rejected_count
@@ -477,15 +753,14 @@ class DriverNotificationService:
         try:
             print(f"🚫 [SERVICE] CANCELLING ORDER {order_id} - all drivers rejected")
 
-            # Отменяем таймер если есть
-            if order_id in self.notification_tasks:
-                self.notification_tasks[order_id].cancel()
-                del self.notification_tasks[order_id]
+            # Отменяем таймеры если есть
+            await self._stop_dispatch(order_id)
 
             # Уведомляем клиента
             client_id = order_data.get('client_id') or order_data.get('user_id')
             if client_id:
-                await Bots.client.send_message(
+                await enqueue_message(
+                    "client",
                     chat_id=client_id,
                     text=(
                         "😞 <b>Przepraszamy</b>\n\n"
@@ -497,28 +772,26 @@ class DriverNotificationService:
                 )
                 print(f"📱 [SERVICE] Notified client {client_id} about order {order_id} rejection")
 
-            self.storage.remove_order(order_id)
+            await self.storage.remove_order_async(order_id)
+            self.events.publish(ORDER_CANCELLED, order_id, reason="all_rejected")
             print(f"✅ [SERVICE] Order {order_id} cancelled and cleaned up successfully")
 
         except Exception as e:
             print(f"💥 [SERVICE] Error cancelling order: {e}")
 
     async def _auto_cancel_order(self, order_id: int):
-        """Автоматическая отмена по таймауту"""
+        """Автоматическая отмена по таймауту (задача планировщика)"""
         try:
-            print(f"⏰ [SERVICE] Starting 120 second timer for order {order_id}")
-            await asyncio.sleep(120)
-
             # Проверяем что заказ еще существует
-            all_orders = self.storage.get_all_orders()
-            if order_id in all_orders:
+            if await self.storage.has_order_async(order_id):
                 print(f"⏰ [SERVICE] AUTO-CANCELLING order {order_id} due to timeout")
 
-                order_data = self.storage.get_order(order_id)
+                order_data = await self.storage.get_order_async(order_id)
                 client_id = order_data.get('client_id') or order_data.get('user_id')
 
                 if client_id:
-                    await Bots.client.send_message(
+                    await enqueue_message(
+                        "client",
                         chat_id=client_id,
                         text=(
                             "⏰ <b>Upłynął czas oczekiwania</b>\n\n"
@@ -529,9 +802,11 @@ class DriverNotificationService:
                         disable_notification=False
                     )
 
-                # НОВОЕ: Отправляем чистые уведомления о тайм-ауте
-                drivers = getattr(Config, 'DRIVER_IDS', ['628521909', '6158974369'])
-                for driver_str in drivers:
+                # Следующая волна уже не нужна
+                await self.scheduler.cancel(self._wave_key(order_id))
+
+                # НОВОЕ: Отправляем чистые уведомления о тайм-ауте (тем, кому предлагали)
+                for driver_str in self._offered_drivers(order_data):
                     try:
                         message = await Bots.driver.send_message(
                             chat_id=int(driver_str),
@@ -541,38 +816,31 @@ class DriverNotificationService:
                         )
 
                         # Автоудаление через 5 секунд
-                        asyncio.create_task(self._delete_message_after_delay(int(driver_str), message.message_id, 5))
+                        await self._delete_later(int(driver_str), message.message_id, 5)
 
                     except Exception as e:
                         print(f"❌ [SERVICE] Failed to notify driver {driver_str} about timeout: {e}")
 
-                self.storage.remove_order(order_id)
+                await self.storage.remove_order_async(order_id)
+                self.events.publish(ORDER_TIMED_OUT, order_id)
                 print(f"⏰ [SERVICE] Order {order_id} auto-cancelled successfully")
             else:
                 print(f"⏰ [SERVICE] Order {order_id} already processed before timeout")
 
-        except asyncio.CancelledError:
-            print(f"⏰ [SERVICE] Timer for order {order_id} was cancelled (order was accepted)")
         except Exception as e:
             print(f"💥 [SERVICE] Error in auto-cancel: {e}")
 
-    async def _delete_message_after_delay(self, chat_id: int, message_id: int, delay_seconds: int):
-        """НОВЫЙ МЕТОД: Удаляет сообщение через заданное время"""
-        try:
-            await asyncio.sleep(delay_seconds)
-            await Bots.driver.delete_message(chat_id=chat_id, message_id=message_id)
-            print(f"🗑️ [CLEAN] Auto-deleted message {message_id} after {delay_seconds}s")
-        except TelegramBadRequest:
-            pass  # Сообщение уже удалено
-        except Exception as e:
-            print(f"⚠️ [CLEAN] Could not delete message {message_id}: {e}")
+    async def _delete_message(self, chat_id: int, message_id: int):
+        """Удалить временное сообщение (задача планировщика): пачкой через sweeper"""
+        self.sweeper.delete(chat_id, (message_id,))
 
     async def _notify_client_no_drivers(self, order_data: dict):
         """Уведомить клиента об отсутствии водителей"""
         try:
             client_id = order_data.get('client_id') or order_data.get('user_id')
             if client_id:
-                await Bots.client.send_message(
+                await enqueue_message(
+                    "client",
                     chat_id=client_id,
                     text=(
                         "😞 <b>Brak dostępnych kierowców</b>\n\n"
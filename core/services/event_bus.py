@@ -0,0 +1,501 @@
+"""
+Шина событий заказов между процессами ботов
+
+Клиентский и водительский боты работают в разных процессах. Раньше они
+узнавали об изменениях друг друга, только перечитывая data/shared_orders.db.
+Шина рассылает события (заказ создан, принят, отклонен, отменен, истек;
+смена статуса поездки) подписчикам во всех процессах за миллисекунды.
+
+Бэкенды:
+- UnixSocketBackend (по умолчанию) - брокером становится процесс, который
+  первым захватил lock-файл; остальные подключаются к его Unix-сокету. Если
+  брокер завершился, его место занимает один из клиентов.
+- RedisBackend - Redis Stream на любом Redis-совместимом сервере (пакет
+  redis опционален, нужен только для EVENT_BUS_BACKEND=redis).
+
+Оба бэкенда хранят ограниченный журнал: после переподключения процесс
+получает пропущенные события. Шина не заменяет БД - это подсказка, что
+данные изменились; источником истины остаются таблицы.
+"""
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Типы событий
+ORDER_CREATED = "order_created"
+ORDER_ACCEPTED = "order_accepted"
+ORDER_REJECTED = "order_rejected"
+ORDER_CANCELLED = "order_cancelled"
+ORDER_TIMED_OUT = "order_timed_out"
+RIDE_STATUS = "ride_status"
+DRIVER_LOCATION = "driver_location"
+CHAT_PAUSED = "chat_paused"
+
+ORDER_EVENTS = (ORDER_CREATED, ORDER_ACCEPTED, ORDER_REJECTED, ORDER_CANCELLED, ORDER_TIMED_OUT)
+
+# Параметры
+REPLAY_SIZE = 1000          # Событий в журнале
+RECONNECT_DELAY = 0.2       # Пауза перед повторным подключением, секунд
+REDIS_BLOCK_MS = 1000       # Ожидание новых событий в XREAD
+PEER_BUFFER_LIMIT = 1 << 20  # Неотправленных байт процессу, после которых брокер его отключает
+
+
+@dataclass
+class OrderEvent:
+    """Событие шины"""
+    type: str
+    order_id: int
+    data: Dict[str, Any] = field(default_factory=dict)
+    origin: str = ""            # Процесс-источник
+    seq: int = 0                # Номер в журнале брокера
+    created_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'OrderEvent':
+        return cls(**data)
+
+    @property
+    def latency_ms(self) -> float:
+        """Сколько прошло с публикации"""
+        return (time.time() - self.created_at) * 1000
+
+
+Deliver = Callable[[OrderEvent], None]
+
+
+class EventBusBackend:
+    """Транспорт между процессами"""
+
+    name = "none"
+
+    async def start(self, deliver: Deliver) -> None:
+        """Начать прием событий других процессов"""
+
+    async def publish(self, event: OrderEvent) -> None:
+        """Отправить событие другим процессам"""
+
+    async def stop(self) -> None:
+        """Остановить транспорт"""
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'backend': self.name}
+
+
+def _encode(message: Dict[str, Any]) -> bytes:
+    return (json.dumps(message, ensure_ascii=False, default=str) + "\n").encode()
+
+
+class UnixSocketBackend(EventBusBackend):
+    """Брокер в одном из процессов, остальные - клиенты Unix-сокета"""
+
+    name = "unix"
+
+    def __init__(self, socket_path, replay_size: int = REPLAY_SIZE, peer_buffer_limit: int = PEER_BUFFER_LIMIT):
+        self.socket_path = Path(socket_path)
+        self.lock_path = self.socket_path.with_name(self.socket_path.name + ".lock")
+        self.replay_size = replay_size
+        self.peer_buffer_limit = peer_buffer_limit
+        self._deliver: Optional[Deliver] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        # Роль брокера
+        self._lock_fd: Optional[int] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._peers: Set[asyncio.StreamWriter] = set()
+        self._peer_tasks: Set[asyncio.Task] = set()
+        self._log: deque = deque(maxlen=replay_size)
+        self._seq = 0
+        self._epoch = ""
+
+        # Роль клиента
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._pending: deque = deque(maxlen=replay_size)
+        self._last_epoch = ""
+        self._last_seq = 0
+
+        self.stats = {'reconnects': 0, 'replayed': 0, 'peers': 0, 'slow_peers': 0}
+
+    @property
+    def role(self) -> str:
+        if self._server is not None:
+            return "broker"
+        if self._writer is not None:
+            return "client"
+        return "disconnected"
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+        self._stopping = False
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        self._task = asyncio.create_task(self._maintain())
+        # Дождаться роли, чтобы первые публикации не ушли в буфер
+        for _ in range(50):
+            if self.role != "disconnected":
+                break
+            await asyncio.sleep(0.01)
+
+    async def publish(self, event: OrderEvent) -> None:
+        if self._server is not None:
+            self._append(event)
+            return
+        if self._writer is not None:
+            try:
+                self._writer.write(_encode({'op': 'publish', 'event': event.to_dict()}))
+                await self._writer.drain()
+                return
+            except (ConnectionError, OSError) as e:
+                logger.warning(f"Event bus publish failed, buffering: {e}")
+        # Нет связи с брокером - отправим после переподключения
+        self._pending.append(event)
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._close_client()
+        await self._close_broker()
+
+    # ------------------------------------------------------------------
+    # Подключение / выбор брокера
+    # ------------------------------------------------------------------
+
+    async def _maintain(self) -> None:
+        while not self._stopping:
+            try:
+                if await self._try_client():
+                    continue
+                if self._try_lock():
+                    await self._serve()
+                    return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Event bus connection error: {e}")
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _try_client(self) -> bool:
+        """Подключиться к брокеру и читать события до разрыва; False - брокера нет"""
+        try:
+            reader, writer = await asyncio.open_unix_connection(str(self.socket_path))
+        except (FileNotFoundError, ConnectionRefusedError):
+            return False
+
+        self._writer = writer
+        writer.write(_encode({'op': 'hello', 'epoch': self._last_epoch, 'last_seq': self._last_seq}))
+        while self._pending:
+            writer.write(_encode({'op': 'publish', 'event': self._pending.popleft().to_dict()}))
+        await writer.drain()
+        logger.info(f"Event bus connected to broker {self.socket_path}")
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if message.get('op') != 'event':
+                    continue
+                event = OrderEvent.from_dict(message['event'])
+                if message.get('replay'):
+                    self.stats['replayed'] += 1
+                self._last_epoch = message['epoch']
+                self._last_seq = event.seq
+                self._deliver(event)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            await self._close_client()
+        if not self._stopping:
+            self.stats['reconnects'] += 1
+            logger.warning("Event bus lost broker connection, reconnecting")
+        return True
+
+    async def _close_client(self) -> None:
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    def _try_lock(self) -> bool:
+        """Захватить роль брокера (lock держится до завершения процесса)"""
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    # ------------------------------------------------------------------
+    # Брокер
+    # ------------------------------------------------------------------
+
+    async def _serve(self) -> None:
+        # Сокет мог остаться от упавшего брокера
+        self.socket_path.unlink(missing_ok=True)
+        self._epoch = uuid.uuid4().hex
+        self._seq = 0
+        self._log.clear()
+        self._server = await asyncio.start_unix_server(self._handle_peer, path=str(self.socket_path))
+        logger.info(f"Event bus broker listening on {self.socket_path}")
+
+        # События, опубликованные без связи, становятся первыми в журнале
+        while self._pending:
+            self._append(self._pending.popleft())
+        await self._server.serve_forever()
+
+    async def _handle_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._peer_tasks.add(task)
+        try:
+            hello = json.loads(await reader.readline() or b'{}')
+            if hello.get('op') != 'hello':
+                return
+
+            # Повтор пропущенного: по номеру, если брокер тот же, иначе весь журнал
+            last_seq = hello.get('last_seq', 0) if hello.get('epoch') == self._epoch else 0
+            for event in list(self._log):
+                if event.seq > last_seq:
+                    writer.write(self._event_line(event, replay=True))
+            await writer.drain()
+            self._peers.add(writer)
+            self.stats['peers'] = len(self._peers)
+
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if message.get('op') == 'publish':
+                    self._append(OrderEvent.from_dict(message['event']))
+        except (ConnectionError, OSError, json.JSONDecodeError) as e:
+            logger.debug(f"Event bus peer disconnected: {e}")
+        finally:
+            self._peers.discard(writer)
+            self.stats['peers'] = len(self._peers)
+            self._peer_tasks.discard(task)
+            writer.close()
+
+    def _event_line(self, event: OrderEvent, replay: bool = False) -> bytes:
+        return _encode({'op': 'event', 'epoch': self._epoch, 'replay': replay, 'event': event.to_dict()})
+
+    def _append(self, event: OrderEvent) -> None:
+        """Записать событие в журнал и разослать всем процессам"""
+        self._seq += 1
+        event.seq = self._seq
+        self._log.append(event)
+        line = self._event_line(event)
+        for writer in list(self._peers):
+            if writer.is_closing():
+                self._peers.discard(writer)
+                continue
+            # drain() здесь не ждем: процесс, который не читает, копил бы
+            # события в памяти брокера. Отключаем его - после переподключения
+            # он догонит пропущенное из журнала
+            if writer.transport.get_write_buffer_size() > self.peer_buffer_limit:
+                logger.warning("Event bus peer is not reading, disconnecting")
+                self._peers.discard(writer)
+                self.stats['peers'] = len(self._peers)
+                self.stats['slow_peers'] += 1
+                writer.transport.abort()
+                continue
+            writer.write(line)
+        self._deliver(event)
+
+    async def _close_broker(self) -> None:
+        server, self._server = self._server, None
+        if server is not None:
+            server.close()
+            for writer in list(self._peers):
+                writer.close()
+            for task in list(self._peer_tasks):
+                task.cancel()
+            await asyncio.gather(*self._peer_tasks, return_exceptions=True)
+            self._peers.clear()
+            self.socket_path.unlink(missing_ok=True)
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            self.stats,
+            backend=self.name,
+            role=self.role,
+            log_size=len(self._log),
+            buffered=len(self._pending)
+        )
+
+
+class RedisBackend(EventBusBackend):
+    """Redis Stream: XADD с ограничением длины, XREAD с последнего ID"""
+
+    name = "redis"
+
+    def __init__(self, url: str, stream: str = "taxi:order_events", replay_size: int = REPLAY_SIZE):
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError("EVENT_BUS_BACKEND=redis requires the 'redis' package") from e
+        self._redis = redis_asyncio.from_url(url)
+        self.stream = stream
+        self.replay_size = replay_size
+        self._deliver: Optional[Deliver] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_id = "$"
+        self.stats = {'reconnects': 0}
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+        # Начинаем с текущего конца потока; после разрыва читаем с последнего ID
+        entries = await self._redis.xrevrange(self.stream, count=1)
+        self._last_id = entries[0][0] if entries else "0-0"
+        self._task = asyncio.create_task(self._consume())
+
+    async def publish(self, event: OrderEvent) -> None:
+        await self._redis.xadd(
+            self.stream,
+            {'event': json.dumps(event.to_dict(), ensure_ascii=False, default=str)},
+            maxlen=self.replay_size,
+            approximate=True
+        )
+
+    async def _consume(self) -> None:
+        while True:
+            try:
+                response = await self._redis.xread({self.stream: self._last_id}, block=REDIS_BLOCK_MS)
+                for _, entries in response or []:
+                    for entry_id, fields in entries:
+                        self._last_id = entry_id
+                        raw = fields.get(b'event') or fields.get('event')
+                        self._deliver(OrderEvent.from_dict(json.loads(raw)))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats['reconnects'] += 1
+                logger.warning(f"Event bus redis error, retrying: {e}")
+                await asyncio.sleep(RECONNECT_DELAY)
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._redis.aclose()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, backend=self.name, last_id=str(self._last_id))
+
+
+def create_backend(bus_config=None) -> EventBusBackend:
+    """Бэкенд по настройкам EventBusConfig"""
+    if bus_config is None:
+        from core.config import config
+        bus_config = config.event_bus if config else None
+    if bus_config is None or bus_config.backend == "none":
+        return EventBusBackend()
+    if bus_config.backend == "redis":
+        return RedisBackend(bus_config.redis_url, bus_config.redis_stream, bus_config.replay_size)
+    return UnixSocketBackend(bus_config.socket_path, bus_config.replay_size)
+
+
+class EventBus:
+    """Публикация и подписка на события заказов"""
+
+    def __init__(self, backend: Optional[EventBusBackend] = None):
+        self.backend = backend
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._subscribers: List[Tuple[Callable[[OrderEvent], Any], Optional[frozenset]]] = []
+        self._pending: Set[asyncio.Task] = set()
+        self._started = False
+        self.stats = {'published': 0, 'received': 0, 'max_latency_ms': 0.0}
+
+    def subscribe(self, callback: Callable[[OrderEvent], Any], types: Optional[Iterable[str]] = None) -> None:
+        """Подписаться на события (callback может быть корутинной функцией)"""
+        self._subscribers.append((callback, frozenset(types) if types is not None else None))
+
+    async def start(self) -> None:
+        """Подключиться к другим процессам"""
+        if self._started:
+            return
+        if self.backend is None:
+            self.backend = create_backend()
+        await self.backend.start(self._receive)
+        self._started = True
+        logger.info(f"Event bus started: {self.backend.get_stats()}")
+
+    async def stop(self) -> None:
+        if not self._started:
+            return
+        self._started = False
+        await asyncio.gather(*self._pending, return_exceptions=True)
+        await self.backend.stop()
+
+    def publish(self, event_type: str, order_id: int, **data) -> OrderEvent:
+        """Опубликовать событие: локальные подписчики сразу, другие процессы - в фоне"""
+        event = OrderEvent(type=event_type, order_id=order_id, data=data, origin=self.origin)
+        self.stats['published'] += 1
+        self._dispatch(event)
+        if self._started:
+            task = asyncio.get_running_loop().create_task(self._send(event))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+        return event
+
+    async def _send(self, event: OrderEvent) -> None:
+        try:
+            await self.backend.publish(event)
+        except Exception as e:
+            logger.error(f"Event bus failed to publish {event.type} for order {event.order_id}: {e}")
+
+    def _receive(self, event: OrderEvent) -> None:
+        """Событие из транспорта: свои уже доставлены при публикации"""
+        if event.origin == self.origin:
+            return
+        self.stats['received'] += 1
+        self.stats['max_latency_ms'] = max(self.stats['max_latency_ms'], event.latency_ms)
+        self._dispatch(event)
+
+    def _dispatch(self, event: OrderEvent) -> None:
+        for callback, types in self._subscribers:
+            if types is not None and event.type not in types:
+                continue
+            try:
+                result = callback(event)
+                if asyncio.iscoroutine(result):
+                    task = asyncio.ensure_future(result)
+                    self._pending.add(task)
+                    task.add_done_callback(self._pending.discard)
+            except Exception as e:
+                logger.error(f"Event bus subscriber failed on {event.type}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика шины"""
+        stats = dict(self.stats, started=self._started, subscribers=len(self._subscribers))
+        if self.backend is not None:
+            stats['transport'] = self.backend.get_stats()
+        return stats
+
+
+# Глобальный экземпляр
+event_bus = EventBus()
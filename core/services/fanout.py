@@ -0,0 +1,287 @@
+"""
+Рассылка с учетом лимитов Telegram
+
+Telegram допускает около 30 сообщений в секунду на бота и 1 сообщение в
+секунду в один чат. Лимиты соблюдаются через token bucket: общий на бота и
+отдельный на каждый чат. Отправки идут параллельно (не больше max_concurrency
+одновременно), а RetryAfter ставит на паузу только тот чат, для которого он
+пришел.
+
+Ограничитель общий для бота: рассылка заказов и очередь outbox
+(core/services/outbox.py) берут токены из одного ChatRateLimiter, причем
+срочные отправки (заказы) проходят раньше фоновых статусных сообщений.
+
+Через один токен бота отправляют оба процесса (run.py и driver_bot.py), поэтому
+каждый берет только свою долю GLOBAL_RATE, а паузы после RetryAfter
+рассылаются через шину событий: лимит Telegram один на токен, а не на процесс.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Any
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from core.services.event_bus import CHAT_PAUSED, EventBus, OrderEvent
+
+logger = logging.getLogger(__name__)
+
+# Лимиты Telegram
+GLOBAL_RATE = 30.0          # Сообщений в секунду на бота
+SENDING_PROCESSES = 2       # Процессов, отправляющих через один токен (run.py и driver_bot.py)
+PER_CHAT_RATE = 1.0         # Сообщений в секунду в один чат
+MAX_CONCURRENCY = 10        # Одновременных запросов к Bot API
+MAX_RETRIES = 3             # Повторов после RetryAfter
+IDLE_BUCKET_TTL = 300.0     # Через сколько секунд простоя корзина чата удаляется
+
+
+class TokenBucket:
+    """Token bucket с резервированием: ожидающие обслуживаются по очереди"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Занять токен; вернуть, сколько секунд ждать до его использования"""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.paused_until - now)
+
+    async def acquire(self) -> float:
+        """Дождаться токена, вернуть время ожидания"""
+        started = time.monotonic()
+        delay = self.reserve()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            # Пауза могла появиться (RetryAfter), пока мы ждали
+            delay = self.paused_until - time.monotonic()
+        return time.monotonic() - started
+
+    def delay(self) -> float:
+        """Через сколько секунд появится свободный токен (без резервирования)"""
+        now = time.monotonic()
+        tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        wait = (1 - tokens) / self.rate if tokens < 1 else 0.0
+        return max(wait, self.paused_until - now)
+
+    def pause(self, seconds: float) -> None:
+        """Не выдавать токены ближайшие seconds секунд"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    @property
+    def idle(self) -> float:
+        """Секунд с последнего обращения"""
+        return time.monotonic() - self.updated
+
+
+class ChatRateLimiter:
+    """Общий лимит бота + лимит на каждый чат"""
+
+    def __init__(self, global_rate: float = GLOBAL_RATE, per_chat_rate: float = PER_CHAT_RATE,
+                 name: Optional[str] = None):
+        self.name = name
+        self.per_chat_rate = per_chat_rate
+        # Без накопления: иначе за первую секунду ушло бы burst + rate сообщений
+        self.global_bucket = TokenBucket(global_rate, capacity=1.0)
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        # Пока срочные отправки ждут токен, фоновые не занимают общий лимит
+        self._urgent_waiting = 0
+        self._urgent_idle = asyncio.Event()
+        self._urgent_idle.set()
+        self._event_bus: Optional[EventBus] = None
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) > 1000:
+                self._prune()
+            bucket = TokenBucket(self.per_chat_rate, capacity=1.0)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _prune(self) -> None:
+        for chat_id in [chat_id for chat_id, bucket in self._chat_buckets.items()
+                        if bucket.idle > IDLE_BUCKET_TTL and bucket.paused_until < time.monotonic()]:
+            del self._chat_buckets[chat_id]
+
+    async def acquire(self, chat_id: int, urgent: bool = True) -> float:
+        """Дождаться права отправить сообщение в чат, вернуть время ожидания.
+
+        Сначала лимит чата, потом общий: общий токен не тратится, пока
+        конкретный чат еще на паузе. Фоновые (urgent=False) отправки
+        пропускают вперед все срочные, которые уже ждут.
+        """
+        waited = await self._chat_bucket(chat_id).acquire()
+        if not urgent:
+            return waited + await self.acquire_background()
+
+        self._urgent_waiting += 1
+        self._urgent_idle.clear()
+        try:
+            return waited + await self.global_bucket.acquire()
+        finally:
+            self._urgent_waiting -= 1
+            if not self._urgent_waiting:
+                self._urgent_idle.set()
+
+    async def acquire_background(self) -> float:
+        """Только общий лимит бота, после всех ждущих срочных отправок.
+
+        Для запросов, которые не пишут в чат (удаление сообщений): лимит
+        чата 1/с они не расходуют и предложения заказов не задерживают.
+        """
+        started = time.monotonic()
+        while self._urgent_waiting:
+            await self._urgent_idle.wait()
+        return (time.monotonic() - started) + await self.global_bucket.acquire()
+
+    def chat_delay(self, chat_id: int) -> float:
+        """Сколько секунд чат еще не сможет получить сообщение (лимит или пауза)"""
+        bucket = self._chat_buckets.get(chat_id)
+        return bucket.delay() if bucket is not None else 0.0
+
+    def pause_chat(self, chat_id: int, seconds: float, publish: bool = True) -> None:
+        """RetryAfter для одного чата - остальные продолжают получать сообщения"""
+        self._chat_bucket(chat_id).pause(seconds)
+        if publish and self._event_bus is not None and self.name is not None:
+            # Пауза по настенным часам: monotonic у процессов разный
+            self._event_bus.publish(CHAT_PAUSED, 0, bot=self.name, chat_id=chat_id,
+                                    until=time.time() + seconds)
+
+    def attach_event_bus(self, bus: EventBus) -> None:
+        """Публиковать свои паузы и принимать паузы другого процесса"""
+        if self._event_bus is not None:
+            return
+        self._event_bus = bus
+        bus.subscribe(self.apply_event, (CHAT_PAUSED,))
+
+    def apply_event(self, event: OrderEvent) -> None:
+        """Пауза чата, полученная другим процессом с тем же ботом"""
+        if event.origin == self._event_bus.origin:
+            return
+        data = event.data
+        if data.get('bot') != self.name:
+            return
+        seconds = data['until'] - time.time()
+        if seconds > 0:
+            self.pause_chat(data['chat_id'], seconds, publish=False)
+
+
+@dataclass
+class FanOutReport:
+    """Итог рассылки одного заказа"""
+    total: int
+    delivered: List[int] = field(default_factory=list)
+    failed: Dict[int, str] = field(default_factory=dict)
+    retries: int = 0
+    time_to_first: Optional[float] = None
+    time_to_last: Optional[float] = None
+    duration: float = 0.0
+
+    @property
+    def success_count(self) -> int:
+        return len(self.delivered)
+
+
+class FanOutDispatcher:
+    """Параллельная рассылка одного события многим чатам"""
+
+    def __init__(
+            self,
+            limiter: Optional[ChatRateLimiter] = None,
+            max_concurrency: int = MAX_CONCURRENCY,
+            max_retries: int = MAX_RETRIES
+    ):
+        self.limiter = limiter or ChatRateLimiter()
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.recent_reports: deque = deque(maxlen=100)
+
+    async def send(self, chat_id: int, send: Callable[[int], Awaitable[Any]], report: FanOutReport) -> Any:
+        """Отправить в один чат с соблюдением лимитов и повтором после RetryAfter"""
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire(chat_id)
+            async with self._semaphore:
+                try:
+                    return await send(chat_id)
+                except TelegramRetryAfter as e:
+                    if attempt >= self.max_retries:
+                        raise
+                    report.retries += 1
+                    self.limiter.pause_chat(chat_id, e.retry_after)
+                    logger.warning(f"RetryAfter {e.retry_after}s for chat {chat_id}, pausing only this chat")
+
+    async def fan_out(self, chat_ids: Iterable[int], send: Callable[[int], Awaitable[Any]]) -> FanOutReport:
+        """Разослать всем chat_ids; send(chat_id) выполняет саму отправку"""
+        chat_ids = list(dict.fromkeys(chat_ids))
+        report = FanOutReport(total=len(chat_ids))
+        started = time.monotonic()
+
+        async def deliver(chat_id: int) -> None:
+            try:
+                await self.send(chat_id, send, report)
+            except Exception as e:
+                report.failed[chat_id] = str(e)
+                return
+            elapsed = time.monotonic() - started
+            report.delivered.append(chat_id)
+            if report.time_to_first is None:
+                report.time_to_first = elapsed
+            report.time_to_last = elapsed
+
+        await asyncio.gather(*(deliver(chat_id) for chat_id in chat_ids))
+        report.duration = time.monotonic() - started
+        self.recent_reports.append(report)
+        return report
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика последних рассылок"""
+        times = [report.time_to_last for report in self.recent_reports if report.time_to_last is not None]
+        return {
+            'fanouts': len(self.recent_reports),
+            'delivered': sum(report.success_count for report in self.recent_reports),
+            'failed': sum(len(report.failed) for report in self.recent_reports),
+            'retries': sum(report.retries for report in self.recent_reports),
+            'avg_time_to_last': round(sum(times) / len(times), 3) if times else 0.0,
+            'max_time_to_last': round(max(times), 3) if times else 0.0,
+        }
+
+
+# Ограничители по ботам: лимиты Telegram считаются на токен бота
+_limiters: Dict[str, ChatRateLimiter] = {}
+_event_bus: Optional[EventBus] = None
+
+
+def get_rate_limiter(bot: str) -> ChatRateLimiter:
+    """Общий ограничитель для бота ("client" / "driver") с долей процесса в лимите"""
+    limiter = _limiters.get(bot)
+    if limiter is None:
+        limiter = _limiters[bot] = ChatRateLimiter(GLOBAL_RATE / SENDING_PROCESSES, name=bot)
+        if _event_bus is not None:
+            limiter.attach_event_bus(_event_bus)
+    return limiter
+
+
+def attach_event_bus(bus: EventBus) -> None:
+    """Делить паузы RetryAfter всех ограничителей с другим процессом"""
+    global _event_bus
+    _event_bus = bus
+    for limiter in _limiters.values():
+        limiter.attach_event_bus(bus)
+
+
+# Глобальный экземпляр (лимиты водительского бота)
+driver_fanout = FanOutDispatcher(get_rate_limiter("driver"))
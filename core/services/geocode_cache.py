@@ -0,0 +1,194 @@
+"""
+Двухуровневый кэш геокодера: LRU в памяти + таблица geocode_cache
+
+Клиенты раз за разом вводят одни и те же адреса (вокзал, торговые центры,
+аэропорт), и каждый такой ввод - платный запрос к Geocoding API на ~200 мс.
+Ответы кэшируются по нормализованному адресу: регистр, пробелы и знаки
+препинания, диакритика (ł, ą, ó ...), префиксы «ul.»/«ulica» и название
+города не влияют на ключ.
+
+Обратное геокодирование (геолокация из Telegram -> адрес) кэшируется по
+точке, привязанной к сетке с шагом config.maps.reverse_grid_m метров
+(REVERSE_GEOCODE_GRID_M, по умолчанию 25): GPS-точки в
+нескольких метрах от недавно виденной получают ее адрес без запроса к API.
+
+Чтение: память -> geocode_cache -> API. Записи живут TTL секунд; в памяти
+держится не больше MEMORY_SIZE последних использованных, в таблице - не
+больше PERSISTENT_SIZE (лишние и устаревшие удаляются раз в PURGE_EVERY
+записей). При старте память прогревается последними использованными
+записями из таблицы. Ошибки БД кэша не мешают геокодированию - это просто
+промах.
+"""
+import logging
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from core.config import config
+from core.repositories.geocode_cache import GeocodeCacheRepository, geocode_cache_repository
+from core.utils.geo import snap_to_grid
+
+logger = logging.getLogger(__name__)
+
+# Параметры кэша
+MEMORY_SIZE = 1000              # Записей в памяти
+PERSISTENT_SIZE = 50000         # Записей в geocode_cache
+TTL = 30 * 24 * 3600            # Срок жизни ответа геокодера, секунд
+PURGE_EVERY = 500               # Очистка таблицы после стольких записей
+REVERSE_GRID_M = 25.0           # Шаг сетки обратного геокодирования по умолчанию, метров
+
+# Слова, не влияющие на результат геокодирования
+_STOP_WORDS = {'ul', 'ulica', 'szczecin', 'poland', 'polska'}
+# Буквы, которые не раскладываются NFKD на базовую + диакритику
+_TRANSLITERATION = str.maketrans({'ł': 'l', 'đ': 'd', 'ø': 'o', 'ß': 'ss'})
+
+# (широта, долгота, адрес)
+Geocoded = Tuple[float, float, str]
+
+
+def normalize_address(address: str) -> str:
+    """Ключ кэша: «ul. Wały  Chrobrego 1, Szczecin» -> «waly chrobrego 1»"""
+    text = unicodedata.normalize('NFKD', address.lower().translate(_TRANSLITERATION))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    words = re.sub(r'[^\w]+', ' ', text).split()
+    return ' '.join(word for word in words if word not in _STOP_WORDS)
+
+
+class GeocodeCache:
+    """Кэш ответов геокодера по нормализованному адресу и по ячейке сетки"""
+
+    def __init__(
+            self,
+            repository: Optional[GeocodeCacheRepository] = None,
+            memory_size: int = MEMORY_SIZE,
+            persistent_size: int = PERSISTENT_SIZE,
+            ttl: float = TTL,
+            grid_m: float = REVERSE_GRID_M
+    ):
+        self.repository = repository or geocode_cache_repository
+        self.memory_size = memory_size
+        self.persistent_size = persistent_size
+        self.ttl = ttl
+        self.grid_m = grid_m
+        # Ключ -> (ответ, момент истечения); порядок - от давно использованных к недавним
+        self._memory: "OrderedDict[str, Tuple[Geocoded, float]]" = OrderedDict()
+        self._puts_since_purge = 0
+        self.stats = {'memory_hits': 0, 'persistent_hits': 0, 'misses': 0, 'stores': 0, 'evicted': 0}
+
+    @staticmethod
+    def key(address: str) -> str:
+        return f"addr:{normalize_address(address)}"
+
+    def reverse_key(self, latitude: float, longitude: float) -> str:
+        """Ячейка сетки grid_m x grid_m, в которую попадает точка"""
+        row, col = snap_to_grid(latitude, longitude, self.grid_m)
+        return f"rev:{self.grid_m:g}:{row}:{col}"
+
+    def _remember(self, key: str, value: Geocoded, expires_at: float) -> None:
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+            self.stats['evicted'] += 1
+
+    async def get(self, address: str) -> Optional[Geocoded]:
+        """Ответ из кэша или None"""
+        return await self._lookup(self.key(address))
+
+    async def get_reverse(self, latitude: float, longitude: float) -> Optional[str]:
+        """Адрес для точки рядом с уже виденной или None"""
+        cached = await self._lookup(self.reverse_key(latitude, longitude))
+        return cached[2] if cached is not None else None
+
+    async def put(self, address: str, latitude: float, longitude: float, formatted_address: str) -> None:
+        """Сохранить ответ API в оба уровня"""
+        await self._store(self.key(address), (latitude, longitude, formatted_address))
+
+    async def put_reverse(self, latitude: float, longitude: float, formatted_address: str) -> None:
+        """Сохранить адрес точки для всей ячейки сетки"""
+        await self._store(self.reverse_key(latitude, longitude), (latitude, longitude, formatted_address))
+
+    async def _lookup(self, key: str) -> Optional[Geocoded]:
+        now = time.time()
+        cached = self._memory.get(key)
+        if cached is not None:
+            value, expires_at = cached
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return value
+            del self._memory[key]
+
+        try:
+            entry = await self.repository.get(key, datetime.now() - timedelta(seconds=self.ttl))
+        except Exception as e:
+            logger.warning(f"Geocode cache read failed: {e}")
+            entry = None
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+
+        value = (entry.latitude, entry.longitude, entry.address)
+        self._remember(key, value, entry.created_at.timestamp() + self.ttl)
+        self.stats['persistent_hits'] += 1
+        return value
+
+    async def _store(self, key: str, value: Geocoded) -> None:
+        self._remember(key, value, time.time() + self.ttl)
+        self.stats['stores'] += 1
+        try:
+            await self.repository.put(key, *value)
+            self._puts_since_purge += 1
+            if self._puts_since_purge >= PURGE_EVERY:
+                await self.purge()
+        except Exception as e:
+            logger.warning(f"Geocode cache write failed: {e}")
+
+    async def purge(self) -> int:
+        """Удалить из таблицы устаревшие записи и лишние сверх PERSISTENT_SIZE"""
+        self._puts_since_purge = 0
+        removed = await self.repository.purge(datetime.now() - timedelta(seconds=self.ttl), self.persistent_size)
+        if removed:
+            logger.info(f"Geocode cache purged: {removed}")
+        return removed
+
+    async def warm_up(self) -> int:
+        """Заполнить память последними использованными записями из таблицы"""
+        try:
+            await self.purge()
+            entries = await self.repository.recent(
+                datetime.now() - timedelta(seconds=self.ttl), self.memory_size
+            )
+        except Exception as e:
+            logger.warning(f"Geocode cache warm-up failed: {e}")
+            return 0
+        # От давно использованных к недавним - недавние окажутся в конце LRU
+        for entry in reversed(entries):
+            self._remember(
+                entry.key,
+                (entry.latitude, entry.longitude, entry.address),
+                entry.created_at.timestamp() + self.ttl
+            )
+        logger.info(f"Geocode cache warmed up: {len(entries)} entries")
+        return len(entries)
+
+    def clear_memory(self) -> None:
+        self._memory.clear()
+
+    def get_stats(self) -> Dict[str, float]:
+        """Статистика кэша"""
+        hits = self.stats['memory_hits'] + self.stats['persistent_hits']
+        lookups = hits + self.stats['misses']
+        return dict(
+            self.stats,
+            hits=hits,
+            size=len(self._memory),
+            hit_rate=round(hits / lookups, 3) if lookups else 0.0
+        )
+
+
+# Глобальный экземпляр
+geocode_cache = GeocodeCache(grid_m=config.maps.reverse_grid_m)
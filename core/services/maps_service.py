@@ -1,5 +1,14 @@
 """
 Сервис для работы с картами и геолокацией
+
+Все запросы к Maps API идут через одну долгоживущую aiohttp-сессию на
+экземпляр MapsService: соединения переиспользуются (keep-alive), DNS
+кэшируется, поэтому адрес или геолокация клиента не стоят нового
+TCP+TLS рукопожатия. Сессия создается при первом запросе и закрывается
+через close() при остановке бота.
+
+Ответы геокодера по адресу и по точке кэшируются (core/services/geocode_cache.py),
+маршруты - по ячейкам точек и времени суток (core/services/route_cache.py).
 """
 import logging
 from dataclasses import dataclass
@@ -7,13 +16,20 @@ from typing import List, Optional
 import math
 
 import aiohttp
-from geopy.distance import geodesic
-
 from core.config import config
 from core.exceptions import ValidationError, ExternalServiceError, NotFoundError, ServiceError
+from core.services.geocode_cache import GeocodeCache, geocode_cache
+from core.services.route_cache import RouteCache, route_cache
+from core.utils.geo import haversine_km
 
 logger = logging.getLogger(__name__)
 
+# Параметры пула соединений
+MAX_CONNECTIONS = 20            # Одновременных соединений всего
+MAX_CONNECTIONS_PER_HOST = 10   # Одновременных соединений к одному хосту
+KEEPALIVE_TIMEOUT = 60          # Простаивающее соединение держится, секунд
+DNS_CACHE_TTL = 300             # Кэш DNS, секунд
+
 
 @dataclass
 class Location:
@@ -31,10 +47,7 @@ class Location:
 
     def distance_to(self, other: 'Location') -> float:
         """Расстояние до другой точки в километрах"""
-        return geodesic(
-            (self.latitude, self.longitude),
-            (other.latitude, other.longitude)
-        ).kilometers
+        return haversine_km(self.latitude, self.longitude, other.latitude, other.longitude)
 
     def __str__(self) -> str:
         return f"Location({self.latitude}, {self.longitude})"
@@ -56,10 +69,32 @@ class RouteInfo:
 class MapsService:
     """Сервис для работы с картами и геолокацией"""
 
-    def __init__(self):
-        self.api_key = config.maps.api_key
-        self.base_url = "https://maps.googleapis.com/maps/api"
+    def __init__(self, api_key: Optional[str] = None, base_url: str = "https://maps.googleapis.com/maps/api",
+                 cache: Optional[GeocodeCache] = None, routes: Optional[RouteCache] = None):
+        self.api_key = api_key or config.maps.api_key
+        self.base_url = base_url
+        self.cache = cache
+        self.routes = routes
         self.timeout = aiohttp.ClientTimeout(total=10)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Общая сессия с пулом соединений (создается при первом запросе)"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=MAX_CONNECTIONS,
+                limit_per_host=MAX_CONNECTIONS_PER_HOST,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=DNS_CACHE_TTL
+            )
+            self._session = aiohttp.ClientSession(timeout=self.timeout, connector=connector)
+        return self._session
+
+    async def close(self) -> None:
+        """Закрыть сессию и соединения пула"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
 
     async def geocode_address(self, address: str) -> Location:
         """Получить координаты по адресу"""
@@ -68,6 +103,11 @@ class MapsService:
             if self.api_key == 'test_key':
                 return self._create_test_location(address)
 
+            if self.cache is not None:
+                cached = await self.cache.get(address)
+                if cached is not None:
+                    return Location(latitude=cached[0], longitude=cached[1], address=cached[2])
+
             url = f"{self.base_url}/geocode/json"
             params = {
                 'address': f"{address}, Szczecin, Poland",  # Добавляем город
@@ -76,25 +116,28 @@ class MapsService:
                 'language': 'pl'
             }
 
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                async with session.get(url, params=params) as response:
-                    if response.status != 200:
-                        raise ExternalServiceError(f"Geocoding API error: {response.status}")
+            session = self._get_session()
+            async with session.get(url, params=params) as response:
+                if response.status != 200:
+                    raise ExternalServiceError(f"Geocoding API error: {response.status}")
+
+                data = await response.json()
 
-                    data = await response.json()
+                if data['status'] != 'OK' or not data.get('results'):
+                    return self._create_test_location(address)
 
-                    if data['status'] != 'OK' or not data.get('results'):
-                        return self._create_test_location(address)
+                result = data['results'][0]
+                location = result['geometry']['location']
+                formatted_address = result['formatted_address']
 
-                    result = data['results'][0]
-                    location = result['geometry']['location']
-                    formatted_address = result['formatted_address']
+                if self.cache is not None:
+                    await self.cache.put(address, location['lat'], location['lng'], formatted_address)
 
-                    return Location(
-                        latitude=location['lat'],
-                        longitude=location['lng'],
-                        address=formatted_address
-                    )
+                return Location(
+                    latitude=location['lat'],
+                    longitude=location['lng'],
+                    address=formatted_address
+                )
 
         except aiohttp.ClientError as e:
             logger.error(f"Network error during geocoding: {e}")
@@ -130,6 +173,11 @@ class MapsService:
             if self.api_key == 'test_key':
                 return f"Szczecin, coordinates: {latitude:.4f}, {longitude:.4f}"
 
+            if self.cache is not None:
+                cached = await self.cache.get_reverse(latitude, longitude)
+                if cached is not None:
+                    return cached
+
             url = f"{self.base_url}/geocode/json"
             params = {
                 'latlng': f"{latitude},{longitude}",
@@ -137,18 +185,21 @@ class MapsService:
                 'language': 'pl'
             }
 
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                async with session.get(url, params=params) as response:
-                    if response.status != 200:
-                        logger.warning(f"Reverse geocoding API error: {response.status}")
-                        return f"Szczecin, Lat: {latitude:.4f}, Lng: {longitude:.4f}"
+            session = self._get_session()
+            async with session.get(url, params=params) as response:
+                if response.status != 200:
+                    logger.warning(f"Reverse geocoding API error: {response.status}")
+                    return f"Szczecin, Lat: {latitude:.4f}, Lng: {longitude:.4f}"
 
-                    data = await response.json()
+                data = await response.json()
 
-                    if data['status'] != 'OK' or not data.get('results'):
-                        return f"Szczecin, Lat: {latitude:.4f}, Lng: {longitude:.4f}"
+                if data['status'] != 'OK' or not data.get('results'):
+                    return f"Szczecin, Lat: {latitude:.4f}, Lng: {longitude:.4f}"
 
-                    return data['results'][0]['formatted_address']
+                formatted_address = data['results'][0]['formatted_address']
+                if self.cache is not None:
+                    await self.cache.put_reverse(latitude, longitude, formatted_address)
+                return formatted_address
 
         except Exception as e:
             logger.error(f"Error during reverse geocoding: {e}")
@@ -161,6 +212,13 @@ class MapsService:
             if self.api_key == 'test_key':
                 return self._calculate_simple_route(origin, destination)
 
+            points = (origin.latitude, origin.longitude), (destination.latitude, destination.longitude)
+            if self.routes is not None:
+                cached = self.routes.get(*points)
+                if cached is not None:
+                    # Шаги маршрута не кэшируются
+                    return RouteInfo(distance_km=cached[0], duration_minutes=cached[1], polyline=cached[2])
+
             url = f"{self.base_url}/directions/json"
             params = {
                 'origin': f"{origin.latitude},{origin.longitude}",
@@ -171,32 +229,35 @@ class MapsService:
                 'units': 'metric'
             }
 
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                async with session.get(url, params=params) as response:
-                    if response.status != 200:
-                        logger.warning(f"Directions API error: {response.status}")
-                        return self._calculate_simple_route(origin, destination)
+            session = self._get_session()
+            async with session.get(url, params=params) as response:
+                if response.status != 200:
+                    logger.warning(f"Directions API error: {response.status}")
+                    return self._calculate_simple_route(origin, destination)
+
+                data = await response.json()
 
-                    data = await response.json()
+                if data['status'] != 'OK' or not data.get('routes'):
+                    return self._calculate_simple_route(origin, destination)
 
-                    if data['status'] != 'OK' or not data.get('routes'):
-                        return self._calculate_simple_route(origin, destination)
+                route = data['routes'][0]
+                leg = route['legs'][0]
 
-                    route = data['routes'][0]
-                    leg = route['legs'][0]
+                distance_km = leg['distance']['value'] / 1000
+                duration_minutes = leg['duration']['value'] / 60
 
-                    distance_km = leg['distance']['value'] / 1000
-                    duration_minutes = leg['duration']['value'] / 60
+                steps = [step['html_instructions'] for step in leg['steps']]
+                polyline = route.get('overview_polyline', {}).get('points')
 
-                    steps = [step['html_instructions'] for step in leg['steps']]
-                    polyline = route.get('overview_polyline', {}).get('points')
+                if self.routes is not None:
+                    self.routes.put(*points, distance_km, int(duration_minutes), polyline)
 
-                    return RouteInfo(
-                        distance_km=distance_km,
-                        duration_minutes=int(duration_minutes),
-                        polyline=polyline,
-                        steps=steps
-                    )
+                return RouteInfo(
+                    distance_km=distance_km,
+                    duration_minutes=int(duration_minutes),
+                    polyline=polyline,
+                    steps=steps
+                )
 
         except Exception as e:
             logger.error(f"Error getting route: {e}")
@@ -217,4 +278,8 @@ class MapsService:
             distance_km=round(distance, 1),
             duration_minutes=duration,
             steps=[f"Ехать от {origin.address} до {destination.address}"]
-        )
\ No newline at end of file
+        )
+
+
+# Глобальный экземпляр
+maps_service = MapsService(cache=geocode_cache, routes=route_cache)
@@ -0,0 +1,158 @@
+"""
+Фоновая очистка старых сообщений в чатах водителей
+
+Раньше перед каждым предложением заказа _cleanup_old_messages читал ID
+сообщений водителя, удалял их по одному запросу к API, стирал все записи и
+заново вставлял последние две - задержка предложения росла с числом старых
+сообщений.
+
+Теперь отправка только записывает ID в общую таблицу driver_messages. Фоновый
+цикл одним атомарным запросом забирает из нее все, кроме последних KEEP_LAST
+сообщений каждого водителя, и удаляет их пачками через Bot.delete_messages
+(до 100 ID за запрос), в рамках общего лимита бота и с уступкой срочным
+отправкам. Таблица общая для обоих процессов, поэтому лимит KEEP_LAST
+действует на водителя, а не на процесс, и каждое сообщение удаляет один
+процесс.
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+from core.services.fanout import get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# Параметры очистки
+KEEP_LAST = 2               # Сообщений, которые остаются в чате водителя
+DELETE_BATCH = 100          # Предел deleteMessages в Bot API
+MAX_PENDING = 1000          # Очередь на удаление на водителя (старше 48 ч Telegram не удаляет)
+SWEEP_INTERVAL = 5.0        # Проход очереди, если никто не разбудил, секунд
+RETRY_DELAY = 10.0          # Пауза после сетевой ошибки, секунд
+
+
+class MessageSweeper:
+    """Пакетное удаление сообщений водителей сверх последних KEEP_LAST"""
+
+    def __init__(self, storage, bot: Any = None, keep_last: int = KEEP_LAST,
+                 sweep_interval: float = SWEEP_INTERVAL):
+        self.storage = storage
+        self._bot = bot
+        self.keep_last = keep_last
+        self.sweep_interval = sweep_interval
+        self._pending: Dict[int, Deque[int]] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {'tracked': 0, 'deleted': 0, 'api_calls': 0, 'dropped': 0, 'errors': 0}
+
+    @property
+    def bot(self) -> Any:
+        if self._bot is None:
+            from core.bot_instance import Bots
+            self._bot = Bots.driver
+        return self._bot
+
+    def track(self, driver_id: int, message_id: int) -> None:
+        """Новое сообщение уже в driver_messages: разбудить цикл, чтобы вытеснить старые"""
+        self.stats['tracked'] += 1
+        self._wake.set()
+
+    def delete(self, chat_id: int, message_ids: Iterable[int]) -> None:
+        """Поставить сообщения в очередь на удаление"""
+        self._enqueue(chat_id, message_ids)
+
+    def _enqueue(self, chat_id: int, message_ids: Iterable[int]) -> None:
+        pending = self._pending.setdefault(chat_id, deque(maxlen=MAX_PENDING))
+        pending.extend(message_ids)
+        self._wake.set()
+
+    async def start(self) -> None:
+        """Запустить цикл (накопленное до перезапуска заберет первый проход)"""
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info("Message sweeper started")
+
+    async def stop(self) -> None:
+        """Остановить цикл (уже забранное из driver_messages, но не удаленное, останется в чате)"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sweep()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.sweep_interval)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Message sweeper loop error: {e}")
+                await asyncio.sleep(RETRY_DELAY)
+
+    async def sweep(self) -> int:
+        """Забрать лишние сообщения из driver_messages и удалить всю очередь, вернуть число удаленных"""
+        self._wake.clear()
+        for driver_id, message_ids in (await self.storage.claim_excess_messages_async(self.keep_last)).items():
+            self._pending.setdefault(driver_id, deque(maxlen=MAX_PENDING)).extend(message_ids)
+        deleted = 0
+        for chat_id in list(self._pending):
+            pending = self._pending.pop(chat_id)
+            message_ids = list(dict.fromkeys(pending))
+            for start in range(0, len(message_ids), DELETE_BATCH):
+                batch = message_ids[start:start + DELETE_BATCH]
+                if not await self._delete_batch(chat_id, batch):
+                    # Повторим на следующем проходе вместе с тем, что не успели
+                    self._enqueue(chat_id, message_ids[start:])
+                    self._wake.clear()
+                    break
+                deleted += len(batch)
+        return deleted
+
+    async def _delete_batch(self, chat_id: int, message_ids: List[int]) -> bool:
+        """Одна пачка; False - повторить позже"""
+        limiter = get_rate_limiter("driver")
+        await limiter.acquire_background()
+
+        try:
+            delete_messages = getattr(self.bot, 'delete_messages', None)
+            if delete_messages is not None:
+                await delete_messages(chat_id=chat_id, message_ids=message_ids)
+                self.stats['api_calls'] += 1
+            else:
+                for message_id in message_ids:
+                    try:
+                        await self.bot.delete_message(chat_id=chat_id, message_id=message_id)
+                    except TelegramBadRequest:
+                        pass  # Сообщение уже удалено
+                    self.stats['api_calls'] += 1
+            self.stats['deleted'] += len(message_ids)
+            print(f"🗑️ [CLEAN] Deleted {len(message_ids)} old messages for driver {chat_id}")
+
+        except TelegramRetryAfter as e:
+            limiter.pause_chat(chat_id, e.retry_after)
+            return False
+
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            # Бот заблокирован или сообщения слишком старые - повтор не поможет
+            self.stats['dropped'] += len(message_ids)
+            logger.warning(f"Could not delete {len(message_ids)} messages for {chat_id}: {e}")
+
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.warning(f"Message sweep for {chat_id} failed, will retry: {e}")
+            return False
+
+        await self.storage.remove_messages_async(chat_id, message_ids)
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика очистки"""
+        return dict(self.stats, pending=sum(map(len, self._pending.values())))
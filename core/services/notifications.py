@@ -27,10 +27,12 @@ async def notify_driver_about_ride(ride_id: int, ride_data: dict):
 async def notify_client_order_update(user_id: int, message: str):
     """Уведомление клиента об обновлении заказа с МАКСИМАЛЬНЫМ звуком"""
     try:
-        from core.bot_instance import Bots
+        from core.models import OutboxPriority
+        from core.services.outbox import enqueue_message
 
         # МАКСИМАЛЬНЫЕ НАСТРОЙКИ ДЛЯ ЗВУКА
-        await Bots.client.send_message(
+        await enqueue_message(
+            "client",
             chat_id=user_id,
             text=message,
             parse_mode="HTML",
@@ -42,10 +44,12 @@ async def notify_client_order_update(user_id: int, message: str):
 
         # Дополнительно отправляем эмодзи для привлечения внимания
         try:
-            await Bots.client.send_message(
+            await enqueue_message(
+                "client",
                 chat_id=user_id,
                 text="🔔",  # Колокольчик
-                disable_notification=False
+                disable_notification=False,
+                priority=OutboxPriority.STATUS
             )
         except:
             pass  # Игнорируем ошибки
@@ -0,0 +1,343 @@
+"""
+Transactional outbox: доставка сообщений Telegram после commit
+
+Обработчик записывает изменение данных и сообщения (OutboxMessage) в одной
+транзакции и сразу освобождает соединение. Фоновый диспетчер забирает
+сообщения из outbox_messages и отправляет их, поэтому блокировка записи
+SQLite не удерживается на время сетевых запросов к Telegram.
+
+Очередь постоянная: неотправленное переживает перезапуск бота. Для каждого
+бота работает свой пул воркеров, причем каждый процесс разбирает только
+сообщения своего бота (run.py - client, driver_bot.py - driver); сообщения идут по классам приоритета
+(OutboxPriority), ошибки повторяются с экспоненциальной паузой, а то, что
+доставить нельзя, уходит в dead-letter (OutboxStatus.DEAD).
+"""
+import asyncio
+import json
+import logging
+import random
+from datetime import datetime
+from typing import Optional, Dict, Any, Iterable, List, Set
+
+from aiogram import types as aiogram_types
+from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest
+
+from core.models import OutboxMessage, OutboxPriority
+from core.repositories.outbox import OutboxRepository, outbox_repository
+from core.services.fanout import get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# Параметры диспетчера
+POLL_INTERVAL = 1.0         # Опрос таблицы, если никто не разбудил, секунд
+BATCH_SIZE = 20             # Сообщений за один захват
+WORKERS_PER_BOT = 4         # Параллельных отправок на бота
+LEASE_SECONDS = 60          # Через сколько захваченное упавшим процессом сообщение снова доступно
+RETRY_BASE_DELAY = 2        # Первая пауза перед повтором, секунд (дальше x2)
+MAX_RETRY_DELAY = 300       # Потолок паузы, секунд
+MAX_ATTEMPTS = 8            # После стольких ошибок сообщение уходит в dead-letter
+MAX_THROTTLED_ATTEMPTS = 30  # То же для RetryAfter (троттлинг - не ошибка сообщения)
+MAX_CHAT_WAIT = 1.0         # Дольше воркер чат не ждет - сообщение возвращается в таблицу
+STOP_TIMEOUT = 10.0         # Сколько при остановке ждать отправки уже захваченного, секунд
+
+
+def _dump_markup(markup) -> Optional[Dict[str, Any]]:
+    """Клавиатура aiogram -> JSON-совместимый словарь"""
+    if markup is None:
+        return None
+    return {'type': type(markup).__name__, 'data': markup.model_dump(exclude_none=True)}
+
+
+def _load_markup(data: Optional[Dict[str, Any]]):
+    """Обратное преобразование клавиатуры"""
+    if not data:
+        return None
+    markup_class = getattr(aiogram_types, data['type'])
+    return markup_class.model_validate(data['data'])
+
+
+def retry_delay(attempts: int) -> float:
+    """Экспоненциальная пауза с разбросом ±20%"""
+    delay = min(RETRY_BASE_DELAY * 2 ** max(attempts - 1, 0), MAX_RETRY_DELAY)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def outbox_message(
+        bot: str,
+        chat_id: int,
+        text: Optional[str] = None,
+        method: str = "send_message",
+        reply_markup=None,
+        priority: OutboxPriority = OutboxPriority.RIDE,
+        **params
+) -> OutboxMessage:
+    """Подготовить сообщение для outbox.
+
+    bot - "client" или "driver", method - метод aiogram.Bot (send_message,
+    send_location, edit_message_text ...), params - его аргументы.
+    """
+    payload = dict(params)
+    if text is not None:
+        payload['text'] = text
+    if reply_markup is not None:
+        payload['reply_markup'] = _dump_markup(reply_markup)
+    return OutboxMessage(
+        bot=bot,
+        chat_id=chat_id,
+        method=method,
+        priority=int(priority),
+        payload=json.dumps(payload, ensure_ascii=False, default=str)
+    )
+
+
+async def enqueue_message(
+        bot: str,
+        chat_id: int,
+        text: Optional[str] = None,
+        priority: OutboxPriority = OutboxPriority.RIDE,
+        **params
+) -> None:
+    """Поставить сообщение в очередь отдельной транзакцией и разбудить диспетчер.
+
+    Замена прямому Bots.*.send_message там, где нет своей транзакции.
+    """
+    await outbox_dispatcher.repository.enqueue([
+        outbox_message(bot, chat_id, text, priority=priority, **params)
+    ])
+    outbox_dispatcher.wake()
+
+
+class OutboxDispatcher:
+    """Фоновая доставка сообщений из outbox: пул воркеров на каждого бота"""
+
+    def __init__(
+            self,
+            repository: Optional[OutboxRepository] = None,
+            bots: Optional[Dict[str, Any]] = None,
+            poll_interval: float = POLL_INTERVAL,
+            batch_size: int = BATCH_SIZE,
+            workers_per_bot: int = WORKERS_PER_BOT
+    ):
+        self.repository = repository or outbox_repository
+        self._bots = bots
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.workers_per_bot = workers_per_bot
+        self._wake_events: Dict[str, asyncio.Event] = {}
+        self._queues: Dict[str, asyncio.PriorityQueue] = {}
+        self._feeders: List[asyncio.Task] = []
+        self._workers: List[asyncio.Task] = []
+        # Отправка + mark_sent, защищенные от отмены воркера
+        self._inflight: Set[asyncio.Task] = set()
+        self._running = False
+        self.stats = {'sent': 0, 'retried': 0, 'dead': 0, 'batches': 0}
+
+    @property
+    def bots(self) -> Dict[str, Any]:
+        if self._bots is None:
+            from core.bot_instance import bots
+            self._bots = bots
+        return self._bots
+
+    def wake(self) -> None:
+        """Разбудить диспетчер после commit с новыми сообщениями"""
+        for event in self._wake_events.values():
+            event.set()
+
+    async def start(self, bot_names: Optional[Iterable[str]] = None) -> None:
+        """Запустить захват и воркеры для bot_names (по умолчанию - для всех ботов).
+
+        Процесс захватывает только сообщения ботов, которыми владеет: иначе оба
+        процесса отправляли бы через один токен, каждый со своим лимитом.
+        """
+        if self._running:
+            return
+        self._running = True
+        for bot_name in (self.bots if bot_names is None else bot_names):
+            self._wake_events[bot_name] = asyncio.Event()
+            self._queues[bot_name] = asyncio.PriorityQueue()
+            self._feeders.append(asyncio.create_task(self._feed(bot_name)))
+            for _ in range(self.workers_per_bot):
+                self._workers.append(asyncio.create_task(self._work(bot_name)))
+        logger.info(f"Outbox dispatcher started: {self.workers_per_bot} workers x {len(self._queues)} bots")
+
+    async def stop(self, timeout: float = STOP_TIMEOUT) -> None:
+        """Остановить диспетчер.
+
+        Новые сообщения больше не захватываются, уже захваченные воркеры
+        отправляют в течение timeout секунд. Начатая отправка доводится до
+        mark_sent (иначе доставленное сообщение осталось бы в SENDING и ушло
+        бы второй раз после аренды), а неотправленное возвращается в очередь.
+        """
+        if not self._running:
+            return
+        self._running = False
+        for task in self._feeders:
+            task.cancel()
+        await asyncio.gather(*self._feeders, return_exceptions=True)
+
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._queues.values())), timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Outbox dispatcher stop: queue not drained in time")
+
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+        leftover = []
+        for queue in self._queues.values():
+            while not queue.empty():
+                leftover.append(queue.get_nowait()[2])
+        try:
+            await self.repository.release(leftover)
+        except Exception as e:
+            logger.error(f"Outbox release on stop failed: {e}")
+
+        self._feeders.clear()
+        self._workers.clear()
+        self._queues.clear()
+        self._wake_events.clear()
+        logger.info(f"Outbox dispatcher stopped: {self.stats}")
+
+    async def _feed(self, bot_name: str) -> None:
+        """Захватывать сообщения бота, пока локальная очередь не заполнена"""
+        queue = self._queues[bot_name]
+        wake_event = self._wake_events[bot_name]
+        while self._running:
+            claimed = 0
+            free = self.batch_size - queue.qsize()
+            if free > 0:
+                try:
+                    messages = await self.repository.claim_batch(free, LEASE_SECONDS, bot=bot_name)
+                except Exception as e:
+                    logger.error(f"Outbox claim for {bot_name} failed: {e}")
+                    messages = []
+                if messages:
+                    self.stats['batches'] += 1
+                for message in messages:
+                    queue.put_nowait((message.priority, message.id, message))
+                claimed = len(messages)
+
+            # Полная пачка - возможно, есть еще; иначе ждем commit или таймаут.
+            # Очередь ждем не дольше половины аренды: дальше воркеры продлевают
+            # ее сами, а захват новых сообщений не должен стоять бесконечно
+            if claimed and claimed >= free:
+                try:
+                    await asyncio.wait_for(queue.join(), timeout=LEASE_SECONDS / 2)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await asyncio.wait_for(wake_event.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            wake_event.clear()
+
+    async def _work(self, bot_name: str) -> None:
+        """Отправлять сообщения бота в порядке приоритета (до отмены в stop)"""
+        queue = self._queues[bot_name]
+        limiter = get_rate_limiter(bot_name)
+        while True:
+            _, _, message = await queue.get()
+            try:
+                # Чат на паузе (RetryAfter) или уже получил свое в эту секунду -
+                # не держим воркер, остальные чаты идут дальше
+                delay = limiter.chat_delay(message.chat_id)
+                if delay > MAX_CHAT_WAIT:
+                    await self.repository.release([message], delay)
+                    continue
+                # Аренда истекает - продлеваем; если сообщение уже перехватил
+                # другой процесс, отправлять его нельзя
+                remaining = (message.available_at - datetime.now()).total_seconds()
+                if remaining < LEASE_SECONDS / 2 and not await self.repository.renew_lease(message, LEASE_SECONDS):
+                    logger.warning(f"Outbox lease lost for message {message.id}, skipping")
+                    continue
+                try:
+                    await limiter.acquire(message.chat_id, urgent=message.priority < OutboxPriority.STATUS)
+                except asyncio.CancelledError:
+                    # Остановка до начала отправки - вернуть сообщение в очередь
+                    await self.repository.release([message])
+                    raise
+                send = asyncio.ensure_future(self._send(message))
+                self._inflight.add(send)
+                send.add_done_callback(self._inflight.discard)
+                await asyncio.shield(send)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox worker for {bot_name} failed on message {message.id}: {e}")
+            finally:
+                queue.task_done()
+
+    async def _send(self, message: OutboxMessage) -> None:
+        """Отправка и отметка об отправке - одно целое"""
+        if await self._deliver(message):
+            await self.repository.mark_sent([message.id])
+
+    async def dispatch_once(self) -> int:
+        """Захватить и отправить по одной пачке каждого бота, вернуть число обработанных"""
+        processed = 0
+        for bot_name in self.bots:
+            messages = await self.repository.claim_batch(self.batch_size, LEASE_SECONDS, bot=bot_name)
+            if not messages:
+                continue
+            self.stats['batches'] += 1
+            sent_ids = [message.id for message in messages if await self._deliver(message)]
+            await self.repository.mark_sent(sent_ids)
+            processed += len(messages)
+        return processed
+
+    async def _deliver(self, message: OutboxMessage) -> bool:
+        """Отправить одно сообщение; True - доставлено"""
+        try:
+            bot = self.bots[message.bot]
+            payload = json.loads(message.payload)
+            if 'reply_markup' in payload:
+                payload['reply_markup'] = _load_markup(payload['reply_markup'])
+            await getattr(bot, message.method)(chat_id=message.chat_id, **payload)
+            self.stats['sent'] += 1
+            return True
+
+        except TelegramRetryAfter as e:
+            # Флуд-контроль: пауза только для этого чата, остальные идут дальше
+            get_rate_limiter(message.bot).pause_chat(message.chat_id, e.retry_after)
+            if message.attempts >= MAX_THROTTLED_ATTEMPTS:
+                await self._dead_letter(message, str(e))
+            else:
+                self.stats['retried'] += 1
+                await self.repository.reschedule(message.id, e.retry_after, str(e))
+
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            # Бот заблокирован или запрос некорректен - повтор не поможет
+            await self._dead_letter(message, str(e))
+
+        except Exception as e:
+            if message.attempts >= MAX_ATTEMPTS:
+                await self._dead_letter(message, str(e))
+            else:
+                self.stats['retried'] += 1
+                await self.repository.reschedule(message.id, retry_delay(message.attempts), str(e))
+        return False
+
+    async def _dead_letter(self, message: OutboxMessage, error: str) -> None:
+        self.stats['dead'] += 1
+        await self.repository.mark_dead(message.id, error)
+        logger.warning(f"Outbox message {message.id} to {message.chat_id} moved to dead-letter "
+                       f"after {message.attempts} attempts: {error}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика диспетчера"""
+        return dict(
+            self.stats,
+            running=self._running,
+            queued={bot_name: queue.qsize() for bot_name, queue in self._queues.items()}
+        )
+
+
+# Глобальный экземпляр
+outbox_dispatcher = OutboxDispatcher()
@@ -0,0 +1,152 @@
+"""
+Машина состояний поездки
+
+Каждый переход - один условный UPDATE ... WHERE id=? AND status=?, поэтому
+из двух одновременных нажатий «Przyjmij» выигрывает ровно одно.
+
+Уведомления о переходе передаются как outbox(ride) -> [OutboxMessage] и
+записываются в той же транзакции; отправляет их OutboxDispatcher.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional, Dict, FrozenSet, Iterable, Callable, Any
+
+from core.models import Ride, RideStatus
+from core.repositories.rides import RideRepository, ride_repository
+from core.services.outbox import outbox_dispatcher
+
+logger = logging.getLogger(__name__)
+
+# Построитель сообщений outbox для выигранного перехода
+OutboxBuilder = Callable[[Ride], Any]
+
+# Допустимые переходы: из какого статуса в какие
+TRANSITIONS: Dict[RideStatus, FrozenSet[RideStatus]] = {
+    RideStatus.PENDING: frozenset({RideStatus.ACCEPTED, RideStatus.CANCELLED, RideStatus.REJECTED}),
+    RideStatus.ACCEPTED: frozenset({RideStatus.DRIVER_ARRIVED, RideStatus.IN_PROGRESS, RideStatus.CANCELLED}),
+    RideStatus.DRIVER_ARRIVED: frozenset({RideStatus.IN_PROGRESS, RideStatus.CANCELLED}),
+    RideStatus.IN_PROGRESS: frozenset({RideStatus.COMPLETED, RideStatus.CANCELLED}),
+}
+
+
+@dataclass
+class TransitionResult:
+    """Результат перехода"""
+    won: bool
+    ride: Optional[Ride]
+
+    @property
+    def found(self) -> bool:
+        return self.ride is not None
+
+    def __bool__(self) -> bool:
+        return self.won
+
+
+class RideStateMachine:
+    """Переходы статусов поездки через compare-and-set"""
+
+    def __init__(self, repository: Optional[RideRepository] = None):
+        self.repository = repository or ride_repository
+
+    async def transition(
+            self,
+            ride_id: int,
+            expected: Iterable[RideStatus],
+            new_status: RideStatus,
+            owner_driver_id: Optional[int] = None,
+            outbox: Optional[OutboxBuilder] = None,
+            **fields
+    ) -> TransitionResult:
+        """Перевести поездку в new_status, если сейчас она в одном из expected"""
+        expected = tuple(expected)
+        for status in expected:
+            if new_status not in TRANSITIONS.get(status, frozenset()):
+                raise ValueError(f"Transition {status.value} -> {new_status.value} is not allowed")
+
+        won, ride = await self.repository.compare_and_set(
+            ride_id, expected, new_status, owner_driver_id=owner_driver_id, outbox=outbox, **fields
+        )
+        if won:
+            logger.info(f"Ride {ride_id}: -> {new_status.value}")
+            if outbox is not None:
+                outbox_dispatcher.wake()
+        else:
+            current = ride.status.value if ride else "missing"
+            logger.info(f"Ride {ride_id}: transition to {new_status.value} lost (status {current})")
+        return TransitionResult(won, ride)
+
+    async def accept(
+            self,
+            ride_id: int,
+            driver_id: int,
+            driver_name: Optional[str] = None,
+            vehicle_id: Optional[int] = None,
+            outbox: Optional[OutboxBuilder] = None
+    ) -> TransitionResult:
+        """Водитель принимает ожидающий заказ"""
+        fields = {'driver_id': driver_id, 'driver_name': driver_name, 'accepted_at': datetime.now()}
+        if vehicle_id is not None:
+            fields['vehicle_id'] = vehicle_id
+        return await self.transition(ride_id, (RideStatus.PENDING,), RideStatus.ACCEPTED, outbox=outbox, **fields)
+
+    async def arrive(
+            self,
+            ride_id: int,
+            driver_id: int,
+            outbox: Optional[OutboxBuilder] = None
+    ) -> TransitionResult:
+        """Водитель прибыл к пассажиру"""
+        return await self.transition(
+            ride_id, (RideStatus.ACCEPTED,), RideStatus.DRIVER_ARRIVED,
+            owner_driver_id=driver_id, outbox=outbox
+        )
+
+    async def start(
+            self,
+            ride_id: int,
+            driver_id: int,
+            outbox: Optional[OutboxBuilder] = None
+    ) -> TransitionResult:
+        """Пассажир в машине, поездка началась"""
+        return await self.transition(
+            ride_id, (RideStatus.DRIVER_ARRIVED,), RideStatus.IN_PROGRESS,
+            owner_driver_id=driver_id, outbox=outbox, started_at=datetime.now()
+        )
+
+    async def complete(
+            self,
+            ride_id: int,
+            driver_id: int,
+            final_price: Decimal,
+            outbox: Optional[OutboxBuilder] = None
+    ) -> TransitionResult:
+        """Поездка завершена"""
+        return await self.transition(
+            ride_id, (RideStatus.IN_PROGRESS,), RideStatus.COMPLETED,
+            owner_driver_id=driver_id, outbox=outbox,
+            completed_at=datetime.now(), final_price=final_price
+        )
+
+    async def cancel(
+            self,
+            ride_id: int,
+            reason: Optional[str] = None,
+            expected: Iterable[RideStatus] = (
+                RideStatus.PENDING, RideStatus.ACCEPTED, RideStatus.DRIVER_ARRIVED, RideStatus.IN_PROGRESS
+            ),
+            owner_driver_id: Optional[int] = None,
+            outbox: Optional[OutboxBuilder] = None
+    ) -> TransitionResult:
+        """Отмена поездки клиентом, водителем или системой"""
+        return await self.transition(
+            ride_id, expected, RideStatus.CANCELLED,
+            owner_driver_id=owner_driver_id, outbox=outbox,
+            cancelled_at=datetime.now(), cancellation_reason=reason
+        )
+
+
+# Глобальный экземпляр
+ride_state_machine = RideStateMachine()
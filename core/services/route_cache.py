@@ -0,0 +1,106 @@
+"""
+Кэш маршрутов и времени в пути для MapsService.get_route
+
+get_route вызывается для каждой оценки стоимости, а city_ride повторяет
+его, когда клиент проходит оформление заново, - каждый раз платный запрос
+к Directions API. Маршрут между теми же точками в то же время суток почти
+не меняется, поэтому ответ кэшируется по ключу:
+
+    (ячейка подачи, ячейка назначения, интервал времени суток)
+
+Ячейки - сетка CELL_M x CELL_M метров, интервал - BUCKET_MINUTES минут
+(время в пути днем и ночью разное). Хранятся расстояние, длительность и
+polyline; в памяти не больше MAX_ENTRIES маршрутов (LRU), каждый живет TTL
+секунд. Статистика (get_stats) передается в систему мониторинга.
+"""
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from core.utils.geo import snap_to_grid
+
+logger = logging.getLogger(__name__)
+
+# Параметры кэша
+CELL_M = 100.0                  # Шаг сетки точек маршрута, метров
+BUCKET_MINUTES = 60             # Интервал времени суток
+MAX_ENTRIES = 5000              # Маршрутов в памяти
+TTL = 6 * 3600                  # Срок жизни маршрута, секунд
+
+RouteKey = Tuple[int, int, int, int, int]
+
+
+class RouteCache:
+    """LRU маршрутов по ячейкам точек и интервалу времени суток"""
+
+    def __init__(
+            self,
+            cell_m: float = CELL_M,
+            bucket_minutes: int = BUCKET_MINUTES,
+            max_entries: int = MAX_ENTRIES,
+            ttl: float = TTL
+    ):
+        self.cell_m = cell_m
+        self.bucket_minutes = bucket_minutes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Ключ -> (distance_km, duration_minutes, polyline, момент истечения)
+        self._routes: "OrderedDict[RouteKey, Tuple[float, int, Optional[str], float]]" = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evicted': 0, 'expired': 0}
+
+    def key(self, origin: Tuple[float, float], destination: Tuple[float, float],
+            at: Optional[datetime] = None) -> RouteKey:
+        at = at or datetime.now()
+        bucket = (at.hour * 60 + at.minute) // self.bucket_minutes
+        return (
+            *snap_to_grid(origin[0], origin[1], self.cell_m),
+            *snap_to_grid(destination[0], destination[1], self.cell_m),
+            bucket
+        )
+
+    def get(self, origin: Tuple[float, float], destination: Tuple[float, float],
+            at: Optional[datetime] = None) -> Optional[Tuple[float, int, Optional[str]]]:
+        """(distance_km, duration_minutes, polyline) или None"""
+        key = self.key(origin, destination, at)
+        cached = self._routes.get(key)
+        if cached is None:
+            self.stats['misses'] += 1
+            return None
+        if cached[3] <= time.time():
+            del self._routes[key]
+            self.stats['expired'] += 1
+            self.stats['misses'] += 1
+            return None
+        self._routes.move_to_end(key)
+        self.stats['hits'] += 1
+        return cached[:3]
+
+    def put(self, origin: Tuple[float, float], destination: Tuple[float, float],
+            distance_km: float, duration_minutes: int, polyline: Optional[str] = None,
+            at: Optional[datetime] = None) -> None:
+        """Сохранить ответ Directions API"""
+        key = self.key(origin, destination, at)
+        self._routes[key] = (distance_km, duration_minutes, polyline, time.time() + self.ttl)
+        self._routes.move_to_end(key)
+        self.stats['stores'] += 1
+        while len(self._routes) > self.max_entries:
+            self._routes.popitem(last=False)
+            self.stats['evicted'] += 1
+
+    def clear(self) -> None:
+        self._routes.clear()
+
+    def get_stats(self) -> Dict[str, float]:
+        """Статистика кэша"""
+        lookups = self.stats['hits'] + self.stats['misses']
+        return dict(
+            self.stats,
+            size=len(self._routes),
+            hit_rate=round(self.stats['hits'] / lookups, 3) if lookups else 0.0
+        )
+
+
+# Глобальный экземпляр
+route_cache = RouteCache()
@@ -0,0 +1,208 @@
+"""
+Планировщик отложенных задач с хранением сроков в SQLite
+
+Раньше каждая автоотмена заказа и каждое удаление временного сообщения были
+отдельной спящей asyncio.Task: при перезапуске процесса они терялись, и
+заказы навсегда оставались в ожидании.
+
+Теперь задача - строка scheduled_jobs (ключ, обработчик, JSON-аргументы,
+срок). В памяти держится только min-heap задач со сроком в ближайшие
+HORIZON секунд, поэтому память не растет с числом задач на будущее. Отмена -
+удаление по ключу в БД и из словаря активных записей за O(1); запись в heap
+становится «мертвой» и пропускается, heap периодически уплотняется.
+
+При старте загружаются и сразу выполняются просроченные задачи. Оба бота
+могут держать одну задачу в памяти: выполнение захватывается условным
+UPDATE ... RETURNING, поэтому обработчик вызывается один раз.
+"""
+import asyncio
+import heapq
+import json
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from core.repositories.jobs import JobRepository, job_repository
+
+logger = logging.getLogger(__name__)
+
+# Параметры планировщика
+HORIZON = 60.0              # Задачи с таким запасом до срока держатся в памяти, секунд
+REFILL_BATCH = 1000         # Задач за одну загрузку из БД
+LEASE_SECONDS = 60          # Аренда задачи на время выполнения
+MAX_ATTEMPTS = 5            # Попыток выполнить задачу
+RETRY_BASE_DELAY = 5        # Пауза после первой ошибки, секунд (дальше x2)
+COMPACT_MIN = 64            # Уплотнять heap, когда мертвых записей больше
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+class JobScheduler:
+    """Отложенные задачи: сроки в SQLite, ближайшие - в min-heap"""
+
+    def __init__(self, repository: Optional[JobRepository] = None, horizon: float = HORIZON):
+        self.repository = repository or job_repository
+        self.horizon = horizon
+        self._handlers: Dict[str, Handler] = {}
+        self._heap: List[Tuple[float, int, str]] = []   # (срок, id задачи, ключ)
+        self._active: Dict[str, int] = {}                 # ключ -> id актуальной записи в heap
+        self._loaded_until = 0.0
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._running_jobs: Set[asyncio.Task] = set()
+        self.stats = {'scheduled': 0, 'cancelled': 0, 'fired': 0, 'failed': 0, 'dropped': 0}
+
+    def register(self, name: str, handler: Handler) -> None:
+        """Зарегистрировать обработчик: handler(**payload)"""
+        self._handlers[name] = handler
+
+    async def schedule(self, name: str, delay: float, key: str, **payload) -> int:
+        """Запланировать задачу через delay секунд (тот же ключ - замена)"""
+        run_at = datetime.now() + timedelta(seconds=delay)
+        job_id = await self.repository.upsert(key, name, json.dumps(payload, default=str), run_at)
+        self.stats['scheduled'] += 1
+        if run_at.timestamp() <= self._loaded_until:
+            self._track(run_at.timestamp(), job_id, key)
+        return job_id
+
+    async def cancel(self, key: str) -> bool:
+        """Отменить задачу по ключу"""
+        self.discard(key)
+        cancelled = await self.repository.delete_key(key)
+        if cancelled:
+            self.stats['cancelled'] += 1
+        return cancelled
+
+    def discard(self, key: str) -> None:
+        """Забыть задачу в памяти (в БД ее уже удалил другой процесс)"""
+        if self._active.pop(key, None) is not None:
+            self._maybe_compact()
+
+    async def start(self) -> None:
+        """Загрузить задачи и запустить цикл (просроченные выполняются сразу)"""
+        if self._task is not None:
+            return
+        await self._refill()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Job scheduler started: {len(self._active)} jobs due within {self.horizon:.0f}s")
+
+    async def stop(self) -> None:
+        """Остановить цикл; невыполненные задачи остаются в БД"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await asyncio.gather(*self._running_jobs, return_exceptions=True)
+        self._heap.clear()
+        self._active.clear()
+        self._loaded_until = 0.0
+
+    # ------------------------------------------------------------------
+    # Память
+    # ------------------------------------------------------------------
+
+    def _track(self, deadline: float, job_id: int, key: str) -> None:
+        if self._active.get(key) == job_id:
+            return
+        self._active[key] = job_id
+        heapq.heappush(self._heap, (deadline, job_id, key))
+        if self._heap[0][1] == job_id:
+            self._wake.set()
+        self._maybe_compact()
+
+    def _maybe_compact(self) -> None:
+        """Убрать из heap записи отмененных и замененных задач"""
+        dead = len(self._heap) - len(self._active)
+        if dead > COMPACT_MIN and dead > len(self._active):
+            self._heap = [item for item in self._heap if self._active.get(item[2]) == item[1]]
+            heapq.heapify(self._heap)
+
+    async def _refill(self) -> None:
+        """Подгрузить из БД задачи со сроком в пределах горизонта"""
+        until = datetime.now() + timedelta(seconds=self.horizon)
+        jobs = await self.repository.due_before(until, REFILL_BATCH)
+        for job in jobs:
+            self._track(job.run_at.timestamp(), job.id, job.key)
+        # Если пачка полная, загружено только до срока последней задачи
+        self._loaded_until = jobs[-1].run_at.timestamp() if len(jobs) >= REFILL_BATCH else until.timestamp()
+
+    # ------------------------------------------------------------------
+    # Выполнение
+    # ------------------------------------------------------------------
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                now = time.time()
+                if now >= self._loaded_until - self.horizon / 2:
+                    await self._refill()
+
+                while self._heap and self._heap[0][0] <= now:
+                    _, job_id, key = heapq.heappop(self._heap)
+                    if self._active.get(key) != job_id:
+                        continue    # отменена или заменена
+                    del self._active[key]
+                    task = asyncio.create_task(self._execute(job_id, key))
+                    self._running_jobs.add(task)
+                    task.add_done_callback(self._running_jobs.discard)
+
+                next_deadline = self._heap[0][0] if self._heap else float('inf')
+                timeout = min(next_deadline, self._loaded_until - self.horizon / 2) - time.time()
+                self._wake.clear()
+                if timeout > 0:
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job scheduler loop error: {e}")
+                await asyncio.sleep(1)
+
+    async def _execute(self, job_id: int, key: str) -> None:
+        job = await self.repository.claim(job_id, LEASE_SECONDS)
+        if job is None:
+            return  # Отменена или выполняется другим процессом
+
+        handler = self._handlers.get(job.name)
+        if handler is None:
+            # Обработчик есть в другом процессе - он заберет задачу после аренды
+            logger.warning(f"No handler for job {job.key} ({job.name}) in this process")
+            return
+
+        try:
+            await handler(**json.loads(job.payload))
+        except Exception as e:
+            self.stats['failed'] += 1
+            if job.attempts >= MAX_ATTEMPTS:
+                self.stats['dropped'] += 1
+                logger.error(f"Job {key} dropped after {job.attempts} attempts: {e}")
+                await self.repository.complete(job_id)
+                return
+            delay = RETRY_BASE_DELAY * 2 ** (job.attempts - 1) * random.uniform(0.8, 1.2)
+            run_at = datetime.now() + timedelta(seconds=delay)
+            await self.repository.retry(job_id, run_at, str(e))
+            if run_at.timestamp() <= self._loaded_until:
+                self._track(run_at.timestamp(), job_id, key)
+            logger.warning(f"Job {key} failed (attempt {job.attempts}), retry in {delay:.0f}s: {e}")
+            return
+
+        self.stats['fired'] += 1
+        await self.repository.complete(job_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика планировщика"""
+        return dict(
+            self.stats,
+            in_memory=len(self._active),
+            heap_size=len(self._heap),
+            running=len(self._running_jobs)
+        )
+
+
+# Глобальный экземпляр
+job_scheduler = JobScheduler()
@@ -0,0 +1,60 @@
+"""
+Векторные расстояния между точками на NumPy
+
+geopy.distance.geodesic считает одну пару за десятки микросекунд на чистом
+Python; для ранжирования сотен водителей на каждый заказ это заметно. Здесь
+расстояния считаются сразу по массивам координат:
+
+- haversine_* - большой круг на сфере; в районе Щецина отличается от
+  geodesic (эллипсоид WGS-84) не больше чем на ~0.5%;
+- equirectangular_* - плоская проекция у точки; еще дешевле, точна на
+  городских расстояниях (десятки км), на больших - хуже.
+
+*_one_to_many: одна точка -> массив точек, результат формы (n,);
+*_many_to_many: массив -> массив, результат формы (n, m). Все в километрах.
+"""
+from typing import Iterable, Union
+
+import numpy as np
+
+from core.utils.geo import EARTH_RADIUS_KM
+
+Coordinates = Union[np.ndarray, Iterable[float]]
+
+
+def _radians(values: Coordinates) -> np.ndarray:
+    return np.radians(np.asarray(values, dtype=np.float64))
+
+
+def haversine_one_to_many(lat: float, lon: float, lats: Coordinates, lons: Coordinates) -> np.ndarray:
+    """Расстояния от точки (lat, lon) до каждой точки массивов, км"""
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = _radians(lats), _radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def haversine_many_to_many(lats1: Coordinates, lons1: Coordinates,
+                           lats2: Coordinates, lons2: Coordinates) -> np.ndarray:
+    """Матрица расстояний (len(lats1), len(lats2)), км"""
+    lat1, lon1 = _radians(lats1)[:, None], _radians(lons1)[:, None]
+    lat2, lon2 = _radians(lats2)[None, :], _radians(lons2)[None, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def equirectangular_one_to_many(lat: float, lon: float, lats: Coordinates, lons: Coordinates) -> np.ndarray:
+    """Приближенные расстояния от точки до массива точек (городские масштабы), км"""
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = _radians(lats), _radians(lons)
+    x = (lon2 - lon1) * np.cos((lat1 + lat2) / 2)
+    return EARTH_RADIUS_KM * np.hypot(x, lat2 - lat1)
+
+
+def equirectangular_many_to_many(lats1: Coordinates, lons1: Coordinates,
+                                 lats2: Coordinates, lons2: Coordinates) -> np.ndarray:
+    """Приближенная матрица расстояний (len(lats1), len(lats2)), км"""
+    lat1, lon1 = _radians(lats1)[:, None], _radians(lons1)[:, None]
+    lat2, lon2 = _radians(lats2)[None, :], _radians(lons2)[None, :]
+    x = (lon2 - lon1) * np.cos((lat1 + lat2) / 2)
+    return EARTH_RADIUS_KM * np.hypot(x, lat2 - lat1)
@@ -1,16 +1,39 @@
-from geopy.distance import geodesic
+from math import asin, cos, radians, sin, sqrt
+from typing import Tuple
 
-from core.models import Session, DriverVehicle
+from core.repositories import vehicle_repository
+
+EARTH_RADIUS_KM = 6371.0088
 
 
 def calculate_distance(point1: tuple, point2: tuple) -> float:
     """Расчет расстояния в км между точками (широта, долгота)."""
-    return geodesic(point1, point2).km if point1 and point2 else 0.0
+    return haversine_km(point1[0], point1[1], point2[0], point2[1]) if point1 and point2 else 0.0
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Расстояние по прямой в км (сфера; в пределах ~0.5% от geodesic, в десятки раз быстрее).
+
+    Для многих точек сразу - core.utils.distance.
+    """
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(a))
+
+
+METERS_PER_DEGREE = 111320.0
+
+
+def snap_to_grid(lat: float, lon: float, cell_m: float) -> Tuple[int, int]:
+    """Ячейка (ряд, столбец) сетки cell_m x cell_m метров, в которую попадает точка."""
+    step = cell_m / METERS_PER_DEGREE
+    row = round(lat / step)
+    # Ширина по долготе - по широте центра ряда, чтобы ячейка не зависела от точки внутри ряда
+    lon_step = step / max(cos(radians(row * step)), 0.01)
+    return row, round(lon / lon_step)
+
 
 async def get_driver_location(driver_id: int) -> tuple:
     """Получение последней локации водителя из БД."""
-    with Session() as session:
-        driver = session.query(DriverVehicle).filter_by(driver_id=driver_id).first()
-        if driver and driver.last_lat and driver.last_lon:
-            return (driver.last_lat, driver.last_lon)
-    return None
\ No newline at end of file
+    return await vehicle_repository.get_location(driver_id)
\ No newline at end of file
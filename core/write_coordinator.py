@@ -0,0 +1,319 @@
+"""
+Координатор записи в SQLite (group commit)
+
+На каждый файл БД в процессе - один поток-писатель с собственным
+соединением. Записи из корутин и потоков попадают в очередь; писатель
+собирает все, что накопилось за flush_interval, и фиксирует их одной
+транзакцией. Каждая запись выполняется в своем SAVEPOINT, поэтому ошибка
+одной записи не откатывает остальные, а вызывающий получает свой Future.
+
+Между процессами (клиентский и водительский бот) файл по-прежнему
+разделяется через блокировку SQLite: BEGIN IMMEDIATE повторяется с
+экспоненциальной паузой, число повторов попадает в статистику.
+"""
+import asyncio
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, Union
+
+logger = logging.getLogger(__name__)
+
+# Параметры по умолчанию
+FLUSH_INTERVAL = 0.005      # Сколько ждать попутных записей после первой, секунд
+MAX_BATCH = 256             # Записей в одной транзакции
+BUSY_TIMEOUT_MS = 100       # Ожидание блокировки внутри SQLite на одну попытку
+MAX_LOCK_RETRIES = 50       # Попыток захватить блокировку записи
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+)
+
+# Границы гистограммы размеров пачек
+BATCH_BUCKETS = (1, 4, 16, 64, 256)
+
+_STOP = object()
+
+Work = Union[str, Callable[[sqlite3.Connection], Any]]
+
+
+@dataclass
+class WriteResult:
+    """Результат одной записи"""
+    rowcount: int
+    lastrowid: Optional[int]
+
+
+@dataclass
+class _Write:
+    """Элемент очереди писателя"""
+    work: Callable[[sqlite3.Connection], Any]
+    future: Future
+
+
+def _is_locked(error: sqlite3.OperationalError) -> bool:
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+class SQLiteWriteCoordinator:
+    """Единственный писатель в файл SQLite внутри процесса"""
+
+    def __init__(
+            self,
+            db_path: Union[str, Path],
+            flush_interval: float = FLUSH_INTERVAL,
+            max_batch: int = MAX_BATCH,
+            busy_timeout_ms: int = BUSY_TIMEOUT_MS,
+            max_lock_retries: int = MAX_LOCK_RETRIES,
+            pragmas: Sequence[str] = PRAGMAS
+    ):
+        self.db_path = Path(db_path)
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.busy_timeout_ms = busy_timeout_ms
+        self.max_lock_retries = max_lock_retries
+        self.pragmas = tuple(pragmas)
+
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+        self.stats = {
+            'writes': 0,
+            'failed_writes': 0,
+            'batches': 0,
+            'max_batch': 0,
+            'lock_retries': 0,
+            'commit_ms_total': 0.0,
+        }
+        self.batch_histogram = {bucket: 0 for bucket in BATCH_BUCKETS}
+
+    # ------------------------------------------------------------------
+    # Постановка записей
+    # ------------------------------------------------------------------
+
+    def submit(self, work: Callable[[sqlite3.Connection], Any]) -> Future:
+        """Выполнить work(conn) в ближайшей транзакции; результат - в Future"""
+        if self._closed:
+            raise RuntimeError(f"Write coordinator for {self.db_path} is closed")
+        self._ensure_thread()
+        future: Future = Future()
+        self._queue.put(_Write(work, future))
+        return future
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> Future:
+        """Поставить один SQL-запрос; Future вернет WriteResult"""
+        def work(conn: sqlite3.Connection) -> WriteResult:
+            cursor = conn.execute(sql, params)
+            return WriteResult(cursor.rowcount, cursor.lastrowid)
+        return self.submit(work)
+
+    def executemany(self, sql: str, seq_of_params: Iterable[Sequence[Any]]) -> Future:
+        """Поставить запрос с набором параметров"""
+        seq_of_params = list(seq_of_params)
+
+        def work(conn: sqlite3.Connection) -> WriteResult:
+            cursor = conn.executemany(sql, seq_of_params)
+            return WriteResult(cursor.rowcount, cursor.lastrowid)
+        return self.submit(work)
+
+    async def execute_async(self, sql: str, params: Sequence[Any] = ()) -> WriteResult:
+        """execute() для корутин"""
+        return await asyncio.wrap_future(self.execute(sql, params))
+
+    async def submit_async(self, work: Callable[[sqlite3.Connection], Any]) -> Any:
+        """submit() для корутин"""
+        return await asyncio.wrap_future(self.submit(work))
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Дождаться фиксации всего, что поставлено до вызова"""
+        self.submit(lambda conn: None).result(timeout)
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        """Зафиксировать очередь и остановить писателя"""
+        with self._start_lock:
+            self._closed = True
+            thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    # Поток-писатель
+    # ------------------------------------------------------------------
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name=f"sqlite-writer:{self.db_path.name}",
+                    daemon=True
+                )
+                self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=self.busy_timeout_ms / 1000)
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        return conn
+
+    def _run(self) -> None:
+        conn = self._connect()
+        stopping = False
+        try:
+            while not stopping:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                batch = [item]
+
+                # Сначала все, что уже в очереди, затем ждем попутные записи
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.max_batch:
+                    try:
+                        remaining = deadline - time.monotonic()
+                        item = self._queue.get_nowait() if remaining <= 0 else self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+
+                self._commit_batch(conn, batch)
+        finally:
+            conn.close()
+
+    def _with_lock_retries(self, conn: sqlite3.Connection, statement: str) -> None:
+        """BEGIN IMMEDIATE / COMMIT с повтором при занятой блокировке"""
+        attempt = 0
+        while True:
+            try:
+                conn.execute(statement)
+                return
+            except sqlite3.OperationalError as e:
+                if not _is_locked(e) or attempt >= self.max_lock_retries:
+                    raise
+                attempt += 1
+                self.stats['lock_retries'] += 1
+                time.sleep(min(0.001 * 2 ** attempt, 0.1))
+
+    def _commit_batch(self, conn: sqlite3.Connection, batch: list) -> None:
+        started = time.perf_counter()
+        try:
+            self._with_lock_retries(conn, "BEGIN IMMEDIATE")
+        except Exception as e:
+            logger.error(f"Write batch of {len(batch)} to {self.db_path} failed to begin: {e}")
+            self._fail(batch, e)
+            return
+
+        outcomes = []
+        try:
+            for write in batch:
+                conn.execute("SAVEPOINT write")
+                try:
+                    value = write.work(conn)
+                    conn.execute("RELEASE write")
+                    outcomes.append((write, value, None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write")
+                    conn.execute("RELEASE write")
+                    outcomes.append((write, None, e))
+            self._with_lock_retries(conn, "COMMIT")
+        except Exception as e:
+            logger.error(f"Write batch of {len(batch)} to {self.db_path} failed to commit: {e}")
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            self._fail(batch, e)
+            return
+
+        self._record_batch(len(batch), (time.perf_counter() - started) * 1000)
+        for write, value, error in outcomes:
+            if error is None:
+                self.stats['writes'] += 1
+                write.future.set_result(value)
+            else:
+                self.stats['failed_writes'] += 1
+                write.future.set_exception(error)
+
+    def _fail(self, batch: list, error: Exception) -> None:
+        self.stats['failed_writes'] += len(batch)
+        for write in batch:
+            write.future.set_exception(error)
+
+    def _record_batch(self, size: int, commit_ms: float) -> None:
+        self.stats['batches'] += 1
+        self.stats['max_batch'] = max(self.stats['max_batch'], size)
+        self.stats['commit_ms_total'] += commit_ms
+        for bucket in BATCH_BUCKETS:
+            if size <= bucket:
+                self.batch_histogram[bucket] += 1
+                break
+        else:
+            self.batch_histogram[BATCH_BUCKETS[-1]] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика писателя"""
+        batches = self.stats['batches']
+        return {
+            'db_path': str(self.db_path),
+            'writes': self.stats['writes'],
+            'failed_writes': self.stats['failed_writes'],
+            'batches': batches,
+            'avg_batch': round(self.stats['writes'] / batches, 2) if batches else 0.0,
+            'max_batch': self.stats['max_batch'],
+            'batch_histogram': {f"<={bucket}": count for bucket, count in self.batch_histogram.items()},
+            'lock_retries': self.stats['lock_retries'],
+            'avg_commit_ms': round(self.stats['commit_ms_total'] / batches, 3) if batches else 0.0,
+            'queued': self._queue.qsize(),
+        }
+
+
+# Реестр писателей: один на файл в процессе
+_coordinators: Dict[str, SQLiteWriteCoordinator] = {}
+_registry_lock = threading.Lock()
+
+
+def get_write_coordinator(db_path: Union[str, Path], **options) -> SQLiteWriteCoordinator:
+    """Писатель для файла БД (options применяются при первом создании)"""
+    key = str(Path(db_path).resolve())
+    with _registry_lock:
+        coordinator = _coordinators.get(key)
+        if coordinator is None or coordinator._closed:
+            coordinator = SQLiteWriteCoordinator(db_path, **options)
+            _coordinators[key] = coordinator
+        return coordinator
+
+
+def get_write_stats() -> Dict[str, Dict[str, Any]]:
+    """Статистика всех писателей процесса"""
+    with _registry_lock:
+        return {key: coordinator.get_stats() for key, coordinator in _coordinators.items()}
+
+
+def close_write_coordinators() -> None:
+    """Зафиксировать очереди и остановить всех писателей"""
+    with _registry_lock:
+        coordinators = list(_coordinators.values())
+        _coordinators.clear()
+    for coordinator in coordinators:
+        coordinator.close()
+
+
+atexit.register(close_write_coordinators)
@@ -105,6 +105,37 @@ async def main():
         logger.info("Initializing database...")
         await init_database()
 
+        # Индекс активных поездок в памяти
+        from core.services.active_rides import active_ride_index
+        await active_ride_index.rebuild()
+
+        # События заказов и поездок от другого бота
+        from core.services.event_bus import event_bus
+        from core.services.driver_notification import driver_notification_service
+        active_ride_index.attach_event_bus(event_bus)
+        driver_notification_service.attach_event_bus(event_bus)
+        from core.services.driver_index import driver_position_index
+        from core.services.availability import driver_availability
+        driver_position_index.attach_event_bus(event_bus)
+        driver_availability.attach_event_bus(event_bus)
+        from core.services import fanout
+        fanout.attach_event_bus(event_bus)
+        await event_bus.start()
+
+        # Доступность водителей: из driver_locations и активных поездок
+        await driver_availability.start()
+
+        # Отложенные задачи (просроченные за время простоя выполняются сразу)
+        from core.services.scheduler import job_scheduler
+        await job_scheduler.start()
+
+        # Фоновое удаление старых сообщений водителей
+        await driver_notification_service.sweeper.start()
+
+        # Доставка уведомлений из outbox
+        from core.services.outbox import outbox_dispatcher
+        await outbox_dispatcher.start(("driver",))
+
         # Информация о боте
         bot_info = await bot.get_me()
         logger.info(f"Starting driver bot: @{bot_info.username}")
@@ -137,6 +168,17 @@ async def main():
         # Закрытие соединений
         logger.info("Shutting down driver bot...")
         try:
+            from core.services.outbox import outbox_dispatcher
+            from core.services.driver_notification import driver_notification_service
+            from core.services.event_bus import event_bus
+            from core.services.scheduler import job_scheduler
+            await job_scheduler.stop()
+            await driver_notification_service.sweeper.stop()
+            from core.services.availability import driver_availability
+            await driver_availability.stop()
+            await outbox_dispatcher.stop()
+            await event_bus.stop()
+            driver_notification_service.storage.close()
             await close_database()
             await bot.session.close()
         except:
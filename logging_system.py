@@ -10,6 +10,8 @@ from pathlib import Path
 from logging.handlers import RotatingFileHandler
 import sqlite3
 
+from core.write_coordinator import get_write_coordinator
+
 
 class TaxiLogger:
     """Специализированный логгер для такси-системы"""
@@ -112,6 +114,7 @@ class TaxiLogger:
         conn.close()
 
         self.db_path = db_path
+        self._writer = get_write_coordinator(db_path)
 
     def info(self, message: str, **kwargs):
         """Информационное сообщение"""
@@ -181,27 +184,30 @@ class TaxiLogger:
 
     def _log_to_db(self, level: str, event_type: str, message: str, data: dict = None, user_id: int = None,
                    order_id: int = None):
-        """Запись в базу данных"""
+        """Запись в базу данных (в фоне, пачкой с другими записями)"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.execute("""
-                         INSERT INTO system_logs
-                             (bot_name, level, event_type, message, data, user_id, order_id)
-                         VALUES (?, ?, ?, ?, ?, ?, ?)
-                         """, (
-                             self.bot_name,
-                             level,
-                             event_type,
-                             message,
-                             json.dumps(data) if data else None,
-                             user_id,
-                             order_id
-                         ))
-            conn.commit()
-            conn.close()
+            future = self._writer.execute("""
+                                          INSERT INTO system_logs
+                                              (bot_name, level, event_type, message, data, user_id, order_id)
+                                          VALUES (?, ?, ?, ?, ?, ?, ?)
+                                          """, (
+                                              self.bot_name,
+                                              level,
+                                              event_type,
+                                              message,
+                                              json.dumps(data) if data else None,
+                                              user_id,
+                                              order_id
+                                          ))
+            future.add_done_callback(self._on_db_log_written)
         except Exception as e:
             self.logger.error(f"Failed to write DB log: {e}")
 
+    def _on_db_log_written(self, future):
+        """Ошибка фоновой записи лога"""
+        if future.exception() is not None:
+            self.logger.error(f"Failed to write DB log: {future.exception()}")
+
 
 class JsonFileHandler:
     """Обработчик для записи в JSON Lines файл"""
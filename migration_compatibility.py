@@ -4,7 +4,6 @@
 """
 
 import asyncio
-import sqlite3
 import os
 import sys
 from pathlib import Path
@@ -81,115 +80,6 @@ def load_environment():
         return True
 
 
-def ensure_database_structure():
-    """Обеспечивает правильную структуру базы данных"""
-
-    # Путь к базе данных
-    db_path = Path("data/database.db")
-    db_path.parent.mkdir(exist_ok=True, parents=True)
-
-    print("🔄 Проверяем структуру базы данных...")
-
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    try:
-        # Получаем список существующих таблиц
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        existing_tables = [row[0] for row in cursor.fetchall()]
-        print(f"📋 Существующие таблицы: {existing_tables}")
-
-        # Проверяем, нужно ли создавать новые таблицы
-        required_tables = ['users', 'vehicles', 'rides', 'driver_locations']
-        missing_tables = [table for table in required_tables if table not in existing_tables]
-
-        if missing_tables:
-            print(f"🆕 Создаем недостающие таблицы: {missing_tables}")
-        else:
-            print("✅ Все необходимые таблицы уже существуют")
-
-        # Проверяем структуру таблицы rides/orders
-        if 'rides' in existing_tables:
-            cursor.execute("PRAGMA table_info(rides)")
-            rides_columns = [column[1] for column in cursor.fetchall()]
-            print(f"📋 Колонки в таблице rides: {rides_columns}")
-
-            # Добавляем недостающие колонки для совместимости
-            compatibility_columns = {
-                'user_id': 'INTEGER',
-                'driver_name': 'TEXT',
-                'origin': 'TEXT',
-                'destination': 'TEXT',
-                'price': 'DECIMAL(10,2)',
-                'order_type': 'VARCHAR(50)',
-                'products': 'TEXT',
-                'budget': 'REAL',
-                'payment_method': 'VARCHAR(20) DEFAULT "cash"'
-            }
-
-            for col_name, col_type in compatibility_columns.items():
-                if col_name not in rides_columns:
-                    try:
-                        cursor.execute(f"ALTER TABLE rides ADD COLUMN {col_name} {col_type}")
-                        print(f"✅ Добавлена колонка: {col_name}")
-                    except sqlite3.Error as e:
-                        print(f"⚠️ Не удалось добавить колонку {col_name}: {e}")
-
-        # Проверяем структуру таблицы vehicles
-        if 'vehicles' in existing_tables:
-            cursor.execute("PRAGMA table_info(vehicles)")
-            vehicles_columns = [column[1] for column in cursor.fetchall()]
-
-            # Добавляем недостающие колонки для совместимости
-            vehicle_compatibility_columns = {
-                'driver_name': 'VARCHAR(255)',
-                'photo': 'BLOB',
-                'last_lat': 'REAL',
-                'last_lon': 'REAL'
-            }
-
-            for col_name, col_type in vehicle_compatibility_columns.items():
-                if col_name not in vehicles_columns:
-                    try:
-                        cursor.execute(f"ALTER TABLE vehicles ADD COLUMN {col_name} {col_type}")
-                        print(f"✅ Добавлена колонка в vehicles: {col_name}")
-                    except sqlite3.Error as e:
-                        print(f"⚠️ Не удалось добавить колонку {col_name}: {e}")
-
-        # Если есть старая таблица orders, мигрируем данные
-        if 'orders' in existing_tables and 'rides' in existing_tables:
-            print("🔄 Мигрируем данные из orders в rides...")
-            try:
-                # Получаем данные из старой таблицы
-                cursor.execute("SELECT * FROM orders")
-                orders = cursor.fetchall()
-
-                # Получаем описание колонок старой таблицы
-                cursor.execute("PRAGMA table_info(orders)")
-                old_columns = [column[1] for column in cursor.fetchall()]
-
-                print(f"📋 Найдено {len(orders)} заказов для миграции")
-                print(f"📋 Колонки в старой таблице orders: {old_columns}")
-
-                if orders:
-                    # Здесь можно добавить логику миграции данных
-                    print("ℹ️ Миграция данных пропущена для безопасности")
-                    print("ℹ️ При необходимости мигрируйте данные вручную")
-
-            except sqlite3.Error as e:
-                print(f"⚠️ Ошибка миграции данных: {e}")
-
-        conn.commit()
-        print("✅ Структура базы данных обновлена")
-
-    except Exception as e:
-        print(f"❌ Ошибка обработки базы данных: {e}")
-        conn.rollback()
-
-    finally:
-        conn.close()
-
-
 async def initialize_new_models():
     """Инициализация новых моделей"""
     print("🔄 Инициализируем новые модели...")
@@ -302,10 +192,7 @@ async def main():
         print("❌ Критические ошибки импортов. Исправьте их перед продолжением.")
         return False
 
-    # Обеспечиваем структуру БД
-    ensure_database_structure()
-
-    # Инициализируем новые модели
+    # Инициализируем новые модели (шаги core/migrations.py применяются здесь же)
     await initialize_new_models()
 
     print("\n" + "=" * 60)
@@ -313,8 +200,7 @@ async def main():
     print("\n📋 Что было сделано:")
     print("✅ Создан .env файл с токенами")
     print("✅ Проверены и исправлены импорты")
-    print("✅ Обновлена структура базы данных")
-    print("✅ Добавлены колонки для совместимости")
+    print("✅ Схема базы данных приведена к последней версии")
     print("✅ Инициализированы новые модели")
     print("✅ Проверена работа сессий")
 
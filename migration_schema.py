@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Скрипт миграции схемы базы данных
+Применяет недостающие шаги core/migrations.py и показывает версию схемы.
+Заменяет fix_database.py, migration_alcohol.py, update_vehicle_types.py
+и migration_indexes.py. Безопасно запускать повторно.
+
+Запуск:
+    python migration_schema.py [--db data/database.db] [--status]
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from sqlalchemy import create_engine, select
+
+# Добавляем корневую папку в путь Python
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from core.migrations import MIGRATIONS, LATEST_VERSION, current_version, run_migrations
+from core.models import SchemaVersion
+
+
+def show_status(engine) -> None:
+    """Вывести примененные и ожидающие шаги"""
+    with engine.connect() as conn:
+        version = current_version(conn)
+        applied = {}
+        if version:
+            rows = conn.execute(select(SchemaVersion.version, SchemaVersion.applied_at)).all()
+            applied = {row.version: row.applied_at for row in rows}
+
+    print(f"📋 Версия схемы: {version} из {LATEST_VERSION}")
+    for migration in MIGRATIONS:
+        if migration.version in applied:
+            print(f"   ✅ {migration.version:3} {migration.name} ({applied[migration.version]:%Y-%m-%d %H:%M})")
+        else:
+            print(f"   ⏳ {migration.version:3} {migration.name}")
+
+
+def migrate_database(db_path: Path = Path("data/database.db")) -> bool:
+    """Применяет недостающие шаги миграции"""
+
+    db_path.parent.mkdir(exist_ok=True, parents=True)
+    engine = create_engine(f"sqlite:///{db_path}")
+    try:
+        print(f"🔄 Миграция схемы: {db_path}")
+
+        with engine.begin() as conn:
+            applied = run_migrations(conn)
+
+        if applied:
+            for migration in applied:
+                print(f"✅ Применен шаг {migration.version}: {migration.name}")
+        else:
+            print("ℹ️ Схема уже актуальна")
+
+        show_status(engine)
+        print("✅ Миграция завершена успешно!")
+        return True
+
+    except Exception as e:
+        print(f"❌ Ошибка миграции: {e}")
+        return False
+
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Миграция схемы базы данных")
+    parser.add_argument("--db", type=Path, default=Path("data/database.db"), help="Путь к файлу SQLite")
+    parser.add_argument("--status", action="store_true", help="Только показать версию схемы")
+    args = parser.parse_args()
+
+    if args.status:
+        if not args.db.exists():
+            print(f"❌ База данных не найдена: {args.db}")
+            sys.exit(1)
+        status_engine = create_engine(f"sqlite:///{args.db}")
+        show_status(status_engine)
+        status_engine.dispose()
+        sys.exit(0)
+
+    success = migrate_database(args.db)
+    sys.exit(0 if success else 1)
@@ -11,10 +11,14 @@ import json
 from datetime import datetime, timedelta
 from pathlib import Path
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 import threading
 from contextlib import asynccontextmanager
 
+from core.write_coordinator import get_write_coordinator
+
+CACHE_METRICS_INTERVAL = 60     # Как часто процесс бота сохраняет статистику кэшей, секунд
+
 
 @dataclass
 class SystemMetrics:
@@ -51,9 +55,12 @@ class PerformanceMonitor:
         self.monitoring_db.parent.mkdir(exist_ok=True)
 
         self._init_database()
+        self._writer = get_write_coordinator(self.monitoring_db)
         self._start_time = time.time()
         self._metrics_cache = {}
         self._bot_metrics = {}
+        # Кэши процесса: имя -> функция статистики (get_stats)
+        self._caches: Dict[str, Callable[[], Dict]] = {}
 
         # Счетчики
         self.counters = {
@@ -168,6 +175,20 @@ class PerformanceMonitor:
                      )
                      """)
 
+        # Таблица статистики кэшей
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_metrics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                cache_name TEXT,
+                hits INTEGER,
+                misses INTEGER,
+                size INTEGER,
+                evicted INTEGER,
+                hit_rate REAL
+            )
+        """)
+
         conn.commit()
         conn.close()
 
@@ -283,15 +304,29 @@ class PerformanceMonitor:
 
         self._bot_metrics[bot_name] = bot_metrics
 
+    def register_cache(self, name: str, get_stats: Callable[[], Dict]):
+        """Регистрирует кэш, статистика которого сохраняется вместе с метриками"""
+        self._caches[name] = get_stats
+
+    def collect_cache_stats(self) -> Dict[str, Dict]:
+        """Текущая статистика зарегистрированных кэшей"""
+        stats = {}
+        for name, get_stats in self._caches.items():
+            try:
+                stats[name] = get_stats()
+            except Exception as e:
+                print(f"❌ Ошибка статистики кэша {name}: {e}")
+        return stats
+
     def save_metrics(self):
         """Сохраняет метрики в базу данных"""
 
         # Собираем системные метрики
         system_metrics = self.collect_system_metrics()
+        cache_stats = self.collect_cache_stats()
 
-        conn = sqlite3.connect(self.monitoring_db)
-
-        try:
+        # Обе таблицы - одной записью в транзакции писателя
+        def write(conn):
             # Сохраняем системные метрики
             conn.execute("""
                          INSERT INTO system_metrics
@@ -327,12 +362,69 @@ class PerformanceMonitor:
                                  bot_metrics.memory_mb
                              ))
 
-            conn.commit()
+            # Сохраняем статистику кэшей
+            self._insert_cache_stats(conn, cache_stats)
 
+        try:
+            self._writer.submit(write).result()
         except Exception as e:
             print(f"❌ Ошибка сохранения метрик: {e}")
+
+    @staticmethod
+    def _insert_cache_stats(conn: sqlite3.Connection, cache_stats: Dict[str, Dict]):
+        for cache_name, stats in cache_stats.items():
+            conn.execute("""
+                INSERT INTO cache_metrics (cache_name, hits, misses, size, evicted, hit_rate)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (
+                cache_name,
+                stats.get('hits', 0),
+                stats.get('misses', 0),
+                stats.get('size', 0),
+                stats.get('evicted', 0),
+                stats.get('hit_rate', 0.0)
+            ))
+
+    async def save_cache_metrics(self):
+        """Сохраняет статистику кэшей процесса через общий писатель"""
+        cache_stats = self.collect_cache_stats()
+        if not cache_stats:
+            return
+        try:
+            await self._writer.submit_async(lambda conn: self._insert_cache_stats(conn, cache_stats))
+        except Exception as e:
+            print(f"❌ Ошибка сохранения статистики кэшей: {e}")
+
+    async def export_cache_metrics(self, interval: float = CACHE_METRICS_INTERVAL):
+        """Периодически сохраняет статистику кэшей (задача процесса бота).
+
+        Кэши живут в памяти бота, а дашборд запускается отдельным процессом -
+        он читает статистику из таблицы cache_metrics.
+        """
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await self.save_cache_metrics()
         finally:
-            conn.close()
+            # Последний снимок при остановке
+            await asyncio.shield(self.save_cache_metrics())
+
+    def _load_cache_stats(self, conn: sqlite3.Connection, hours: int) -> Dict[str, Dict]:
+        """Последняя сохраненная статистика каждого кэша за N часов"""
+        cursor = conn.execute("""
+            SELECT cache_name, hits, misses, size, evicted, hit_rate
+            FROM cache_metrics
+            WHERE id IN (
+                SELECT MAX(id) FROM cache_metrics
+                WHERE timestamp > datetime('now', '-{} hours')
+                GROUP BY cache_name
+            )
+            ORDER BY cache_name
+        """.format(hours))
+        return {
+            name: {'hits': hits, 'misses': misses, 'size': size, 'evicted': evicted, 'hit_rate': hit_rate}
+            for name, hits, misses, size, evicted, hit_rate in cursor.fetchall()
+        }
 
     def check_alerts(self):
         """Проверяет пороговые значения и создает алерты"""
@@ -388,21 +480,17 @@ class PerformanceMonitor:
 
         # Сохраняем алерты
         if alerts:
-            conn = sqlite3.connect(self.monitoring_db)
-            for alert in alerts:
-                conn.execute("""
-                             INSERT INTO alerts
-                                 (alert_type, severity, message, metric_value, threshold)
-                             VALUES (?, ?, ?, ?, ?)
-                             """, (
-                                 alert['type'],
-                                 alert['severity'],
-                                 alert['message'],
-                                 alert['value'],
-                                 alert['threshold']
-                             ))
-            conn.commit()
-            conn.close()
+            self._writer.executemany("""
+                                     INSERT INTO alerts
+                                         (alert_type, severity, message, metric_value, threshold)
+                                     VALUES (?, ?, ?, ?, ?)
+                                     """, [(
+                                         alert['type'],
+                                         alert['severity'],
+                                         alert['message'],
+                                         alert['value'],
+                                         alert['threshold']
+                                     ) for alert in alerts])
 
             # Выводим алерты
             for alert in alerts:
@@ -459,6 +547,10 @@ class PerformanceMonitor:
 
             stats = cursor.fetchone()
 
+            # Кэши из таблицы (их пишет процесс бота) и свои, если есть
+            cache_stats = self._load_cache_stats(conn, hours)
+            cache_stats.update(self.collect_cache_stats())
+
             return {
                 'system_metrics': system_data,
                 'bot_metrics': bot_data,
@@ -469,6 +561,7 @@ class PerformanceMonitor:
                     'avg_response_time': stats[2] if stats[2] else 0,
                     'peak_orders': stats[3] if stats[3] else 0
                 },
+                'cache_stats': cache_stats,
                 'uptime_seconds': int(time.time() - self._start_time)
             }
 
@@ -521,6 +614,15 @@ class PerformanceMonitor:
         else:
             print(f"\n✅ Активных алертов нет")
 
+        # Кэши
+        cache_stats = dashboard_data.get('cache_stats', {})
+        if cache_stats:
+            print("\n🗃️ КЭШИ:")
+            for cache_name, stats in cache_stats.items():
+                print(f"   {cache_name}: попаданий {stats.get('hit_rate', 0) * 100:.0f}% "
+                      f"({stats.get('hits', 0)}/{stats.get('hits', 0) + stats.get('misses', 0)}), "
+                      f"записей {stats.get('size', 0)}")
+
         # Метрики ботов
         print(f"\n🤖 СОСТОЯНИЕ БОТОВ:")
         for bot_name, bot_metrics in self._bot_metrics.items():
@@ -559,12 +661,20 @@ class PerformanceMonitor:
             """.format(days))
             deleted_alerts = cursor.rowcount
 
+            # Удаляем старую статистику кэшей
+            cursor = conn.execute("""
+                DELETE FROM cache_metrics 
+                WHERE timestamp < datetime('now', '-{} days')
+            """.format(days))
+            deleted_caches = cursor.rowcount
+
             conn.commit()
 
             print(f"🗑️ Очистка метрик старше {days} дней:")
             print(f"   Системных: {deleted_system}")
             print(f"   Ботов: {deleted_bots}")
             print(f"   Алертов: {deleted_alerts}")
+            print(f"   Кэшей: {deleted_caches}")
 
         except Exception as e:
             print(f"❌ Ошибка очистки метрик: {e}")
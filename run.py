@@ -100,6 +100,7 @@ logger = logging.getLogger(__name__)
 
 async def main():
     """Главная функция клиентского бота"""
+    cache_metrics_task = None
 
     try:
         # Инициализация бота
@@ -142,6 +143,52 @@ async def main():
         logger.info("Initializing database...")
         await init_database()
 
+        # Кэш геокодера: последние адреса из geocode_cache в память
+        from core.services.geocode_cache import geocode_cache
+        await geocode_cache.warm_up()
+
+        # Статистика кэшей карт - в систему мониторинга, если она доступна
+        from core.services.route_cache import route_cache
+        try:
+            from monitoring_system import performance_monitor
+            performance_monitor.register_cache('geocode', geocode_cache.get_stats)
+            performance_monitor.register_cache('route', route_cache.get_stats)
+            # Дашборд - другой процесс: статистика уходит в cache_metrics
+            cache_metrics_task = asyncio.create_task(performance_monitor.export_cache_metrics())
+        except ImportError as e:
+            logger.info(f"Monitoring not available, cache stats not exported: {e}")
+
+        # Индекс активных поездок в памяти
+        from core.services.active_rides import active_ride_index
+        await active_ride_index.rebuild()
+
+        # События заказов и поездок от другого бота
+        from core.services.event_bus import event_bus
+        from core.services.driver_notification import driver_notification_service
+        active_ride_index.attach_event_bus(event_bus)
+        driver_notification_service.attach_event_bus(event_bus)
+        from core.services.driver_index import driver_position_index
+        from core.services.availability import driver_availability
+        driver_position_index.attach_event_bus(event_bus)
+        driver_availability.attach_event_bus(event_bus)
+        from core.services import fanout
+        fanout.attach_event_bus(event_bus)
+        await event_bus.start()
+
+        # Доступность водителей: из driver_locations и активных поездок
+        await driver_availability.start()
+
+        # Отложенные задачи (просроченные за время простоя выполняются сразу)
+        from core.services.scheduler import job_scheduler
+        await job_scheduler.start()
+
+        # Фоновое удаление старых сообщений водителей
+        await driver_notification_service.sweeper.start()
+
+        # Доставка уведомлений из outbox
+        from core.services.outbox import outbox_dispatcher
+        await outbox_dispatcher.start(("client",))
+
         # Информация о боте
         bot_info = await bot.get_me()
         logger.info(f"Starting client bot: @{bot_info.username}")
@@ -186,6 +233,22 @@ async def main():
         # Закрытие соединений
         logger.info("Shutting down...")
         try:
+            if cache_metrics_task:
+                cache_metrics_task.cancel()
+                await asyncio.gather(cache_metrics_task, return_exceptions=True)
+            from core.services.outbox import outbox_dispatcher
+            from core.services.driver_notification import driver_notification_service
+            from core.services.event_bus import event_bus
+            from core.services.scheduler import job_scheduler
+            await job_scheduler.stop()
+            await driver_notification_service.sweeper.stop()
+            from core.services.availability import driver_availability
+            await driver_availability.stop()
+            await outbox_dispatcher.stop()
+            await event_bus.stop()
+            driver_notification_service.storage.close()
+            from core.services.maps_service import maps_service
+            await maps_service.close()
             await close_database()
             await bot.session.close()
         except:
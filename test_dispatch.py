@@ -0,0 +1,208 @@
+"""
+Тест геораспределения: волны ближайших водителей, следующая волна по
+таймеру или после отказа всей волны, уведомления только тем, кому предлагали;
+волны идут, пока до автоотмены остается время на ответ
+
+Запуск:
+    python test_dispatch.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+os.environ.setdefault('CLIENT_BOT_TOKEN', '123456:TEST-CLIENT-TOKEN')
+os.environ.setdefault('DRIVER_BOT_TOKEN', '654321:TEST-DRIVER-TOKEN')
+sys.path.insert(0, str(current_dir))
+
+from core.repositories import vehicle_repository
+from core.services import driver_notification
+from core.services.dispatch import plan_waves, WAVE_TIMEOUT
+from core.services.driver_notification import (
+    DriverNotificationService, SharedOrderStorage, JOB_DISPATCH_WAVE, JOB_AUTO_CANCEL,
+    AUTO_CANCEL_SECONDS, response_time_text
+)
+from core.services.fanout import FanOutReport
+
+PICKUP = (53.4285, 14.5528)
+# Водитель -> позиция; чем больше id, тем дальше от точки подачи
+LOCATIONS = {driver_id: (PICKUP[0] + driver_id * 0.01, PICKUP[1]) for driver_id in range(1, 8)}
+DRIVERS = [7, 6, 5, 4, 3, 2, 1, 99]     # 99 - без позиции
+
+
+def test_plan_waves_orders_by_distance():
+    plan = plan_waves(DRIVERS, LOCATIONS, PICKUP, ring_size=3)
+    assert plan.waves == [[1, 2, 3], [4, 5, 6], [7, 99]]
+    assert 1.0 < plan.distances[1] < 1.2
+
+    # Без координат заказа или позиций водителей - всем сразу, как раньше
+    assert plan_waves(DRIVERS, LOCATIONS, None).waves == [DRIVERS]
+    assert plan_waves(DRIVERS, {}, PICKUP).waves == [DRIVERS]
+
+
+class FakeFanout:
+    def __init__(self):
+        self.waves = []
+
+    async def fan_out(self, chat_ids, send):
+        chat_ids = list(chat_ids)
+        self.waves.append(chat_ids)
+        return FanOutReport(total=len(chat_ids), delivered=chat_ids)
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.jobs = {}
+
+    async def schedule(self, name, delay, key, **payload):
+        self.jobs[key] = (name, delay, payload)
+
+    async def cancel(self, key):
+        return self.jobs.pop(key, None) is not None
+
+    def discard(self, key):
+        pass
+
+
+class FakeEvents:
+    def publish(self, *args, **kwargs):
+        pass
+
+
+class FakeDriverBot:
+    def __init__(self):
+        self.texts = []
+
+    async def send_message(self, chat_id, text, **params):
+        self.texts.append(text)
+        return type('Message', (), {'message_id': len(self.texts)})()
+
+
+class FakeSweeper:
+    def track(self, chat_id, message_id):
+        pass
+
+
+def _service(storage: SharedOrderStorage, drivers) -> DriverNotificationService:
+    service = DriverNotificationService.__new__(DriverNotificationService)
+    service.storage = storage
+    service.fanout = FakeFanout()
+    service.scheduler = FakeScheduler()
+    service.events = FakeEvents()
+    service.sweeper = FakeSweeper()
+    service._all_drivers = lambda: list(drivers)
+    return service
+
+
+async def _notify(service: DriverNotificationService, order_id: int, locations: dict):
+    async def get_locations(driver_ids, since=None):
+        return {driver_id: locations[driver_id] for driver_id in driver_ids if driver_id in locations}
+
+    vehicle_repository.get_locations = get_locations
+    try:
+        order = {'client_id': 1001, 'pickup_lat': PICKUP[0], 'pickup_lng': PICKUP[1]}
+        await service.notify_all_drivers(order_id, order)
+    finally:
+        del vehicle_repository.get_locations
+
+
+async def _scenario(storage: SharedOrderStorage):
+    service = _service(storage, DRIVERS)
+    await _notify(service, 10, LOCATIONS)
+
+    # Первая волна - пять ближайших, следующая запланирована по таймеру
+    assert service.fanout.waves == [[1, 2, 3, 4, 5]]
+    assert service.scheduler.jobs["dispatch_wave:10"][0] == JOB_DISPATCH_WAVE
+    assert service.scheduler.jobs["auto_cancel:10"][0] == JOB_AUTO_CANCEL
+    assert (await storage.get_order_async(10))['dispatch']['queue'] == [[6, 7, 99]]
+
+    # Отказ всей волны - следующая сразу, без ожидания таймера
+    for driver_id in (1, 2, 3, 4, 5):
+        await storage.add_response_async(10, driver_id, "reject")
+        await service._handle_driver_rejection(10, driver_id, await storage.get_responses_async(10))
+    assert service.scheduler.jobs["dispatch_wave:10"][1] == 0
+    assert await storage.has_order_async(10)
+
+    # Задача волны: предложение следующим, очередь пуста - новых волн нет
+    del service.scheduler.jobs["dispatch_wave:10"]
+    assert await service._offer_next_wave(10) == 3
+    assert service.fanout.waves[-1] == [6, 7, 99]
+    assert "dispatch_wave:10" not in service.scheduler.jobs
+    assert service._offered_drivers(await storage.get_order_async(10)) == [1, 2, 3, 4, 5, 6, 7, 99]
+
+
+async def _many_waves_scenario(storage: SharedOrderStorage):
+    # 40 водителей - 8 волн по 5, но на ответ всем дается AUTO_CANCEL_SECONDS
+    drivers = list(range(1, 41))
+    locations = {driver_id: (PICKUP[0] + driver_id * 0.001, PICKUP[1]) for driver_id in drivers}
+    service = _service(storage, drivers)
+    await _notify(service, 20, locations)
+    assert 119 < service.scheduler.jobs["auto_cancel:20"][1] <= AUTO_CANCEL_SECONDS
+    assert service._response_seconds(await storage.get_order_async(20)) == AUTO_CANCEL_SECONDS
+
+    # Время идет: каждая следующая волна получает остаток до автоотмены
+    response_seconds = [AUTO_CANCEL_SECONDS]
+    while "dispatch_wave:20" in service.scheduler.jobs:
+        del service.scheduler.jobs["dispatch_wave:20"]
+        order = await storage.get_order_async(20)
+        order['dispatch']['deadline'] -= WAVE_TIMEOUT
+        await storage.add_order_async(20, order)
+        assert await service._offer_next_wave(20) == 5
+        response_seconds.append(service._response_seconds(await storage.get_order_async(20)))
+
+    print(f"📡 Волн до автоотмены: {len(service.fanout.waves)}, время на ответ: {response_seconds}")
+    assert len(service.fanout.waves) == AUTO_CANCEL_SECONDS // WAVE_TIMEOUT
+    assert response_seconds == [120, 90, 60, 30]
+    # Еще через WAVE_TIMEOUT времени на новую волну нет
+    order = await storage.get_order_async(20)
+    order['dispatch']['deadline'] -= WAVE_TIMEOUT - 10
+    await storage.add_order_async(20, order)
+    assert await service._offer_next_wave(20) == 0
+
+    # Текст предложения совпадает с оставшимся временем
+    driver_bot = FakeDriverBot()
+    bots, driver_notification.Bots = driver_notification.Bots, type('Bots', (), {'driver': driver_bot})
+    try:
+        await service._send_clean_notification(36, 20, await storage.get_order_async(20))
+    finally:
+        driver_notification.Bots = bots
+    assert "Czas na odpowiedź:</b> 10 s" in driver_bot.texts[0]
+
+    # Все отказались, новой волны не успеть - отмена сразу, не дожидаясь таймера
+    for driver_id in range(1, 21):
+        await storage.add_response_async(20, driver_id, "reject")
+    await service._handle_driver_rejection(20, 20, await storage.get_responses_async(20))
+    assert "dispatch_wave:20" not in service.scheduler.jobs
+    assert "auto_cancel:20" not in service.scheduler.jobs
+
+    assert [response_time_text(seconds) for seconds in (120, 60, 300, 90, 30)] == \
+        ["2 minuty", "1 minuta", "5 minut", "90 s", "30 s"]
+
+
+def test_dispatch_offers_in_waves():
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SharedOrderStorage(Path(tmp) / "shared_orders.db")
+        try:
+            asyncio.run(_scenario(storage))
+        finally:
+            storage.close()
+
+
+def test_dispatch_waves_fit_auto_cancel():
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SharedOrderStorage(Path(tmp) / "shared_orders.db")
+        try:
+            asyncio.run(_many_waves_scenario(storage))
+        finally:
+            storage.close()
+
+
+if __name__ == "__main__":
+    print("🧪 ТЕСТ ГЕОРАСПРЕДЕЛЕНИЯ ЗАКАЗОВ")
+    print("=" * 60)
+    test_plan_waves_orders_by_distance()
+    test_dispatch_offers_in_waves()
+    test_dispatch_waves_fit_auto_cancel()
+    print("✅ Все проверки пройдены")
@@ -0,0 +1,89 @@
+"""
+Тест векторных расстояний: haversine и equirectangular на районе Щецина
+совпадают с geopy.geodesic в пределах допуска, матрица совпадает с
+построчными расчетами, скалярный haversine_km - с векторным
+
+Запуск:
+    python test_distance.py
+"""
+import math
+import os
+import random
+import sys
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+os.environ.setdefault('CLIENT_BOT_TOKEN', '123456:TEST-CLIENT-TOKEN')
+os.environ.setdefault('DRIVER_BOT_TOKEN', '654321:TEST-DRIVER-TOKEN')
+sys.path.insert(0, str(current_dir))
+
+import numpy as np
+from geopy.distance import geodesic
+
+from core.utils.distance import (
+    haversine_one_to_many, haversine_many_to_many,
+    equirectangular_one_to_many, equirectangular_many_to_many
+)
+from core.utils.geo import haversine_km
+
+CENTER = (53.4285, 14.5528)     # Щецин
+AREA_KM = 30.0                  # Город и пригороды
+HAVERSINE_TOLERANCE = 0.005     # Относительная погрешность против geodesic
+EQUIRECTANGULAR_TOLERANCE = 0.006
+POINTS = 500
+
+
+def _random_points(rng: random.Random, count: int) -> tuple:
+    lats, lons = [], []
+    for _ in range(count):
+        distance = AREA_KM * math.sqrt(rng.random())
+        bearing = rng.uniform(0, 2 * math.pi)
+        lats.append(CENTER[0] + distance * math.cos(bearing) / 111.32)
+        lons.append(CENTER[1] + distance * math.sin(bearing) / (111.32 * math.cos(math.radians(CENTER[0]))))
+    return np.array(lats), np.array(lons)
+
+
+def test_accuracy_against_geodesic():
+    rng = random.Random(11)
+    lats, lons = _random_points(rng, POINTS)
+    origin = (float(lats[0]), float(lons[0]))
+    reference = np.array([geodesic(origin, (lat, lon)).km for lat, lon in zip(lats, lons)])
+
+    far = reference > 0.1   # Относительная погрешность на нулевых расстояниях не определена
+    for kernel, tolerance in ((haversine_one_to_many, HAVERSINE_TOLERANCE),
+                              (equirectangular_one_to_many, EQUIRECTANGULAR_TOLERANCE)):
+        distances = kernel(origin[0], origin[1], lats, lons)
+        relative = np.abs(distances[far] - reference[far]) / reference[far]
+        print(f"📏 {kernel.__name__}: макс. погрешность {relative.max() * 100:.3f}%")
+        assert relative.max() < tolerance
+        assert np.all(np.abs(distances[~far] - reference[~far]) < 0.001)
+
+
+def test_many_to_many_matches_rows():
+    rng = random.Random(5)
+    lats1, lons1 = _random_points(rng, 40)
+    lats2, lons2 = _random_points(rng, 60)
+
+    for matrix_kernel, row_kernel in ((haversine_many_to_many, haversine_one_to_many),
+                                      (equirectangular_many_to_many, equirectangular_one_to_many)):
+        matrix = matrix_kernel(lats1, lons1, lats2, lons2)
+        assert matrix.shape == (40, 60)
+        for i in range(40):
+            assert np.allclose(matrix[i], row_kernel(lats1[i], lons1[i], lats2, lons2), rtol=1e-12)
+
+    # Векторный и скалярный haversine - одна формула
+    distances = haversine_one_to_many(CENTER[0], CENTER[1], lats2, lons2)
+    expected = [haversine_km(CENTER[0], CENTER[1], lat, lon) for lat, lon in zip(lats2, lons2)]
+    assert np.allclose(distances, expected, rtol=1e-12)
+
+    # Списки на входе и пустые массивы
+    assert haversine_one_to_many(*CENTER, [CENTER[0]], [CENTER[1]]).tolist() == [0.0]
+    assert haversine_one_to_many(*CENTER, [], []).shape == (0,)
+
+
+if __name__ == "__main__":
+    print("🧪 ТЕСТ ВЕКТОРНЫХ РАССТОЯНИЙ")
+    print("=" * 60)
+    test_accuracy_against_geodesic()
+    test_many_to_many_matches_rows()
+    print("✅ Все проверки пройдены")
@@ -0,0 +1,183 @@
+"""
+Тест реестра доступности водителей: переходы поездок и геолокация меняют
+состояние в памяти, водитель без геолокации дольше ONLINE_TTL получает заказы
+в последней волне, driver_locations пишется в фоне одной строкой на водителя, после
+перезапуска состояние восстанавливается, правка трансляции геопозиции
+(edited_message) обновляет позицию в индексе
+
+Запуск:
+    python test_driver_availability.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+os.environ.setdefault('CLIENT_BOT_TOKEN', '123456:TEST-CLIENT-TOKEN')
+os.environ.setdefault('DRIVER_BOT_TOKEN', '654321:TEST-DRIVER-TOKEN')
+sys.path.insert(0, str(current_dir))
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Chat, Location, Message, Update, User
+
+from core.config import DatabaseConfig
+from core.database import DatabaseManager
+from core.models import RideStatus
+from core.repositories.driver_locations import DriverLocationRepository
+from core.repositories.rides import RideRepository
+from core.repositories.vehicles import VehicleRepository
+from core.services.availability import DriverAvailabilityRegistry, ONLINE_TTL
+from core.services.dispatch import plan_waves
+from core.services.driver_index import DriverPositionIndex, POSITION_TTL, driver_position_index
+from core.services.ride_state import RideStateMachine
+
+PICKUP = (53.4285, 14.5528)
+DRIVER_ID, OTHER_DRIVER_ID, SILENT_DRIVER_ID = 5001, 5002, 5003
+LIVE_DRIVER_ID = 5004
+
+
+async def _scenario(manager: DatabaseManager):
+    locations = DriverLocationRepository(db=manager)
+    rides = RideRepository(db=manager)
+    machine = RideStateMachine(rides)
+
+    def make_registry():
+        return DriverAvailabilityRegistry(locations, rides, DriverPositionIndex(), flush_interval=0.05)
+
+    registry = make_registry()
+    await registry.start()
+    try:
+        # Геолокация: водитель в сети и виден в пространственном индексе
+        registry.heartbeat(DRIVER_ID, *PICKUP)
+        registry.heartbeat(OTHER_DRIVER_ID, PICKUP[0] + 0.01, PICKUP[1])
+        assert registry.get(DRIVER_ID).is_online()
+        assert [driver_id for driver_id, _ in registry.index.nearest(*PICKUP, 2)] == [DRIVER_ID, OTHER_DRIVER_ID]
+
+        # Принятие заказа через машину состояний - водитель занят
+        ride = await rides.create(
+            client_id=1001, user_id=1001,
+            pickup_address="Wały Chrobrego 1, Szczecin", pickup_lat=PICKUP[0], pickup_lng=PICKUP[1],
+            destination_address="Galaxy, Szczecin", destination_lat=53.4389, destination_lng=14.5186,
+            estimated_price=Decimal('25.00'), status=RideStatus.PENDING
+        )
+        assert (await machine.accept(ride.id, DRIVER_ID)).won
+        assert registry.get(DRIVER_ID).ride_id == ride.id
+        assert registry.available_drivers([DRIVER_ID, OTHER_DRIVER_ID, 9999]) == [OTHER_DRIVER_ID, 9999]
+
+        # Геолокация устарела - позиция неизвестна: заказ предлагается, но в последней волне
+        registry.heartbeat(SILENT_DRIVER_ID, *PICKUP, at=time.time() - ONLINE_TTL - 1)
+        assert not registry.get(SILENT_DRIVER_ID).is_online()
+        candidates = registry.available_drivers([SILENT_DRIVER_ID, OTHER_DRIVER_ID])
+        assert candidates == [SILENT_DRIVER_ID, OTHER_DRIVER_ID]
+        plan = plan_waves(candidates, registry.index.positions(candidates), PICKUP, ring_size=1)
+        assert plan.waves == [[OTHER_DRIVER_ID], [SILENT_DRIVER_ID]]
+        registry.heartbeat(SILENT_DRIVER_ID, *PICKUP)
+        assert registry.index.get(SILENT_DRIVER_ID) is not None
+
+        # Запись в фоне: одна строка на водителя, повторные heartbeat - update
+        registry.heartbeat(DRIVER_ID, PICKUP[0] + 0.001, PICKUP[1])
+        # Ждем строк в БД: dirty очищается до окончания записи
+        for _ in range(100):
+            rows = {row.driver_id: row for row in await locations.list_all()}
+            if len(rows) == 3 and rows[DRIVER_ID].latitude == PICKUP[0] + 0.001:
+                break
+            await asyncio.sleep(0.02)
+        assert len(rows) == 3
+        assert rows[DRIVER_ID].latitude == PICKUP[0] + 0.001
+        assert rows[DRIVER_ID].is_available and rows[DRIVER_ID].is_online
+
+        # Запасные позиции из БД для распределения - только не старше TTL
+        vehicles = VehicleRepository(db=manager)
+        assert DRIVER_ID in await vehicles.get_locations([DRIVER_ID], since=datetime.now() - timedelta(minutes=1))
+        assert await vehicles.get_locations([DRIVER_ID], since=datetime.now() + timedelta(minutes=1)) == {}
+
+        # Прием заказов выключен в driver_locations (другим процессом)
+        paused = dict(driver_id=OTHER_DRIVER_ID, latitude=PICKUP[0] + 0.01, longitude=PICKUP[1],
+                      is_online=True, is_available=False, updated_at=datetime.now())
+        await locations.upsert_many([paused])
+
+        # Более старое состояние другого процесса не перезаписывает новое
+        stale = dict(driver_id=DRIVER_ID, latitude=0.0, longitude=0.0, is_online=False, is_available=True,
+                     updated_at=rows[DRIVER_ID].updated_at.replace(year=2020))
+        await locations.upsert_many([stale])
+        assert {row.driver_id: row for row in await locations.list_all()}[DRIVER_ID].latitude != 0.0
+    finally:
+        await registry.stop()
+
+    # Перезапуск: состояние из driver_locations и активных поездок
+    restarted = make_registry()
+    await restarted.rebuild()
+    state = restarted.get(DRIVER_ID)
+    assert state.ride_id == ride.id and state.is_online(time.time())
+    assert restarted.location(DRIVER_ID) == (PICKUP[0] + 0.001, PICKUP[1])
+    assert not restarted.can_take_orders(OTHER_DRIVER_ID)
+    # Перезапуск спустя долгое время: позиции устарели, но заказы водители получают
+    assert restarted.can_take_orders(SILENT_DRIVER_ID, time.time() + ONLINE_TTL + 1)
+    assert restarted.index.get(DRIVER_ID) is not None
+
+    # Поездка завершена - водитель снова свободен
+    await machine.arrive(ride.id, DRIVER_ID)
+    await machine.start(ride.id, DRIVER_ID)
+    await machine.complete(ride.id, DRIVER_ID, Decimal('25.00'))
+    assert restarted.can_take_orders(DRIVER_ID)
+    assert registry.can_take_orders(DRIVER_ID)
+
+
+async def _live_location_edit():
+    from core.handlers.driver import order_handlers
+
+    # Позиция из исходного сообщения трансляции уже выпала из индекса по TTL
+    driver_position_index.update(LIVE_DRIVER_ID, *PICKUP, time.time() - POSITION_TTL - 1, publish=False)
+    assert driver_position_index.positions([LIVE_DRIVER_ID]) == {}
+
+    # Трансляция геопозиции приходит правкой сообщения (edited_message)
+    dp = Dispatcher()
+    dp.include_router(order_handlers.router)
+    assert "edited_message" in dp.resolve_used_update_types()
+    moved = (PICKUP[0] + 0.02, PICKUP[1])
+    edited = Message(
+        message_id=1,
+        date=datetime.now(),
+        edit_date=int(time.time()),
+        chat=Chat(id=LIVE_DRIVER_ID, type="private"),
+        from_user=User(id=LIVE_DRIVER_ID, is_bot=False, first_name="Driver"),
+        location=Location(latitude=moved[0], longitude=moved[1])
+    )
+    bot = Bot(os.environ['DRIVER_BOT_TOKEN'])
+    try:
+        await dp.feed_update(bot, Update(update_id=1, edited_message=edited))
+    finally:
+        await bot.session.close()
+
+    assert driver_position_index.positions([LIVE_DRIVER_ID]) == {LIVE_DRIVER_ID: moved}
+    print(f"📡 Правка трансляции геопозиции обновила позицию: {moved}")
+
+
+def test_driver_availability_registry():
+    with tempfile.TemporaryDirectory() as tmp:
+        async def run():
+            manager = DatabaseManager(DatabaseConfig(url=f"sqlite+aiosqlite:///{Path(tmp) / 'taxi.db'}"))
+            await manager.initialize()
+            try:
+                await _scenario(manager)
+            finally:
+                await manager.close()
+
+        asyncio.run(run())
+
+
+def test_edited_live_location_refreshes_position():
+    asyncio.run(_live_location_edit())
+
+
+if __name__ == "__main__":
+    print("🧪 ТЕСТ РЕЕСТРА ДОСТУПНОСТИ ВОДИТЕЛЕЙ")
+    print("=" * 60)
+    test_driver_availability_registry()
+    test_edited_live_location_refreshes_position()
+    print("✅ Все проверки пройдены")
@@ -0,0 +1,111 @@
+"""
+Тест индекса позиций водителей: запросы по радиусу и k ближайших совпадают
+с полным перебором, устаревшие позиции выпадают, запрос занимает
+микросекунды
+
+Запуск:
+    python test_driver_index.py
+"""
+import math
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+os.environ.setdefault('CLIENT_BOT_TOKEN', '123456:TEST-CLIENT-TOKEN')
+os.environ.setdefault('DRIVER_BOT_TOKEN', '654321:TEST-DRIVER-TOKEN')
+sys.path.insert(0, str(current_dir))
+
+from core.services.driver_index import DriverPositionIndex
+from core.utils.geo import haversine_km
+
+CENTER = (53.4285, 14.5528)
+DRIVERS = 2000
+QUERIES = 200
+MAX_QUERY_US = 1000
+
+
+def _random_point(rng: random.Random, radius_km: float = 15.0) -> tuple:
+    distance = radius_km * math.sqrt(rng.random())
+    bearing = rng.uniform(0, 2 * math.pi)
+    return (
+        CENTER[0] + distance * math.cos(bearing) / 111.32,
+        CENTER[1] + distance * math.sin(bearing) / (111.32 * math.cos(math.radians(CENTER[0])))
+    )
+
+
+def _brute_force(positions: dict, point: tuple) -> list:
+    return sorted(
+        ((driver_id, haversine_km(point[0], point[1], lat, lon)) for driver_id, (lat, lon) in positions.items()),
+        key=lambda item: item[1]
+    )
+
+
+def test_queries_match_brute_force():
+    rng = random.Random(7)
+    index = DriverPositionIndex()
+    positions = {driver_id: _random_point(rng) for driver_id in range(DRIVERS)}
+    for driver_id, (lat, lon) in positions.items():
+        index.update(driver_id, lat, lon)
+
+    # Часть водителей переезжает в другие ячейки
+    for driver_id in range(0, DRIVERS, 10):
+        positions[driver_id] = _random_point(rng)
+        index.update(driver_id, *positions[driver_id])
+
+    knn_us, radius_us = [], []
+    for _ in range(QUERIES):
+        point = _random_point(rng, 20.0)
+        expected = _brute_force(positions, point)
+
+        started = time.perf_counter()
+        nearest = index.nearest(point[0], point[1], 10)
+        knn_us.append((time.perf_counter() - started) * 1_000_000)
+        assert [driver_id for driver_id, _ in nearest] == [driver_id for driver_id, _ in expected[:10]]
+
+        started = time.perf_counter()
+        found = index.within_radius(point[0], point[1], 2.5)
+        radius_us.append((time.perf_counter() - started) * 1_000_000)
+        assert {driver_id for driver_id, _ in found} == {d for d, distance in expected if distance <= 2.5}
+
+    print(f"📍 {DRIVERS} водителей: k=10 p50 {statistics.median(knn_us):.0f} µs, "
+          f"радиус 2.5 км p50 {statistics.median(radius_us):.0f} µs")
+    assert statistics.median(knn_us) < MAX_QUERY_US
+    assert statistics.median(radius_us) < MAX_QUERY_US
+
+    # Меньше водителей, чем k, и ограничение радиуса
+    assert len(index.nearest(CENTER[0], CENTER[1], DRIVERS + 5)) == DRIVERS
+    assert all(distance <= 1.0 for _, distance in index.nearest(CENTER[0], CENTER[1], 50, max_radius_km=1.0))
+
+
+def test_stale_positions_expire():
+    index = DriverPositionIndex(ttl=60)
+    now = time.time()
+    index.update(1, *CENTER, updated_at=now - 120)
+    index.update(2, *CENTER, updated_at=now - 30)
+    index.update(3, CENTER[0] + 0.01, CENTER[1], updated_at=now)
+
+    assert [driver_id for driver_id, _ in index.nearest(*CENTER, 5)] == [2, 3]
+    assert index.get(1) is None
+    assert index.get_stats()['expired'] == 1
+
+    # Устаревшее событие не перезаписывает свежую позицию
+    index.update(3, *CENTER, updated_at=now - 10)
+    assert index.get(3) == (CENTER[0] + 0.01, CENTER[1])
+
+    # Обновление продлевает жизнь позиции
+    index.update(2, *CENTER, updated_at=now + 40)
+    assert index.expire(now + 80) == 1
+    assert index.positions() == {2: CENTER}
+    assert index.get_stats()['cells'] == 1
+
+
+if __name__ == "__main__":
+    print("🧪 ТЕСТ ИНДЕКСА ПОЗИЦИЙ ВОДИТЕЛЕЙ")
+    print("=" * 60)
+    test_queries_match_brute_force()
+    test_stale_positions_expire()
+    print("✅ Все проверки пройдены")
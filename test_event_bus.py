@@ -0,0 +1,211 @@
+"""
+Тест шины событий: доставка между экземплярами за миллисекунды, повтор
+пропущенного после разрыва и переход роли брокера; процесс, который не
+читает события, брокер отключает, и он догоняет их из журнала
+
+Запуск:
+    python test_event_bus.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+os.environ.setdefault('CLIENT_BOT_TOKEN', '123456:TEST-CLIENT-TOKEN')
+os.environ.setdefault('DRIVER_BOT_TOKEN', '654321:TEST-DRIVER-TOKEN')
+sys.path.insert(0, str(current_dir))
+
+from core.models import RideStatus
+from core.services.active_rides import ActiveRideIndex
+from core.services.event_bus import (
+    EventBus, UnixSocketBackend, ORDER_CREATED, ORDER_ACCEPTED, RIDE_STATUS, _encode
+)
+
+MAX_LATENCY_MS = 50
+
+
+class Inbox:
+    """Подписчик, который запоминает события"""
+
+    def __init__(self, bus: EventBus, types=None):
+        self.events = []
+        self._arrived = asyncio.Event()
+        bus.subscribe(self._on_event, types)
+
+    def _on_event(self, event):
+        self.events.append(event)
+        self._arrived.set()
+
+    async def wait_for(self, count: int, timeout: float = 2.0):
+        deadline = time.monotonic() + timeout
+        while len(self.events) < count:
+            self._arrived.clear()
+            await asyncio.wait_for(self._arrived.wait(), max(deadline - time.monotonic(), 0.001))
+        return self.events
+
+
+async def _wait_role(backend: UnixSocketBackend, role: str):
+    for _ in range(200):
+        if backend.role == role:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"backend role {backend.role} != {role}")
+
+
+async def _scenario(socket_path: Path):
+    backend_a = UnixSocketBackend(socket_path)
+    backend_b = UnixSocketBackend(socket_path)
+    bus_a, bus_b = EventBus(backend_a), EventBus(backend_b)
+    inbox_a, inbox_b = Inbox(bus_a), Inbox(bus_b)
+    bus_c = None
+    try:
+        await bus_a.start()
+        await bus_b.start()
+        assert backend_a.role == "broker" and backend_b.role == "client"
+
+        # Доставка в обе стороны
+        started = time.perf_counter()
+        bus_b.publish(ORDER_CREATED, 1, client_id=1001)
+        await inbox_a.wait_for(1)
+        latency_ms = (time.perf_counter() - started) * 1000
+        bus_a.publish(ORDER_ACCEPTED, 1, driver_id=5001)
+        await inbox_b.wait_for(2)
+        print(f"📡 Доставка клиент -> брокер: {latency_ms:.2f} мс")
+        assert latency_ms < MAX_LATENCY_MS
+        assert inbox_a.events[0].data == {'client_id': 1001}
+        # Свои события доставляются локально один раз, без эха от брокера
+        assert [e.type for e in inbox_b.events] == [ORDER_CREATED, ORDER_ACCEPTED]
+
+        # Разрыв соединения: пропущенное приходит из журнала
+        await backend_b._close_client()
+        for order_id in (2, 3, 4):
+            bus_a.publish(ORDER_CREATED, order_id)
+        events = await inbox_b.wait_for(5)
+        assert [e.order_id for e in events[2:]] == [2, 3, 4]
+        assert backend_b.stats['replayed'] == 3
+        assert backend_b.stats['reconnects'] == 1
+
+        # Брокер завершился: его роль занимает клиент, новые процессы подключаются
+        await bus_a.stop()
+        await _wait_role(backend_b, "broker")
+        bus_c = EventBus(UnixSocketBackend(socket_path))
+        inbox_c = Inbox(bus_c)
+        await bus_c.start()
+        bus_b.publish(ORDER_CREATED, 5)
+        assert [e.order_id for e in await inbox_c.wait_for(1)] == [5]
+    finally:
+        for bus in (bus_c, bus_b, bus_a):
+            if bus is not None:
+                await bus.stop()
+
+
+class FakeRideRepository:
+    """Только подписка на переходы - индексу этого достаточно"""
+
+    def __init__(self):
+        self._listeners = []
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+
+class FakeRide:
+    def __init__(self, ride_id, status, client_id, driver_id):
+        self.id = ride_id
+        self.status = status
+        self.client_id = client_id
+        self.user_id = client_id
+        self.driver_id = driver_id
+
+
+async def _index_scenario(socket_path: Path):
+    client_repo, driver_repo = FakeRideRepository(), FakeRideRepository()
+    client_index, driver_index = ActiveRideIndex(client_repo), ActiveRideIndex(driver_repo)
+    client_bus = EventBus(UnixSocketBackend(socket_path))
+    driver_bus = EventBus(UnixSocketBackend(socket_path))
+    client_index.attach_event_bus(client_bus)
+    driver_index.attach_event_bus(driver_bus)
+    inbox = Inbox(client_bus, (RIDE_STATUS,))
+    try:
+        await client_bus.start()
+        await driver_bus.start()
+
+        # Водительский процесс принял заказ - клиентский индекс узнает сразу
+        ride = FakeRide(7, RideStatus.ACCEPTED, 1001, 5001)
+        for listener in driver_repo._listeners:
+            listener(ride)
+        await inbox.wait_for(1)
+        entry = await client_index.for_client(1001)
+        assert entry.ride_id == 7 and entry.status == RideStatus.ACCEPTED
+        assert client_index.remote_updates == 1
+
+        ride.status = RideStatus.COMPLETED
+        for listener in driver_repo._listeners:
+            listener(ride)
+        await inbox.wait_for(2)
+        assert 7 not in client_index._by_ride
+    finally:
+        await driver_bus.stop()
+        await client_bus.stop()
+
+
+async def _slow_peer_scenario(socket_path: Path):
+    broker = UnixSocketBackend(socket_path, peer_buffer_limit=64 * 1024)
+    bus_a, bus_b = EventBus(broker), EventBus(UnixSocketBackend(socket_path))
+    inbox_b = Inbox(bus_b)
+    reader = writer = None
+    try:
+        await bus_a.start()
+        await bus_b.start()
+
+        # Процесс подключился и завис: события не читает
+        reader, writer = await asyncio.open_unix_connection(str(socket_path))
+        writer.write(_encode({'op': 'hello', 'epoch': '', 'last_seq': 0}))
+        await writer.drain()
+        while broker.stats['peers'] < 2:
+            await asyncio.sleep(0.01)
+
+        padding = "x" * 2048
+        for order_id in range(1, 501):
+            bus_a.publish(ORDER_CREATED, order_id, padding=padding)
+            await asyncio.sleep(0)
+        print(f"🐢 Брокер после публикаций: {broker.get_stats()}")
+        assert broker.stats['slow_peers'] == 1
+        assert broker.stats['peers'] == 1
+
+        # Читающий процесс получил все, соединение зависшего закрыто брокером
+        assert len(await inbox_b.wait_for(500, timeout=5)) == 500
+        await asyncio.wait_for(reader.read(), timeout=5)
+        assert reader.at_eof()
+    finally:
+        if writer is not None:
+            writer.close()
+        await bus_b.stop()
+        await bus_a.stop()
+
+
+def test_event_bus_delivery_replay_failover():
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(_scenario(Path(tmp) / "events.sock"))
+
+
+def test_event_bus_updates_remote_ride_index():
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(_index_scenario(Path(tmp) / "events.sock"))
+
+
+def test_event_bus_disconnects_slow_peer():
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(_slow_peer_scenario(Path(tmp) / "events.sock"))
+
+
+if __name__ == "__main__":
+    print("🧪 ТЕСТ ШИНЫ СОБЫТИЙ")
+    print("=" * 60)
+    test_event_bus_delivery_replay_failover()
+    test_event_bus_updates_remote_ride_index()
+    test_event_bus_disconnects_slow_peer()
+    print("✅ Все проверки пройдены")
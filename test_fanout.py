@@ -0,0 +1,120 @@
+"""
+Тест рассылки водителям с лимитами Telegram
+
+Запуск:
+    python test_fanout.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+os.environ.setdefault('CLIENT_BOT_TOKEN', '123456:TEST-CLIENT-TOKEN')
+os.environ.setdefault('DRIVER_BOT_TOKEN', '654321:TEST-DRIVER-TOKEN')
+sys.path.insert(0, str(current_dir))
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from core.services.event_bus import EventBus, UnixSocketBackend
+from core.services.fanout import (
+    FanOutDispatcher, ChatRateLimiter, GLOBAL_RATE, SENDING_PROCESSES, get_rate_limiter
+)
+
+DRIVERS = 50
+API_LATENCY = 0.05
+
+
+async def _fan_out_to_drivers():
+    dispatcher = FanOutDispatcher(ChatRateLimiter(global_rate=30, per_chat_rate=1))
+    delivered_at = {}
+    throttled = {7}
+    started = time.monotonic()
+
+    async def send(chat_id):
+        await asyncio.sleep(API_LATENCY)
+        if chat_id in throttled:
+            throttled.discard(chat_id)
+            raise TelegramRetryAfter(SendMessage(chat_id=chat_id, text="x"), "Flood control", retry_after=1)
+        delivered_at[chat_id] = time.monotonic() - started
+
+    report = await dispatcher.fan_out(range(DRIVERS), send)
+    sequential = DRIVERS * (API_LATENCY + 0.2)
+    print(f"🚀 {DRIVERS} водителей: последний через {report.time_to_last:.2f}s "
+          f"(последовательно было бы ~{sequential:.1f}s), повторов: {report.retries}")
+
+    assert report.success_count == DRIVERS and not report.failed
+    assert report.retries == 1
+    # Пауза только для чата 7, остальные идут с общей скоростью 30/с
+    assert delivered_at[7] >= 1.0
+    others = [at for chat_id, at in delivered_at.items() if chat_id != 7]
+    assert max(others) < (DRIVERS - 1) / 30 + 0.5
+    # Не больше ~30 сообщений в первую секунду
+    assert sum(1 for at in delivered_at.values() if at < 1.0) <= 31
+
+
+async def _per_chat_limit():
+    limiter = ChatRateLimiter(global_rate=30, per_chat_rate=1)
+    started = time.monotonic()
+    for _ in range(3):
+        await limiter.acquire(42)
+    elapsed = time.monotonic() - started
+    print(f"💬 3 сообщения в один чат: {elapsed:.2f}s")
+    assert elapsed >= 1.9
+
+
+async def _pause_shared_between_processes(socket_path: Path):
+    # Два процесса с одним водительским ботом
+    bus_a, bus_b = EventBus(UnixSocketBackend(socket_path)), EventBus(UnixSocketBackend(socket_path))
+    limiter_a, limiter_b = ChatRateLimiter(name="driver"), ChatRateLimiter(name="driver")
+    client_b = ChatRateLimiter(name="client")
+    limiter_a.attach_event_bus(bus_a)
+    limiter_b.attach_event_bus(bus_b)
+    client_b.attach_event_bus(bus_b)
+    try:
+        await bus_a.start()
+        await bus_b.start()
+
+        limiter_a.pause_chat(42, 5)
+        for _ in range(200):
+            if limiter_b.chat_delay(42) > 0:
+                break
+            await asyncio.sleep(0.01)
+        print(f"⏸️ RetryAfter в процессе A -> пауза в процессе B: {limiter_b.chat_delay(42):.2f}s")
+        assert 4 < limiter_b.chat_delay(42) <= 5
+        # Пауза другого бота и своя же пауза обратно не применяются
+        assert client_b.chat_delay(42) == 0
+        assert limiter_a.chat_delay(42) <= 5
+    finally:
+        await bus_b.stop()
+        await bus_a.stop()
+
+
+def test_fan_out_respects_limits_and_retry_after():
+    asyncio.run(_fan_out_to_drivers())
+
+
+def test_per_chat_limit():
+    asyncio.run(_per_chat_limit())
+
+
+def test_retry_after_pause_is_shared():
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(_pause_shared_between_processes(Path(tmp) / "events.sock"))
+
+
+def test_process_takes_its_share_of_bot_limit():
+    assert get_rate_limiter("driver").global_bucket.rate == GLOBAL_RATE / SENDING_PROCESSES
+
+
+if __name__ == "__main__":
+    print("🧪 ТЕСТ РАССЫЛКИ ВОДИТЕЛЯМ")
+    print("=" * 60)
+    test_fan_out_respects_limits_and_retry_after()
+    test_per_chat_limit()
+    test_retry_after_pause_is_shared()
+    test_process_takes_its_share_of_bot_limit()
+    print("✅ Все проверки пройдены")
@@ -0,0 +1,189 @@
+"""
+Тест кэша геокодера: варианты написания адреса дают один ключ, повторный
+адрес не доходит до API, после перезапуска память прогревается из
+geocode_cache, устаревшие и лишние записи вытесняются; обратное
+геокодирование близких GPS-точек отвечает из кэша по ячейке сетки
+
+Запуск:
+    python test_geocode_cache.py
+"""
+import asyncio
+import math
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+os.environ.setdefault('CLIENT_BOT_TOKEN', '123456:TEST-CLIENT-TOKEN')
+os.environ.setdefault('DRIVER_BOT_TOKEN', '654321:TEST-DRIVER-TOKEN')
+sys.path.insert(0, str(current_dir))
+
+from aiohttp import web
+
+from core.config import DatabaseConfig
+from core.database import DatabaseManager
+from core.repositories.geocode_cache import GeocodeCacheRepository
+from core.services.geocode_cache import GeocodeCache, normalize_address
+from core.services.maps_service import MapsService
+
+STATION = (53.4187, 14.5502, 'Szczecin Główny, Kolumba, 70-035 Szczecin, Polska')
+METERS_PER_DEGREE = 111320.0
+
+
+def test_normalize_address():
+    assert normalize_address("ul. Wały  Chrobrego 1, Szczecin") == "waly chrobrego 1"
+    assert normalize_address("WAŁY CHROBREGO 1") == "waly chrobrego 1"
+    assert normalize_address("Ulica Wały Chrobrego 1, Szczecin, Poland") == "waly chrobrego 1"
+    assert normalize_address("Dworzec Główny") == normalize_address("dworzec  glowny.")
+    assert normalize_address("Plac Żołnierza Polskiego") == "plac zolnierza polskiego"
+    assert normalize_address("Galaxy") != normalize_address("Kaskada")
+
+
+async def _scenario(manager: DatabaseManager):
+    api_calls = []
+
+    async def geocode(request: web.Request) -> web.Response:
+        api_calls.append(request.query['address'])
+        return web.json_response({'status': 'OK', 'results': [{
+            'formatted_address': STATION[2],
+            'geometry': {'location': {'lat': STATION[0], 'lng': STATION[1]}}
+        }]})
+
+    app = web.Application()
+    app.router.add_get('/maps/api/geocode/json', geocode)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/maps/api"
+
+    repository = GeocodeCacheRepository(db=manager)
+    cache = GeocodeCache(repository, memory_size=2)
+    service = MapsService(api_key='test-cache', base_url=base_url, cache=cache)
+    try:
+        # Первый ввод - запрос к API, варианты написания - из памяти
+        for typed in ("Dworzec Główny", "dworzec glowny", "ul. Dworzec  Główny, Szczecin"):
+            location = await service.geocode_address(typed)
+            assert (location.latitude, location.longitude, location.address) == STATION
+        assert len(api_calls) == 1
+        assert cache.stats['memory_hits'] == 2 and cache.stats['misses'] == 1
+
+        # Память переполнена - вытесненный адрес читается из таблицы
+        await cache.put("Galaxy", 53.4389, 14.5186, "Galaxy, Szczecin")
+        await cache.put("Kaskada", 53.4302, 14.5530, "Kaskada, Szczecin")
+        assert cache.stats['evicted'] == 1
+        assert (await service.geocode_address("DWORZEC GŁÓWNY")).address == STATION[2]
+        assert len(api_calls) == 1 and cache.stats['persistent_hits'] == 1
+
+        # Перезапуск: прогрев из geocode_cache, дальше чтения только из памяти
+        restarted = GeocodeCache(repository, memory_size=2)
+        assert await restarted.warm_up() == 2
+        assert await restarted.get("Dworzec Główny") == STATION
+        assert await restarted.get("kaskada") is not None
+        assert restarted.get_stats()['hit_rate'] == 1.0
+
+        # Устаревшие записи не отдаются и удаляются
+        expired = GeocodeCache(repository, ttl=0)
+        assert await expired.get("Galaxy") is None
+        assert await expired.purge() == 3
+
+        # Ограничение размера таблицы
+        small = GeocodeCache(repository, persistent_size=2)
+        for name in ("A", "B", "C"):
+            await small.put(name, 53.0, 14.0, name)
+        assert await small.purge() == 1
+        assert len(await repository.recent(datetime.now() - timedelta(days=1), 10)) == 2
+    finally:
+        await service.close()
+        await runner.cleanup()
+
+
+def test_reverse_key_grid():
+    cache = GeocodeCache(grid_m=25)
+    # Центр ячейки сетки рядом с вокзалом
+    step = 25 / METERS_PER_DEGREE
+    lat = round(STATION[0] / step) * step
+    meter_lon = 1 / (METERS_PER_DEGREE * math.cos(math.radians(lat)))
+    lon = round(STATION[1] / (25 * meter_lon)) * 25 * meter_lon
+    center = cache.reverse_key(lat, lon)
+
+    # Точки в пределах 10 м от центра - та же ячейка, в 60 м - другая
+    for d_lat, d_lon in ((10, 0), (-10, 0), (0, 10), (0, -10), (7, -7)):
+        assert cache.reverse_key(lat + d_lat / METERS_PER_DEGREE, lon + d_lon * meter_lon) == center
+    assert cache.reverse_key(lat + 60 / METERS_PER_DEGREE, lon) != center
+    assert cache.reverse_key(lat, lon + 60 * meter_lon) != center
+    assert GeocodeCache(grid_m=100).reverse_key(lat, lon) != center
+
+
+async def _reverse_scenario(manager: DatabaseManager):
+    api_calls = []
+
+    async def geocode(request: web.Request) -> web.Response:
+        api_calls.append(request.query['latlng'])
+        return web.json_response({'status': 'OK', 'results': [{'formatted_address': f"Adres {len(api_calls)}"}]})
+
+    app = web.Application()
+    app.router.add_get('/maps/api/geocode/json', geocode)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/maps/api"
+
+    repository = GeocodeCacheRepository(db=manager)
+    cache = GeocodeCache(repository, grid_m=25)
+    service = MapsService(api_key='test-cache', base_url=base_url, cache=cache)
+    cell = 25 / METERS_PER_DEGREE
+    lat, lon = round(53.4187 / cell) * cell, 14.5502
+    try:
+        # Дрожание GPS в пределах ячейки - один запрос к API
+        assert await service.reverse_geocode(lat, lon) == "Adres 1"
+        assert await service.reverse_geocode(lat + 2 / METERS_PER_DEGREE, lon) == "Adres 1"
+        assert await service.reverse_geocode(lat - 3 / METERS_PER_DEGREE, lon) == "Adres 1"
+        assert len(api_calls) == 1 and cache.stats['memory_hits'] == 2
+
+        # Другая ячейка - новый запрос
+        assert await service.reverse_geocode(lat + 100 / METERS_PER_DEGREE, lon) == "Adres 2"
+        assert len(api_calls) == 2
+
+        # Постоянный уровень: другой процесс получает адрес из geocode_cache
+        other = MapsService(api_key='test-cache', base_url=base_url, cache=GeocodeCache(repository, grid_m=25))
+        assert await other.reverse_geocode(lat + 1 / METERS_PER_DEGREE, lon) == "Adres 1"
+        assert len(api_calls) == 2
+        await other.close()
+    finally:
+        await service.close()
+        await runner.cleanup()
+
+
+def _with_database(scenario):
+    with tempfile.TemporaryDirectory() as tmp:
+        async def run():
+            manager = DatabaseManager(DatabaseConfig(url=f"sqlite+aiosqlite:///{Path(tmp) / 'taxi.db'}"))
+            await manager.initialize()
+            try:
+                await scenario(manager)
+            finally:
+                await manager.close()
+
+        asyncio.run(run())
+
+
+def test_geocode_cache_tiers():
+    _with_database(_scenario)
+
+
+def test_reverse_geocode_cache():
+    _with_database(_reverse_scenario)
+
+
+if __name__ == "__main__":
+    print("🧪 ТЕСТ КЭША ГЕОКОДЕРА")
+    print("=" * 60)
+    test_normalize_address()
+    test_geocode_cache_tiers()
+    test_reverse_key_grid()
+    test_reverse_geocode_cache()
+    print("✅ Все проверки пройдены")
@@ -0,0 +1,72 @@
+"""
+Тест общей сессии MapsService: повторные запросы идут по одному соединению,
+close() закрывает пул, после него сессия создается заново
+
+Запуск:
+    python test_maps_session.py
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+os.environ.setdefault('CLIENT_BOT_TOKEN', '123456:TEST-CLIENT-TOKEN')
+os.environ.setdefault('DRIVER_BOT_TOKEN', '654321:TEST-DRIVER-TOKEN')
+sys.path.insert(0, str(current_dir))
+
+from aiohttp import web
+
+from core.services.maps_service import MapsService, Location
+
+ADDRESS = 'Wały Chrobrego 1, 70-500 Szczecin, Polska'
+
+
+async def _scenario():
+    connections = set()
+
+    async def geocode(request: web.Request) -> web.Response:
+        connections.add(request.transport.get_extra_info('peername'))
+        return web.json_response({'status': 'OK', 'results': [{
+            'formatted_address': ADDRESS,
+            'geometry': {'location': {'lat': 53.4285, 'lng': 14.5528}}
+        }]})
+
+    app = web.Application()
+    app.router.add_get('/maps/api/geocode/json', geocode)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    service = MapsService(api_key='test-session', base_url=f"http://127.0.0.1:{port}/maps/api")
+    try:
+        for _ in range(5):
+            assert await service.reverse_geocode(53.4285, 14.5528) == ADDRESS
+        location = await service.geocode_address("Wały Chrobrego 1")
+        assert isinstance(location, Location) and location.address == ADDRESS
+        assert len(connections) == 1
+
+        session = service._get_session()
+        await service.close()
+        assert session.closed
+
+        # После закрытия - новая сессия и новое соединение
+        assert await service.reverse_geocode(53.4285, 14.5528) == ADDRESS
+        assert service._get_session() is not session
+        assert len(connections) == 2
+    finally:
+        await service.close()
+        await runner.cleanup()
+
+
+def test_maps_service_reuses_connection():
+    asyncio.run(_scenario())
+
+
+if __name__ == "__main__":
+    print("🧪 ТЕСТ ОБЩЕЙ СЕССИИ MAPS API")
+    print("=" * 60)
+    test_maps_service_reuses_connection()
+    print("✅ Все проверки пройдены")
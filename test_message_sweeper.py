@@ -0,0 +1,121 @@
+"""
+Тест фоновой очистки сообщений водителей: последние сообщения по общей
+таблице, пакетное удаление лишних, два процесса и перезапуск
+
+Запуск:
+    python test_message_sweeper.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+os.environ.setdefault('CLIENT_BOT_TOKEN', '123456:TEST-CLIENT-TOKEN')
+os.environ.setdefault('DRIVER_BOT_TOKEN', '654321:TEST-DRIVER-TOKEN')
+sys.path.insert(0, str(current_dir))
+
+from core.services.driver_notification import SharedOrderStorage
+from core.services.message_sweeper import MessageSweeper, KEEP_LAST
+
+DRIVER_ID = 5001
+OLD_MESSAGES = 250
+
+
+class FakeBot:
+    """Запоминает пакетные удаления; первая попытка может упасть"""
+
+    def __init__(self, fail_first: bool = False):
+        self.calls = []
+        self._fail_first = fail_first
+
+    async def delete_messages(self, chat_id, message_ids):
+        if self._fail_first:
+            self._fail_first = False
+            raise ConnectionError("network is unreachable")
+        self.calls.append((chat_id, list(message_ids)))
+        return True
+
+
+class LegacyBot:
+    """Бот без deleteMessages - удаление по одному"""
+
+    def __init__(self):
+        self.deleted = []
+
+    async def delete_message(self, chat_id, message_id):
+        self.deleted.append(message_id)
+
+
+async def _scenario(storage: SharedOrderStorage, other_storage: SharedOrderStorage):
+    bot = FakeBot(fail_first=True)
+    sweeper = MessageSweeper(storage, bot=bot)
+
+    # Путь отправки только запоминает ID: API не вызывается
+    for message_id in range(1, OLD_MESSAGES + 1):
+        await storage.add_message_async(DRIVER_ID, message_id, message_id)
+        sweeper.track(DRIVER_ID, message_id)
+    assert bot.calls == []
+
+    # Сетевая ошибка - забранное из таблицы ждет следующего прохода
+    assert await sweeper.sweep() == 0
+    assert sweeper.get_stats()['pending'] == OLD_MESSAGES - KEEP_LAST
+
+    # Пачки по 100 ID вместо запроса на каждое сообщение
+    assert await sweeper.sweep() == OLD_MESSAGES - KEEP_LAST
+    print(f"🗑️ Удалено за {len(bot.calls)} запросов: {sweeper.get_stats()}")
+    assert [len(ids) for _, ids in bot.calls] == [100, 100, OLD_MESSAGES - KEEP_LAST - 200]
+    assert bot.calls[0][1][0] == 1
+    assert sorted(storage.get_driver_messages(DRIVER_ID)) == [OLD_MESSAGES - 1, OLD_MESSAGES]
+
+    # После перезапуска удалять нечего; новое сообщение вытесняет самое старое в фоне
+    restarted = MessageSweeper(storage, bot=FakeBot())
+    await restarted.start()
+    try:
+        await storage.add_message_async(DRIVER_ID, OLD_MESSAGES + 1, 0)
+        restarted.track(DRIVER_ID, OLD_MESSAGES + 1)
+        for _ in range(100):
+            if restarted.bot.calls:
+                break
+            await asyncio.sleep(0.01)
+        assert restarted.bot.calls == [(DRIVER_ID, [OLD_MESSAGES - 1])]
+    finally:
+        await restarted.stop()
+
+    # Два процесса: лимит KEEP_LAST общий, каждое сообщение удаляет один из них
+    bots = FakeBot(), FakeBot()
+    sweepers = MessageSweeper(storage, bot=bots[0]), MessageSweeper(other_storage, bot=bots[1])
+    first_id = OLD_MESSAGES + 2
+    for offset in range(6):
+        process = offset % 2
+        await (storage, other_storage)[process].add_message_async(DRIVER_ID, first_id + offset, 0)
+        sweepers[process].track(DRIVER_ID, first_id + offset)
+    await asyncio.gather(*(process_sweeper.sweep() for process_sweeper in sweepers))
+    deleted = [message_id for process_bot in bots for _, ids in process_bot.calls for message_id in ids]
+    assert sorted(deleted) == [OLD_MESSAGES, OLD_MESSAGES + 1] + list(range(first_id, first_id + 4))
+    assert sorted(storage.get_driver_messages(DRIVER_ID)) == [first_id + 4, first_id + 5]
+
+    # Бот без пакетного метода удаляет по одному
+    legacy = MessageSweeper(storage, bot=LegacyBot())
+    legacy.delete(DRIVER_ID, [7, 8, 8])
+    assert await legacy.sweep() == 2
+    assert legacy.bot.deleted == [7, 8]
+
+
+def test_message_sweeper_batches_and_shares_table():
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SharedOrderStorage(Path(tmp) / "shared_orders.db")
+        other_storage = SharedOrderStorage(Path(tmp) / "shared_orders.db")
+        try:
+            asyncio.run(_scenario(storage, other_storage))
+        finally:
+            other_storage.close()
+            storage.close()
+
+
+if __name__ == "__main__":
+    print("🧪 ТЕСТ ОЧИСТКИ СООБЩЕНИЙ ВОДИТЕЛЕЙ")
+    print("=" * 60)
+    test_message_sweeper_batches_and_shares_table()
+    print("✅ Все проверки пройдены")
@@ -0,0 +1,114 @@
+"""
+Тест версионных миграций схемы: старая база догоняется до последней версии,
+а при актуальной схеме старт делает один запрос
+
+Запуск:
+    python test_migrations.py
+"""
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+os.environ.setdefault('CLIENT_BOT_TOKEN', '123456:TEST-CLIENT-TOKEN')
+os.environ.setdefault('DRIVER_BOT_TOKEN', '654321:TEST-DRIVER-TOKEN')
+sys.path.insert(0, str(current_dir))
+
+from sqlalchemy import create_engine, event
+
+from core.config import DatabaseConfig
+from core.database import DatabaseManager
+from core.migrations import LATEST_VERSION
+from core.models import Base
+
+
+def _legacy_database(db_path: Path):
+    """База в состоянии до миграций: без полей ожидания и индексов, фото в vehicles"""
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    with sqlite3.connect(db_path) as conn:
+        for table in ('schema_version', 'vehicle_photos', 'outbox_messages'):
+            conn.execute(f"DROP TABLE {table}")
+        for index in ('ix_rides_driver_status_created', 'ix_rides_client_status_created',
+                      'ix_rides_status_created', 'ix_rides_completed_at'):
+            conn.execute(f"DROP INDEX {index}")
+        for column in ('waiting_minutes', 'waiting_cost', 'stops_log', 'budget', 'payment_method'):
+            conn.execute(f"ALTER TABLE rides DROP COLUMN {column}")
+        conn.execute("ALTER TABLE vehicles DROP COLUMN vehicle_type")
+        conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, products TEXT)")
+        conn.execute(
+            "INSERT INTO vehicles (id, driver_id, make, model, year, color, license_plate, seats, "
+            "photo, is_active, is_verified) "
+            "VALUES (1, 42, 'Mitsubishi', 'Lancer Sportback', 2012, 'Black', 'ZS 12345', 5, x'FFD8FF', 1, 0)"
+        )
+
+
+def _columns(db_path: Path, table: str) -> set:
+    with sqlite3.connect(db_path) as conn:
+        return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+async def _start(db_path: Path) -> int:
+    """Инициализировать менеджер и вернуть число SQL-запросов при старте"""
+    manager = DatabaseManager(DatabaseConfig(url=f"sqlite+aiosqlite:///{db_path}"))
+    statements = []
+
+    original_create_tables = manager.create_tables
+
+    async def counted_create_tables():
+        event.listen(manager.async_engine.sync_engine, "before_cursor_execute",
+                     lambda *args: statements.append(args[2]))
+        await original_create_tables()
+
+    manager.create_tables = counted_create_tables
+    await manager.initialize()
+    await manager.close()
+    return len(statements)
+
+
+def test_legacy_database_is_upgraded_then_single_lookup():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "legacy.db"
+        _legacy_database(db_path)
+
+        first = asyncio.run(_start(db_path))
+        rides = _columns(db_path, 'rides')
+        assert {'waiting_minutes', 'waiting_cost', 'stops_log', 'budget', 'payment_method'} <= rides
+        assert 'vehicle_type' in _columns(db_path, 'vehicles')
+        assert 'budget' in _columns(db_path, 'orders')
+
+        with sqlite3.connect(db_path) as conn:
+            versions = [row[0] for row in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+            vehicle = conn.execute("SELECT vehicle_type, seats FROM vehicles WHERE id = 1").fetchone()
+            indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+            photo = conn.execute("SELECT vehicle_id, file_size FROM vehicle_photos").fetchone()
+        assert versions == list(range(1, LATEST_VERSION + 1))
+        assert vehicle == ('HATCHBACK', 4)
+        assert 'ix_rides_driver_status_created' in indexes
+        assert photo == (1, 3)
+
+        second = asyncio.run(_start(db_path))
+        print(f"🗄️ запросов при старте: миграция {first}, актуальная схема {second}")
+        assert second == 1
+
+
+def test_fresh_database_gets_latest_version():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "fresh.db"
+        asyncio.run(_start(db_path))
+        with sqlite3.connect(db_path) as conn:
+            assert conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0] == LATEST_VERSION
+        assert asyncio.run(_start(db_path)) == 1
+
+
+if __name__ == "__main__":
+    print("🧪 ТЕСТ МИГРАЦИЙ СХЕМЫ")
+    print("=" * 60)
+    test_legacy_database_is_upgraded_then_single_lookup()
+    test_fresh_database_gets_latest_version()
+    print("✅ Все проверки пройдены")
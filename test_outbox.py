@@ -0,0 +1,325 @@
+"""
+Тест transactional outbox: сообщения записываются только при выигранном
+переходе и доставляются ровно один раз; воркеры отправляют по приоритету,
+повторяют сбои и переносят недоставляемое в dead-letter; остановка доводит
+начатую отправку до конца и возвращает захваченное в очередь; чат на паузе
+не задерживает остальные, аренду продлевает только ее владелец
+
+Запуск:
+    python test_outbox.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+os.environ.setdefault('CLIENT_BOT_TOKEN', '123456:TEST-CLIENT-TOKEN')
+os.environ.setdefault('DRIVER_BOT_TOKEN', '654321:TEST-DRIVER-TOKEN')
+sys.path.insert(0, str(current_dir))
+
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from core.config import DatabaseConfig
+from core.database import DatabaseManager
+from core.models import RideStatus, OutboxPriority
+from core.repositories.outbox import OutboxRepository
+from core.repositories.rides import RideRepository
+from core.services import outbox as outbox_service
+from core.services.fanout import get_rate_limiter
+from core.services.outbox import OutboxDispatcher, outbox_message
+from core.services.ride_state import RideStateMachine
+
+PARALLEL_DRIVERS = 20
+
+
+class RecordingBot:
+    """Бот, который запоминает отправленные сообщения"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, **params):
+        self.sent.append((chat_id, params))
+
+
+class FlakyBot(RecordingBot):
+    """Чат BLOCKED_CHAT заблокировал бота, FLAKY_CHAT отвечает ошибкой первые два раза"""
+
+    BLOCKED_CHAT = 4
+    FLAKY_CHAT = 5
+
+    def __init__(self):
+        super().__init__()
+        self.flaky_failures = 2
+
+    async def send_message(self, chat_id, **params):
+        if chat_id == self.BLOCKED_CHAT:
+            raise TelegramForbiddenError(method=None, message="bot was blocked by the user")
+        if chat_id == self.FLAKY_CHAT and self.flaky_failures:
+            self.flaky_failures -= 1
+            raise ConnectionError("network is unreachable")
+        await super().send_message(chat_id, **params)
+
+
+class SlowBot(RecordingBot):
+    """Бот, у которого отправка занимает заметное время"""
+
+    def __init__(self):
+        super().__init__()
+        self.started = asyncio.Event()
+
+    async def send_message(self, chat_id, **params):
+        self.started.set()
+        await asyncio.sleep(0.3)
+        await super().send_message(chat_id, **params)
+
+
+async def _scenario(tmp: str):
+    manager = DatabaseManager(DatabaseConfig(url=f"sqlite+aiosqlite:///{Path(tmp) / 'outbox.db'}"))
+    await manager.initialize()
+    try:
+        rides = RideRepository(db=manager)
+        outbox = OutboxRepository(db=manager)
+        machine = RideStateMachine(rides)
+
+        ride = await rides.create(
+            client_id=1001,
+            user_id=1001,
+            pickup_address="Wały Chrobrego 1, Szczecin",
+            pickup_lat=53.4285,
+            pickup_lng=14.5528,
+            destination_address="Galaxy, Szczecin",
+            destination_lat=53.4389,
+            destination_lng=14.5186,
+            estimated_price=Decimal('25.00'),
+            status=RideStatus.PENDING
+        )
+
+        keyboard = InlineKeyboardBuilder()
+        keyboard.button(text="📍", callback_data="show_driver_location")
+
+        def notify_client(order):
+            return [outbox_message(
+                "client", order.client_id, f"Kierowca {order.driver_id}",
+                reply_markup=keyboard.as_markup(), parse_mode="HTML"
+            )]
+
+        await asyncio.gather(*(
+            machine.accept(ride.id, 5000 + i, outbox=notify_client)
+            for i in range(PARALLEL_DRIVERS)
+        ))
+
+        # Проигравшие переходы ничего не записали
+        assert await outbox.count_by_status() == {'pending': 1}
+
+        client_bot = RecordingBot()
+        dispatchers = [
+            OutboxDispatcher(repository=outbox, bots={'client': client_bot, 'driver': RecordingBot()})
+            for _ in range(3)
+        ]
+        # Несколько диспетчеров (процессов) разбирают одну очередь
+        await asyncio.gather(*(dispatcher.dispatch_once() for dispatcher in dispatchers))
+
+        print(f"📨 {PARALLEL_DRIVERS} принятий -> отправлено сообщений: {len(client_bot.sent)}")
+        assert len(client_bot.sent) == 1
+        chat_id, params = client_bot.sent[0]
+        assert chat_id == 1001
+        assert params['reply_markup'].inline_keyboard[0][0].callback_data == "show_driver_location"
+        assert await outbox.count_by_status() == {'sent': 1}
+    finally:
+        await manager.close()
+
+
+async def _workers_scenario(tmp: str):
+    manager = DatabaseManager(DatabaseConfig(url=f"sqlite+aiosqlite:///{Path(tmp) / 'workers.db'}"))
+    await manager.initialize()
+    retry_base_delay = outbox_service.RETRY_BASE_DELAY
+    outbox_service.RETRY_BASE_DELAY = 0.05
+    try:
+        outbox = OutboxRepository(db=manager)
+        # Записаны в порядке, обратном приоритету
+        await outbox.enqueue([
+            outbox_message("driver", 1, "status", priority=OutboxPriority.STATUS),
+            outbox_message("driver", 2, "ride", priority=OutboxPriority.RIDE),
+            outbox_message("driver", 3, "offer", priority=OutboxPriority.OFFER),
+            outbox_message("driver", FlakyBot.BLOCKED_CHAT, "blocked"),
+            outbox_message("driver", FlakyBot.FLAKY_CHAT, "flaky"),
+        ])
+
+        driver_bot = FlakyBot()
+        dispatcher = OutboxDispatcher(
+            repository=outbox, bots={'driver': driver_bot}, poll_interval=0.05, workers_per_bot=1
+        )
+        await dispatcher.start()
+        try:
+            # Ждем состояния строк в БД: отправка в бот еще не означает mark_sent
+            for _ in range(100):
+                if await outbox.count_by_status() == {'sent': 4, 'dead': 1}:
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            await dispatcher.stop()
+
+        order = [chat_id for chat_id, _ in driver_bot.sent]
+        print(f"📨 Порядок отправки: {order}, статистика: {dispatcher.get_stats()}")
+        assert order[:3] == [3, 2, 1]
+        assert order[3] == FlakyBot.FLAKY_CHAT
+        assert dispatcher.stats['retried'] == 2
+        assert await outbox.count_by_status() == {'sent': 4, 'dead': 1}
+
+        dead = await outbox.list_dead()
+        assert [message.chat_id for message in dead] == [FlakyBot.BLOCKED_CHAT]
+        assert "blocked" in dead[0].last_error
+
+        # Из dead-letter сообщение можно вернуть в очередь вручную
+        assert await outbox.requeue_dead() == 1
+        assert await outbox.count_by_status() == {'sent': 4, 'pending': 1}
+    finally:
+        outbox_service.RETRY_BASE_DELAY = retry_base_delay
+        await manager.close()
+
+
+async def _stop_scenario(tmp: str):
+    manager = DatabaseManager(DatabaseConfig(url=f"sqlite+aiosqlite:///{Path(tmp) / 'stop.db'}"))
+    await manager.initialize()
+    try:
+        outbox = OutboxRepository(db=manager)
+        await outbox.enqueue([
+            outbox_message("client", 1, "slow"),
+            outbox_message("client", 2, "queued"),
+        ])
+
+        # Один воркер занят медленной отправкой - второе сообщение ждет в очереди
+        client_bot = SlowBot()
+        dispatcher = OutboxDispatcher(
+            repository=outbox, bots={'client': client_bot}, poll_interval=0.05, workers_per_bot=1
+        )
+        await dispatcher.start()
+        await asyncio.wait_for(client_bot.started.wait(), timeout=5)
+        await dispatcher.stop(timeout=0.1)
+
+        # Начатая отправка отмечена, захваченное без отправки вернулось в очередь
+        print(f"🛑 После остановки: {await outbox.count_by_status()}")
+        assert [chat_id for chat_id, _ in client_bot.sent] == [1]
+        assert await outbox.count_by_status() == {'sent': 1, 'pending': 1}
+        pending = await outbox.claim_batch(10, lease_seconds=60, bot='client')
+        assert [(message.chat_id, message.attempts) for message in pending] == [(2, 1)]
+    finally:
+        await manager.close()
+
+
+async def _paused_chat_scenario(tmp: str):
+    manager = DatabaseManager(DatabaseConfig(url=f"sqlite+aiosqlite:///{Path(tmp) / 'paused.db'}"))
+    await manager.initialize()
+    paused_chat, free_chat = 7001, 7002
+    try:
+        outbox = OutboxRepository(db=manager)
+        # Чат на паузе после RetryAfter, его сообщение первое по приоритету
+        get_rate_limiter('client').pause_chat(paused_chat, 60)
+        await outbox.enqueue([
+            outbox_message("client", paused_chat, "paused", priority=OutboxPriority.OFFER),
+            outbox_message("client", free_chat, "free", priority=OutboxPriority.STATUS),
+        ])
+
+        client_bot = RecordingBot()
+        dispatcher = OutboxDispatcher(
+            repository=outbox, bots={'client': client_bot}, poll_interval=0.05, workers_per_bot=1
+        )
+        await dispatcher.start()
+        try:
+            for _ in range(40):
+                if await outbox.count_by_status() == {'sent': 1, 'pending': 1}:
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            await dispatcher.stop()
+
+        # Единственный воркер не ждал паузу, сообщение вернулось в таблицу до ее конца
+        assert [chat_id for chat_id, _ in client_bot.sent] == [free_chat]
+        assert await outbox.count_by_status() == {'sent': 1, 'pending': 1}
+        assert await outbox.claim_batch(10, lease_seconds=60, bot='client') == []
+
+        # Аренду продлевает только владелец: после перехвата другим процессом - нет
+        await outbox.enqueue([outbox_message("driver", 1, "lease")])
+        [mine] = await outbox.claim_batch(1, lease_seconds=0, bot='driver')
+        assert await outbox.renew_lease(mine, 60)
+        assert await outbox.claim_batch(1, lease_seconds=60, bot='driver') == []
+        await outbox.renew_lease(mine, 0)
+        [other] = await outbox.claim_batch(1, lease_seconds=60, bot='driver')
+        assert other.id == mine.id
+        assert not await outbox.renew_lease(mine, 60)
+        assert await outbox.release([mine]) == 0
+    finally:
+        await manager.close()
+
+
+async def _own_bot_scenario(tmp: str):
+    manager = DatabaseManager(DatabaseConfig(url=f"sqlite+aiosqlite:///{Path(tmp) / 'own_bot.db'}"))
+    await manager.initialize()
+    try:
+        outbox = OutboxRepository(db=manager)
+        await outbox.enqueue([
+            outbox_message("client", 1, "client"),
+            outbox_message("driver", 2, "driver"),
+        ])
+
+        # Процесс клиентского бота не трогает сообщения водительского
+        client_bot, driver_bot = RecordingBot(), RecordingBot()
+        dispatcher = OutboxDispatcher(
+            repository=outbox, bots={'client': client_bot, 'driver': driver_bot}, poll_interval=0.05
+        )
+        await dispatcher.start(("client",))
+        try:
+            for _ in range(40):
+                if await outbox.count_by_status() == {'sent': 1, 'pending': 1}:
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            await dispatcher.stop()
+
+        assert [chat_id for chat_id, _ in client_bot.sent] == [1]
+        assert driver_bot.sent == []
+        [pending] = await outbox.claim_batch(10, lease_seconds=60, bot='driver')
+        assert (pending.chat_id, pending.attempts) == (2, 1)
+    finally:
+        await manager.close()
+
+
+def test_outbox_delivers_winner_message_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(_scenario(tmp))
+
+
+def test_outbox_workers_priority_retry_dead_letter():
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(_workers_scenario(tmp))
+
+
+def test_outbox_stop_finishes_inflight_and_releases_claimed():
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(_stop_scenario(tmp))
+
+
+def test_outbox_skips_paused_chat_and_keeps_lease():
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(_paused_chat_scenario(tmp))
+
+
+def test_outbox_claims_only_own_bot():
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(_own_bot_scenario(tmp))
+
+
+if __name__ == "__main__":
+    print("🧪 ТЕСТ OUTBOX")
+    print("=" * 60)
+    test_outbox_delivers_winner_message_once()
+    test_outbox_workers_priority_retry_dead_letter()
+    test_outbox_stop_finishes_inflight_and_releases_claimed()
+    test_outbox_skips_paused_chat_and_keeps_lease()
+    test_outbox_claims_only_own_bot()
+    print("✅ Все проверки пройдены")
@@ -0,0 +1,165 @@
+"""
+Тест машины состояний поездки: параллельные принятия заказа
+
+Запуск:
+    python test_ride_state_machine.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+os.environ.setdefault('CLIENT_BOT_TOKEN', '123456:TEST-CLIENT-TOKEN')
+os.environ.setdefault('DRIVER_BOT_TOKEN', '654321:TEST-DRIVER-TOKEN')
+sys.path.insert(0, str(current_dir))
+
+from core.config import DatabaseConfig
+from core.database import DatabaseManager
+from core.models import RideStatus
+from core.repositories.rides import RideRepository
+from core.services.ride_state import RideStateMachine
+
+PARALLEL_DRIVERS = 50
+
+
+async def _with_machine(scenario):
+    """Запустить сценарий на чистой временной БД"""
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = DatabaseManager(DatabaseConfig(url=f"sqlite+aiosqlite:///{Path(tmp) / 'rides.db'}"))
+        await manager.initialize()
+        try:
+            repository = RideRepository(db=manager)
+            await scenario(repository, RideStateMachine(repository))
+        finally:
+            await manager.close()
+
+
+async def _create_ride(repository: RideRepository):
+    return await repository.create(
+        client_id=1001,
+        user_id=1001,
+        pickup_address="Wały Chrobrego 1, Szczecin",
+        pickup_lat=53.4285,
+        pickup_lng=14.5528,
+        destination_address="Galaxy, Szczecin",
+        destination_lat=53.4389,
+        destination_lng=14.5186,
+        estimated_price=Decimal('25.00'),
+        status=RideStatus.PENDING
+    )
+
+
+async def _parallel_accepts(repository: RideRepository, machine: RideStateMachine):
+    ride = await _create_ride(repository)
+    driver_ids = [5000 + i for i in range(PARALLEL_DRIVERS)]
+
+    results = await asyncio.gather(*(
+        machine.accept(ride.id, driver_id, driver_name=f"Driver {driver_id}")
+        for driver_id in driver_ids
+    ))
+
+    winners = [driver_id for driver_id, result in zip(driver_ids, results) if result.won]
+    print(f"🏁 {PARALLEL_DRIVERS} параллельных принятий -> победителей: {len(winners)}")
+    assert len(winners) == 1, winners
+
+    stored = await repository.get(ride.id)
+    assert stored.status == RideStatus.ACCEPTED
+    assert stored.driver_id == winners[0]
+    assert all(result.ride.driver_id == winners[0] for result in results)
+
+
+async def _ownership_and_order(repository: RideRepository, machine: RideStateMachine):
+    ride = await _create_ride(repository)
+    assert (await machine.accept(ride.id, 7001)).won
+
+    # Чужой водитель не может менять статус
+    assert not (await machine.arrive(ride.id, 7002)).won
+    # Нельзя начать поездку до прибытия
+    assert not (await machine.start(ride.id, 7001)).won
+
+    assert (await machine.arrive(ride.id, 7001)).won
+    assert (await machine.start(ride.id, 7001)).won
+
+    # Завершение и отмена одновременно: выигрывает только одно
+    complete, cancel = await asyncio.gather(
+        machine.complete(ride.id, 7001, Decimal('30.00')),
+        machine.cancel(ride.id, "race", owner_driver_id=7001)
+    )
+    assert complete.won != cancel.won
+    print(f"🏁 complete vs cancel -> {'complete' if complete.won else 'cancel'}")
+
+    # Повторное завершение ничего не меняет
+    assert not (await machine.complete(ride.id, 7001, Decimal('99.00'))).won
+
+    missing = await machine.accept(999999, 7001)
+    assert not missing.won and not missing.found
+
+
+async def _completed_by_driver(repository: RideRepository, machine: RideStateMachine):
+    for driver_id in (7101, 7102):
+        ride = await _create_ride(repository)
+        assert (await machine.accept(ride.id, driver_id)).won
+        assert (await machine.arrive(ride.id, driver_id)).won
+        assert (await machine.start(ride.id, driver_id)).won
+        assert (await machine.complete(ride.id, driver_id, Decimal('30.00'))).won
+
+    week_ago = datetime.now() - timedelta(days=7)
+    own = await repository.list_completed_since(week_ago, driver_id=7101)
+    assert [ride.driver_id for ride in own] == [7101]
+    assert len(await repository.list_completed_since(week_ago)) == 2
+    assert await repository.list_completed_since(datetime.now() + timedelta(days=1), driver_id=7101) == []
+
+
+async def _cancel_active_for_driver(repository: RideRepository, machine: RideStateMachine):
+    driver_id = 7201
+    accepted, in_progress, other = [await _create_ride(repository) for _ in range(3)]
+    for ride in (accepted, in_progress):
+        assert (await machine.accept(ride.id, driver_id)).won
+    assert (await machine.accept(other.id, 7202)).won
+    assert (await machine.arrive(in_progress.id, driver_id)).won
+    assert (await machine.start(in_progress.id, driver_id)).won
+
+    # Завершение и сброс водителя одновременно: завершенная поездка не отменяется
+    completed, cancelled_ids = await asyncio.gather(
+        machine.complete(in_progress.id, driver_id, Decimal('30.00')),
+        repository.cancel_active_for_driver(driver_id, "Reset by driver command")
+    )
+    statuses = {ride_id: (await repository.get(ride_id)).status for ride_id in (accepted.id, in_progress.id)}
+    assert accepted.id in cancelled_ids
+    assert (in_progress.id in cancelled_ids) != completed.won
+    assert statuses[in_progress.id] == (RideStatus.COMPLETED if completed.won else RideStatus.CANCELLED)
+    assert statuses[accepted.id] == RideStatus.CANCELLED
+    assert (await repository.get(other.id)).status == RideStatus.ACCEPTED
+
+    # Повторный сброс - отменять нечего
+    assert await repository.cancel_active_for_driver(driver_id, "again") == []
+
+
+def test_parallel_accepts_single_winner():
+    asyncio.run(_with_machine(_parallel_accepts))
+
+
+def test_transitions_respect_owner_and_order():
+    asyncio.run(_with_machine(_ownership_and_order))
+
+
+def test_completed_since_filters_by_driver():
+    asyncio.run(_with_machine(_completed_by_driver))
+
+
+def test_cancel_active_for_driver_is_conditional():
+    asyncio.run(_with_machine(_cancel_active_for_driver))
+
+
+if __name__ == "__main__":
+    print("🧪 ТЕСТ МАШИНЫ СОСТОЯНИЙ ПОЕЗДКИ")
+    print("=" * 60)
+    test_parallel_accepts_single_winner()
+    test_transitions_respect_owner_and_order()
+    test_completed_since_filters_by_driver()
+    test_cancel_active_for_driver_is_conditional()
+    print("✅ Все проверки пройдены")
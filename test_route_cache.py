@@ -0,0 +1,101 @@
+"""
+Тест кэша маршрутов: близкие точки в том же интервале времени суток
+отвечают из кэша, другое время суток и другие ячейки - промах,
+вытеснение по размеру и TTL, повторный get_route не доходит до API
+
+Запуск:
+    python test_route_cache.py
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+os.environ.setdefault('CLIENT_BOT_TOKEN', '123456:TEST-CLIENT-TOKEN')
+os.environ.setdefault('DRIVER_BOT_TOKEN', '654321:TEST-DRIVER-TOKEN')
+sys.path.insert(0, str(current_dir))
+
+from aiohttp import web
+
+from core.services.maps_service import MapsService, Location
+from core.services.route_cache import RouteCache
+
+STATION = (53.4187, 14.5502)
+GALAXY = (53.4389, 14.5186)
+MORNING = datetime(2024, 5, 6, 8, 10)
+
+
+def test_route_cache_keys_and_eviction():
+    cache = RouteCache(cell_m=100, bucket_minutes=60, max_entries=2)
+    cache.put(STATION, GALAXY, 3.2, 11, "poly", at=MORNING)
+
+    # Точка в ~10 м и то же время суток - попадание
+    assert cache.get((STATION[0] + 0.0001, STATION[1]), GALAXY, at=MORNING.replace(minute=50)) == (3.2, 11, "poly")
+    # Другой час, обратное направление, далекая точка - промах
+    assert cache.get(STATION, GALAXY, at=MORNING.replace(hour=17)) is None
+    assert cache.get(GALAXY, STATION, at=MORNING) is None
+    assert cache.get((STATION[0] + 0.01, STATION[1]), GALAXY, at=MORNING) is None
+
+    # LRU: использованный маршрут остается, самый старый вытесняется
+    cache.put(GALAXY, STATION, 3.4, 12, at=MORNING)
+    assert cache.get(STATION, GALAXY, at=MORNING) is not None
+    cache.put(STATION, (53.43, 14.55), 1.5, 6, at=MORNING)
+    assert cache.get(GALAXY, STATION, at=MORNING) is None
+    assert cache.get(STATION, GALAXY, at=MORNING) is not None
+
+    stats = cache.get_stats()
+    assert stats['evicted'] == 1 and stats['size'] == 2
+    assert stats['hits'] == 3 and stats['misses'] == 4
+
+    # TTL
+    expiring = RouteCache(ttl=0)
+    expiring.put(STATION, GALAXY, 3.2, 11, at=MORNING)
+    assert expiring.get(STATION, GALAXY, at=MORNING) is None
+    assert expiring.get_stats()['expired'] == 1
+
+
+async def _scenario():
+    api_calls = []
+
+    async def directions(request: web.Request) -> web.Response:
+        api_calls.append(request.query['origin'])
+        return web.json_response({'status': 'OK', 'routes': [{
+            'overview_polyline': {'points': 'abc'},
+            'legs': [{'distance': {'value': 3200}, 'duration': {'value': 660},
+                      'steps': [{'html_instructions': 'Prosto'}]}]
+        }]})
+
+    app = web.Application()
+    app.router.add_get('/maps/api/directions/json', directions)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/maps/api"
+
+    cache = RouteCache()
+    service = MapsService(api_key='test-route', base_url=base_url, routes=cache)
+    try:
+        first = await service.get_route(Location(*STATION), Location(*GALAXY))
+        again = await service.get_route(Location(STATION[0] + 0.0001, STATION[1]), Location(*GALAXY))
+        assert (first.distance_km, first.duration_minutes, first.polyline) == (3.2, 11, 'abc')
+        assert (again.distance_km, again.duration_minutes, again.polyline) == (3.2, 11, 'abc')
+        assert len(api_calls) == 1
+        assert cache.get_stats()['hit_rate'] == 0.5
+    finally:
+        await service.close()
+        await runner.cleanup()
+
+
+def test_get_route_uses_cache():
+    asyncio.run(_scenario())
+
+
+if __name__ == "__main__":
+    print("🧪 ТЕСТ КЭША МАРШРУТОВ")
+    print("=" * 60)
+    test_route_cache_keys_and_eviction()
+    test_get_route_uses_cache()
+    print("✅ Все проверки пройдены")
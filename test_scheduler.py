@@ -0,0 +1,168 @@
+"""
+Тест планировщика отложенных задач: задачи переживают перезапуск,
+выполняются один раз при нескольких процессах, отмена не оставляет следов
+в памяти
+
+Запуск:
+    python test_scheduler.py
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+os.environ.setdefault('CLIENT_BOT_TOKEN', '123456:TEST-CLIENT-TOKEN')
+os.environ.setdefault('DRIVER_BOT_TOKEN', '654321:TEST-DRIVER-TOKEN')
+sys.path.insert(0, str(current_dir))
+
+from core.config import DatabaseConfig
+from core.database import DatabaseManager
+from core.models import ScheduledJob
+from core.repositories.jobs import JobRepository
+from core.services import scheduler as scheduler_module
+from core.services.scheduler import JobScheduler
+
+OUTSTANDING_TIMERS = 3000
+
+
+async def _manager(tmp: str) -> DatabaseManager:
+    manager = DatabaseManager(DatabaseConfig(url=f"sqlite+aiosqlite:///{Path(tmp) / 'jobs.db'}"))
+    await manager.initialize()
+    return manager
+
+
+async def _restart_scenario(tmp: str):
+    manager = await _manager(tmp)
+    jobs = JobRepository(db=manager)
+    fired = []
+
+    async def auto_cancel(order_id):
+        fired.append(order_id)
+
+    def make_scheduler():
+        scheduler = JobScheduler(jobs)
+        scheduler.register("order.auto_cancel", auto_cancel)
+        return scheduler
+
+    try:
+        first = make_scheduler()
+        await first.start()
+        await first.schedule("order.auto_cancel", 0.3, key="auto_cancel:1", order_id=1)
+        await first.schedule("order.auto_cancel", 0.3, key="auto_cancel:2", order_id=2)
+        assert await first.cancel("auto_cancel:2")
+        # Процесс остановлен до срока
+        await first.stop()
+        await asyncio.sleep(0.5)
+        assert fired == []
+
+        # После перезапуска оба бота загружают просроченную задачу, выполняет один
+        restarted = [make_scheduler(), make_scheduler()]
+        await asyncio.gather(*(scheduler.start() for scheduler in restarted))
+        for _ in range(100):
+            if fired and not any(scheduler._running_jobs for scheduler in restarted):
+                break
+            await asyncio.sleep(0.02)
+        for scheduler in restarted:
+            await scheduler.stop()
+
+        print(f"⏰ После перезапуска выполнено: {fired}")
+        assert fired == [1]
+        assert await jobs.count() == 0
+    finally:
+        await manager.close()
+
+
+async def _retry_scenario(tmp: str):
+    manager = await _manager(tmp)
+    retry_base_delay = scheduler_module.RETRY_BASE_DELAY
+    scheduler_module.RETRY_BASE_DELAY = 0.05
+    attempts = []
+
+    async def flaky(chat_id, message_id):
+        attempts.append(message_id)
+        if len(attempts) == 1:
+            raise ConnectionError("network is unreachable")
+
+    scheduler = JobScheduler(JobRepository(db=manager))
+    scheduler.register("driver.delete_message", flaky)
+    try:
+        await scheduler.start()
+        await scheduler.schedule("driver.delete_message", 0, key="delete_message:1:77", chat_id=1, message_id=77)
+        for _ in range(100):
+            if scheduler.stats['fired']:
+                break
+            await asyncio.sleep(0.02)
+        assert attempts == [77, 77]
+        assert scheduler.stats['failed'] == 1
+        assert await scheduler.repository.count() == 0
+    finally:
+        scheduler_module.RETRY_BASE_DELAY = retry_base_delay
+        await scheduler.stop()
+        await manager.close()
+
+
+async def _memory_scenario(tmp: str):
+    manager = await _manager(tmp)
+    now = datetime.now()
+    # Тысячи таймеров одной транзакцией: ближайшие и за горизонтом
+    async with manager.get_async_session() as session:
+        session.add_all(
+            ScheduledJob(key=f"{prefix}:{order_id}", name="order.auto_cancel",
+                         payload=json.dumps({'order_id': order_id}), run_at=now + timedelta(seconds=delay))
+            for prefix, delay in (("soon", 30), ("later", 3600))
+            for order_id in range(OUTSTANDING_TIMERS)
+        )
+
+    scheduler = JobScheduler(JobRepository(db=manager), horizon=60)
+    scheduler.register("order.auto_cancel", lambda order_id: asyncio.sleep(0))
+    try:
+        await scheduler.start()
+
+        # В памяти только задачи в пределах горизонта, не больше одной пачки
+        stats = scheduler.get_stats()
+        assert stats['in_memory'] == min(OUTSTANDING_TIMERS, scheduler_module.REFILL_BATCH)
+        assert all(key.startswith("soon:") for key in scheduler._active)
+
+        # Отмена - O(1) в памяти, heap уплотняется
+        for order_id in range(OUTSTANDING_TIMERS):
+            scheduler.discard(f"soon:{order_id}")
+        stats = scheduler.get_stats()
+        print(f"🧠 После отмены {OUTSTANDING_TIMERS} таймеров: {stats}")
+        assert stats['in_memory'] == 0
+        assert stats['heap_size'] <= scheduler_module.COMPACT_MIN
+
+        # Отмена через БД
+        assert await scheduler.cancel("later:0")
+        assert not await scheduler.cancel("later:0")
+        assert await scheduler.repository.count() == 2 * OUTSTANDING_TIMERS - 1
+    finally:
+        await scheduler.stop()
+        await manager.close()
+
+
+def test_scheduler_survives_restart_and_fires_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(_restart_scenario(tmp))
+
+
+def test_scheduler_retries_failed_job():
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(_retry_scenario(tmp))
+
+
+def test_scheduler_memory_stays_flat():
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(_memory_scenario(tmp))
+
+
+if __name__ == "__main__":
+    print("🧪 ТЕСТ ПЛАНИРОВЩИКА")
+    print("=" * 60)
+    test_scheduler_survives_restart_and_fires_once()
+    test_scheduler_retries_failed_job()
+    test_scheduler_memory_stays_flat()
+    print("✅ Все проверки пройдены")
@@ -0,0 +1,116 @@
+"""
+Тест SharedOrderStorage: постоянные соединения чтения видят записи
+координатора, синхронный и асинхронный интерфейсы согласованы, массовые
+выборки выполняются одним запросом
+
+Запуск:
+    python test_shared_storage.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+os.environ.setdefault('CLIENT_BOT_TOKEN', '123456:TEST-CLIENT-TOKEN')
+os.environ.setdefault('DRIVER_BOT_TOKEN', '654321:TEST-DRIVER-TOKEN')
+sys.path.insert(0, str(current_dir))
+
+from core.services.driver_notification import SharedOrderStorage, DriverNotificationService
+
+
+async def _scenario(storage: SharedOrderStorage):
+    await storage.add_order_async(1, {'pickup_address': "Wały Chrobrego 1", 'estimated_price': Decimal('25.50')})
+    storage.add_order(2, {'pickup_address': "Galaxy"})
+
+    # Запись через координатор сразу видна обоим соединениям чтения
+    assert storage.get_all_orders() == [1, 2]
+    assert await storage.get_all_orders_async() == [1, 2]
+    assert (await storage.get_order_async(1))['estimated_price'] == 25.5
+
+    await asyncio.gather(*(
+        storage.add_response_async(1, driver_id, "reject") for driver_id in range(10, 20)
+    ))
+    responses = await storage.get_responses_async(1)
+    assert responses == {driver_id: "reject" for driver_id in range(10, 20)}
+    assert storage.get_responses(1) == responses
+
+    await storage.add_message_async(10, 501, 1)
+    await storage.add_message_async(10, 502, 2)
+    assert sorted(await storage.get_driver_messages_async(10)) == [501, 502]
+    assert storage.get_driver_messages(10, 2) == [502]
+
+    await storage.remove_order_async(1)
+    assert await storage.get_order_async(1) == {}
+    assert storage.get_responses(1) == {}
+    assert storage.get_driver_messages(10) == [502]
+
+    # Соединения чтения открываются один раз на поток, а не на вызов
+    for _ in range(100):
+        storage.get_order(2)
+        await storage.get_order_async(2)
+    assert len(storage._connections) == 2
+
+
+def _bulk_scenario(storage: SharedOrderStorage):
+    for order_id in range(1, 6):
+        storage.add_order(order_id, {'order': order_id})
+    storage.add_response(1, 10, "reject")
+    storage.add_response(1, 11, "reject")
+    storage.add_response(3, 10, "accept")
+
+    statements = []
+    storage._connection().set_trace_callback(statements.append)
+
+    assert storage.has_order(3)
+    assert not storage.has_order(42)
+    assert storage.get_orders_bulk() == {order_id: {'order': order_id} for order_id in range(1, 6)}
+    assert storage.get_orders_bulk([2, 4, 42]) == {2: {'order': 2}, 4: {'order': 4}}
+    assert storage.get_responses_bulk() == {
+        1: {10: "reject", 11: "reject"}, 2: {}, 3: {10: "accept"}, 4: {}, 5: {}
+    }
+    assert storage.get_responses_bulk([1, 2]) == {1: {10: "reject", 11: "reject"}, 2: {}}
+
+    # Один запрос на вызов, а не N+1
+    assert len(statements) == 6
+
+    # Старый интерфейс сервиса построен на массовых выборках
+    service = DriverNotificationService.__new__(DriverNotificationService)
+    service.storage = storage
+    statements.clear()
+    assert 3 in service.pending_orders
+    assert service.driver_responses[3] == {10: "accept"}
+    assert len(statements) == 2
+
+    plan = storage._connection().execute(
+        "EXPLAIN QUERY PLAN SELECT 1 FROM pending_orders WHERE order_id = ?", (3,)
+    ).fetchall()
+    assert any("USING INTEGER PRIMARY KEY" in row[-1] for row in plan)
+
+
+def test_shared_storage_bulk_queries():
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SharedOrderStorage(Path(tmp) / "shared_orders.db")
+        try:
+            _bulk_scenario(storage)
+        finally:
+            storage.close()
+
+
+def test_shared_storage_persistent_connections():
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SharedOrderStorage(Path(tmp) / "shared_orders.db")
+        try:
+            asyncio.run(_scenario(storage))
+        finally:
+            storage.close()
+
+
+if __name__ == "__main__":
+    print("🧪 ТЕСТ SHARED ORDER STORAGE")
+    print("=" * 60)
+    test_shared_storage_persistent_connections()
+    test_shared_storage_bulk_queries()
+    print("✅ Все проверки пройдены")
@@ -0,0 +1,120 @@
+"""
+Тест координатора записи SQLite: group commit, изоляция ошибок, повторы блокировки
+
+Запуск:
+    python test_write_coordinator.py
+"""
+import asyncio
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+current_dir = Path(__file__).parent
+sys.path.insert(0, str(current_dir))
+
+from core.write_coordinator import SQLiteWriteCoordinator
+
+THREADS = 8
+WRITES_PER_THREAD = 100
+COROUTINES = 200
+
+
+def _create_table(db_path: Path):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, source TEXT NOT NULL)")
+
+
+def _count(db_path: Path) -> int:
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+
+def test_group_commit_from_threads_and_coroutines():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "events.db"
+        _create_table(db_path)
+        writer = SQLiteWriteCoordinator(db_path)
+
+        def thread_writes(n):
+            futures = [
+                writer.execute("INSERT INTO events (source) VALUES (?)", (f"thread-{n}",))
+                for _ in range(WRITES_PER_THREAD)
+            ]
+            for future in futures:
+                assert future.result().rowcount == 1
+
+        async def coroutine_writes():
+            results = await asyncio.gather(*(
+                writer.execute_async("INSERT INTO events (source) VALUES (?)", ("coroutine",))
+                for _ in range(COROUTINES)
+            ))
+            return {result.lastrowid for result in results}
+
+        threads = [threading.Thread(target=thread_writes, args=(n,)) for n in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        row_ids = asyncio.run(coroutine_writes())
+        for thread in threads:
+            thread.join()
+        writer.close()
+
+        total = THREADS * WRITES_PER_THREAD + COROUTINES
+        stats = writer.get_stats()
+        print(f"📦 {total} записей -> {stats['batches']} транзакций (средняя пачка {stats['avg_batch']})")
+        assert _count(db_path) == total
+        assert len(row_ids) == COROUTINES
+        assert stats['writes'] == total
+        assert stats['batches'] < total
+
+
+def test_failed_write_does_not_roll_back_batch():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "events.db"
+        _create_table(db_path)
+        writer = SQLiteWriteCoordinator(db_path, flush_interval=0.05)
+
+        good = writer.execute("INSERT INTO events (source) VALUES (?)", ("ok",))
+        bad = writer.execute("INSERT INTO events (source) VALUES (?)", (None,))
+        also_good = writer.execute("INSERT INTO events (source) VALUES (?)", ("ok",))
+
+        assert good.result().rowcount == 1
+        assert also_good.result().rowcount == 1
+        assert isinstance(bad.exception(), sqlite3.IntegrityError)
+        writer.close()
+
+        assert _count(db_path) == 2
+        assert writer.get_stats()['failed_writes'] == 1
+
+
+def test_lock_held_by_other_process_is_retried():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "events.db"
+        _create_table(db_path)
+        writer = SQLiteWriteCoordinator(db_path, busy_timeout_ms=10)
+        writer.flush()
+
+        # Другой процесс держит блокировку записи
+        other = sqlite3.connect(db_path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        future = writer.execute("INSERT INTO events (source) VALUES (?)", ("after-lock",))
+        time.sleep(0.3)
+        other.execute("COMMIT")
+        other.close()
+
+        assert future.result(timeout=10).rowcount == 1
+        writer.close()
+        retries = writer.get_stats()['lock_retries']
+        print(f"🔒 повторов блокировки: {retries}")
+        assert retries > 0
+
+
+if __name__ == "__main__":
+    print("🧪 ТЕСТ КООРДИНАТОРА ЗАПИСИ SQLITE")
+    print("=" * 60)
+    test_group_commit_from_threads_and_coroutines()
+    test_failed_write_does_not_roll_back_batch()
+    test_lock_held_by_other_process_is_retried()
+    print("✅ Все проверки пройдены")